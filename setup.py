@@ -47,6 +47,7 @@ setup(
     name=SFFTKRW_NAME,
     version=SFFTKRW_VERSION,
     packages=find_packages(),
+    py_modules=[u'sfftkrw_client'],
     author=SFFTKRW_AUTHOR,
     author_email=SFFTKRW_AUTHOR_EMAIL,
     description=SFFTKRW_DESCRIPTION,
@@ -61,6 +62,7 @@ setup(
     entry_points={
         'console_scripts': [
             '{} = sfftkrw.sffrw:main'.format(SFFTKRW_ENTRY_POINT),
+            '{}-client = sfftkrw_client:main'.format(SFFTKRW_ENTRY_POINT),
         ]
     },
 )
@@ -5,7 +5,7 @@ from .conf import SFFTKRW_VERSION, SFFTKRW_ENTRY_POINT
 
 BASE_DIR = os.path.dirname(__file__)
 
-VALID_EXTENSIONS = ['sff', 'xml', 'hff', 'h5', 'hdf5', 'json']
+VALID_EXTENSIONS = ['sff', 'xml', 'hff', 'h5', 'hdf5', 'json', 'sffz']
 EMDB_SFF_VERSION = '0.8.0.dev1'
 
 # in reverse order; add newer versions on top
@@ -0,0 +1,375 @@
+# -*- coding: utf-8 -*-
+# bench.py
+"""
+bench.py
+========
+
+Benchmarks for encoding and decoding EMDB-SFF data
+
+Run the mesh compression benchmark on the meshes of one or more EMDB-SFF files with
+
+.. code:: bash
+
+    python -m sfftkrw.core.bench file.sff [file.sff ...]
+
+If no files are given the meshes in the bundled test data are used.
+
+Measure the memory used per object when reading a synthetic segmentation with
+
+.. code:: bash
+
+    python -m sfftkrw.core.bench --memory [segments]
+
+The benchmark suite (:py:func:`run_benchmarks`; ``sff bench``) times every read/write path and codec at several
+sizes and records the peak memory of each; see :py:data:`BENCHMARKS`.
+"""
+from __future__ import division, print_function
+
+import datetime
+import gc
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import timeit
+import tracemalloc
+
+import numpy
+
+from .. import BASE_DIR
+from ..conf import SFFTKRW_VERSION
+from ..schema import FORMAT_CHARS, BIT_MODE
+
+__author__ = 'Paul K. Korir, PhD'
+__email__ = 'pkorir@ebi.ac.uk, paul.korir@gmail.com'
+__date__ = '2026-10-19'
+
+#: the compressions compared by :py:func:`bench_mesh_compression`; ``None`` is the uncompressed encoding
+MESH_COMPRESSIONS = [None, u'zlib', u'shuffle+zlib', u'delta+shuffle+zlib']
+
+#: meshes in the bundled test data
+MESH_TEST_FILES = [os.path.join(BASE_DIR, u'test_data', u'sff', u'v0.8', u'emd_3791.sff')]
+
+
+def _encoded_sequences(seg):
+    """Generator of (kind, :py:class:`numpy.ndarray`, mode) for all vertices, normals and triangles in ``seg``"""
+    for segment in seg.segment_list:
+        for mesh in segment.mesh_list:
+            yield u'vertices', mesh.vertices.data_array, mesh.vertices.mode
+            if mesh.normals is not None:
+                yield u'normals', mesh.normals.data_array, mesh.normals.mode
+            yield u'triangles', mesh.triangles.data_array, mesh.triangles.mode
+
+
+def bench_mesh_compression(fn, compressions=None, repeats=3):
+    """Measure the encoded size and the encoding/decoding throughput of the meshes in ``fn``
+
+    :param str fn: an EMDB-SFF file with meshes
+    :param list compressions: the compressions to compare (default: :py:data:`MESH_COMPRESSIONS`)
+    :param int repeats: the number of times to time each encode/decode; the best time is kept
+    :return: one ``dict`` per kind (``vertices``, ``normals``, ``triangles``) and compression with keys ``file``,
+        ``kind``, ``compression``, ``raw_bytes``, ``encoded_bytes``, ``ratio``, ``encode_mb_s`` and ``decode_mb_s``
+    :rtype: list
+    """
+    from ..schema.adapter_v0_8_0_dev1 import SFFSegmentation, SFFEncodedSequence
+    if compressions is None:
+        compressions = MESH_COMPRESSIONS
+    seg = SFFSegmentation.from_file(fn)
+    arrays = dict()
+    for kind, array, mode in _encoded_sequences(seg):
+        arrays.setdefault(kind, list()).append((array, mode))
+    results = list()
+    for kind, items in arrays.items():
+        raw_bytes = sum(numpy.dtype(FORMAT_CHARS[mode]).itemsize * array.size for array, mode in items)
+        for compression in compressions:
+            encoded = [SFFEncodedSequence._encode(array, mode=mode, compression=compression) for array, mode in items]
+
+            def _encode_all():
+                for array, mode in items:
+                    SFFEncodedSequence._encode(array, mode=mode, compression=compression)
+
+            def _decode_all():
+                for data, (_, mode) in zip(encoded, items):
+                    SFFEncodedSequence._decode(data, mode=mode, compression=compression)
+
+            encode_time = min(timeit.repeat(_encode_all, number=1, repeat=repeats))
+            decode_time = min(timeit.repeat(_decode_all, number=1, repeat=repeats))
+            encoded_bytes = sum(len(data) for data in encoded)
+            results.append({
+                u'file': os.path.basename(fn),
+                u'kind': kind,
+                u'compression': compression or u'none',
+                u'raw_bytes': raw_bytes,
+                u'encoded_bytes': encoded_bytes,
+                u'ratio': raw_bytes / encoded_bytes if encoded_bytes else 0.0,
+                u'encode_mb_s': raw_bytes / encode_time / 2 ** 20 if encode_time else float(u'inf'),
+                u'decode_mb_s': raw_bytes / decode_time / 2 ** 20 if decode_time else float(u'inf'),
+            })
+    return results
+
+
+def _synthetic_segmentation(segments, lattice=None):
+    """A shape segmentation with ``segments`` segments each with a colour, an annotation with one external reference
+    and one ellipsoid; with a ``lattice`` (a 3D :py:class:`numpy.ndarray`) each segment also has a 3D volume"""
+    from ..schema import adapter_v0_8_0_dev1 as adapter
+    seg = adapter.SFFSegmentation(
+        name=u'synthetic', primary_descriptor=u'shape_primitive_list', details=u'synthetic segmentation'
+    )
+    seg.software_list = adapter.SFFSoftwareList()
+    seg.transform_list = adapter.SFFTransformList()
+    seg.transform_list.append(adapter.SFFTransformationMatrix.from_array(numpy.eye(3, 4)))
+    if lattice is not None:
+        seg.lattice_list = adapter.SFFLatticeList()
+        lattice = adapter.SFFLattice.from_array(lattice, mode=u'auto')
+        lattice.id = 0  # referenced by the 3D volumes
+        seg.lattice_list.append(lattice)
+    # accessing `seg.segment_list` re-wraps every segment so we build the list separately
+    segment_list = adapter.SFFSegmentList()
+    for i in range(segments):
+        external_references = adapter.SFFExternalReferenceList()
+        external_references.append(adapter.SFFExternalReference(
+            resource=u'UniProt', url=u'https://www.uniprot.org/uniprot/P{:05d}'.format(i), accession=u'P{:05d}'.format(i)
+        ))
+        shape_primitive_list = adapter.SFFShapePrimitiveList()
+        shape_primitive_list.append(adapter.SFFEllipsoid(x=1.0, y=2.0, z=3.0, transform_id=0))
+        segment_list.append(adapter.SFFSegment(
+            id=i + 1, parent_id=0,
+            colour=adapter.SFFRGBA(red=0.1, green=0.2, blue=0.3, alpha=1.0),
+            biological_annotation=adapter.SFFBiologicalAnnotation(
+                name=u'segment {}'.format(i + 1), number_of_instances=1, external_references=external_references
+            ),
+            shape_primitive_list=shape_primitive_list,
+            three_d_volume=adapter.SFFThreeDVolume(lattice_id=0, value=float(i + 1)) if lattice is not None else None,
+        ))
+    seg.segment_list = segment_list
+    return seg
+
+
+def bench_memory(segments=100000):
+    """Measure the memory used by the objects of a segmentation with ``segments`` segments read from XML
+
+    :param int segments: the number of segments in the synthetic segmentation
+    :return: a ``dict`` with keys ``segments``, ``objects`` (the number of ``generateDS`` objects),
+        ``total_bytes`` (memory allocated while reading), ``bytes_per_object`` (the size of a ``generateDS``
+        object including its ``__dict__``, if any) and ``bytes_per_segment``
+    :rtype: dict
+    """
+    from ..schema import adapter_v0_8_0_dev1 as adapter
+    from ..schema.v0_8_0_dev1 import GeneratedsSuper
+    handle, fn = tempfile.mkstemp(suffix=u'.sff')
+    os.close(handle)
+    try:
+        _synthetic_segmentation(segments).export(fn)
+        gc.collect()
+        tracemalloc.start()
+        seg = adapter.SFFSegmentation.from_file(fn)
+        total_bytes, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        os.remove(fn)
+    objects = [obj for obj in gc.get_objects() if isinstance(obj, GeneratedsSuper)]
+    object_bytes = 0
+    for obj in objects:
+        object_bytes += sys.getsizeof(obj)
+        if getattr(obj, u'__dict__', None):  # only counts dictionaries which exist
+            object_bytes += sys.getsizeof(obj.__dict__)
+    del seg
+    return {
+        u'segments': segments,
+        u'objects': len(objects),
+        u'total_bytes': total_bytes,
+        u'bytes_per_object': object_bytes / len(objects),
+        u'bytes_per_segment': total_bytes / segments,
+    }
+
+
+#: the default sizes of :py:func:`run_benchmarks`; writing HDF5 files of 10000 segments takes tens of seconds
+BENCH_SIZES = [10, 100, 1000]
+
+#: the file formats read and written by the benchmark suite
+BENCH_FORMATS = [u'sff', u'hff', u'json']
+
+#: the lattice modes benchmarked: all of :py:data:`sfftkrw.schema.FORMAT_CHARS` and bit-packed masks
+LATTICE_MODES = sorted(FORMAT_CHARS) + [BIT_MODE]
+
+
+def _measure(func, repeats):
+    """The best time of ``repeats`` calls of ``func`` and the peak memory allocated (as traced by
+    :py:mod:`tracemalloc`, which includes ``numpy`` arrays) during one more call"""
+    seconds = min(timeit.repeat(func, number=1, repeat=repeats))
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return seconds, peak_bytes
+
+
+def _lattice_array(voxels, mode):
+    """A cubic lattice of about ``voxels`` voxels of ``mode`` with a few labels"""
+    edge = max(int(round(voxels ** (1 / 3))), 1)
+    if mode == BIT_MODE:
+        return numpy.random.randint(0, 2, size=(edge, edge, edge)).astype(numpy.uint8)
+    return numpy.random.randint(0, 100, size=(edge, edge, edge)).astype(FORMAT_CHARS[mode])
+
+
+def _vertices(count):
+    """``count`` vertices along a random walk (as consecutive mesh vertices are)"""
+    return numpy.cumsum(numpy.random.rand(count, 3) - 0.5, axis=0).astype(numpy.float32)
+
+
+def _triangles(count):
+    """``count`` triangles of a strip"""
+    first = numpy.arange(count, dtype=numpy.uint32)
+    return numpy.stack([first, first + 1, first + 2], axis=1)
+
+
+def bench_files(size, repeats, temp_dir):
+    """``from_file`` and ``export`` of a segmentation of ``size`` segments (see :py:func:`_synthetic_segmentation`)
+    with a lattice of ``100 * size`` voxels in each of :py:data:`BENCH_FORMATS`"""
+    from ..schema.adapter_v0_8_0_dev1 import SFFSegmentation
+    seg = _synthetic_segmentation(size, lattice=_lattice_array(100 * size, u'uint8'))
+    for format_ in BENCH_FORMATS:
+        fn = os.path.join(temp_dir, u'bench.{}'.format(format_))
+        seconds, peak_bytes = _measure(lambda: seg.export(fn), repeats)
+        yield u'export', format_, size, seconds, peak_bytes
+        seconds, peak_bytes = _measure(lambda: SFFSegmentation.from_file(fn), repeats)
+        yield u'from_file', format_, size, seconds, peak_bytes
+
+
+def bench_lattice_codecs(size, repeats, temp_dir):
+    """Lattice encoding and decoding of ``100 * size`` voxels in each of :py:data:`LATTICE_MODES`"""
+    from ..schema.adapter_v0_8_0_dev1 import SFFLattice, SFFVolumeStructure
+    for mode in LATTICE_MODES:
+        array = _lattice_array(100 * size, mode)
+        sections, rows, cols = array.shape
+        lattice_size = SFFVolumeStructure(rows=rows, cols=cols, sections=sections)
+        encoded = SFFLattice._encode(array, mode=mode)
+        seconds, peak_bytes = _measure(lambda: SFFLattice._encode(array, mode=mode), repeats)
+        yield u'lattice_encode', mode, array.size, seconds, peak_bytes
+        seconds, peak_bytes = _measure(lambda: SFFLattice._decode(encoded, lattice_size, mode=mode), repeats)
+        yield u'lattice_decode', mode, array.size, seconds, peak_bytes
+
+
+def bench_sequence_codecs(size, repeats, temp_dir):
+    """Encoding and decoding of ``10 * size`` vertices (``float32``) and triangles (``uint32``) with each of
+    :py:data:`MESH_COMPRESSIONS`"""
+    from ..schema.adapter_v0_8_0_dev1 import SFFEncodedSequence
+    for kind, array, mode in [(u'vertices', _vertices(10 * size), u'float32'),
+                              (u'triangles', _triangles(10 * size), u'uint32')]:
+        for compression in MESH_COMPRESSIONS:
+            variant = u'{}:{}'.format(kind, compression or u'none')
+            encoded = SFFEncodedSequence._encode(array, mode=mode, compression=compression)
+            seconds, peak_bytes = _measure(
+                lambda: SFFEncodedSequence._encode(array, mode=mode, compression=compression), repeats
+            )
+            yield u'sequence_encode', variant, len(array), seconds, peak_bytes
+            seconds, peak_bytes = _measure(
+                lambda: SFFEncodedSequence._decode(encoded, mode=mode, compression=compression), repeats
+            )
+            yield u'sequence_decode', variant, len(array), seconds, peak_bytes
+
+
+def bench_annotation(size, repeats, temp_dir):
+    """``merge_annotation``, ``get_by_id`` (of every segment) and validation of segmentations of ``size``
+    segments"""
+    seg, other_seg = _synthetic_segmentation(size), _synthetic_segmentation(size)
+    seconds, peak_bytes = _measure(lambda: seg.merge_annotation(other_seg, include_colour=True), repeats)
+    yield u'merge_annotation', None, size, seconds, peak_bytes
+    segment_list = seg.segment_list
+    segment_ids = list(segment_list.get_ids())
+
+    def _get_all():
+        for segment_id in segment_ids:
+            segment_list.get_by_id(segment_id)
+
+    seconds, peak_bytes = _measure(_get_all, repeats)
+    yield u'get_by_id', None, size, seconds, peak_bytes
+    seconds, peak_bytes = _measure(seg._is_valid, repeats)
+    yield u'validate', None, size, seconds, peak_bytes
+
+
+#: the benchmarks run by :py:func:`run_benchmarks` by name; each is a generator of (benchmark, variant, items,
+#: seconds, peak bytes) for one size
+BENCHMARKS = {
+    u'files': bench_files,
+    u'lattice_codecs': bench_lattice_codecs,
+    u'sequence_codecs': bench_sequence_codecs,
+    u'annotation': bench_annotation,
+}
+
+
+def run_benchmarks(sizes=None, repeats=3, benchmarks=None, callback=None):
+    """Run the benchmark suite
+
+    :param list sizes: the sizes to run each benchmark at (default: :py:data:`BENCH_SIZES`); the number of
+        segments in segmentations, of vertices and triangles in encoded sequences (times 10) and of voxels in lattices
+        (times 100)
+    :param int repeats: the number of times to time each operation; the best time is kept
+    :param list benchmarks: the names of the benchmarks to run (default: all of :py:data:`BENCHMARKS`)
+    :param callback: called with each result as it is measured e.g. to show progress
+    :return: the results with details of the environment (``sfftkrw_version``, ``python``, ``numpy``, ``h5py``,
+        ``platform``, ``date``, ``sizes`` and ``repeats``) and under ``results`` one ``dict`` per measurement with
+        keys ``benchmark``, ``variant`` (the format, mode or compression or ``None``), ``size``, ``items`` (the number
+        of segments, voxels or vertices/triangles processed), ``seconds`` and ``peak_bytes``
+    :rtype: dict
+    """
+    import h5py
+    if sizes is None:
+        sizes = BENCH_SIZES
+    if benchmarks is None:
+        benchmarks = list(BENCHMARKS)
+    report = {
+        u'sfftkrw_version': SFFTKRW_VERSION,
+        u'python': platform.python_version(),
+        u'numpy': numpy.__version__,
+        u'h5py': h5py.__version__,
+        u'platform': platform.platform(),
+        u'date': datetime.datetime.now().isoformat(),
+        u'sizes': list(sizes),
+        u'repeats': repeats,
+        u'results': list(),
+    }
+    temp_dir = tempfile.mkdtemp()
+    try:
+        for name in benchmarks:
+            for size in sizes:
+                for benchmark, variant, items, seconds, peak_bytes in BENCHMARKS[name](size, repeats, temp_dir):
+                    result = {
+                        u'benchmark': benchmark,
+                        u'variant': variant,
+                        u'size': size,
+                        u'items': int(items),
+                        u'seconds': seconds,
+                        u'peak_bytes': peak_bytes,
+                    }
+                    report[u'results'].append(result)
+                    if callback is not None:
+                        callback(result)
+    finally:
+        shutil.rmtree(temp_dir)
+    return report
+
+
+def main():
+    if sys.argv[1:2] == [u'--memory']:
+        r = bench_memory(int(sys.argv[2]) if len(sys.argv) > 2 else 100000)
+        print(u"{segments} segments; {objects} objects; {total_bytes} bytes; {bytes_per_object:.1f} bytes/object; "
+              u"{bytes_per_segment:.1f} bytes/segment".format(**r))
+        return 0
+    fns = sys.argv[1:] or MESH_TEST_FILES
+    print(u"{:<16} {:<10} {:<20} {:>12} {:>12} {:>7} {:>12} {:>12}".format(
+        u'file', u'kind', u'compression', u'raw', u'encoded', u'ratio', u'enc MB/s', u'dec MB/s'
+    ))
+    for fn in fns:
+        for r in bench_mesh_compression(fn):
+            print(u"{file:<16} {kind:<10} {compression:<20} {raw_bytes:>12} {encoded_bytes:>12} {ratio:>7.2f} "
+                   u"{encode_mb_s:>12.1f} {decode_mb_s:>12.1f}".format(**r))
+    return 0
+
+
+if __name__ == u'__main__':
+    sys.exit(main())
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+# cache.py
+"""
+cache.py
+========
+
+An on-disk, content-addressed cache of conversions
+
+Converting the same file to the same format with the same options always produces the same output. The
+:py:class:`ConversionCache` stores each output under a key computed from the content of the input file, the
+output format and the conversion options so that repeat conversions only cost a hash of the input and a file
+copy (or hardlink).
+
+.. code:: python
+
+    from sfftkrw.core.cache import ConversionCache
+
+    cache = ConversionCache(u'/path/to/cache', max_size=512 * 2 ** 20)
+    cache.convert(u'emd_1014.sff', u'emd_1014.hff')  # converts and stores
+    cache.convert(u'emd_1014.sff', u'emd_1014.hff')  # copies from the cache
+
+The cache is evicted in least-recently-used order whenever its total size exceeds ``max_size`` bytes.
+"""
+from __future__ import division, print_function
+
+import errno
+import hashlib
+import json
+import os
+import re
+import shutil
+
+from .print_tools import print_date
+from .utils import make_temporary_file
+from ..conf import SFFTKRW_VERSION
+
+__author__ = 'Paul K. Korir, PhD'
+__email__ = 'pkorir@ebi.ac.uk, paul.korir@gmail.com'
+__date__ = '2026-10-19'
+
+#: default maximum size of the cache in MiB
+DEFAULT_CACHE_SIZE = 1024
+
+#: conversion options which affect the output; each is read from ``args`` and included in the key
+CACHE_KEY_OPTIONS = [
+    (u'exclude_geometry', False),
+    (u'json_indent', 2),
+    (u'json_sort', False),
+    (u'details', None),
+    (u'primary_descriptor', None),
+    (u'annotation_index', False),
+    (u'hff_layout', u'groups'),
+    (u'hff_layout_version', 1),
+    (u'intern_transforms', False),
+    (u'transform_tolerance', 0.0),
+    (u'schema_extensions', False),
+]
+
+_CHUNK_SIZE = 2 ** 20
+
+
+def _output_format(fn):
+    """Return the canonical output format for the file name ``fn``
+
+    :param str fn: the output file name
+    :return: one of ``sff``, ``hff``, ``json`` or ``sffz``
+    :rtype: str
+    """
+    if re.match(r'.*\.(sff|xml)$', fn, re.IGNORECASE):
+        return u'sff'
+    elif re.match(r'.*\.(hff|h5|hdf5)$', fn, re.IGNORECASE):
+        return u'hff'
+    elif re.match(r'.*\.json$', fn, re.IGNORECASE):
+        return u'json'
+    elif re.match(r'.*\.sffz$', fn, re.IGNORECASE):
+        return u'sffz'
+    raise ValueError(u"Unknown file type {}".format(fn))
+
+
+class ConversionCache(object):
+    """A directory of converted files keyed by input content, output format and conversion options
+
+    :param str path: the cache directory; created if it does not exist
+    :param int max_size: the maximum total size of the cache in bytes
+    :param bool hardlink: hardlink (instead of copy) entries to their destination; only use this if the
+        outputs will never be modified in place since they share their content with the cache
+    """
+
+    def __init__(self, path, max_size=DEFAULT_CACHE_SIZE * 2 ** 20, hardlink=False):
+        self.path = path
+        self.max_size = max_size
+        self.hardlink = hardlink
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+
+    def key(self, from_file, output, args=None):
+        """Compute the key of converting ``from_file`` to ``output`` with the options in ``args``
+
+        :param str from_file: the input file
+        :param str output: the output file; only the extension is used
+        :param args: conversion options (see :py:data:`CACHE_KEY_OPTIONS`)
+        :type args: :py:class:`argparse.Namespace`
+        :return: a hexadecimal digest
+        :rtype: str
+        """
+        content = hashlib.sha256()
+        with open(from_file, u'rb') as f:
+            for chunk in iter(lambda: f.read(_CHUNK_SIZE), b''):
+                content.update(chunk)
+        description = {
+            u'input': content.hexdigest(),
+            u'format': _output_format(output),
+            u'sfftkrw_version': SFFTKRW_VERSION,
+            u'options': [[name, getattr(args, name, default)] for name, default in CACHE_KEY_OPTIONS],
+        }
+        return hashlib.sha256(json.dumps(description, sort_keys=True).encode(u'utf-8')).hexdigest()
+
+    def _entry(self, key):
+        return os.path.join(self.path, key[:2], key)
+
+    def _entries(self):
+        """List all entries as (last use, size, path)"""
+        entries = list()
+        for dirpath, _, filenames in os.walk(self.path):
+            for filename in filenames:
+                if filename.startswith(u'.'):  # incomplete entries
+                    continue
+                entry = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(entry)
+                except OSError:  # evicted by another process
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry))
+        return entries
+
+    @property
+    def size(self):
+        """The total size of the cache in bytes"""
+        return sum(size for _, size, _ in self._entries())
+
+    def fetch(self, key, output):
+        """Write the entry for ``key`` to ``output`` if it exists
+
+        :param str key: the key from :py:meth:`key`
+        :param str output: the destination
+        :return: ``True`` on a hit; ``False`` otherwise (including when another process evicts the entry while it
+            is being fetched)
+        :rtype: bool
+        """
+        entry = self._entry(key)
+        try:
+            os.utime(entry, None)  # mark as recently used
+        except OSError:
+            return False
+        if os.path.lexists(output):
+            os.remove(output)
+        if self.hardlink:
+            try:
+                os.link(entry, output)
+                return True
+            except OSError:  # e.g. on another device or evicted
+                pass
+        try:
+            shutil.copyfile(entry, output)
+        except (IOError, OSError) as error:
+            if error.errno != errno.ENOENT or os.path.exists(entry):
+                raise
+            # evicted since it was marked as used; a partial copy is possible if eviction happened mid-copy
+            if os.path.lexists(output):
+                os.remove(output)
+            return False
+        return True
+
+    def store(self, key, fn):
+        """Add the file ``fn`` to the cache under ``key`` then evict entries if the cache is too big
+
+        :param str key: the key from :py:meth:`key`
+        :param str fn: the converted file
+        """
+        entry = self._entry(key)
+        if not os.path.isdir(os.path.dirname(entry)):
+            os.makedirs(os.path.dirname(entry))
+        # copy then rename so that other processes never see partial entries
+        handle, tmp = make_temporary_file(os.path.dirname(entry))
+        os.close(handle)
+        try:
+            shutil.copyfile(fn, tmp)
+            os.rename(tmp, entry)
+        except Exception:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        self.evict()
+
+    def evict(self):
+        """Remove least-recently used entries until the cache is no larger than ``max_size``"""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in entries:
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(entry)
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self):
+        """Remove all entries"""
+        for _, _, entry in self._entries():
+            os.remove(entry)
+
+    def convert(self, from_file, output, args=None):
+        """Convert ``from_file`` to ``output`` using the cache
+
+        On a miss the file is converted as by ``sff convert`` (:py:func:`sfftkrw.sffrw.convert_file`) and the
+        result stored.
+
+        :param str from_file: the input file
+        :param str output: the output file; the extension determines the output format
+        :param args: conversion options (see :py:data:`CACHE_KEY_OPTIONS`)
+        :type args: :py:class:`argparse.Namespace`
+        :return int status: 0 on success
+        """
+        from ..sffrw import convert_file
+        key = self.key(from_file, output, args)
+        if self.fetch(key, output):
+            if getattr(args, u'verbose', False):
+                print_date(u"Retrieved {} from the conversion cache".format(output))
+            return 0
+        status = convert_file(from_file, output, args)
+        if status == 0:
+            self.store(key, output)
+        return status
@@ -0,0 +1,539 @@
+# -*- coding: utf-8 -*-
+# generate.py
+"""
+generate.py
+===========
+
+Generate synthetic EMDB-SFF segmentations of any size for scale testing
+
+A :py:class:`SegmentationGenerator` describes a segmentation by its number of segments, external references,
+lattices (shape, mode and sparsity), meshes (vertex and triangle counts) and shape primitives. Every value in the
+segmentation follows from these and a seed: each segment and each section of each lattice is made from its own
+random stream so that the same parameters always give the same segmentation. Segments and lattice sections are
+only made as they are written so that :py:meth:`SegmentationGenerator.write` streams segmentations far larger than
+memory (e.g. 10 GB stress inputs) to any EMDB-SFF format.
+
+.. code:: python
+
+    from sfftkrw.core.generate import SegmentationGenerator
+
+    generator = SegmentationGenerator(segments=100000, lattices=2, lattice_shape=(1024, 1024, 1024), seed=42)
+    generator.write(u'/path/to/stress.hff')
+
+or from the command line
+
+.. code:: bash
+
+    sff generate --segments 100000 --lattices 2 --lattice-shape 1024 1024 1024 --seed 42 /path/to/stress.hff
+
+Small segmentations may also be built in memory with :py:meth:`SegmentationGenerator.segmentation`.
+"""
+from __future__ import division, print_function
+
+import base64
+import io
+import json
+import re
+import tempfile
+import zipfile
+import zlib
+
+import h5py
+import numpy
+
+from . import _str
+from .print_tools import print_date
+from ..conf import SFFTKRW_VERSION
+from ..schema import FORMAT_CHARS, ENDIANNESS, BIT_MODE
+from ..schema import adapter_v0_8_0_dev1 as _v0_8
+from ..schema import v0_8_0_dev1 as _sff
+from ..schema.base import SFFValueError
+
+__author__ = 'Paul K. Korir, PhD'
+__email__ = 'pkorir@ebi.ac.uk, paul.korir@gmail.com'
+__date__ = '2026-10-19'
+
+#: the modes of generated lattices: all of :py:data:`sfftkrw.schema.FORMAT_CHARS` and bit-packed masks
+LATTICE_MODES = sorted(FORMAT_CHARS) + [BIT_MODE]
+
+#: the resources, URL templates and accession templates of generated external references
+RESOURCES = [
+    (u'UniProt', u'https://www.uniprot.org/uniprot/{}', u'P{:05d}'),
+    (u'EMDB', u'https://www.ebi.ac.uk/emdb/{}', u'EMD-{:05d}'),
+    (u'GO', u'http://purl.obolibrary.org/obo/{}', u'GO_{:07d}'),
+]
+
+#: the shape primitives generated and their dimensions
+SHAPES = [
+    (_v0_8.SFFCone, [u'height', u'bottom_radius']),
+    (_v0_8.SFFCuboid, [u'x', u'y', u'z']),
+    (_v0_8.SFFCylinder, [u'height', u'diameter']),
+    (_v0_8.SFFEllipsoid, [u'x', u'y', u'z']),
+]
+
+#: the side of the cubic bounding box in which meshes and shapes are placed
+EXTENT = 1000.0
+
+#: the number of segments written at a time to each table of the 'tables' HDF5 layout
+TABLE_BATCH = 1000
+
+#: the largest lattice payload (in bytes) written to HDF5 as a string; numpy has no larger string types so larger
+#: payloads are written as a chunked dataset of bytes
+HFF_STRING_LIMIT = 2 ** 31 - 1
+
+#: the size (in bytes) of each chunk of lattice payloads written to HDF5 as datasets of bytes
+HFF_PAYLOAD_CHUNK = 2 ** 24
+
+# the random streams of segments and lattice sections
+_SEGMENT, _LATTICE = 0, 1
+
+# stands in for a payload which is streamed into the output in its place
+_PAYLOAD = u'@payload@'
+
+
+def _append_table(group, name, table):
+    """Append the rows of the structured array ``table`` to the dataset ``name`` of ``group`` (created if need be)"""
+    if name not in group:
+        group.create_dataset(name, data=table, maxshape=(None,), chunks=True)
+    else:
+        dataset = group[name]
+        start = dataset.shape[0]
+        dataset.resize((start + len(table),))
+        dataset[start:] = table
+
+
+class SegmentationGenerator(object):
+    """A deterministic synthetic segmentation
+
+    Segment ``i`` (from 0) has the ID ``i + 1``, a random colour, a biological annotation with
+    ``external_references`` external references, ``meshes`` meshes of ``vertices`` vertices and ``triangles``
+    triangles and ``shapes`` shape primitives. With lattices, segment ``i`` is the voxels of value
+    ``i // lattices + 1`` in lattice ``i % lattices`` (segments whose value does not fit the mode have no 3D volume).
+    A fraction ``sparsity`` of the voxels of each lattice are 0 (background) and the rest belong to its segments at
+    random.
+
+    :param int segments: the number of segments
+    :param int external_references: the number of external references of each segment
+    :param int lattices: the number of lattices
+    :param tuple lattice_shape: the shape of the data of each lattice as decoded into
+        :py:attr:`sfftkrw.SFFLattice.data_array` i.e. (sections, rows, cols)
+    :param str lattice_mode: the mode of each lattice; one of :py:data:`LATTICE_MODES`
+    :param float sparsity: the fraction of the voxels of each lattice which are 0
+    :param int meshes: the number of meshes of each segment
+    :param int vertices: the number of vertices of each mesh
+    :param int triangles: the number of triangles of each mesh
+    :param int shapes: the number of shape primitives of each segment
+    :param int seed: the seed from which everything is generated
+    """
+
+    def __init__(self, segments=100, external_references=1, lattices=0, lattice_shape=(64, 64, 64),
+                 lattice_mode=u'uint8', sparsity=0.9, meshes=0, vertices=1000, triangles=2000, shapes=1, seed=0):
+        for name, value in [(u'segments', segments), (u'external_references', external_references),
+                            (u'lattices', lattices), (u'meshes', meshes), (u'triangles', triangles),
+                            (u'shapes', shapes)]:
+            if value < 0:
+                raise SFFValueError(u"invalid number of {}: {}".format(name, value))
+        if len(lattice_shape) != 3 or min(lattice_shape) <= 0:
+            raise SFFValueError(u"invalid lattice shape: {}".format(lattice_shape))
+        if lattice_mode not in LATTICE_MODES:
+            raise SFFValueError(u"invalid lattice mode '{}'; valid modes are: {}".format(
+                lattice_mode, u", ".join(LATTICE_MODES)
+            ))
+        if not 0 <= sparsity <= 1:
+            raise SFFValueError(u"invalid sparsity: {}; should be between 0 and 1".format(sparsity))
+        if vertices <= 0:
+            raise SFFValueError(u"invalid number of vertices: {}".format(vertices))
+        if not 0 <= seed < 2 ** 32:
+            raise SFFValueError(u"invalid seed: {}; should be between 0 and 2**32 - 1".format(seed))
+        self.segments = segments
+        self.external_references = external_references
+        self.lattices = lattices
+        self.lattice_shape = tuple(lattice_shape)
+        self.lattice_mode = lattice_mode
+        self.sparsity = sparsity
+        self.meshes = meshes
+        self.vertices = vertices
+        self.triangles = triangles
+        self.shapes = shapes
+        self.seed = seed
+
+    def __repr__(self):
+        return (u"SegmentationGenerator(segments={}, external_references={}, lattices={}, lattice_shape={}, "
+                u"lattice_mode={}, sparsity={}, meshes={}, vertices={}, triangles={}, shapes={}, seed={})").format(
+            self.segments, self.external_references, self.lattices, self.lattice_shape, self.lattice_mode,
+            self.sparsity, self.meshes, self.vertices, self.triangles, self.shapes, self.seed
+        )
+
+    def _random(self, *key):
+        """The random stream for ``key`` e.g. (:py:data:`_SEGMENT`, index)"""
+        return numpy.random.RandomState([self.seed] + list(key))
+
+    @property
+    def primary_descriptor(self):
+        if self.meshes:
+            return u'mesh_list'
+        elif self.lattices:
+            return u'three_d_volume'
+        return u'shape_primitive_list'
+
+    @property
+    def _max_value(self):
+        """The largest segment value a lattice can hold exactly"""
+        if self.lattice_mode == BIT_MODE:
+            return 1
+        dtype = numpy.dtype(FORMAT_CHARS[self.lattice_mode])
+        if dtype.kind == u'f':
+            return 2 ** (numpy.finfo(dtype).nmant + 1)
+        return int(numpy.iinfo(dtype).max)
+
+    def _values(self, index):
+        """The number of segments in lattice ``index`` (values 1 to this number)"""
+        if index >= self.segments:
+            return 0
+        return min((self.segments - index - 1) // self.lattices + 1, self._max_value)
+
+    def header(self):
+        """The segmentation without segments or lattices
+
+        :return seg: the segmentation with empty segment and lattice lists
+        :rtype seg: :py:class:`sfftkrw.SFFSegmentation`
+        """
+        seg = _v0_8.SFFSegmentation(
+            name=u'synthetic segmentation', primary_descriptor=self.primary_descriptor,
+            details=u'generated by {!r}'.format(self),
+        )
+        seg.software_list = _v0_8.SFFSoftwareList()
+        seg.software_list.append(_v0_8.SFFSoftware(
+            id=0, name=u'sfftk-rw', version=SFFTKRW_VERSION, processing_details=u'sff generate'
+        ))
+        seg.transform_list = _v0_8.SFFTransformList()
+        seg.transform_list.append(_v0_8.SFFTransformationMatrix.from_array(numpy.eye(3, 4), id=0))
+        seg.bounding_box = _v0_8.SFFBoundingBox(xmin=0.0, xmax=EXTENT, ymin=0.0, ymax=EXTENT, zmin=0.0, zmax=EXTENT)
+        seg.global_external_references = _v0_8.SFFGlobalExternalReferenceList()
+        seg.segment_list = _v0_8.SFFSegmentList()
+        seg.lattice_list = _v0_8.SFFLatticeList()
+        return seg
+
+    def segment(self, index):
+        """Segment ``index`` (from 0)
+
+        :param int index: the index of the segment
+        :return segment: the segment whose ID is ``index + 1``
+        :rtype segment: :py:class:`sfftkrw.SFFSegment`
+        """
+        rs = self._random(_SEGMENT, index)
+        # values are rounded so that they are written exactly to XML
+        red, green, blue = numpy.round(rs.random_sample(3), 3)
+        references = _v0_8.SFFExternalReferenceList()
+        for j in range(self.external_references):
+            resource, url, accession = RESOURCES[rs.randint(len(RESOURCES))]
+            accession = accession.format(rs.randint(100000))
+            references.append(_v0_8.SFFExternalReference(
+                id=index * self.external_references + j, resource=resource, url=url.format(accession),
+                accession=accession, label=u'{} {}'.format(resource, accession),
+            ))
+        segment = _v0_8.SFFSegment(
+            id=index + 1, parent_id=0,
+            colour=_v0_8.SFFRGBA(red=float(red), green=float(green), blue=float(blue), alpha=1.0),
+            biological_annotation=_v0_8.SFFBiologicalAnnotation(
+                name=u'segment {}'.format(index + 1), description=u'synthetic segment', number_of_instances=1,
+                external_references=references,
+            ),
+        )
+        if self.meshes:
+            segment.mesh_list = _v0_8.SFFMeshList()
+            for j in range(self.meshes):
+                # a blob of vertices about a random centre
+                centre = rs.uniform(0, EXTENT, 3)
+                vertices = rs.normal(centre, EXTENT / 100, size=(self.vertices, 3)).astype(numpy.float32)
+                triangles = rs.randint(0, self.vertices, size=(self.triangles, 3)).astype(numpy.uint32)
+                segment.mesh_list.append(_v0_8.SFFMesh(
+                    id=index * self.meshes + j,
+                    vertices=_v0_8.SFFVertices.from_array(vertices),
+                    triangles=_v0_8.SFFTriangles.from_array(triangles),
+                    transform_id=0,
+                ))
+        if self.shapes:
+            segment.shape_primitive_list = _v0_8.SFFShapePrimitiveList()
+            for j in range(self.shapes):
+                shape_class, dimensions = SHAPES[rs.randint(len(SHAPES))]
+                segment.shape_primitive_list.append(shape_class(
+                    id=index * self.shapes + j, transform_id=0,
+                    **dict((dimension, round(float(rs.uniform(1, EXTENT / 10)), 3)) for dimension in dimensions)
+                ))
+        if self.lattices and index // self.lattices + 1 <= self._max_value:
+            segment.three_d_volume = _v0_8.SFFThreeDVolume(
+                lattice_id=index % self.lattices, value=float(index // self.lattices + 1)
+            )
+        return segment
+
+    def iter_segments(self):
+        """Generator of all segments in turn; see :py:meth:`segment`"""
+        for index in range(self.segments):
+            yield self.segment(index)
+
+    def lattice(self, index):
+        """Lattice ``index`` (from 0) without its data
+
+        :param int index: the index (and ID) of the lattice
+        :return lattice: the lattice
+        :rtype lattice: :py:class:`sfftkrw.SFFLattice`
+        """
+        sections, rows, cols = self.lattice_shape
+        lattice = _v0_8.SFFLattice(new_obj=False)
+        lattice.id = index
+        lattice.mode = self.lattice_mode
+        lattice.endianness = u'little'
+        lattice.size = _v0_8.SFFVolumeStructure(rows=rows, cols=cols, sections=sections)
+        lattice.start = _v0_8.SFFVolumeIndex(rows=0, cols=0, sections=0)
+        return lattice
+
+    def iter_sections(self, index):
+        """Generator of the sections of lattice ``index`` in turn as arrays of shape (rows, cols)"""
+        _, rows, cols = self.lattice_shape
+        values = self._values(index)
+        dtype = numpy.uint8 if self.lattice_mode == BIT_MODE else FORMAT_CHARS[self.lattice_mode]
+        for section in range(self.lattice_shape[0]):
+            rs = self._random(_LATTICE, index, section)
+            background = rs.random_sample((rows, cols)) < self.sparsity
+            if values:
+                voxels = rs.randint(1, values + 1, size=(rows, cols))
+                voxels[background] = 0
+            else:
+                voxels = numpy.zeros((rows, cols), dtype=numpy.int64)
+            yield voxels.astype(dtype)
+
+    def lattice_array(self, index):
+        """All the data of lattice ``index`` as a :py:class:`numpy.ndarray` of shape :py:attr:`lattice_shape`"""
+        return numpy.stack(list(self.iter_sections(index)))
+
+    def iter_payload(self, index):
+        """Generator of the encoded data (base64 of the zlib-compressed voxels) of lattice ``index`` in pieces as
+        bytes; the whole payload is never held in memory"""
+        compressor = zlib.compressobj()
+        pending = [b'']  # compressed bytes to be base64-encoded in whole groups of 3
+        dtype = numpy.dtype(u'{}{}'.format(
+            ENDIANNESS[u'little'], FORMAT_CHARS[self.lattice_mode] if self.lattice_mode != BIT_MODE else u'B'
+        ))
+
+        def _encode(data, final=False):
+            compressed = pending[0] + compressor.compress(data)
+            if final:
+                compressed += compressor.flush()
+                end = len(compressed)
+            else:
+                end = len(compressed) // 3 * 3
+            pending[0] = compressed[end:]
+            return base64.b64encode(compressed[:end])
+
+        bits = numpy.zeros(0, dtype=numpy.uint8)  # voxels of binary masks still to be packed 8 to the byte
+        for section in self.iter_sections(index):
+            if self.lattice_mode == BIT_MODE:
+                bits = numpy.concatenate([bits, section.reshape(-1)])
+                end = len(bits) // 8 * 8
+                data, bits = numpy.packbits(bits[:end]).tobytes(), bits[end:]
+            else:
+                data = section.astype(dtype).tobytes()
+            yield _encode(data)
+        yield _encode(numpy.packbits(bits).tobytes(), final=True)
+
+    def segmentation(self):
+        """The whole segmentation in memory; only for small segmentations
+
+        :return seg: the segmentation
+        :rtype seg: :py:class:`sfftkrw.SFFSegmentation`
+        """
+        seg = self.header()
+        segment_list = _v0_8.SFFSegmentList()
+        for segment in self.iter_segments():
+            segment_list.append(segment)
+        seg.segment_list = segment_list
+        for index in range(self.lattices):
+            lattice = self.lattice(index)
+            seg.lattice_list.append(_v0_8.SFFLattice(
+                id=index, mode=lattice.mode, endianness=lattice.endianness, size=lattice.size, start=lattice.start,
+                data=self.lattice_array(index),
+            ))
+        return seg
+
+    def write(self, fn, args=None):
+        """Stream the segmentation to the file ``fn``
+
+        Only one segment and one section of a lattice are made at a time. The output is the same as that of
+        :py:meth:`sfftkrw.SFFSegmentation.export` of :py:meth:`segmentation` except that JSON is written with one
+        segment per line. The encoded data of each lattice is written to a temporary file for HDF5 output; encoded
+        data larger than :py:data:`HFF_STRING_LIMIT` is written as a chunked dataset of bytes rather than a string
+        (which :py:meth:`sfftkrw.SFFSegmentation.from_file` reads either way).
+
+        :param str fn: the output file; the extension (``.sff``, ``.hff``, ``.json`` or ``.sffz``) determines the
+            format
+        :param args: parsed arguments; ``hff_layout`` and ``hff_layout_version`` apply to HDF5 output and
+            ``schema_extensions`` must be set to write lattices of mode :py:data:`BIT_MODE`
+        :type args: :py:class:`argparse.Namespace`
+        :return int status: 0 on success; 65 if the lattices are of mode :py:data:`BIT_MODE` and
+            ``schema_extensions`` is not set
+        """
+        if self.lattices and self.lattice_mode == BIT_MODE and not _v0_8._schema_extensions(args):
+            print_date(u"Lattice mode '{}' is an extension of the EMDB-SFF schema; use --schema-extensions to write "
+                       u"it".format(BIT_MODE))
+            return 65
+        if re.match(r'.*\.(sff|xml)$', fn, re.IGNORECASE):
+            self._write_xml(fn)
+        elif re.match(r'.*\.(hff|h5|hdf5)$', fn, re.IGNORECASE):
+            self._write_hff(fn, args=args)
+        elif re.match(r'.*\.json$', fn, re.IGNORECASE):
+            with io.open(fn, u'w', encoding=u'utf-8') as f:
+                for piece in self._json(self._json_segments(), (self._json_lattice(i) for i in range(self.lattices))):
+                    f.write(piece)
+        elif re.match(r'.*\.sffz$', fn, re.IGNORECASE):
+            self._write_sffz(fn)
+        else:
+            raise SFFValueError(u"invalid EMDB-SFF file name: {}".format(fn))
+        return 0
+
+    def _lattice_parts(self, index, export):
+        """The text before and after the data of lattice ``index`` in the output of ``export`` (a function of the
+        lattice returning text)"""
+        lattice = self.lattice(index)
+        lattice.data = _PAYLOAD
+        before, after = export(lattice).split(_PAYLOAD)
+        return before, after
+
+    def _write_xml(self, fn):
+        header = self.header()
+        local = header._local
+        # the segment and lattice lists are written here and the details come after them
+        details = local.details
+        local.segment_list = local.lattice_list = local.details = None
+        with io.open(fn, u'w', encoding=u'utf-8') as f:
+            f.write(u'<?xml version="1.0" encoding="UTF-8"?>\n<segmentation')
+            local.exportAttributes(f, 0, set())
+            f.write(u'>\n')
+            local.exportChildren(f, 1)
+            _sff.showIndent(f, 1)
+            f.write(u'<segment_list>\n')
+            for segment in self.iter_segments():
+                segment._local.export(f, 2, name_=u'segment')
+            _sff.showIndent(f, 1)
+            f.write(u'</segment_list>\n')
+            _sff.showIndent(f, 1)
+            f.write(u'<lattice_list>\n')
+            for index in range(self.lattices):
+                def _export(lattice):
+                    text = io.StringIO()
+                    lattice._local.export(text, 2, name_=u'lattice')
+                    return text.getvalue()
+
+                before, after = self._lattice_parts(index, _export)
+                f.write(before)
+                for piece in self.iter_payload(index):
+                    f.write(piece.decode(u'ascii'))
+                f.write(after)
+            _sff.showIndent(f, 1)
+            f.write(u'</lattice_list>\n')
+            if details is not None:
+                _sff.showIndent(f, 1)
+                f.write(u'<details>{}</details>\n'.format(_sff.quote_xml(details)))
+            f.write(u'</segmentation>\n')
+
+    def _json(self, segments, lattices):
+        """Generator of the pieces of the JSON document with the segments and lattices given as iterables of the
+        JSON of each segment and of the pieces of the JSON of each lattice"""
+        data = self.header().as_json()
+        del data[u'segment_list'], data[u'lattice_list']
+        yield json.dumps(data)[:-1] + u', "segment_list": ['
+        for i, segment in enumerate(segments):
+            yield (u',\n' if i else u'\n') + segment
+        yield u'\n], "lattice_list": ['
+        for i, lattice in enumerate(lattices):
+            yield u',\n' if i else u'\n'
+            for piece in lattice:
+                yield piece
+        yield u'\n]}\n'
+
+    def _json_segments(self):
+        for segment in self.iter_segments():
+            yield json.dumps(segment.as_json())
+
+    def _json_lattice(self, index):
+        before, after = self._lattice_parts(index, lambda lattice: json.dumps(lattice.as_json()))
+        yield before
+        for piece in self.iter_payload(index):
+            yield piece.decode(u'ascii')
+        yield after
+
+    def _write_hff(self, fn, args=None):
+        with h5py.File(fn, u'w') as f:
+            self.header().as_hff(f, args=args)
+            group = f.create_group(u'segment_list')
+            if _v0_8._hff_layout(args) == u'tables':
+                group.attrs[u'layout'] = u'tables'
+                group.create_group(u'shapes')
+                batch, offset = list(), 0
+                for index, segment in enumerate(self.iter_segments()):
+                    batch.append(segment._local)
+                    if len(batch) == TABLE_BATCH or index == self.segments - 1:
+                        for name, rows, columns in _v0_8.SFFSegmentList._table_rows(batch, offset=offset):
+                            if rows:
+                                _append_table(group, name, _v0_8._make_table(rows, columns))
+                        batch, offset = list(), offset + len(batch)
+                if u'segments' not in group:
+                    group.create_dataset(u'segments', data=_v0_8._make_table([], _v0_8.SFFSegmentList.segment_columns))
+            else:
+                for segment in self.iter_segments():
+                    segment.as_hff(group, args=args)
+            group = f.create_group(u'lattice_list')
+            for index in range(self.lattices):
+                self.lattice(index).as_hff(group, args=args)
+                with tempfile.TemporaryFile() as payload:
+                    for piece in self.iter_payload(index):
+                        payload.write(piece)
+                    payload.flush()
+                    size = payload.tell()
+                    if size <= HFF_STRING_LIMIT:
+                        # h5py only writes strings from memory; a mapped fixed-length string is paged in as it is
+                        # written
+                        group[u'{}/data'.format(index)] = numpy.memmap(
+                            payload, dtype=u'S{}'.format(size), mode=u'r', shape=()
+                        )
+                    else:
+                        data = group[_str(index)].create_dataset(
+                            u'data', shape=(size,), dtype=numpy.uint8, chunks=(min(size, HFF_PAYLOAD_CHUNK),)
+                        )
+                        payload.seek(0)
+                        for start in range(0, size, HFF_PAYLOAD_CHUNK):
+                            piece = payload.read(HFF_PAYLOAD_CHUNK)
+                            data[start:start + len(piece)] = numpy.frombuffer(piece, dtype=numpy.uint8)
+
+    def _write_sffz(self, fn):
+        with zipfile.ZipFile(fn, u'w', zipfile.ZIP_STORED, allowZip64=True) as zf:
+            with tempfile.TemporaryFile(mode=u'w+') as segments:
+                # the metadata refers to the arrays so the JSON of the segments is kept aside until they are written
+                for index, segment in enumerate(self.iter_segments()):
+                    if segment._local.mesh_list is not None:
+                        for j, mesh in enumerate(segment._local.mesh_list.mesh):
+                            for kind in [u'vertices', u'normals', u'triangles']:
+                                local = getattr(mesh, kind)
+                                if local is None:
+                                    continue
+                                name = u'segment_list/{}/mesh_list/{}/{}.npy'.format(index, j, kind)
+                                _v0_8._write_npy_member(zf, name, numpy.asarray(
+                                    local._data_array, dtype=_v0_8._payload_dtype(local.mode, local.endianness)
+                                ))
+                                local.data, local._data_crc = name, None
+                    segments.write(json.dumps(segment.as_json()) + u'\n')
+                lattices = list()
+                for index in range(self.lattices):
+                    name = u'lattice_list/{}.npy'.format(index)
+                    _v0_8._write_npy_chunks(
+                        zf, name, self.lattice_shape, _v0_8._payload_dtype(self.lattice_mode, u'little'),
+                        self.iter_sections(index)
+                    )
+                    lattice = self.lattice(index)
+                    lattice.data = name
+                    lattices.append([json.dumps(lattice.as_json())])
+                segments.seek(0)
+                info = zipfile.ZipInfo(_v0_8.SFFZ_METADATA, date_time=(1980, 1, 1, 0, 0, 0))
+                with zf.open(info, u'w', force_zip64=True) as f:
+                    for piece in self._json((line.rstrip(u'\n') for line in segments), lattices):
+                        f.write(piece.encode(u'utf-8'))
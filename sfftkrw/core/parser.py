@@ -13,9 +13,12 @@ import os
 import re
 
 from . import _dict_iter_keys
+from .cache import DEFAULT_CACHE_SIZE
 from .print_tools import print_date
+from .serve import DEFAULT_SOCKET
 from .. import SFFTKRW_VERSION, SFFTKRW_ENTRY_POINT, SUPPORTED_EMDB_SFF_VERSIONS
 from ..core import _decode, _basestring
+from ..schema import HFF_LAYOUTS, HFF_LAYOUT_VERSIONS
 
 __author__ = 'Paul K. Korir, PhD'
 __email__ = 'pkorir@ebi.ac.uk, paul.korir@gmail.com'
@@ -88,6 +91,7 @@ FORMAT_LIST = [
     ('sff', 'XML'),
     ('hff', 'HDF5'),
     ('json', 'JSON'),
+    ('sffz', 'SFFZ container'),
 ]
 format_ = {
     'args': ['-f', '--format'],
@@ -131,7 +135,7 @@ output = {
     'args': ['-o', '--output'],
     'kwargs': {
         'default': None,
-        'help': "file to convert to; the extension (.sff, .hff, .json) determines the output format [default: None]"
+        'help': "file to convert to; the extension (.sff, .hff, .json, .sffz) determines the output format [default: None]"
     }
 }
 primary_descriptor = {
@@ -162,6 +166,113 @@ json_indent = {
         'help': "size in spaces of the JSON indent [default: 2]"
     }
 }
+annotation_index = {
+    'args': ['--annotation-index'],
+    'kwargs': {
+        'default': False,
+        'action': 'store_true',
+        'help': "include an index from external reference accessions, resources and URLs to segment IDs in HDF5 "
+                "output [default: False]"
+    }
+}
+hff_layout = {
+    'args': ['--hff-layout'],
+    'kwargs': {
+        'default': HFF_LAYOUTS[0],
+        'choices': HFF_LAYOUTS,
+        'help': "how to lay out large collections (e.g. shape primitives) in HDF5 output: one group per object "
+                "('groups') or one table per kind of object ('tables'); both are readable [default: {}]".format(
+            HFF_LAYOUTS[0])
+    }
+}
+hff_layout_version = {
+    'args': ['--hff-layout-version'],
+    'kwargs': {
+        'type': int,
+        'default': HFF_LAYOUT_VERSIONS[0],
+        'choices': HFF_LAYOUT_VERSIONS,
+        'help': "how to store small values (IDs, modes, names, etc.) in HDF5 output: as scalar datasets (1) or as "
+                "attributes of their group (2; faster and smaller but not readable by older releases); both are "
+                "readable [default: {}]".format(HFF_LAYOUT_VERSIONS[0])
+    }
+}
+hff_workers = {
+    'args': ['--hff-workers'],
+    'kwargs': {
+        'type': int,
+        'default': None,
+        'metavar': 'N',
+        'help': "read the segments and lattices of HDF5 input in N worker processes [default: read in this process]"
+    }
+}
+intern_transforms = {
+    'args': ['--intern-transforms'],
+    'kwargs': {
+        'default': False,
+        'action': 'store_true',
+        'help': "keep only one copy of identical transformation matrices and update the references to them "
+                "[default: False]"
+    }
+}
+transform_tolerance = {
+    'args': ['--transform-tolerance'],
+    'kwargs': {
+        'type': float,
+        'default': 0.0,
+        'help': "the largest difference between values of transformation matrices considered identical by "
+                "--intern-transforms [default: 0.0]"
+    }
+}
+cache_dir = {
+    'args': ['--cache-dir'],
+    'kwargs': {
+        'default': None,
+        'help': "reuse previous conversions of identical files (with the same options) stored in this directory; "
+                "the cache is disabled by default [default: None]"
+    }
+}
+cache_size = {
+    'args': ['--cache-size'],
+    'kwargs': {
+        'type': int,
+        'default': DEFAULT_CACHE_SIZE,
+        'help': "maximum size of the conversion cache in MiB; least recently used conversions are removed "
+                "first [default: {}]".format(DEFAULT_CACHE_SIZE)
+    }
+}
+cache_hardlink = {
+    'args': ['--cache-hardlink'],
+    'kwargs': {
+        'default': False,
+        'action': 'store_true',
+        'help': "hardlink outputs to the conversion cache instead of copying them; outputs must then never be "
+                "modified in place [default: False]"
+    }
+}
+schema_extensions = {
+    'args': ['--schema-extensions'],
+    'kwargs': {
+        'default': False,
+        'action': 'store_true',
+        'help': "allow extensions of the EMDB-SFF schema in the output e.g. lattices of mode 'bit' [default: False]"
+    }
+}
+server = {
+    'args': ['--server'],
+    'kwargs': {
+        'default': None,
+        'metavar': 'SOCKET',
+        'help': "run on the server (see 'sff serve') listening on this socket instead of in this process [default: None]"
+    }
+}
+workers = {
+    'args': ['-w', '--workers'],
+    'kwargs': {
+        'type': int,
+        'default': None,
+        'help': "number of worker processes [default: number of CPUs]"
+    }
+}
 verbose = {
     'args': ['-v', '--verbose'],
     'kwargs': {
@@ -184,6 +295,17 @@ convert_parser.add_argument(*verbose['args'], **verbose['kwargs'])
 add_args(convert_parser, exclude_geometry)
 add_args(convert_parser, json_indent)
 add_args(convert_parser, json_sort)
+add_args(convert_parser, annotation_index)
+add_args(convert_parser, hff_layout)
+add_args(convert_parser, hff_layout_version)
+add_args(convert_parser, hff_workers)
+add_args(convert_parser, intern_transforms)
+add_args(convert_parser, transform_tolerance)
+add_args(convert_parser, schema_extensions)
+add_args(convert_parser, cache_dir)
+add_args(convert_parser, cache_size)
+add_args(convert_parser, cache_hardlink)
+add_args(convert_parser, server)
 group = convert_parser.add_mutually_exclusive_group()
 group.add_argument(*output['args'], **output['kwargs'])
 group.add_argument(*format_['args'], **format_['kwargs'])
@@ -193,10 +315,113 @@ group.add_argument(*format_['args'], **format_['kwargs'])
 # =========================================================================
 view_parser = subparsers.add_parser(
     'view', description="View a summary of an SFF file", help="view file summary")
-view_parser.add_argument('from_file', help="any SFF file")
+view_parser.add_argument('from_file', help="any SFF file; a directory with --batch")
 view_parser.add_argument(
     '--sff-version', action='store_true', help="show SFF format version")
+view_parser.add_argument(
+    '--batch', action='store_true', default=False,
+    help="write one CSV row summarising each EMDB-SFF file in the directory tree at from_file [default: False]")
+add_args(view_parser, workers)
 view_parser.add_argument(*verbose['args'], **verbose['kwargs'])
+add_args(view_parser, server)
+
+# =========================================================================
+# validate subparser
+# =========================================================================
+validate_parser = subparsers.add_parser(
+    'validate', description="Check that EMDB-SFF files can be read and have all the required attributes",
+    help="validate EMDB-SFF files")
+validate_parser.add_argument('from_file', nargs='+', help="EMDB-SFF files (.sff, .hff, .json, .sffz)")
+validate_parser.add_argument(*verbose['args'], **verbose['kwargs'])
+add_args(validate_parser, server)
+
+# =========================================================================
+# upgrade subparser
+# =========================================================================
+upgrade_parser = subparsers.add_parser(
+    'upgrade', description="Upgrade an EMDB-SFF v0.7.0.dev0 file to v0.8.0.dev1 reading meshes directly into "
+                           "arrays", help="upgrade v0.7 files to v0.8")
+upgrade_parser.add_argument('from_file', help="a v0.7 .sff or .hff file")
+upgrade_parser.add_argument(*output['args'], **output['kwargs'])
+add_args(upgrade_parser, json_indent)
+add_args(upgrade_parser, json_sort)
+add_args(upgrade_parser, hff_layout)
+upgrade_parser.add_argument(*verbose['args'], **verbose['kwargs'])
+
+# =========================================================================
+# bench subparser
+# =========================================================================
+bench_parser = subparsers.add_parser(
+    'bench', description="Time reading, writing, encoding and decoding synthetic EMDB-SFF data at several sizes and "
+                         "record the peak memory of each; results are written as JSON",
+    help="run performance benchmarks")
+bench_parser.add_argument(
+    '-s', '--sizes', type=int, nargs='+', default=None,
+    help="the sizes to run each benchmark at: the number of segments in segmentations, of vertices and triangles in "
+         "encoded sequences (x 10) and of voxels in lattices (x 100) [default: 10 100 1000]")
+bench_parser.add_argument(
+    '-r', '--repeats', type=int, default=3,
+    help="the number of times to time each operation; the best time is kept [default: 3]")
+bench_parser.add_argument(
+    '-b', '--benchmarks', nargs='+', default=None,
+    help="the benchmarks to run; any of: files, lattice_codecs, sequence_codecs, annotation [default: all]")
+bench_parser.add_argument(
+    '-o', '--output', default=None, help="JSON file to write the results to [default: standard output]")
+bench_parser.add_argument(*verbose['args'], **verbose['kwargs'])
+
+# =========================================================================
+# generate subparser
+# =========================================================================
+generate_parser = subparsers.add_parser(
+    'generate', description="Generate a synthetic EMDB-SFF segmentation of any size for scale testing; segments and "
+                            "lattices are streamed to the output and the same options always give the same "
+                            "segmentation",
+    help="generate synthetic segmentations")
+generate_parser.add_argument(
+    'output', help="file to write; the extension (.sff, .hff, .json, .sffz) determines the output format")
+generate_parser.add_argument(
+    '-n', '--segments', type=int, default=100, help="the number of segments [default: 100]")
+generate_parser.add_argument(
+    '-e', '--external-references', type=int, default=1,
+    help="the number of external references of each segment [default: 1]")
+generate_parser.add_argument(
+    '-l', '--lattices', type=int, default=0,
+    help="the number of lattices; the segments are shared among them as 3D volumes [default: 0]")
+generate_parser.add_argument(
+    '--lattice-shape', type=int, nargs=3, default=[64, 64, 64], metavar=('SECTIONS', 'ROWS', 'COLS'),
+    help="the shape of each lattice [default: 64 64 64]")
+generate_parser.add_argument(
+    '--lattice-mode', default='uint8',
+    help="the mode of each lattice: int8, uint8, int16, uint16, int32, uint32, int64, uint64, float32, float64 or "
+         "bit (with --schema-extensions) [default: uint8]")
+generate_parser.add_argument(
+    '--sparsity', type=float, default=0.9,
+    help="the fraction of the voxels of each lattice which are 0 (background) [default: 0.9]")
+generate_parser.add_argument(
+    '-m', '--meshes', type=int, default=0, help="the number of meshes of each segment [default: 0]")
+generate_parser.add_argument(
+    '--vertices', type=int, default=1000, help="the number of vertices of each mesh [default: 1000]")
+generate_parser.add_argument(
+    '--triangles', type=int, default=2000, help="the number of triangles of each mesh [default: 2000]")
+generate_parser.add_argument(
+    '-p', '--shapes', type=int, default=1, help="the number of shape primitives of each segment [default: 1]")
+generate_parser.add_argument(
+    '--seed', type=int, default=0, help="the seed from which the segmentation is generated [default: 0]")
+add_args(generate_parser, hff_layout)
+add_args(generate_parser, hff_layout_version)
+add_args(generate_parser, schema_extensions)
+generate_parser.add_argument(*verbose['args'], **verbose['kwargs'])
+
+# =========================================================================
+# serve subparser
+# =========================================================================
+serve_parser = subparsers.add_parser(
+    'serve', description="Run convert, view and validate jobs on a pool of warm worker processes",
+    help="serve jobs over a local socket")
+serve_parser.add_argument('-s', '--socket', default=DEFAULT_SOCKET,
+                          help="path of the Unix domain socket to listen on [default: {}]".format(DEFAULT_SOCKET))
+add_args(serve_parser, workers)
+serve_parser.add_argument(*verbose['args'], **verbose['kwargs'])
 
 # get the full list of tools from the Parser object
 tool_list = ['all', 'core', 'schema', 'main']
@@ -252,7 +477,8 @@ def parse_args(_args, use_shlex=False):
                 "sfftk-rw version: {} for EMDB-SFF {}".format(SFFTKRW_VERSION, ', '.join(SUPPORTED_EMDB_SFF_VERSIONS)))
             return 0
         # anytime a new argument is added to the base parser subparsers are bumped down in index
-        elif _args[0] in _dict_iter_keys(Parser._actions[2].choices):
+        # `bench` runs with its defaults
+        elif _args[0] in _dict_iter_keys(Parser._actions[2].choices) and _args[0] != 'bench':
             exec('{}_parser.print_help()'.format(_args[0]))
             return 0
     # parse arguments
@@ -261,7 +487,16 @@ def parse_args(_args, use_shlex=False):
     # check values
     # view
     if args.subcommand == 'view':
-        pass  # no view-specific checks yet
+        if args.batch:
+            if not os.path.isdir(args.from_file):
+                print_date("Invalid directory for --batch: {}".format(args.from_file))
+                return 64
+        if args.workers is not None:
+            try:
+                assert args.workers > 0
+            except AssertionError:
+                print_date("Invalid value for --workers: {}".format(args.workers))
+                return 64
     # convert
     elif args.subcommand == 'convert':
         # we only use the first file in sfftk-rw; sfftk may use more than one file
@@ -334,6 +569,118 @@ def parse_args(_args, use_shlex=False):
             if args.json_sort and args.verbose:
                 print_date("JSON keys will be sorted lexicographically")
 
+        # validate the number of HDF5 readers
+        if args.hff_workers is not None:
+            try:
+                assert args.hff_workers > 0
+            except AssertionError:
+                print_date("Invalid value for --hff-workers: {}".format(args.hff_workers))
+                return 64
+
+        # validate the tolerance for interning transforms
+        try:
+            assert args.transform_tolerance >= 0
+        except AssertionError:
+            print_date("Invalid value for --transform-tolerance: {}".format(args.transform_tolerance))
+            return 64
+
+        # validate the conversion cache
+        if args.cache_dir is not None:
+            try:
+                assert args.cache_size > 0
+            except AssertionError:
+                print_date("Invalid value for --cache-size: {}".format(args.cache_size))
+                return 64
+            if args.verbose:
+                print_date("Using conversion cache in {} ({} MiB)".format(args.cache_dir, args.cache_size))
+
+    # upgrade
+    elif args.subcommand == 'upgrade':
+        if not re.match(r'.*\.(sff|xml|hff|h5|hdf5)$', args.from_file, re.IGNORECASE):
+            print_date("Only .sff and .hff files can be upgraded: {}".format(args.from_file))
+            return 64
+        # as for convert: file.sff to file.hff and file.hff to file.sff
+        if args.output is None:
+            stem = ".".join(os.path.basename(args.from_file).split('.')[:-1])
+            if re.match(r'.*\.(sff|xml)$', args.from_file, re.IGNORECASE):
+                args.output = os.path.join(os.path.dirname(args.from_file), stem + '.hff')
+            else:
+                args.output = os.path.join(os.path.dirname(args.from_file), stem + '.sff')
+            if args.verbose:
+                print_date("Setting output file to {}".format(args.output))
+
+    # bench
+    elif args.subcommand == 'bench':
+        from .bench import BENCHMARKS
+        if args.sizes is not None:
+            try:
+                assert all(size > 0 for size in args.sizes)
+            except AssertionError:
+                print_date("Invalid value for --sizes: {}".format(" ".join(map(str, args.sizes))))
+                return 64
+        try:
+            assert args.repeats > 0
+        except AssertionError:
+            print_date("Invalid value for --repeats: {}".format(args.repeats))
+            return 64
+        if args.benchmarks is not None:
+            for benchmark in args.benchmarks:
+                try:
+                    assert benchmark in BENCHMARKS
+                except AssertionError:
+                    print_date("Unknown benchmark: {}; valid benchmarks are: {}".format(
+                        benchmark, ", ".join(BENCHMARKS)))
+                    return 64
+
+    # generate
+    elif args.subcommand == 'generate':
+        from .generate import LATTICE_MODES
+        if not re.match(r'.*\.(sff|xml|hff|h5|hdf5|json|sffz)$', args.output, re.IGNORECASE):
+            print_date("Invalid output file: {}; the extension should be one of .sff, .hff, .json or .sffz".format(
+                args.output))
+            return 64
+        for option in ['segments', 'external_references', 'lattices', 'meshes', 'triangles', 'shapes']:
+            try:
+                assert getattr(args, option) >= 0
+            except AssertionError:
+                print_date("Invalid value for --{}: {}".format(option.replace('_', '-'), getattr(args, option)))
+                return 64
+        try:
+            assert min(args.lattice_shape) > 0
+        except AssertionError:
+            print_date("Invalid value for --lattice-shape: {}".format(" ".join(map(str, args.lattice_shape))))
+            return 64
+        try:
+            assert args.lattice_mode in LATTICE_MODES
+        except AssertionError:
+            print_date("Invalid value for --lattice-mode: {}; valid modes are: {}".format(
+                args.lattice_mode, ", ".join(LATTICE_MODES)))
+            return 64
+        try:
+            assert 0 <= args.sparsity <= 1
+        except AssertionError:
+            print_date("Invalid value for --sparsity: {}; should be between 0 and 1".format(args.sparsity))
+            return 64
+        try:
+            assert args.vertices > 0
+        except AssertionError:
+            print_date("Invalid value for --vertices: {}".format(args.vertices))
+            return 64
+        try:
+            assert 0 <= args.seed < 2 ** 32
+        except AssertionError:
+            print_date("Invalid value for --seed: {}; should be between 0 and 4294967295".format(args.seed))
+            return 64
+
+    # serve
+    elif args.subcommand == 'serve':
+        if args.workers is not None:
+            try:
+                assert args.workers > 0
+            except AssertionError:
+                print_date("Invalid value for --workers: {}".format(args.workers))
+                return 64
+
     # tests
     elif args.subcommand == 'tests':
         # normalise tool list
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+# serve.py
+"""
+serve.py
+========
+
+A long-lived conversion service
+
+Every ``sff`` command pays for starting the interpreter and importing ``h5py``, ``lxml``, ``numpy`` and the
+``generateDS`` modules before doing any real work. ``sff serve`` keeps a pool of warm worker processes
+listening on a Unix domain socket so that small jobs complete in milliseconds.
+
+.. code:: bash
+
+    sff serve --socket /tmp/sfftkrw.sock --workers 4 &
+    sff convert --server /tmp/sfftkrw.sock file.sff -o file.hff
+    sff-client --socket /tmp/sfftkrw.sock view file.hff
+
+``sff-client`` (:py:mod:`sfftkrw_client`) sends the job without importing ``sfftkrw`` at all.
+
+The protocol is one JSON object per line in each direction. A request has the command-line arguments of the job
+(``argv``; the first item is ``convert``, ``view`` or ``validate``) and the working directory of the client
+(``cwd``) against which relative paths are resolved::
+
+    {"argv": ["convert", "file.sff", "-o", "file.hff"], "cwd": "/data"}
+
+The response has the exit status and whatever the job wrote to ``stdout`` and ``stderr``::
+
+    {"status": 0, "stdout": "", "stderr": "..."}
+"""
+from __future__ import division, print_function
+
+import errno
+import importlib
+import json
+import os
+import signal
+import socket
+import socketserver
+import stat
+import sys
+import tempfile
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+from sfftkrw_client import DEFAULT_SOCKET, submit
+
+from .print_tools import print_date
+from .. import SUPPORTED_EMDB_SFF_VERSIONS
+
+__author__ = 'Paul K. Korir, PhD'
+__email__ = 'pkorir@ebi.ac.uk, paul.korir@gmail.com'
+__date__ = '2026-10-19'
+
+#: jobs accepted by the server
+JOBS = [u'convert', u'view', u'validate']
+
+
+def _warm_up():
+    """Import the adapters (and therefore ``h5py``, ``lxml`` and ``numpy``) once per worker"""
+    for schema_version in SUPPORTED_EMDB_SFF_VERSIONS:
+        importlib.import_module(u'sfftkrw.schema.adapter_v{schema_version}'.format(
+            schema_version=schema_version.replace(u'.', u'_')
+        ))
+
+
+def _run(argv):
+    """Run a single job; output goes to the (redirected) standard streams
+
+    :param list argv: the job's command-line arguments
+    :return int status: exit status
+    """
+    from .parser import parse_args
+    from ..sffrw import handle_convert, handle_view, handle_validate
+    args = parse_args(argv)
+    if not hasattr(args, u'subcommand'):  # parse_args returns an exit status on failure
+        return args
+    if args.subcommand == u'convert':
+        return handle_convert(args)
+    elif args.subcommand == u'validate':
+        return handle_validate(args)
+    return handle_view(args)
+
+
+def run_job(argv, cwd):
+    """Run a job in a worker process capturing everything written to ``stdout`` and ``stderr``
+
+    The streams are redirected at the file descriptor level so that output from extension modules and from
+    functions which hold a reference to :py:obj:`sys.stderr` (e.g. :py:func:`.print_date`) is also captured.
+
+    :param list argv: the job's command-line arguments
+    :param str cwd: the directory against which relative paths are resolved
+    :return: the response
+    :rtype: dict
+    """
+    captured = [tempfile.TemporaryFile(), tempfile.TemporaryFile()]
+    streams = [sys.stdout, sys.stderr]
+    saved_cwd = os.getcwd()  # workers are reused so jobs must not change each other's directory
+    saved = list()
+    for stream, capture in zip(streams, captured):
+        stream.flush()
+        saved.append(os.dup(stream.fileno()))
+        os.dup2(capture.fileno(), stream.fileno())
+    try:
+        os.chdir(cwd)
+        if not argv or argv[0] not in JOBS:
+            print_date(u"Invalid job {}; valid jobs are: {}".format(argv[:1], u", ".join(JOBS)))
+            status = 64
+        else:
+            status = _run(argv)
+    except SystemExit as e:
+        status = e.code if isinstance(e.code, int) else 1
+    except Exception:
+        traceback.print_exc()
+        status = 1
+    finally:
+        os.chdir(saved_cwd)
+        outputs = list()
+        for stream, capture, fd in zip(streams, captured, saved):
+            stream.flush()
+            os.dup2(fd, stream.fileno())
+            os.close(fd)
+            capture.seek(0)
+            outputs.append(capture.read().decode(u'utf-8', u'replace'))
+            capture.close()
+    return {u'status': status, u'stdout': outputs[0], u'stderr': outputs[1]}
+
+
+class _JobHandler(socketserver.StreamRequestHandler):
+    """Pass each request line to the worker pool and write back the response"""
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line.decode(u'utf-8'))
+                future = self.server.pool.submit(run_job, request[u'argv'], request.get(u'cwd', os.getcwd()))
+                response = future.result()
+            except Exception as e:
+                response = {u'status': 1, u'stdout': u'', u'stderr': u"{}: {}\n".format(type(e).__name__, e)}
+            self.wfile.write(json.dumps(response).encode(u'utf-8') + b'\n')
+            self.wfile.flush()
+
+
+def _remove_stale_socket(socket_path):
+    """Remove the socket ``socket_path`` left behind by a server which is no longer running
+
+    :raises OSError: if ``socket_path`` is not a socket or a server is listening on it
+    """
+    try:
+        mode = os.lstat(socket_path).st_mode
+    except OSError:
+        return  # nothing to remove
+    if not stat.S_ISSOCK(mode):
+        raise OSError(errno.EEXIST, u"{} exists and is not a socket".format(socket_path))
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socket_path)
+    except socket.error:
+        os.remove(socket_path)  # no one is listening
+        return
+    finally:
+        client.close()
+    raise OSError(errno.EADDRINUSE, u"a server is already listening on {}".format(socket_path))
+
+
+class JobServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """A Unix domain socket server which runs jobs on a pool of warm worker processes
+
+    :param str socket_path: the path of the socket; a stale socket (on which no server is listening) is replaced
+    :param int workers: the number of worker processes (default: number of CPUs)
+    :raises OSError: if ``socket_path`` exists and is not a socket or a server is already listening on it
+    """
+    daemon_threads = True
+
+    def __init__(self, socket_path=DEFAULT_SOCKET, workers=None):
+        _remove_stale_socket(socket_path)
+        self.pool = ProcessPoolExecutor(max_workers=workers, initializer=_warm_up)
+        socketserver.UnixStreamServer.__init__(self, socket_path, _JobHandler)
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+        self.pool.shutdown()
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def serve(socket_path=DEFAULT_SOCKET, workers=None, verbose=False):
+    """Serve jobs until interrupted (``SIGINT`` or ``SIGTERM``)
+
+    :param str socket_path: the path of the socket
+    :param int workers: the number of worker processes
+    :param bool verbose: report when the server starts and stops
+    :return int status: exit status
+    """
+    signal.signal(signal.SIGTERM, _interrupt)
+    try:
+        server = JobServer(socket_path, workers=workers)
+    except OSError as os_error:
+        print_date(u"Unable to serve on {}: {}".format(socket_path, os_error.strerror or os_error))
+        return 73
+    if verbose:
+        print_date(u"Serving on {}".format(socket_path))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if verbose:
+            print_date(u"Stopped serving on {}".format(socket_path))
+    return 0
@@ -0,0 +1,341 @@
+# -*- coding: utf-8 -*-
+# store.py
+"""
+store.py
+========
+
+A directory of compressed chunks for very large lattices
+
+A :py:class:`LatticeStore` holds the voxels of one lattice as a regular grid of zlib-compressed chunk files
+together with a JSON manifest (``manifest.json``) of the lattice's mode, endianness, shape, chunk shape, start and
+ID. Several processes may write different (even overlapping) regions of the same store at once:
+:py:meth:`LatticeStore.write_region` locks each chunk it modifies and every chunk is replaced atomically so that
+readers never see a partial chunk.
+
+.. code:: python
+
+    from sfftkrw.core.store import LatticeStore
+
+    store = LatticeStore.create(u'/path/to/store', shape=(512, 512, 512), mode=u'uint8')
+    store.write_region((0, 0, 256), numpy.ones((512, 512, 256), dtype=numpy.uint8))  # e.g. in another process
+    region = store.read_region((0, 0, 0), (64, 64, 64))
+    lattice = store.to_lattice()
+
+Regions are given in the axis order of :py:attr:`sfftkrw.SFFLattice.data_array` i.e. (sections, rows, cols).
+Chunks which have never been written read as zeros. Use :py:func:`export_lattices` and :py:func:`import_lattices`
+to move lattices between EMDB-SFF files and stores.
+"""
+from __future__ import division, print_function
+
+import contextlib
+import itertools
+import json
+import os
+import zlib
+
+import numpy
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from .utils import make_temporary_file
+from ..schema import FORMAT_CHARS, ENDIANNESS, BIT_MODE
+
+__author__ = 'Paul K. Korir, PhD'
+__email__ = 'pkorir@ebi.ac.uk, paul.korir@gmail.com'
+__date__ = '2026-10-19'
+
+#: the name of the manifest in the store directory
+MANIFEST = u'manifest.json'
+
+#: the default shape of each chunk
+DEFAULT_CHUNKS = (64, 64, 64)
+
+_STORE_VERSION = 1
+
+
+@contextlib.contextmanager
+def _locked(fn):
+    """Hold an exclusive lock on the file ``fn`` (created if need be) across processes"""
+    with open(fn, u'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _replace(fn, data):
+    """Write ``data`` to ``fn`` through a temporary file so that other processes never see a partial file"""
+    handle, tmp = make_temporary_file(os.path.dirname(fn))
+    try:
+        with os.fdopen(handle, u'wb') as f:
+            f.write(data)
+        os.replace(tmp, fn)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+class LatticeStore(object):
+    """A lattice stored as a directory of compressed chunks
+
+    Use :py:meth:`create` or :py:meth:`from_lattice` to make a new store.
+
+    :param str path: the store directory
+    :raises ValueError: if ``path`` is not a lattice store
+    """
+
+    def __init__(self, path):
+        self.path = path
+        try:
+            with open(os.path.join(path, MANIFEST), u'r') as f:
+                manifest = json.load(f)
+        except (IOError, OSError, ValueError):
+            raise ValueError(u"not a lattice store: {}".format(path))
+        if manifest.get(u'version') != _STORE_VERSION:
+            raise ValueError(u"unsupported lattice store version: {}".format(manifest.get(u'version')))
+        self.id = manifest[u'id']
+        self.mode = manifest[u'mode']
+        self.endianness = manifest[u'endianness']
+        self.shape = tuple(manifest[u'shape'])
+        self.chunks = tuple(manifest[u'chunks'])
+        self.start = manifest[u'start']
+
+    @classmethod
+    def create(cls, path, shape, mode=u'uint32', endianness=u'little', chunks=DEFAULT_CHUNKS, start=None,
+               lattice_id=None):
+        """Create an empty store in the directory ``path``
+
+        :param str path: the store directory; created if it does not exist
+        :param tuple shape: the shape of the lattice as (sections, rows, cols)
+        :param str mode: the mode of the lattice; one of the keys of
+            :py:data:`sfftkrw.schema.FORMAT_CHARS` or ``bit``
+        :param str endianness: ``little`` (default) or ``big``
+        :param tuple chunks: the shape of each chunk (default: :py:data:`DEFAULT_CHUNKS`)
+        :param dict start: the start of the lattice with keys ``rows``, ``cols`` and ``sections`` (default: all 0)
+        :param int lattice_id: the ID of the lattice
+        :return: the store
+        :rtype: :py:class:`LatticeStore`
+        :raises ValueError: if the store already exists or any value is invalid
+        """
+        if mode != BIT_MODE and mode not in FORMAT_CHARS:
+            raise ValueError(u"invalid mode: {}".format(mode))
+        if endianness not in ENDIANNESS:
+            raise ValueError(u"invalid endianness: {}".format(endianness))
+        if len(shape) != 3 or len(chunks) != 3 or min(chunks) < 1 or min(shape) < 0:
+            raise ValueError(u"invalid shape {} or chunks {}".format(shape, chunks))
+        if os.path.exists(os.path.join(path, MANIFEST)):
+            raise ValueError(u"lattice store already exists: {}".format(path))
+        if not os.path.isdir(os.path.join(path, u'chunks')):
+            os.makedirs(os.path.join(path, u'chunks'))
+        manifest = {
+            u'version': _STORE_VERSION,
+            u'id': lattice_id,
+            u'mode': mode,
+            u'endianness': endianness,
+            u'shape': [int(n) for n in shape],
+            u'chunks': [int(n) for n in chunks],
+            u'start': start if start is not None else {u'rows': 0, u'cols': 0, u'sections': 0},
+        }
+        _replace(os.path.join(path, MANIFEST), json.dumps(manifest, indent=2).encode(u'utf-8'))
+        return cls(path)
+
+    @property
+    def dtype(self):
+        """The type of the stored voxels; masks in ``bit`` mode are stored one voxel to the byte"""
+        if self.mode == BIT_MODE:
+            return numpy.dtype(numpy.uint8)
+        return numpy.dtype(u'{}{}'.format(ENDIANNESS[self.endianness], FORMAT_CHARS[self.mode]))
+
+    def _chunk_file(self, index):
+        return os.path.join(self.path, u'chunks', u'.'.join(map(str, index)))
+
+    def _chunk_shape(self, index):
+        return tuple(min(c, s - i * c) for i, c, s in zip(index, self.chunks, self.shape))
+
+    def _chunk_indices(self, offset, shape):
+        """All chunks which overlap the region at ``offset`` of ``shape``"""
+        return itertools.product(*[
+            range(o // c, (o + s - 1) // c + 1) for o, s, c in zip(offset, shape, self.chunks)
+        ])
+
+    def _check_region(self, offset, shape):
+        if len(offset) != 3 or len(shape) != 3 or any(
+                o < 0 or s < 0 or o + s > n for o, s, n in zip(offset, shape, self.shape)):
+            raise ValueError(u"region at {} of shape {} is outside the lattice of shape {}".format(
+                tuple(offset), tuple(shape), self.shape
+            ))
+
+    def _check_values(self, array):
+        """Reject voxels which would change on conversion to :py:attr:`dtype` (e.g. -1 in a ``uint16`` store)"""
+        if not array.size or (self.mode != BIT_MODE and numpy.can_cast(array.dtype, self.dtype, casting=u'safe')):
+            return
+        if array.dtype.kind not in u'biuf':
+            raise ValueError(u"cannot store voxels of type {} in a store of mode {}".format(array.dtype, self.mode))
+        if self.mode == BIT_MODE:
+            fits = numpy.all((array == 0) | (array == 1))
+        elif self.dtype.kind == u'f':
+            fits = True  # only precision may be lost
+        else:
+            info = numpy.iinfo(self.dtype)
+            fits = info.min <= array.min() and array.max() <= info.max
+            if fits and array.dtype.kind == u'f':
+                fits = numpy.all(numpy.mod(array, 1) == 0)
+        if not fits:
+            raise ValueError(u"voxels of the region do not fit a store of mode {}".format(self.mode))
+
+    def _read_chunk(self, index):
+        """The chunk at ``index``; zeros if it has never been written"""
+        try:
+            with open(self._chunk_file(index), u'rb') as f:
+                data = f.read()
+        except (IOError, OSError):
+            return numpy.zeros(self._chunk_shape(index), dtype=self.dtype)
+        return numpy.frombuffer(zlib.decompress(data), dtype=self.dtype).reshape(self._chunk_shape(index))
+
+    def _overlap(self, index, offset, shape):
+        """The slices of the overlap of the chunk at ``index`` and the region in chunk and region coordinates"""
+        chunk_slices, region_slices = list(), list()
+        for i, c, o, s in zip(index, self.chunks, offset, shape):
+            lo, hi = max(o, i * c), min(o + s, (i + 1) * c)
+            chunk_slices.append(slice(lo - i * c, hi - i * c))
+            region_slices.append(slice(lo - o, hi - o))
+        return tuple(chunk_slices), tuple(region_slices)
+
+    def write_region(self, offset, array):
+        """Write ``array`` to the region of the lattice at ``offset``
+
+        Each chunk is locked while it is modified so any number of processes may write to the store at once.
+
+        :param tuple offset: the (sections, rows, cols) index of the first voxel of the region
+        :param array: the voxels; converted to :py:attr:`dtype`
+        :type array: :py:class:`numpy.ndarray`
+        :raises ValueError: if the region is outside the lattice or any voxel does not fit :py:attr:`dtype`
+        """
+        array = numpy.asarray(array)
+        self._check_region(offset, array.shape)
+        self._check_values(array)
+        if not array.size:
+            return
+        for index in self._chunk_indices(offset, array.shape):
+            chunk_slices, region_slices = self._overlap(index, offset, array.shape)
+            chunk_file = self._chunk_file(index)
+            with _locked(os.path.join(self.path, u'chunks', u'.{}.lock'.format(os.path.basename(chunk_file)))):
+                if all(s.stop - s.start == n for s, n in zip(chunk_slices, self._chunk_shape(index))):
+                    chunk = array[region_slices]  # the whole chunk is replaced
+                else:
+                    chunk = self._read_chunk(index).copy()
+                    chunk[chunk_slices] = array[region_slices]
+                _replace(chunk_file, zlib.compress(numpy.ascontiguousarray(chunk, dtype=self.dtype)))
+
+    def read_region(self, offset, shape):
+        """Read the region of the lattice at ``offset`` of ``shape``
+
+        :param tuple offset: the (sections, rows, cols) index of the first voxel of the region
+        :param tuple shape: the shape of the region
+        :return: the voxels
+        :rtype: :py:class:`numpy.ndarray`
+        :raises ValueError: if the region is outside the lattice
+        """
+        self._check_region(offset, shape)
+        array = numpy.zeros(shape, dtype=self.dtype)
+        if not array.size:
+            return array
+        for index in self._chunk_indices(offset, shape):
+            chunk_slices, region_slices = self._overlap(index, offset, shape)
+            array[region_slices] = self._read_chunk(index)[chunk_slices]
+        return array
+
+    @classmethod
+    def from_lattice(cls, path, lattice, chunks=DEFAULT_CHUNKS):
+        """Create a store in ``path`` from the :py:class:`sfftkrw.SFFLattice` ``lattice``
+
+        :param str path: the store directory
+        :param lattice: the lattice
+        :type lattice: :py:class:`sfftkrw.SFFLattice`
+        :param tuple chunks: the shape of each chunk (default: :py:data:`DEFAULT_CHUNKS`)
+        :return: the store
+        :rtype: :py:class:`LatticeStore`
+        """
+        array = lattice.data_array
+        store = cls.create(
+            path, array.shape, mode=lattice.mode, endianness=lattice.endianness, chunks=chunks,
+            start={u'rows': lattice.start.rows, u'cols': lattice.start.cols, u'sections': lattice.start.sections},
+            lattice_id=lattice.id,
+        )
+        store.write_region((0, 0, 0), array)
+        return store
+
+    def to_lattice(self):
+        """The whole store as a :py:class:`sfftkrw.SFFLattice`
+
+        :return: the lattice
+        :rtype: :py:class:`sfftkrw.SFFLattice`
+        """
+        from ..schema.adapter_v0_8_0_dev1 import SFFLattice, SFFVolumeIndex, SFFVolumeStructure
+        sections, rows, cols = self.shape
+        lattice = SFFLattice.from_array(
+            self.read_region((0, 0, 0), self.shape), mode=self.mode, endianness=self.endianness,
+            size=SFFVolumeStructure(sections=sections, rows=rows, cols=cols), start=SFFVolumeIndex(**self.start),
+        )
+        if self.id is not None:
+            lattice.id = self.id
+        return lattice
+
+
+def export_lattices(fn, path, chunks=DEFAULT_CHUNKS, args=None):
+    """Write each lattice of the EMDB-SFF file ``fn`` to the store ``path/<lattice id>``
+
+    :param str fn: an EMDB-SFF file (``.sff``, ``.hff``, ``.json`` or ``.sffz``)
+    :param str path: the directory of the stores
+    :param tuple chunks: the shape of each chunk (default: :py:data:`DEFAULT_CHUNKS`)
+    :param args: parsed arguments used to read ``fn``
+    :type args: :py:class:`argparse.Namespace`
+    :return: the stores in the order of the lattices
+    :rtype: list
+    """
+    from ..schema.adapter_v0_8_0_dev1 import SFFSegmentation
+    seg = SFFSegmentation.from_file(fn, args=args)
+    return [
+        LatticeStore.from_lattice(os.path.join(path, str(lattice.id)), lattice, chunks=chunks)
+        for lattice in seg.lattice_list
+    ]
+
+
+def import_lattices(fn, path, output, args=None):
+    """Replace the lattices of the EMDB-SFF file ``fn`` with those of the stores in ``path`` and export the
+    result to ``output``
+
+    The lattices are ordered by ID; their IDs are kept so that references from 3D volumes remain valid.
+
+    :param str fn: an EMDB-SFF file
+    :param str path: the directory of the stores (as written by :py:func:`export_lattices`)
+    :param str output: the output file; the extension determines the output format
+    :param args: parsed arguments used to read ``fn`` and write ``output``
+    :type args: :py:class:`argparse.Namespace`
+    :return int status: 0 on success
+    """
+    from ..schema.adapter_v0_8_0_dev1 import SFFSegmentation, SFFLatticeList
+    seg = SFFSegmentation.from_file(fn, args=args)
+    stores = list()
+    for name in os.listdir(path):
+        if os.path.exists(os.path.join(path, name, MANIFEST)):
+            stores.append(LatticeStore(os.path.join(path, name)))
+    lattice_list = SFFLatticeList()
+    for store in sorted(stores, key=lambda s: (s.id is None, s.id)):
+        lattice_list.append(store.to_lattice())
+    seg.lattice_list = lattice_list
+    return seg.export(output, args=args)
@@ -0,0 +1,333 @@
+# -*- coding: utf-8 -*-
+# upgrade.py
+"""
+upgrade.py
+==========
+
+Upgrade EMDB-SFF v0.7.0.dev0 files to v0.8.0.dev1
+
+v0.7 meshes are lists of individually tagged vertices and polygons which take a very long time to load into
+adapters. :py:func:`upgrade` instead streams a v0.7 XML file one ``<segment/>`` at a time (an HDF5 file one segment
+group at a time), reads each mesh straight into :py:class:`numpy.ndarray` objects (see
+:py:meth:`sfftkrw.schema.adapter_v0_7_0_dev0.SFFMesh.arrays_from_xml`) and immediately encodes it as v0.8
+:py:class:`SFFVertices`, :py:class:`SFFNormals` and :py:class:`SFFTriangles` so that only the encoded meshes are
+ever held in memory. Lattices are copied in their encoded form.
+
+.. code:: python
+
+    from sfftkrw.core.upgrade import upgrade
+
+    upgrade(u'emd_1234_v0.7.sff', u'emd_1234.sff')
+
+The following have no v0.8 equivalent and are left out: complexes and macromolecules, transforms other than
+transformation matrices and normals which are not one per vertex.
+"""
+from __future__ import division, print_function
+
+import re
+
+import h5py
+from lxml import etree
+
+from . import _decode
+from .print_tools import print_date
+from .utils import get_version
+from ..schema import adapter_v0_7_0_dev0 as _v0_7
+from ..schema import adapter_v0_8_0_dev1 as _v0_8
+from ..schema import v0_7_0_dev0 as _sff_v0_7
+
+__author__ = 'Paul K. Korir, PhD'
+__email__ = 'pkorir@ebi.ac.uk, paul.korir@gmail.com'
+__date__ = '2026-10-19'
+
+#: the only version which can be upgraded
+UPGRADABLE_VERSION = u'0.7.0.dev0'
+
+#: v0.7 shape adapters, the corresponding v0.8 adapters and their attributes
+SHAPES = [
+    (_v0_7.SFFCone, _v0_8.SFFCone, [u'height', u'bottom_radius']),
+    (_v0_7.SFFCuboid, _v0_8.SFFCuboid, [u'x', u'y', u'z']),
+    (_v0_7.SFFCylinder, _v0_8.SFFCylinder, [u'height', u'diameter']),
+    (_v0_7.SFFEllipsoid, _v0_8.SFFEllipsoid, [u'x', u'y', u'z']),
+]
+
+
+def _external_references(references, cls):
+    """Copy v0.7 external references into a v0.8 list of class ``cls``"""
+    obj = cls()
+    for ref in references:
+        obj.append(_v0_8.SFFExternalReference(
+            resource=ref.type,
+            url=ref.other_type,
+            accession=ref.value,
+            label=ref.label,
+            description=ref.description,
+        ))
+    return obj
+
+
+def _lattice(lattice_id, mode, endianness, size, start, data):
+    """Create a v0.8 lattice keeping the encoded data as is; the v0.7 and v0.8 lattice encodings are identical
+
+    :param tuple size: (rows, cols, sections)
+    :param tuple start: (rows, cols, sections)
+    """
+    obj = _v0_8.SFFLattice(new_obj=False)
+    obj.id = int(lattice_id)
+    obj.mode = _decode(mode, u'utf-8')
+    obj.endianness = _decode(endianness, u'utf-8')
+    obj.size = _v0_8.SFFVolumeStructure(rows=int(size[0]), cols=int(size[1]), sections=int(size[2]))
+    obj.start = _v0_8.SFFVolumeIndex(rows=int(start[0]), cols=int(start[1]), sections=int(start[2]))
+    obj.data = _decode(data, u'utf-8')
+    return obj
+
+
+def _mesh(mesh_id, transform_id, arrays):
+    """Create a v0.8 mesh from the vertices, normals and triangles of a v0.7 mesh"""
+    vertices, normals, triangles = arrays
+    mesh = _v0_8.SFFMesh(new_obj=False)
+    mesh.id = mesh_id
+    mesh.vertices = _v0_8.SFFVertices.from_array(vertices)
+    if normals is not None:
+        mesh.normals = _v0_8.SFFNormals.from_array(normals)
+    mesh.triangles = _v0_8.SFFTriangles.from_array(triangles)
+    if transform_id is not None:
+        mesh.transform_id = int(transform_id)
+    return mesh
+
+
+def _segment(segment, meshes):
+    """Create a v0.8 segment from a v0.7 segment (without meshes) and its meshes
+
+    :param segment: the v0.7 segment
+    :type segment: :py:class:`sfftkrw.schema.adapter_v0_7_0_dev0.SFFSegment`
+    :param list meshes: v0.8 meshes
+    :return: the v0.8 segment
+    :rtype: :py:class:`sfftkrw.schema.adapter_v0_8_0_dev1.SFFSegment`
+    """
+    obj = _v0_8.SFFSegment(new_obj=False)
+    obj.id = segment.id
+    obj.parent_id = segment.parent_id
+    if segment.biological_annotation is not None:
+        annotation = segment.biological_annotation
+        obj.biological_annotation = _v0_8.SFFBiologicalAnnotation(
+            name=annotation.name,
+            description=annotation.description,
+            number_of_instances=annotation.number_of_instances,
+        )
+        if annotation.external_references:
+            obj.biological_annotation.external_references = _external_references(
+                annotation.external_references, _v0_8.SFFExternalReferenceList
+            )
+    if segment.colour is not None:
+        obj.colour = _v0_8.SFFRGBA(
+            red=segment.colour.red,
+            green=segment.colour.green,
+            blue=segment.colour.blue,
+            alpha=segment.colour.alpha,
+        )
+    if meshes:
+        obj.mesh_list = _v0_8.SFFMeshList()
+        for mesh in meshes:
+            obj.mesh_list.append(mesh)
+    if segment.shapes:
+        obj.shape_primitive_list = _v0_8.SFFShapePrimitiveList()
+        for shape in segment.shapes:
+            for old, new, attrs in SHAPES:
+                if isinstance(shape, old):
+                    _shape = new(new_obj=False)
+                    _shape.id = shape.id
+                    _shape.transform_id = shape.transform_id
+                    _shape.attribute = shape.attribute
+                    for attr in attrs:
+                        setattr(_shape, attr, getattr(shape, attr))
+                    obj.shape_primitive_list.append(_shape)
+                    break
+    if segment.volume is not None:
+        obj.three_d_volume = _v0_8.SFFThreeDVolume(
+            lattice_id=segment.volume.lattice_id,
+            value=segment.volume.value,
+            transform_id=segment.volume.transform_id,
+        )
+    return obj
+
+
+def _segmentation(seg, transforms, segment_list, lattices):
+    """Create a v0.8 segmentation from the header of a v0.7 segmentation and the upgraded segments and lattices
+
+    :param seg: the v0.7 segmentation; its segments and lattices are ignored
+    :type seg: :py:class:`sfftkrw.schema.adapter_v0_7_0_dev0.SFFSegmentation`
+    :param list transforms: the ``generateDS`` objects of the v0.7 transforms
+    :param segment_list: the v0.8 segments
+    :type segment_list: :py:class:`sfftkrw.schema.adapter_v0_8_0_dev1.SFFSegmentList`
+    :param list lattices: the v0.8 lattices
+    :return: the v0.8 segmentation
+    :rtype: :py:class:`sfftkrw.schema.adapter_v0_8_0_dev1.SFFSegmentation`
+    """
+    obj = _v0_8.SFFSegmentation(name=seg.name, details=seg.details)
+    obj.software_list = _v0_8.SFFSoftwareList()
+    if seg.software is not None:
+        obj.software_list.append(_v0_8.SFFSoftware(
+            name=seg.software.name,
+            version=seg.software.version,
+            processing_details=seg.software.processing_details,
+        ))
+    obj.primary_descriptor = {
+        u'meshList': u'mesh_list',
+        u'shapePrimitiveList': u'shape_primitive_list',
+        u'threeDVolume': u'three_d_volume',
+    }.get(seg.primary_descriptor, seg.primary_descriptor)
+    obj.transform_list = _v0_8.SFFTransformList()
+    for transform in transforms:
+        if isinstance(transform, _sff_v0_7.transformationMatrixType):
+            obj.transform_list.append(_v0_8.SFFTransformationMatrix(
+                id=transform.id,
+                rows=transform.rows,
+                cols=transform.cols,
+                data=transform.data,
+            ))
+        else:
+            print_date(u"Warning: dropping transform {} of unsupported type {}".format(
+                transform.id, type(transform).__name__))
+    if seg.bounding_box is not None:
+        obj.bounding_box = _v0_8.SFFBoundingBox(
+            xmin=seg.bounding_box.xmin,
+            xmax=seg.bounding_box.xmax,
+            ymin=seg.bounding_box.ymin,
+            ymax=seg.bounding_box.ymax,
+            zmin=seg.bounding_box.zmin,
+            zmax=seg.bounding_box.zmax,
+        )
+    if seg.global_external_references:
+        obj.global_external_references = _external_references(
+            seg.global_external_references, _v0_8.SFFGlobalExternalReferenceList
+        )
+    obj.segment_list = segment_list
+    obj.lattice_list = _v0_8.SFFLatticeList()
+    for lattice in lattices:
+        obj.lattice_list.append(lattice)
+    return obj
+
+
+def _upgrade_xml(fn, args=None):
+    """Upgrade a v0.7 XML file one ``<segment/>`` at a time"""
+    segment_list = _v0_8.SFFSegmentList()
+    context = etree.iterparse(fn, events=(u'end',), tag=u'segment', huge_tree=True)
+    for _, element in context:
+        meshes = list()
+        for mesh_list in element.findall(u'meshList'):
+            for mesh in mesh_list.iterfind(u'mesh'):
+                meshes.append(_mesh(
+                    int(mesh.get(u'id')) if mesh.get(u'id') is not None else None,
+                    mesh.findtext(u'transformId'),
+                    _v0_7.SFFMesh.arrays_from_xml(mesh),
+                ))
+            element.remove(mesh_list)
+        segment = _sff_v0_7.segmentType.factory()
+        segment.build(element)
+        segment_list.append(_segment(_v0_7.SFFSegment.from_gds_type(segment), meshes))
+        # free the parsed segment
+        element.clear()
+        element.getparent().remove(element)
+    # only the header is left in the tree
+    seg = _sff_v0_7.segmentation.factory()
+    seg.build(context.root)
+    transforms = seg.transformList.transform if seg.transformList is not None else []
+    lattices = [
+        _lattice(
+            L.id, L.mode, L.endianness,
+            (L.size.rows, L.size.cols, L.size.sections),
+            (L.start.rows, L.start.cols, L.start.sections),
+            L.data,
+        ) for L in (seg.latticeList.lattice if seg.latticeList is not None else [])
+    ]
+    return _segmentation(_v0_7.SFFSegmentation.from_gds_type(seg), transforms, segment_list, lattices)
+
+
+def _upgrade_hff(fn, args=None):
+    """Upgrade a v0.7 HDF5 file one segment group at a time (in order of ID as for the other HDF5 readers)"""
+    with h5py.File(fn, u'r') as h:
+        # header
+        seg = _v0_7.SFFSegmentation()
+        seg.name = _decode(h[u'name'][()], u'utf-8')
+        seg.version = _decode(h[u'version'][()], u'utf-8')
+        seg.software = _v0_7.SFFSoftware.from_hff(h[u'software'], args=args)
+        seg.primary_descriptor = _decode(h[u'primaryDescriptor'][()], u'utf-8')
+        if u'boundingBox' in h:
+            seg.bounding_box = _v0_7.SFFBoundingBox.from_hff(h[u'boundingBox'], args=args)
+        if u'globalExternalReferences' in h:
+            seg.global_external_references = _v0_7.SFFGlobalExternalReferenceList()
+            for gref in h[u'globalExternalReferences']:
+                g = _v0_7.SFFExternalReference(new_obj=False)
+                g.type, g.other_type, g.value, g.label, g.description = [_decode(_, u'utf-8') for _ in gref]
+                seg.global_external_references.append(g)
+        lattices = list()
+        for lattice_id in sorted(h[u'lattices'], key=int):
+            h_lattice = h[u'lattices'][lattice_id]
+            cols, rows, sections = h_lattice[u'size'][()]
+            start_cols, start_rows, start_sections = h_lattice[u'start'][()]
+            lattices.append(_lattice(
+                lattice_id, h_lattice[u'mode'][()], h_lattice[u'endianness'][()],
+                (rows, cols, sections), (start_rows, start_cols, start_sections), h_lattice[u'data'][()],
+            ))
+        if u'details' in h:
+            seg.details = _decode(h[u'details'][()], u'utf-8')
+        transforms = [t._local for t in _v0_7.SFFTransformList.from_hff(h[u'transforms'], args=args)]
+        # segments
+        segment_list = _v0_8.SFFSegmentList()
+        for segment_id in sorted(h[u'segments'], key=int):
+            group = h[u'segments'][segment_id]
+            segment = _v0_7.SFFSegment(new_obj=False)
+            segment.id = int(segment_id)
+            segment.parent_id = int(group[u'parentID'][()])
+            if u'biologicalAnnotation' in group:
+                segment.biological_annotation = _v0_7.SFFBiologicalAnnotation.from_hff(
+                    group[u'biologicalAnnotation'], args=args)
+            if u'colour' in group:
+                segment.colour = _v0_7.SFFRGBA.from_hff(group, args=args)
+            if u'shapes' in group:
+                segment.shapes = _v0_7.SFFShapePrimitiveList.from_hff(group[u'shapes'], args=args)
+            if u'volume' in group:
+                segment.volume = _v0_7.SFFThreeDVolume.from_hff(group[u'volume'], args=args)
+            meshes = list()
+            if u'meshes' in group:
+                for mesh_id in sorted(group[u'meshes'], key=int):
+                    h_mesh = group[u'meshes'][mesh_id]
+                    meshes.append(_mesh(
+                        int(mesh_id),
+                        h_mesh[u'transformId'][()] if u'transformId' in h_mesh else None,
+                        _v0_7.SFFMesh.arrays_from_hff(h_mesh),
+                    ))
+            segment_list.append(_segment(segment, meshes))
+    return _segmentation(seg, transforms, segment_list, lattices)
+
+
+def upgrade(fn, output, args=None):
+    """Upgrade the EMDB-SFF v0.7.0.dev0 file ``fn`` to v0.8.0.dev1 and export it to ``output``
+
+    :param str fn: a v0.7 ``.sff`` or ``.hff`` file (v0.7 JSON files have no geometry)
+    :param str output: the output file; the extension determines the output format
+    :param args: parsed arguments used to write ``output``
+    :type args: :py:class:`argparse.Namespace`
+    :return int status: 0 on success; 64 for other file types, 65 for files of other versions and 74 for files
+        which cannot be read
+    """
+    if not re.match(r'.*\.(sff|xml|hff|h5|hdf5)$', fn, re.IGNORECASE):
+        print_date(u"Invalid EMDB-SFF v0.7 file name (only .sff and .hff files can be upgraded): {}".format(fn))
+        return 64
+    try:
+        version = get_version(fn)
+    except (IOError, OSError) as e:
+        print_date(u"Unable to read {}: {}".format(fn, e))
+        return 74
+    except (KeyError, IndexError, SyntaxError) as e:  # no version; SyntaxError includes XML parse errors
+        print_date(u"Unable to read the version of {}: {}".format(fn, e))
+        return 65
+    if version != UPGRADABLE_VERSION:
+        print_date(u"Only EMDB-SFF v{} files can be upgraded: {} is v{}".format(UPGRADABLE_VERSION, fn, version))
+        return 65
+    if re.match(r'.*\.(sff|xml)$', fn, re.IGNORECASE):
+        seg = _upgrade_xml(fn, args=args)
+    else:
+        seg = _upgrade_hff(fn, args=args)
+    return seg.export(output, args=args)
@@ -8,14 +8,39 @@ A collection of helpful utilities
 """
 from __future__ import print_function, division
 
+import binascii
+import contextlib
+import errno
+import itertools
 import json
+import os
 import re
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
 
 import h5py
 
 from ..core import _decode
 
 UNIQUE_ID = 1
+_UNIQUE_ID_LOCK = threading.Lock()
+# per-thread ID counters set up by `id_allocation`
+_local_ids = threading.local()
+#: the number of IDs reserved from the process-wide counter at a time by :py:func:`id_allocation`
+ID_BLOCK_SIZE = 1024
+
+#: the columns of a summary (see :py:func:`get_summary`) in the order they are reported by ``sff view --batch``
+SUMMARY_FIELDS = [u'file', u'format', u'version', u'name', u'primary_descriptor', u'segments', u'error']
+
+# top-level names of summary fields in each EMDB-SFF version (v0.8 first)
+_SUMMARY_NAMES = {
+    u'version': [u'version'],
+    u'name': [u'name'],
+    u'primary_descriptor': [u'primary_descriptor', u'primaryDescriptor'],
+    u'segments': [u'segment_list', u'segmentList', u'segments'],
+}
 
 
 def get_path(D, path):
@@ -101,21 +126,230 @@ def get_version(fn):
         version = root.findall('./version')[0].text
     elif re.match(r".*\.(hff|h5|hdf5)$", fn, re.IGNORECASE):
         with h5py.File(fn, 'r') as h:
-            version = h[u'/version'][()]
+            # an attribute of the root group in HDF5 layout version 2
+            version = h.attrs[u'version'] if u'version' in h.attrs else h[u'/version'][()]
     elif re.match(r".*\.json$", fn, re.IGNORECASE):
         with open(fn, 'r') as j:
             version = json.load(j)[u'version']
+    elif re.match(r".*\.sffz$", fn, re.IGNORECASE):
+        version = _sffz_metadata(fn)[u'version']
     else:
         raise ValueError(u"invalid filetype: {}".format(fn))
     return _decode(version, 'utf-8')
 
 
+def _xml_summary(fn, summary):
+    """Stream through the top of the XML document counting the direct children of the segment list
+
+    Elements are discarded as soon as they are closed and parsing stops at the end of the segment list so that
+    lattices are never read.
+    """
+    from xml.etree import ElementTree as ET
+    depth = 0
+    in_segments = False
+    for event, elem in ET.iterparse(fn, events=(u'start', u'end')):
+        if event == u'start':
+            depth += 1
+            if depth == 2 and elem.tag in _SUMMARY_NAMES[u'segments']:
+                in_segments = True
+                summary[u'segments'] = 0
+            elif depth == 3 and in_segments:
+                summary[u'segments'] += 1
+            continue
+        if depth == 2:
+            for field in [u'version', u'name', u'primary_descriptor']:
+                if elem.tag in _SUMMARY_NAMES[field]:
+                    summary[field] = elem.text
+            if in_segments:
+                break
+        if depth >= 2:
+            elem.clear()
+        depth -= 1
+
+
+def _hff_summary(fn, summary):
+    """Read the top-level scalars and count the members of the segment list"""
+    with h5py.File(fn, u'r') as h:
+        for field, names in _SUMMARY_NAMES.items():
+            for name in names:
+                if field != u'segments' and name in h.attrs:  # HDF5 layout version 2
+                    summary[field] = _decode(h.attrs[name], u'utf-8')
+                    break
+                if name in h:
+                    if field == u'segments':
+                        if _decode(h[name].attrs.get(u'layout', u'groups'), u'utf-8') == u'tables':
+                            summary[field] = len(h[name][u'segments'])
+                        else:
+                            summary[field] = len(h[name])
+                    else:
+                        summary[field] = _decode(h[name][()], u'utf-8')
+                    break
+
+
+def _json_summary(fn, summary, data=None):
+    """Read the top-level values; segments are counted as plain dictionaries"""
+    if data is None:
+        with open(fn, u'r') as j:
+            data = json.load(j)
+    for field, names in _SUMMARY_NAMES.items():
+        for name in names:
+            if name in data:
+                summary[field] = len(data[name]) if field == u'segments' else data[name]
+                break
+
+
+def _sffz_metadata(fn):
+    """The JSON metadata of an SFFZ container; its arrays are not read"""
+    with zipfile.ZipFile(fn, u'r') as zf:
+        return json.loads(_decode(zf.read(u'segmentation.json'), u'utf-8'))
+
+
+def get_summary(fn):
+    """Summarise an EMDB-SFF file without building the segmentation
+
+    Only the version, name, primary descriptor and number of segments are read; no geometry is decoded. This
+    works for all EMDB-SFF versions.
+
+    :param str fn: name of an EMDB-SFF file
+    :return: the summary with keys ``format`` (``XML``, ``HDF5``, ``JSON`` or ``SFFZ``), ``version``, ``name``,
+        ``primary_descriptor`` and ``segments``; absent values are ``None``
+    :rtype: dict
+    :raises ValueError: if ``fn`` does not have a valid EMDB-SFF extension
+    """
+    summary = {u'format': None, u'version': None, u'name': None, u'primary_descriptor': None, u'segments': 0}
+    if re.match(r".*\.(sff|xml)$", fn, re.IGNORECASE):
+        summary[u'format'] = u'XML'
+        _xml_summary(fn, summary)
+    elif re.match(r".*\.(hff|h5|hdf5)$", fn, re.IGNORECASE):
+        summary[u'format'] = u'HDF5'
+        _hff_summary(fn, summary)
+    elif re.match(r".*\.json$", fn, re.IGNORECASE):
+        summary[u'format'] = u'JSON'
+        _json_summary(fn, summary)
+    elif re.match(r".*\.sffz$", fn, re.IGNORECASE):
+        summary[u'format'] = u'SFFZ'
+        _json_summary(fn, summary, data=_sffz_metadata(fn))
+    else:
+        raise ValueError(u"invalid filetype: {}".format(fn))
+    return summary
+
+
+def _summary_row(fn):
+    """Summary of ``fn`` as a row for :py:func:`batch_summary`; failures are reported in the ``error`` column"""
+    row = dict.fromkeys(SUMMARY_FIELDS)
+    row[u'file'] = fn
+    try:
+        row.update(get_summary(fn))
+    except Exception as e:
+        row[u'error'] = u"{}: {}".format(type(e).__name__, e)
+    return row
+
+
+def find_sff_files(path):
+    """List all EMDB-SFF files (by extension) in the directory tree rooted at ``path``
+
+    :param str path: a directory
+    :return: sorted file names
+    :rtype: list
+    """
+    fns = list()
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            if re.match(r".*\.(sff|xml|hff|h5|hdf5|json|sffz)$", filename, re.IGNORECASE):
+                fns.append(os.path.join(dirpath, filename))
+    return sorted(fns)
+
+
+def batch_summary(path, workers=None):
+    """Summarise all EMDB-SFF files in the directory tree at ``path`` in parallel
+
+    :param str path: a directory
+    :param int workers: the number of worker processes (default: number of CPUs)
+    :return: one ``dict`` per file with keys :py:data:`SUMMARY_FIELDS` in the order of :py:func:`find_sff_files`
+    :rtype: generator
+    """
+    fns = find_sff_files(path)
+    if not fns:
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for row in executor.map(_summary_row, fns, chunksize=max(1, len(fns) // 64)):
+            yield row
+
+
+def make_temporary_file(dirname, prefix=u'.', suffix=u''):
+    """Create a new, empty file with a unique name in ``dirname`` as :py:func:`tempfile.mkstemp` does
+
+    Unlike :py:func:`tempfile.mkstemp` the file has the permissions of any other new file (``0666`` less the
+    umask) rather than ``0600`` so that it keeps them when it replaces another file (e.g. with :py:func:`os.replace`).
+
+    :param str dirname: the directory of the file
+    :param str prefix: the start of the file name
+    :param str suffix: the end of the file name
+    :return: an open OS-level handle to the file and its name
+    :rtype: tuple
+    """
+    flags = os.O_RDWR | os.O_CREAT | os.O_EXCL | getattr(os, u'O_BINARY', 0)
+    for _ in range(tempfile.TMP_MAX):
+        fn = os.path.join(dirname, u'{}{}{}'.format(prefix, _decode(binascii.hexlify(os.urandom(8)), u'ascii'), suffix))
+        try:
+            return os.open(fn, flags, 0o666), fn
+        except OSError as os_error:
+            if os_error.errno != errno.EEXIST:
+                raise
+    raise IOError(errno.EEXIST, u"no unique temporary file name found in {}".format(dirname))
+
+
 def get_unique_id():
     """Return an ID that will be unique over the current segmentation
 
+    IDs come from a process-wide counter unless the calling thread is inside :py:func:`id_allocation`.
+
     :return: unique_id
     :rtype: int
     """
+    counter = getattr(_local_ids, u'counter', None)
+    if counter is not None:
+        return next(counter)
+    global UNIQUE_ID
+    with _UNIQUE_ID_LOCK:
+        UNIQUE_ID = UNIQUE_ID + 1
+        return UNIQUE_ID
+
+
+def _reserved_ids(block):
+    """Generator of IDs taken ``block`` at a time from the process-wide counter"""
     global UNIQUE_ID
-    UNIQUE_ID = UNIQUE_ID + 1
-    return UNIQUE_ID
+    while True:
+        with _UNIQUE_ID_LOCK:
+            first = UNIQUE_ID + 1
+            UNIQUE_ID = UNIQUE_ID + block
+        for unique_id in range(first, first + block):
+            yield unique_id
+
+
+@contextlib.contextmanager
+def id_allocation(start=None, block=ID_BLOCK_SIZE):
+    """Context manager in which :py:func:`get_unique_id` uses a private counter for the calling thread
+
+    By default the counter gives out IDs from blocks of ``block`` IDs reserved from the process-wide counter so
+    that the IDs given out while loading or exporting one segmentation never collide with those of objects
+    created anywhere else in the process, while threads working on other segmentations concurrently only
+    contend for the lock once per block.
+
+    .. code:: python
+
+        with id_allocation():
+            seg.export(u'file.json')  # missing IDs are unique in the process
+
+        with id_allocation(start=1):
+            seg.export(u'file.json')  # missing IDs are 1, 2, 3... whatever other IDs exist
+
+    :param int start: the first ID to give out; if set, IDs are counted from ``start`` without reserving them
+    :param int block: the number of IDs to reserve at a time
+    """
+    previous = getattr(_local_ids, u'counter', None)
+    _local_ids.counter = _reserved_ids(block) if start is None else itertools.count(start)
+    try:
+        yield
+    finally:
+        _local_ids.counter = previous
@@ -11,6 +11,17 @@ FORMAT_CHARS = {
     u'float64': u'd',
 }
 
+# lattices of binary masks (0/1) may be packed 8 voxels to the byte; it is an extension of the EMDB-SFF schema
+# (added to `mode_type` of the generated module by `postgenerate`) so lattices of this mode are only written when
+# asked for with `schema_extensions` (--schema-extensions)
+BIT_MODE = u'bit'
+
+# HDF5 layouts: one group per object (the default) or structured datasets (tables) for large collections
+HFF_LAYOUTS = [u'groups', u'tables']
+
+# HDF5 layout versions: small values as scalar datasets (1; the default) or as attributes of their group (2)
+HFF_LAYOUT_VERSIONS = [1, 2]
+
 ENDIANNESS = {
     u'little': u'<',
     u'big': u'>',
@@ -900,6 +900,54 @@ class SFFShapePrimitiveList(SFFListType):
         return obj
 
 
+def _mesh_arrays(vertex_ids, is_normal, points, polygon_vertex_ids, polygon_lengths):
+    """Convert the vertices and polygons of a mesh into vertex, normal and triangle arrays
+
+    Polygons refer to vertices by ID and may also list the IDs of normals; these are dropped. Polygons with more
+    than three vertices are triangulated as fans about their first vertex.
+
+    :param vertex_ids: the IDs of all vertices (surface and normal)
+    :param is_normal: boolean mask of vertices designated ``normal``
+    :param points: an (n, 3) array of co-ordinates for all vertices
+    :param polygon_vertex_ids: the vertex IDs of all polygons concatenated
+    :param polygon_lengths: the number of vertex IDs in each polygon
+    :return: a tuple of vertices, normals (``None`` unless there is one normal per vertex) and triangles
+    :rtype: tuple(:py:class:`numpy.ndarray`)
+    """
+    vertex_ids = numpy.asarray(vertex_ids, dtype=numpy.int64)
+    is_normal = numpy.asarray(is_normal, dtype=bool)
+    points = numpy.asarray(points).reshape(-1, 3)
+    polygon_vertex_ids = numpy.asarray(polygon_vertex_ids, dtype=numpy.int64)
+    polygon_lengths = numpy.asarray(polygon_lengths, dtype=numpy.int64)
+    vertices = points[~is_normal]
+    normals = points[is_normal]
+    surface_ids = vertex_ids[~is_normal]
+    # look up the index of each referenced vertex
+    order = numpy.argsort(surface_ids, kind=u'stable')
+    sorted_ids = surface_ids[order]
+    position = numpy.searchsorted(sorted_ids, polygon_vertex_ids)
+    position[position == len(sorted_ids)] = 0
+    found = sorted_ids[position] == polygon_vertex_ids if len(sorted_ids) else numpy.zeros_like(
+        polygon_vertex_ids, dtype=bool)
+    if not numpy.isin(polygon_vertex_ids[~found], vertex_ids[is_normal]).all():
+        raise ValueError(u"polygons refer to vertices which do not exist")
+    indices = order[position[found]]
+    polygons = numpy.repeat(numpy.arange(len(polygon_lengths)), polygon_lengths)[found]
+    lengths = numpy.bincount(polygons, minlength=len(polygon_lengths))
+    # fan triangulation: (v0, vi, vi+1) for i = 1..k-2
+    starts = numpy.cumsum(lengths) - lengths
+    fans = numpy.maximum(lengths - 2, 0)
+    owner = numpy.repeat(numpy.arange(len(lengths)), fans)
+    step = numpy.arange(fans.sum()) - numpy.repeat(numpy.cumsum(fans) - fans, fans) + 1
+    first = starts[owner]
+    triangles = numpy.column_stack(
+        (indices[first], indices[first + step], indices[first + step + 1])
+    ).astype(numpy.uint32)
+    if len(normals) != len(vertices):
+        normals = None
+    return vertices, normals, triangles
+
+
 class SFFVertex(SFFIndexType):
     """Single vertex"""
     gds_type = _sff.vertexType
@@ -971,10 +1019,6 @@ class SFFVertexList(SFFListType):
     iter_attr = (u'v', SFFVertex)
     min_length = 3
 
-    def __init__(self, **kwargs):
-        super(SFFVertexList, self).__init__(**kwargs)
-        self._vertex_dict = {v.vID: v for v in map(SFFVertex.from_gds_type, self._local.v)}
-
     def __eq__(self, other):
         try:
             assert isinstance(other, type(self))
@@ -996,19 +1040,13 @@ class SFFVertexList(SFFListType):
     def from_hff(cls, hff_data, name=None, args=None):
         """Return an SFFType object given an HDF5 object"""
         assert isinstance(hff_data, h5py.Dataset)
-        obj = cls()
-        for vertex in hff_data:
-            obj.append(
-                SFFVertex(
-                    vID=vertex[u'vID'],
-                    designation=_decode(vertex[u'designation'], u'utf-8'),
-                    x=float(vertex[u'x']),
-                    y=float(vertex[u'y']),
-                    z=float(vertex[u'z']),
-                    new_obj=False
-                )
-            )
-        return obj
+        # one read of the whole dataset; iterating over a dataset reads it one row at a time
+        vertices = hff_data[()]
+        return cls.from_gds_type(_sff.vertexListType(v=[
+            _sff.vertexType(
+                vID=int(vID), designation=_decode(designation, u'utf-8'), x=float(x), y=float(y), z=float(z)
+            ) for vID, designation, x, y, z in vertices.tolist()
+        ]))
 
 
 class SFFPolygonList(SFFListType):
@@ -1019,10 +1057,6 @@ class SFFPolygonList(SFFListType):
     iter_attr = (u'P', SFFPolygon)
     min_length = 1
 
-    def __init__(self, **kwargs):
-        super(SFFPolygonList, self).__init__(**kwargs)
-        self._polygon_dict = {P.PID: P for P in list(map(SFFPolygon, self._local.P))}
-
     def __eq__(self, other):
         try:
             assert isinstance(other, type(self))
@@ -1044,13 +1078,10 @@ class SFFPolygonList(SFFListType):
     def from_hff(cls, hff_data, name=None, args=None):
         """Return an SFFType object given an HDF5 object"""
         assert isinstance(hff_data, h5py.Dataset)
-        obj = cls()
-        for polygon in hff_data:
-            P = SFFPolygon(new_obj=False)
-            P.PID = int(polygon[u'PID'])
-            [P.append(int(_)) for _ in polygon[u'v']]
-            obj.append(P)
-        return obj
+        polygons = hff_data[()]
+        return cls.from_gds_type(_sff.polygonListType(P=[
+            _sff.polygonType(PID=int(PID), v=v.tolist()) for PID, v in zip(polygons[u'PID'], polygons[u'v'])
+        ]))
 
 
 class SFFMesh(SFFIndexType):
@@ -1096,6 +1127,70 @@ class SFFMesh(SFFIndexType):
         obj.polygons = SFFPolygonList.from_hff(hff_data[u'polygons'], args=args)
         return obj
 
+    def as_arrays(self):
+        """The vertices, normals and triangles of this mesh as :py:class:`numpy.ndarray` objects
+
+        See :py:meth:`arrays_from_hff` for how polygons are converted into triangles.
+
+        :return: a tuple of vertices, normals (or ``None``) and triangles
+        :rtype: tuple
+        """
+        vertices = self._local.vertexList.v
+        polygons = self._local.polygonList.P
+        return _mesh_arrays(
+            [v.vID for v in vertices],
+            [v.designation == u'normal' for v in vertices],
+            [(v.x, v.y, v.z) for v in vertices],
+            [i for P in polygons for i in P.v],
+            [len(P.v) for P in polygons],
+        )
+
+    @staticmethod
+    def arrays_from_hff(hff_data):
+        """Read the vertices, normals and triangles of a mesh in an HDF5 group without creating any adapters
+
+        Polygons which list the IDs of normals have them dropped and polygons of more than three vertices are
+        triangulated as fans. Normals are only returned if there is one for every vertex.
+
+        :param hff_data: the mesh group e.g. ``/segments/1/meshes/0``
+        :type hff_data: ``h5py.Group``
+        :return: a tuple of vertices, normals (or ``None``) and triangles
+        :rtype: tuple
+        """
+        assert isinstance(hff_data, h5py.Group)
+        vertices = hff_data[u'vertices'][()]
+        polygons = hff_data[u'polygons'][()]
+        return _mesh_arrays(
+            vertices[u'vID'],
+            vertices[u'designation'].astype(numpy.bytes_) == b'normal',
+            numpy.column_stack((vertices[u'x'], vertices[u'y'], vertices[u'z'])),
+            numpy.concatenate(list(polygons[u'v'])) if len(polygons) else [],
+            [len(v) for v in polygons[u'v']],
+        )
+
+    @staticmethod
+    def arrays_from_xml(element):
+        """Read the vertices, normals and triangles of a ``<mesh/>`` element without creating any adapters
+
+        See :py:meth:`arrays_from_hff`.
+
+        :param element: the ``<mesh/>`` element
+        :type element: ``lxml.etree._Element``
+        :return: a tuple of vertices, normals (or ``None``) and triangles
+        :rtype: tuple
+        """
+        return _mesh_arrays(
+            element.xpath(u'vertexList/v/@vID', smart_strings=False),
+            [v.get(u'designation') == u'normal' for v in element.iterfind(u'vertexList/v')],
+            numpy.array([
+                element.xpath(u'vertexList/v/x/text()', smart_strings=False),
+                element.xpath(u'vertexList/v/y/text()', smart_strings=False),
+                element.xpath(u'vertexList/v/z/text()', smart_strings=False),
+            ], dtype=numpy.float64).T,
+            element.xpath(u'polygonList/P/v/text()', smart_strings=False),
+            [len(P.findall(u'v')) for P in element.iterfind(u'polygonList/P')],
+        )
+
 
 class SFFMeshList(SFFListType):
     """Mesh list representation"""
@@ -1127,10 +1222,9 @@ class SFFMeshList(SFFListType):
                 ],
             )
             # load vertex data
-            i = 0
-            for vertex in mesh.vertices:
-                h_v[i] = (vertex.vID, vertex.designation, vertex.x, vertex.y, vertex.z)
-                i += 1
+            vertices = numpy.empty(mesh.num_vertices, dtype=h_v.dtype)
+            vertices[:] = [(v.vID, v.designation, v.x, v.y, v.z) for v in mesh._local.vertexList.v]
+            h_v[...] = vertices
             # /sff/segments/1/meshes/0/polygons
             h_P = h_mesh.create_dataset(
                 u"polygons",
@@ -1140,11 +1234,12 @@ class SFFMeshList(SFFListType):
                     (u'v', vertex_array),
                 ],
             )
-            #  load polygon data
-            j = 0
-            for polygon in mesh.polygons:
-                h_P[j] = (polygon.PID, numpy.array(polygon.vertex_ids))
-                j += 1
+            #  load polygon data
+            polygons = numpy.empty(mesh.num_polygons, dtype=h_P.dtype)
+            polygons[u'PID'] = [P.PID for P in mesh._local.polygonList.P]
+            for j, P in enumerate(mesh._local.polygonList.P):
+                polygons[u'v'][j] = numpy.array(P.v, dtype=u'u4')
+            h_P[...] = polygons
             if mesh.transform_id:
                 h_mesh[u"transformId"] = mesh.transform_id
         return parent_group
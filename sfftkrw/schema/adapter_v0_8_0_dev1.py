@@ -5,35 +5,420 @@ adapter_v0_8_0_dev1
 """
 from __future__ import print_function
 
+import argparse
+import asyncio
 import base64
+import binascii
 import collections
+import io
 import json
 import numbers
 import os
 import random
 import re
+import shutil
 import struct
 import sys
+import threading
+import zipfile
 import zlib
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 
 import h5py
 import numpy
 
-from . import FORMAT_CHARS, ENDIANNESS
+from . import FORMAT_CHARS, ENDIANNESS, BIT_MODE, HFF_LAYOUTS, HFF_LAYOUT_VERSIONS
 from . import v0_8_0_dev1 as _sff
 
 # ensure that we can read/write encoded data
 _sff.ExternalEncoding = u"utf-8"
 
-from .base import SFFType, SFFIndexType, SFFAttribute, SFFListType, SFFTypeError, _assert_or_raise
+from .base import SFFType, SFFIndexType, SFFAttribute, SFFListType, SFFTypeError, SFFValueError, _assert_or_raise
 from ..core import _str, _encode, _bytes, _decode, _dict, _classic_dict
 from ..core.print_tools import print_date
-from ..core.utils import get_unique_id
+from ..core.utils import get_unique_id, id_allocation, make_temporary_file
 
 _volume = collections.namedtuple(
     u'volume', [u'rows', u'cols', u'sections']
 )
 
+# candidate modes for `mode='auto'` in order of increasing width
+_INTEGER_MODES = [u'uint8', u'int8', u'uint16', u'int16', u'uint32', u'int32', u'uint64', u'int64']
+
+
+# filters which may precede zlib in the `compression` of encoded sequences e.g. 'delta+shuffle+zlib';
+# they are applied in this order when encoding and in the reverse order when decoding
+_COMPRESSION_FILTERS = [u'delta', u'shuffle']
+
+
+def _compression_filters(compression):
+    """Return the filters named in ``compression`` after checking that it is valid
+
+    :param str compression: the compression e.g. ``zlib``, ``shuffle+zlib`` or ``delta+shuffle+zlib``
+    :return: the filters to apply before zlib
+    :rtype: list
+    """
+    parts = compression.split(u'+')
+    filters = parts[:-1]
+    if parts[-1] != u'zlib' or filters != [f for f in _COMPRESSION_FILTERS if f in filters]:
+        raise SFFValueError(
+            u"invalid compression '{}'; use 'zlib' optionally preceded by any of {} (in that order) "
+            u"joined with '+'".format(compression, u', '.join(_COMPRESSION_FILTERS))
+        )
+    return filters
+
+
+def _is_binary(array):
+    """Return ``True`` if ``array`` only has 0s and 1s and can therefore be stored using ``mode='bit'``"""
+    if array.dtype.kind == u'b':
+        return True
+    if array.dtype.kind not in u'iuf':
+        return False
+    return bool(numpy.all((array == 0) | (array == 1)))
+
+
+def _narrowest_mode(array):
+    """Return the narrowest mode in ``FORMAT_CHARS`` which can hold every value of ``array`` without loss
+
+    Integer (and boolean) arrays are narrowed using the range of their values. Floating point arrays whose values
+    are all whole numbers (e.g. label volumes read from MRC files) are narrowed in the same way; all other
+    floating point arrays keep their own width.
+
+    :param array: the data
+    :type array: :py:class:`numpy.ndarray`
+    :return: the name of the mode e.g. ``uint8``
+    :rtype: str
+    """
+    if array.size == 0:
+        return _INTEGER_MODES[0]
+    if array.dtype.kind == u'f':
+        if not numpy.all(numpy.isfinite(array)) or not numpy.all(numpy.mod(array, 1) == 0):
+            return u'float64' if array.dtype.itemsize > 4 else u'float32'
+    elif array.dtype.kind not in u'biu':
+        raise SFFTypeError(array.dtype, u"integer or floating point dtype")
+    min_value, max_value = array.min(), array.max()
+    for mode in _INTEGER_MODES:
+        info = numpy.iinfo(mode)
+        if info.min <= min_value and max_value <= info.max:
+            return mode
+    # values out of the range of 64-bit integers are only possible with floats
+    return u'float64'
+
+
+def _hff_layout(args):
+    """The HDF5 layout requested in ``args`` (one of :py:data:`HFF_LAYOUTS`)"""
+    layout = getattr(args, u'hff_layout', None) or HFF_LAYOUTS[0]
+    if layout not in HFF_LAYOUTS:
+        raise SFFValueError(u"invalid HDF5 layout '{}'; valid layouts are: {}".format(layout, u", ".join(HFF_LAYOUTS)))
+    return layout
+
+
+def _hff_layout_version(args):
+    """The HDF5 layout version requested in ``args`` (one of :py:data:`HFF_LAYOUT_VERSIONS`)"""
+    version = getattr(args, u'hff_layout_version', None) or HFF_LAYOUT_VERSIONS[0]
+    if version not in HFF_LAYOUT_VERSIONS:
+        raise SFFValueError(u"invalid HDF5 layout version '{}'; valid versions are: {}".format(
+            version, u", ".join(map(_str, HFF_LAYOUT_VERSIONS))
+        ))
+    return version
+
+
+def _schema_extensions(args):
+    """Whether ``args`` allow writing extensions of the EMDB-SFF schema e.g. lattices of mode :py:data:`BIT_MODE`"""
+    return bool(getattr(args, u'schema_extensions', False))
+
+
+def _extension_lattices(seg_local):
+    """The IDs of the lattices of the `generateDS` segmentation ``seg_local`` whose mode is not in the schema"""
+    if seg_local.lattice_list is None:
+        return list()
+    return [lattice.id for lattice in seg_local.lattice_list.lattice if lattice.mode == BIT_MODE]
+
+
+#: strings longer than this are always written as datasets since HDF5 attributes are limited to 64 KiB
+_HFF_MAX_ATTRIBUTE_LENGTH = 2 ** 13
+
+
+def _hff_set(group, name, value, args=None):
+    """Write the small value ``value`` as ``name`` in ``group``: a scalar dataset in HDF5 layout version 1 and an
+    attribute of ``group`` in layout version 2 (except for long strings)"""
+    if _hff_layout_version(args) > 1 and not (isinstance(value, _str) and len(value) > _HFF_MAX_ATTRIBUTE_LENGTH):
+        group.attrs[name] = value
+    else:
+        group[name] = value
+
+
+def _hff_replace(group, name, value, args=None):
+    """Replace the small value ``name`` in ``group`` (see :py:func:`_hff_set`) with ``value``; ``None`` removes it"""
+    if name in group.attrs:
+        del group.attrs[name]
+    if name in group:
+        del group[name]
+    if value is not None:
+        _hff_set(group, name, value, args)
+
+
+def _hff_get(group, names):
+    """Read the small values ``names`` from ``group`` whichever HDF5 layout version wrote them
+
+    All attributes of ``group`` are read at once; values which are not attributes are read from datasets.
+
+    :return: the values which are present by name
+    :rtype: dict
+    """
+    values = dict(group.attrs.items())
+    for name in names:
+        if name not in values and name in group:
+            values[name] = group[name][()]
+    return values
+
+
+#: buffers accepted in place of a base64 string as the payload of lattices and encoded sequences
+_BUFFER_TYPES = (_bytes, bytearray, memoryview)
+
+
+def _payload_text(data):
+    """The base64 payload ``data`` as a string for the JSON writer; buffers are decoded as ASCII"""
+    if isinstance(data, _BUFFER_TYPES) and not isinstance(data, _str):
+        return _str(data, u'ascii')
+    return data
+
+
+def _hff_set_payload(group, data):
+    """Write the base64 payload ``data`` (a string or a buffer) to ``group`` as a variable-length string"""
+    if isinstance(data, (bytearray, memoryview)):
+        data = _bytes(data)  # h5py only writes strings from str or bytes
+    group[u'data'] = data
+
+
+def _hff_payload(data):
+    """The base64 payload ``data`` as read from HDF5
+
+    Payloads are strings except those too large for a string, which are written as a dataset of bytes (see
+    :py:meth:`sfftkrw.core.generate.SegmentationGenerator.write`); these are read as a buffer.
+    """
+    if isinstance(data, numpy.ndarray):
+        return memoryview(numpy.ascontiguousarray(data, dtype=numpy.uint8))
+    return _decode(data, 'utf-8')
+
+
+#: the number of bytes inflated at a time by :py:func:`_inflate`
+_INFLATE_CHUNK = 1 << 24
+
+
+def _inflate(binzip, dtype, count):
+    """Decompress the zlib stream ``binzip`` straight into a new (writable) array of ``count`` items of ``dtype``
+
+    The decompressed bytes are never held twice: they are copied into the array a chunk at a time.
+
+    :raises SFFValueError: if the stream does not hold exactly ``count`` items
+    """
+    array = numpy.empty(count, dtype=dtype)
+    out = array.view(numpy.uint8)
+    position = 0
+    decompressor = zlib.decompressobj()
+    binzip = memoryview(binzip)
+    try:
+        for start in range(0, len(binzip), _INFLATE_CHUNK):
+            data = decompressor.decompress(binzip[start:start + _INFLATE_CHUNK], _INFLATE_CHUNK)
+            while data:
+                out[position:position + len(data)] = numpy.frombuffer(data, dtype=numpy.uint8)
+                position += len(data)
+                data = decompressor.decompress(decompressor.unconsumed_tail, _INFLATE_CHUNK)
+        data = decompressor.flush()
+        out[position:position + len(data)] = numpy.frombuffer(data, dtype=numpy.uint8)
+        position += len(data)
+    except ValueError:  # more data than expected
+        position = -1
+    if position != out.size:
+        raise SFFValueError(u"payload does not hold {} values of type {}".format(count, numpy.dtype(dtype)))
+    return array
+
+
+def _payload_fingerprint(array):
+    """A CRC-32 of the bytes of ``array`` or ``None`` for read-only arrays (e.g. memory-mapped), which cannot be
+    changed in place"""
+    if not array.flags.writeable:
+        return None
+    return zlib.crc32(array if array.flags.c_contiguous else numpy.ascontiguousarray(array))
+
+
+def _payload_dirty(local):
+    """Whether the decoded array of the ``generateDS`` object ``local`` has not been encoded
+
+    The array (``_data_array``) is kept on the ``generateDS`` object by ``data_array``; ``data`` is ``None`` while
+    an array (e.g. one assigned to ``data_array`` or mapped from an SFFZ container) has not been encoded.
+    """
+    return getattr(local, u'_data_array', None) is not None and local.data is None
+
+
+def _sync_payload(item_class, local):
+    """Encode the decoded array of the ``generateDS`` object ``local`` if it has not been encoded or has been
+    changed in place since it was decoded or encoded (by its fingerprint, ``_data_crc``)
+
+    Only done once per export: reading ``data`` never looks for changes made in place.
+    """
+    crc = getattr(local, u'_data_crc', None)
+    if crc is not None and local.data is not None and crc != _payload_fingerprint(local._data_array):
+        local.data = None
+    if _payload_dirty(local):
+        item_class.from_gds_type(local).data  # encodes the array
+
+
+def _cast_payload(array, mode, endianness):
+    """``array`` cast (only if needed) to the contiguous type of payloads of ``mode`` and ``endianness``
+
+    Floating point modes may only lose precision; every other mode requires the values to be unchanged.
+
+    :raises SFFValueError: if a value does not fit ``mode`` e.g. -1 or 300 for ``uint8``, 1.7 for ``int32`` or
+        1e300 for ``float32``
+    """
+    dtype = _payload_dtype(mode, endianness)
+    array = numpy.asarray(array)
+    if array.size and not numpy.can_cast(array.dtype, dtype, casting=u'safe'):
+        if array.dtype.kind not in u'biuf':
+            raise SFFValueError(u"cannot encode values of type {} with mode '{}'".format(array.dtype, mode))
+        if mode == BIT_MODE:
+            fits = _is_binary(array)
+        elif dtype.kind == u'f':
+            fits = not numpy.any(numpy.isfinite(array) & (numpy.abs(array) > numpy.finfo(dtype).max))
+        else:
+            info = numpy.iinfo(dtype)
+            fits = bool(info.min <= array.min() and array.max() <= info.max)
+            if fits and array.dtype.kind == u'f':
+                fits = bool(numpy.all(numpy.mod(array, 1) == 0))
+        if not fits:
+            raise SFFValueError(u"values do not fit mode '{}'".format(mode))
+    return numpy.ascontiguousarray(array, dtype=dtype)
+
+
+def _keep_array(local, array, mode, endianness):
+    """Keep ``array`` as the decoded array of the ``generateDS`` object ``local`` cast (only if needed) to the
+    contiguous type of its payload so that it matches the array that would be decoded"""
+    local._data_array = _cast_payload(array, mode, endianness)
+    local._data_crc = _payload_fingerprint(local._data_array)
+
+
+class SFFPayloadAttribute(SFFAttribute):
+    """The base64 ``data`` of lattices and encoded sequences
+
+    Objects read from an SFFZ container hold a memory-mapped array (``_data_array`` on the ``generateDS`` object)
+    in place of the payload; it is only encoded when the payload is first accessed. Likewise, an array assigned to
+    ``data_array`` is only encoded when the payload is next accessed. Changes made in place to the array returned by
+    ``data_array`` are only looked for on export (see :py:meth:`SFFSegmentation.export`) so that reading the payload
+    costs nothing and unchanged payloads are written out exactly as they were read.
+    """
+
+    def __get__(self, obj, _):
+        local = obj._local
+        if _payload_dirty(local):
+            local.data = obj._encode(
+                local._data_array, mode=obj.mode, endianness=obj.endianness,
+                compression=getattr(obj, u'compression', None)
+            )
+            local._data_crc = _payload_fingerprint(local._data_array)
+        return super(SFFPayloadAttribute, self).__get__(obj, _)
+
+    def __set__(self, obj, value):
+        if getattr(obj._local, u'_data_array', None) is not None:
+            obj._local._data_array = None  # superseded by the new payload
+            obj._local._data_crc = None
+        super(SFFPayloadAttribute, self).__set__(obj, value)
+
+
+def _hff_workers(args):
+    """The number of processes to read HDF5 lists with (``args.hff_workers``); 1 reads in this process"""
+    workers = getattr(args, u'hff_workers', None) or 1
+    if workers < 1:
+        raise SFFValueError(u"invalid number of HDF5 workers: {}".format(workers))
+    return workers
+
+
+def _hff_read_items(fn, group_name, item_class, names, args=None):
+    """Read the members ``names`` of the group ``group_name`` in the HDF5 file ``fn`` as ``item_class`` objects
+
+    Runs in the worker processes of :py:func:`_hff_read_parallel` and only returns the ``generateDS`` objects since
+    these are cheap to pickle.
+    """
+    with h5py.File(fn, u'r') as h:
+        group = h[group_name]
+        return [item_class.from_hff(group[name], args=args)._local for name in names]
+
+
+def _hff_read_parallel(group, item_class, workers, args=None):
+    """Read all the members of the list ``group`` (one subgroup per item named by its ID) in ``workers`` processes
+
+    Each process opens the file read-only and reads runs of consecutive members.
+
+    :return: the ``generateDS`` objects of the items in the order of their IDs or ``None`` if ``group`` is not in
+        a file on disk (e.g. a file read into memory)
+    :rtype: list
+    """
+    fn = group.file.filename
+    if not os.path.isfile(fn):
+        return None
+    names = sorted(group.keys(), key=int)
+    size = len(names) // (workers * 4) + 1  # a few runs per worker to balance the load
+    runs = [names[i:i + size] for i in range(0, len(names), size)]
+    items = list()
+    with ProcessPoolExecutor(max_workers=min(workers, len(runs) or 1)) as executor:
+        for run in executor.map(_hff_read_items, repeat(fn), repeat(group.name), repeat(item_class), runs,
+                                repeat(args)):
+            items += run
+    return items
+
+
+def _from_missing(value, dtype):
+    """Missing values (``None``) in tables are -1 for integer columns, NaN for float columns, empty strings for
+    string columns and 0 for flag (``u1``) columns"""
+    if value is None:
+        return {u'i8': -1, u'f8': numpy.nan, u'str': u'', u'u1': 0}[dtype]
+    return value
+
+
+def _to_missing(array, dtype):
+    """Inverse of :py:func:`_from_missing` for a whole column; returns a list"""
+    if dtype == u'u1':
+        return array.tolist()
+    if dtype == u'str':
+        return [_decode(value, u'utf-8') or None for value in array.tolist()]
+    missing = array == -1 if dtype == u'i8' else numpy.isnan(array)
+    if not missing.any():
+        return array.tolist()
+    values = array.astype(object)
+    values[missing] = None
+    return values.tolist()
+
+
+def _make_table(rows, columns):
+    """A structured array from ``rows`` (sequences of values which may be ``None``) with ``columns``
+    (``[(name, 'i8' | 'f8' | 'u1' | 'str'), ...]``)"""
+    dtype = numpy.dtype([(column, h5py.string_dtype() if _dtype == u'str' else _dtype) for column, _dtype in columns])
+    return numpy.array(
+        [tuple(_from_missing(value, _dtype) for value, (_, _dtype) in zip(row, columns)) for row in rows],
+        dtype=dtype
+    )
+
+
+def _table_columns(table, columns):
+    """The columns of the structured array ``table`` as lists with missing values as ``None``"""
+    return {column: _to_missing(table[column], dtype) for column, dtype in columns}
+
+
+def _gds_values(obj, names):
+    """The values of the attributes ``names`` of the ``generateDS`` object ``obj`` (which may be ``None``)"""
+    if obj is None:
+        return [None] * len(names)
+    return [getattr(obj, name, None) for name in names]
+
+
+def _gds_object(adapter_class, **kwargs):
+    """A ``generateDS`` object for ``adapter_class`` tagged as the adapter would tag it"""
+    obj = adapter_class.gds_type(**kwargs)
+    obj.original_tagname_ = adapter_class.gds_tag_name
+    return obj
+
 
 class SFFRGBA(SFFType):
     """Colours"""
@@ -85,7 +470,7 @@ class SFFRGBA(SFFType):
     def as_hff(self, parent_group, name=u"colour", args=None):
         """Return the data of this object as an HDF5 group in the given parent group"""
         assert isinstance(parent_group, h5py.Group)
-        parent_group[name] = self.value
+        _hff_set(parent_group, name, self.value, args)
         return parent_group
 
     @classmethod
@@ -93,7 +478,7 @@ class SFFRGBA(SFFType):
         """Return an SFFType object given an HDF5 object"""
         _assert_or_raise(parent_group, h5py.Group)
         obj = cls(new_obj=False)
-        obj.value = parent_group[name][()]
+        obj.value = _hff_get(parent_group, [name])[name]
         return obj
 
     def as_json(self, args=None):
@@ -167,36 +552,37 @@ class SFFExternalReference(SFFIndexType):
         # then create the group
         group = parent_group.create_group(name)
         # we can do this because we can guarantee that the id exists
-        group[u'id'] = self.id
+        _hff_set(group, u'id', self.id, args)
         if self.resource:
-            group[u'resource'] = self.resource
+            _hff_set(group, u'resource', self.resource, args)
         if self.url:
-            group[u'url'] = self.url
+            _hff_set(group, u'url', self.url, args)
         if self.accession:
-            group[u'accession'] = self.accession
+            _hff_set(group, u'accession', self.accession, args)
         if self.label:
-            group[u'label'] = self.label
+            _hff_set(group, u'label', self.label, args)
         if self.description:
-            group[u'description'] = self.description
+            _hff_set(group, u'description', self.description, args)
         return parent_group
 
     @classmethod
     def from_hff(cls, parent_group, name=None, args=None):
         _assert_or_raise(parent_group, h5py.Group)
         group = parent_group[parent_group.name]
+        values = _hff_get(group, [u'id', u'resource', u'url', u'accession', u'label', u'description'])
         obj = cls(new_obj=False)
-        if u'id' in group:
-            obj.id = int(group[u'id'][()])
-        if u'resource' in group:
-            obj.resource = _decode(group[u'resource'][()], 'utf-8')
-        if u'url' in group:
-            obj.url = _decode(group[u'url'][()], 'utf-8')
-        if u'accession' in group:
-            obj.accession = _decode(group[u'accession'][()], 'utf-8')
-        if u'label' in group:
-            obj.label = _decode(group[u'label'][()], 'utf-8')
-        if u'description' in group:
-            obj.description = _decode(group[u'description'][()], 'utf-8')
+        if u'id' in values:
+            obj.id = int(values[u'id'])
+        if u'resource' in values:
+            obj.resource = _decode(values[u'resource'], 'utf-8')
+        if u'url' in values:
+            obj.url = _decode(values[u'url'], 'utf-8')
+        if u'accession' in values:
+            obj.accession = _decode(values[u'accession'], 'utf-8')
+        if u'label' in values:
+            obj.label = _decode(values[u'label'], 'utf-8')
+        if u'description' in values:
+            obj.description = _decode(values[u'description'], 'utf-8')
         return obj
 
 
@@ -279,6 +665,246 @@ class SFFGlobalExternalReferenceList(SFFListType):
         return obj
 
 
+class SFFAnnotationIndex(object):
+    """Columnar index of all the external references in a segmentation
+
+    Each external reference is a row; each of ``resource``, ``url``, ``accession``, ``label`` and ``description``
+    is a column of integer codes into a single pool of interned strings (:py:attr:`strings`; ``-1`` is ``None``)
+    alongside the ``id`` and ``segment_id`` (the ID of the owning segment; ``-1`` for global external
+    references) integer columns. Queries are then vectorised filters over the columns:
+
+    .. code:: python
+
+        index = seg.annotation_index
+        index.segment_ids(accession=u'GO:0005739')  # every segment annotated with GO:0005739
+        index.segment_ids(resource=[u'go', u'omit'])  # with a reference from either resource
+        for extref in index.select(resource=u'go', segment_id=15559):
+            print(extref)
+
+    Rows give access to the original external references (:py:meth:`__getitem__`, :py:meth:`select`) and to the
+    segment's :py:class:`SFFExternalReferenceList` (:py:meth:`external_references`) so changes made through them
+    modify the segmentation. The index is the only lookup structure for external references: it is rebuilt on the
+    next query whenever the segmentation's annotation has changed through
+    :py:meth:`SFFSegmentation.merge_annotation`, :py:meth:`SFFSegmentation.copy_annotation` and
+    :py:meth:`SFFSegmentation.clear_annotation` or, for changes made any other way, once
+    :py:meth:`SFFSegmentation.reset_annotation_index` has been called.
+    """
+    columns = (u'resource', u'url', u'accession', u'label', u'description')
+    u"""the string columns"""
+
+    def __init__(self):
+        self._segmentation = None
+        self._version = None
+        self._clear()
+
+    def _clear(self):
+        self._strings = list()
+        self._codes = dict()
+        self._id = numpy.empty(0, dtype=numpy.int64)
+        self._segment_id = numpy.empty(0, dtype=numpy.int64)
+        self._data = {column: numpy.empty(0, dtype=numpy.int32) for column in self.columns}
+        self._refs = list()
+        self._lists = dict()
+
+    def _refresh(self, refs=False):
+        """Rebuild the columns if the segmentation's annotation has changed since they were built or, with ``refs``,
+        if the rows have no external references (when read with :py:meth:`from_hff`)"""
+        if self._segmentation is not None and (
+                self._version != getattr(self._segmentation, u'_annotation_version', 0) or (refs and self._refs is None)
+        ):
+            self._build()
+
+    @property
+    def strings(self):
+        """The pool of interned strings"""
+        self._refresh()
+        return self._strings
+
+    @property
+    def id(self):
+        """The ``id`` column; ``-1`` is ``None``"""
+        self._refresh()
+        return self._id
+
+    @property
+    def segment_id(self):
+        """The ``segment_id`` column; ``-1`` for global external references"""
+        self._refresh()
+        return self._segment_id
+
+    @property
+    def data(self):
+        """The string columns by name"""
+        self._refresh()
+        return self._data
+
+    def __len__(self):
+        return len(self.id)  # refreshes the columns
+
+    def __repr__(self):
+        return u"SFFAnnotationIndex({} rows, {} strings)".format(len(self), len(self.strings))
+
+    def __getitem__(self, index):
+        """The external reference in row ``index``"""
+        self._refresh(refs=True)
+        return SFFExternalReference.from_gds_type(self._refs[index])
+
+    def _intern(self, value):
+        """The code for ``value`` adding it to the pool of strings if it is new; ``-1`` for ``None``"""
+        if value is None:
+            return -1
+        try:
+            return self._codes[value]
+        except KeyError:
+            code = len(self._strings)
+            self._strings.append(sys.intern(value))
+            self._codes[value] = code
+            return code
+
+    @classmethod
+    def from_segmentation(cls, segmentation):
+        """Build the index from all external references in ``segmentation`` (global external references first)
+
+        :param segmentation: the segmentation
+        :type segmentation: :py:class:`SFFSegmentation`
+        :return index: the index
+        :rtype index: :py:class:`SFFAnnotationIndex`
+        """
+        index = cls()
+        index._segmentation = segmentation
+        index._build()
+        return index
+
+    def _build(self):
+        self._clear()
+        ids, segment_ids = list(), list()
+        codes = {column: list() for column in self.columns}
+
+        def _add(refs, segment_id):
+            for ref in refs:
+                self._refs.append(ref)
+                ids.append(-1 if ref.id is None else ref.id)
+                segment_ids.append(segment_id)
+                for column in self.columns:
+                    codes[column].append(self._intern(getattr(ref, column)))
+
+        # work on the generateDS objects directly since adapters are created on every access
+        self._version = getattr(self._segmentation, u'_annotation_version', 0)
+        seg_local = self._segmentation._local
+        if seg_local.global_external_references is not None:
+            _add(seg_local.global_external_references.ref, -1)
+        if seg_local.segment_list is not None:
+            for segment in seg_local.segment_list.segment:
+                annotation = segment.biological_annotation
+                if annotation is not None and annotation.external_references is not None:
+                    self._lists[segment.id] = annotation.external_references
+                    _add(annotation.external_references.ref, segment.id)
+        self._id = numpy.array(ids, dtype=numpy.int64)
+        self._segment_id = numpy.array(segment_ids, dtype=numpy.int64)
+        self._data = {column: numpy.array(codes[column], dtype=numpy.int32) for column in self.columns}
+
+    def mask(self, **criteria):
+        """A boolean array marking the rows which match all ``criteria``
+
+        Each criterion is a column name (one of :py:attr:`columns`, ``id`` or ``segment_id``) and either a value
+        or a list of values any of which may match.
+
+        :return mask: the mask
+        :rtype mask: :py:class:`numpy.ndarray`
+        :raises TypeError: for an unknown column
+        """
+        mask = numpy.ones(len(self), dtype=bool)  # refreshes the columns
+        for column, values in criteria.items():
+            if isinstance(values, (_str, numbers.Integral)) or values is None:
+                values = [values]
+            if column in self.columns:
+                values = [self._codes.get(value, -2) if value is not None else -1 for value in values]
+                mask &= numpy.isin(self.data[column], values)
+            elif column in (u'id', u'segment_id'):
+                mask &= numpy.isin(getattr(self, column), list(values))
+            else:
+                raise TypeError(u"invalid column '{}'; valid columns are: {}".format(
+                    column, u", ".join(self.columns + (u'id', u'segment_id'))
+                ))
+        return mask
+
+    def segment_ids(self, **criteria):
+        """The sorted IDs of segments with an external reference matching all ``criteria`` (see :py:meth:`mask`)
+
+        :return segment_ids: segment IDs
+        :rtype segment_ids: list
+        """
+        mask = self.mask(**criteria) & (self.segment_id >= 0)
+        return numpy.unique(self.segment_id[mask]).tolist()
+
+    def select(self, **criteria):
+        """The external references matching all ``criteria`` (see :py:meth:`mask`)
+
+        :return extrefs: external references
+        :rtype extrefs: list
+        """
+        return [self[int(index)] for index in numpy.flatnonzero(self.mask(**criteria))]
+
+    def row(self, index):
+        """The values in row ``index``
+
+        :param int index: the row
+        :return row: column names and values
+        :rtype row: dict
+        """
+        row = {column: self.strings[self.data[column][index]] if self.data[column][index] >= 0 else None for column in
+               self.columns}
+        row[u'id'] = int(self.id[index]) if self.id[index] >= 0 else None
+        row[u'segment_id'] = int(self.segment_id[index]) if self.segment_id[index] >= 0 else None
+        return row
+
+    def external_references(self, segment_id):
+        """The external references of segment ``segment_id``
+
+        :param int segment_id: the segment ID
+        :return extrefs: the segment's external references
+        :rtype extrefs: :py:class:`SFFExternalReferenceList`
+        :raises KeyError: if the segment has no external references
+        """
+        self._refresh(refs=True)
+        return SFFExternalReferenceList.from_gds_type(self._lists[segment_id])
+
+    def as_hff(self, parent_group, name=u'annotation_index', args=None):
+        """Write the index as a group of its columns (``id``, ``segment_id`` and the codes of each string column)
+        and the pool of ``strings``"""
+        _assert_or_raise(parent_group, h5py.Group)
+        group = parent_group.create_group(name)
+        group.create_dataset(u'strings', data=self.strings, dtype=h5py.string_dtype())
+        group[u'id'] = self.id
+        group[u'segment_id'] = self.segment_id
+        for column in self.columns:
+            group[column] = self.data[column]
+        return parent_group
+
+    @classmethod
+    def from_hff(cls, parent_group, name=u'annotation_index', args=None):
+        """Read an index written by :py:meth:`as_hff`
+
+        The external references of the rows are only looked up once they are used (by which time the index must
+        belong to a segmentation).
+        """
+        _assert_or_raise(parent_group, h5py.Group)
+        group = parent_group[name]
+        index = cls()
+        for value in group[u'strings'][()]:
+            index._intern(_decode(value, u'utf-8'))
+        index._id = group[u'id'][()].astype(numpy.int64)
+        index._segment_id = group[u'segment_id'][()].astype(numpy.int64)
+        index._data = {column: group[column][()].astype(numpy.int32) for column in cls.columns}
+        index._refs = None
+        return index
+
+    def _attach(self, segmentation):
+        """Make this index (read with :py:meth:`from_hff`) that of ``segmentation`` as it is now"""
+        self._segmentation = segmentation
+        self._version = getattr(segmentation, u'_annotation_version', 0)
+
+
 class SFFBiologicalAnnotation(SFFType):
     """Biological annotation"""
     gds_type = _sff.biological_annotationType
@@ -346,13 +972,13 @@ class SFFBiologicalAnnotation(SFFType):
         group = parent_group.create_group(name)
         # description and nubmerOfInstances as datasets
         if self.name:
-            group[u'name'] = self.name
+            _hff_set(group, u'name', self.name, args)
         if self.description:
-            group[u'description'] = self.description
+            _hff_set(group, u'description', self.description, args)
         if isinstance(self.number_of_instances, numbers.Integral):
-            group[u'number_of_instances'] = self.number_of_instances if self.number_of_instances > 0 else 1
+            _hff_set(group, u'number_of_instances', self.number_of_instances if self.number_of_instances > 0 else 1, args)
         else:
-            group[u'number_of_instances'] = 1
+            _hff_set(group, u'number_of_instances', 1, args)
         if self.external_references:
             _ = self.external_references.as_hff(group, args=args)
         return parent_group
@@ -362,15 +988,16 @@ class SFFBiologicalAnnotation(SFFType):
         """Return an SFFType object given an HDF5 object"""
         _assert_or_raise(parent_group, h5py.Group)
         group = parent_group[name]
+        values = _hff_get(group, [u'name', u'description', u'number_of_instances'])
         obj = cls(new_obj=False)
-        if u'name' in group:
-            obj.name = _decode(group[u'name'][()], u'utf-8')
+        if u'name' in values:
+            obj.name = _decode(values[u'name'], u'utf-8')
         else:
             obj.name = None
-        if u'description' in group:
-            obj.description = _decode(group[u'description'][()], u'utf-8')
-        if u'number_of_instances' in group:
-            obj.number_of_instances = int(group[u'number_of_instances'][()])
+        if u'description' in values:
+            obj.description = _decode(values[u'description'], u'utf-8')
+        if u'number_of_instances' in values:
+            obj.number_of_instances = int(values[u'number_of_instances'])
         if u"external_references" in group:
             obj.external_references = SFFExternalReferenceList.from_hff(group, args=args)
         return obj
@@ -413,11 +1040,11 @@ class SFFThreeDVolume(SFFType):
         _assert_or_raise(parent_group, h5py.Group)
         group = parent_group.create_group(name)
         if self.lattice_id is not None:
-            group[u'lattice_id'] = self.lattice_id
+            _hff_set(group, u'lattice_id', self.lattice_id, args)
         if self.value is not None:
-            group[u'value'] = self.value
+            _hff_set(group, u'value', self.value, args)
         if self.transform_id is not None:
-            group[u'transform_id'] = self.transform_id
+            _hff_set(group, u'transform_id', self.transform_id, args)
         return parent_group
 
     @classmethod
@@ -425,13 +1052,14 @@ class SFFThreeDVolume(SFFType):
         """Return an SFFType object given an HDF5 object"""
         _assert_or_raise(parent_group, h5py.Group)
         group = parent_group[name]
+        values = _hff_get(group, [u'lattice_id', u'value', u'transform_id'])
         obj = cls(new_obj=False)
-        if u'lattice_id' in group:
-            obj.lattice_id = int(group[u'lattice_id'][()])
-        if u'value' in group:
-            obj.value = group[u'value'][()]
-        if u'transform_id' in group:
-            obj.transform_id = int(group[u'transform_id'][()])
+        if u'lattice_id' in values:
+            obj.lattice_id = int(values[u'lattice_id'])
+        if u'value' in values:
+            obj.value = values[u'value']
+        if u'transform_id' in values:
+            obj.transform_id = int(values[u'transform_id'])
         return obj
 
 
@@ -478,11 +1106,11 @@ class SFFVolume(SFFType):
         _assert_or_raise(name, _str)  # will be set in the children
         group = parent_group.create_group(name)
         if self.rows is not None:
-            group[u'rows'] = self.rows
+            _hff_set(group, u'rows', self.rows, args)
         if self.cols is not None:
-            group[u'cols'] = self.cols
+            _hff_set(group, u'cols', self.cols, args)
         if self.sections is not None:
-            group[u'sections'] = self.sections
+            _hff_set(group, u'sections', self.sections, args)
         return parent_group
 
     @classmethod
@@ -491,12 +1119,13 @@ class SFFVolume(SFFType):
         _assert_or_raise(name, _str)  # will be set in the children
         obj = cls(new_obj=False)
         group = parent_group[name]
-        if u'rows' in group:
-            obj.rows = group[u'rows'][()]
-        if u'cols' in group:
-            obj.cols = group[u'cols'][()]
-        if u'sections' in group:
-            obj.sections = group[u'sections'][()]
+        values = _hff_get(group, [u'rows', u'cols', u'sections'])
+        if u'rows' in values:
+            obj.rows = values[u'rows']
+        if u'cols' in values:
+            obj.cols = values[u'cols']
+        if u'sections' in values:
+            obj.sections = values[u'sections']
         return obj
 
 
@@ -549,7 +1178,8 @@ class SFFLattice(SFFIndexType):
     id = SFFAttribute(u'id', required=True, help=u"the ID for this lattice (referenced by 3D volumes)")
     mode = SFFAttribute(u'mode', required=True, default=u'uint32',
                         help=u"type of data for each voxel; valid values are: int8, uint8, int16, uint16, int32, "
-                             u"uint32, int64, uint64, float32, float64")
+                             u"uint32, int64, uint64, float32, float64 or bit (binary masks packed 8 voxels "
+                             u"to the byte)")
     endianness = SFFAttribute(u'endianness', required=True, default=u'little',
                               help=u"endianness; either 'little' (default) or 'big'")
     size = SFFAttribute(u'size', sff_type=SFFVolumeStructure, required=True,
@@ -559,23 +1189,29 @@ class SFFLattice(SFFIndexType):
                          required=True,
                          help=u"starting index of the lattices described using a"
                               ":py:class:`sfftkrw.schema.adapter.SFFVolumeIndex` object")
-    data = SFFAttribute(u'data', required=True,
-                        help=u"data provided by a :py:class:`numpy.ndarray`, byte-sequence or unicode string; "
-                             u"the dimensions should correspond with those specified in the 'size' attribute")
+    data = SFFPayloadAttribute(u'data', required=True,
+                               help=u"data provided by a :py:class:`numpy.ndarray`, byte-sequence or unicode string; "
+                                    u"the dimensions should correspond with those specified in the 'size' attribute")
 
     def __init__(self, **kwargs):
+        data_array, decoded = None, None
         if u'data' in kwargs:
             if isinstance(kwargs[u'data'], numpy.ndarray):
-                self._data = kwargs[u'data']
+                data_array = kwargs[u'data']
                 kwargs[u'data'] = SFFLattice._encode(kwargs[u'data'], **kwargs)
-            elif isinstance(kwargs[u'data'], (_bytes, _str)):
-                self._data = SFFLattice._decode(kwargs[u'data'], **kwargs)
+            elif isinstance(kwargs[u'data'], _BUFFER_TYPES + (_str,)):
+                decoded = SFFLattice._decode(kwargs[u'data'], **kwargs)
             # elif isinstance(kwargs[u'data'], _str):
             #     _data = _encode(kwargs[u'data'], u'ASCII')
             #     self._data = SFFLattice._decode(_data, **kwargs)
             #     kwargs[u'data'] = _data
             #     del _data
         super(SFFLattice, self).__init__(**kwargs)
+        if data_array is not None:
+            _keep_array(self._local, data_array, self.mode, self.endianness)
+        elif decoded is not None:
+            self._local._data_array = decoded
+            self._local._data_crc = _payload_fingerprint(decoded)
 
     @classmethod
     def from_array(cls, data, size=None, mode=u'uint32', endianness=u'little',
@@ -588,7 +1224,10 @@ class SFFLattice(SFFIndexType):
         :type size: :py:class:`SFFVolumeStructure`
         :param start: the values of the corner voxel
         :type start: :py:class:`SFFVolumeIndex`
-        :param mode: the size of each voxel; valid values are: `int8`, `uint8`, `int16`, `uint16`, `int32`, `uint32`, `int64`, `uint64``float32`, `float64`
+        :param mode: the size of each voxel; valid values are: `int8`, `uint8`, `int16`, `uint16`, `int32`, `uint32`, `int64`, `uint64``float32`, `float64`;
+            `bit` packs a binary mask (only 0s and 1s) 8 voxels to the byte but is not part of the EMDB-SFF schema so
+            other readers may not decode it;
+            use `auto` to pick the narrowest of the modes above (other than `bit`) that holds the data without loss
         :type mode: bytes or str or unicode
         :param endianness: byte ordering: ``little`` (default) or ``big``
         :type endianness: bytes or str or unicode
@@ -597,6 +1236,10 @@ class SFFLattice(SFFIndexType):
         """
         # assertions
         r, c, s = data.shape
+        if mode == u'auto':
+            # `bit` must be asked for explicitly
+            mode = _narrowest_mode(data)
+            data = data.astype(mode)
         encoded_data = SFFLattice._encode(data, mode=mode, endianness=endianness)
         if size is None:
             size = SFFVolumeStructure(rows=r, cols=c, sections=s)
@@ -607,22 +1250,38 @@ class SFFLattice(SFFIndexType):
             start=start,
             data=encoded_data
         )
-        obj._data = data
+        _keep_array(obj._local, data, mode, endianness)
         return obj
 
     @property
     def data_array(self):
-        """The data as a :py:class:`numpy.ndarray`"""
-        if not hasattr(self, u'_data'):
+        """The data as a :py:class:`numpy.ndarray`
+
+        The array is decoded once and kept with the lattice so that changes made to it in place are written out on
+        export; only then is the payload re-encoded (assign the array to :py:attr:`data_array` for :py:attr:`data`
+        to reflect the changes sooner).
+        """
+        local = self._local
+        if getattr(local, u'_data_array', None) is None:
             # make numpy from bytes
-            self._data = SFFLattice._decode(
+            local._data_array = SFFLattice._decode(
                 self.data,
                 size=self.size,
                 mode=self.mode,
                 endianness=self.endianness,
                 start=self.start
             )
-        return self._data
+            local._data_crc = _payload_fingerprint(local._data_array)
+        return local._data_array
+
+    @data_array.setter
+    def data_array(self, array):
+        """Replace the data; the payload is encoded when next accessed"""
+        size = tuple(self.size.value[::-1]) if self.size is not None else None
+        if array.shape != size:
+            raise SFFValueError(u"array has shape {}; the lattice has shape {}".format(array.shape, size))
+        _keep_array(self._local, array, self.mode, self.endianness)
+        self._local.data = None
 
     @classmethod
     def from_bytes(cls, byte_seq, size, mode=u'uint32', endianness=u'little',
@@ -665,11 +1324,15 @@ class SFFLattice(SFFIndexType):
         :type array: :py:class:`numpy.ndarray`
         :return str: the corresponding zipped object as a string
         """
-        r, c, s = array.shape
-        voxel_count = r * c * s
-        format_string = "{}{}{}".format(ENDIANNESS[endianness], voxel_count, FORMAT_CHARS[mode])
         try:
-            binpack = struct.pack(format_string, *array.flat)
+            if mode == BIT_MODE:
+                if not _is_binary(array):
+                    raise SFFValueError(u"mode '{}' requires an array of only 0s and 1s".format(BIT_MODE))
+                # one bit per voxel; endianness does not apply
+                binpack = numpy.packbits(numpy.asarray(array, dtype=bool), axis=None)
+            else:
+                # cast to the required mode only if needed; the array's buffer is compressed directly
+                binpack = _cast_payload(array, mode, endianness)
             del array
             binzip = zlib.compress(binpack)
             del binpack
@@ -685,28 +1348,22 @@ class SFFLattice(SFFIndexType):
         """Decode a base64-encoded, zipped byte sequence to a numpy array
 
         :param bin64: the base64-encoded zipped data
-        :type bin64: bytes or unicode string
+        :type bin64: bytes, memoryview or unicode string
         :param size: the size of the expected volume
         :type size: :py:class:`SFFVolumeStructure`
-        :return: a :py:class:`numpy.ndarray` object
+        :return: a :py:class:`numpy.ndarray` object of the type of ``mode`` (``uint8`` for ``bit``)
         :rtype: :py:class:`numpy.ndarray`
         """
-        if isinstance(bin64, _str):
-            binzip = base64.b64decode(_encode(bin64, u'utf-8'))
-        else:
-            binzip = base64.b64decode(bin64)
+        binzip = binascii.a2b_base64(bin64)  # reads ASCII strings and buffers without converting them first
         del bin64
-        binpack = zlib.decompress(binzip)
-        del binzip
         _count = size.voxel_count
-        _len = len(binpack)
-        endianness_ = ENDIANNESS[endianness]
-        format_char = FORMAT_CHARS[mode]
-        bindata = struct.unpack("{}{}{}".format(endianness_, _count, format_char), binpack)
-        del binpack
-        data = numpy.array(bindata).reshape(*size.value[::-1])
-        del bindata
-        return data
+        if mode == BIT_MODE:
+            bits = _inflate(binzip, numpy.uint8, (_count + 7) // 8)
+            del binzip
+            return numpy.unpackbits(bits, count=_count).reshape(*size.value[::-1])
+        data = _inflate(binzip, _payload_dtype(mode, endianness), _count)
+        del binzip
+        return data.reshape(*size.value[::-1])
 
     def as_json(self, args=None):
         if self.id is None:
@@ -717,7 +1374,7 @@ class SFFLattice(SFFIndexType):
             u'endianness': self.endianness,
             u'size': self.size.as_json(args=args) if self.size is not None else None,
             u'start': self.start.as_json(args=args) if self.start is not None else None,
-            u'data': self.data,
+            u'data': _payload_text(self.data),
         }
 
     @classmethod
@@ -753,17 +1410,18 @@ class SFFLattice(SFFIndexType):
             _assert_or_raise(name, _str)
         group = parent_group.create_group(name)
         if self.id is not None:
-            group[u'id'] = self.id
+            _hff_set(group, u'id', self.id, args)
         if self.mode:
-            group[u'mode'] = self.mode
+            _hff_set(group, u'mode', self.mode, args)
         if self.endianness:
-            group[u'endianness'] = self.endianness
+            _hff_set(group, u'endianness', self.endianness, args)
         if self.size:
             group = self.size.as_hff(group, args=args)
         if self.start:
             group = self.start.as_hff(group, args=args)
-        if self.data:
-            group[u'data'] = self.data
+        data = self.data
+        if data:
+            _hff_set_payload(group, data)
         return parent_group
 
     @classmethod
@@ -771,18 +1429,19 @@ class SFFLattice(SFFIndexType):
         _assert_or_raise(parent_group, h5py.Group)
         obj = cls(new_obj=False)
         group = parent_group[parent_group.name]
-        if u'id' in group:
-            obj.id = int(group[u'id'][()])
-        if u'mode' in group:
-            obj.mode = _decode(group[u'mode'][()], 'utf-8')
-        if u'endianness' in group:
-            obj.endianness = _decode(group[u'endianness'][()], 'utf-8')
+        values = _hff_get(group, [u'id', u'mode', u'endianness', u'data'])
+        if u'id' in values:
+            obj.id = int(values[u'id'])
+        if u'mode' in values:
+            obj.mode = _decode(values[u'mode'], 'utf-8')
+        if u'endianness' in values:
+            obj.endianness = _decode(values[u'endianness'], 'utf-8')
         if u'size' in group:
             obj.size = SFFVolumeStructure.from_hff(group, args=args)
         if u'start' in group:
             obj.start = SFFVolumeIndex.from_hff(group, args=args)
-        if u'data' in group:
-            obj.data = _decode(group[u'data'][()], 'utf-8')
+        if u'data' in values:
+            obj.data = _hff_payload(values[u'data'])
         return obj
 
 
@@ -821,6 +1480,12 @@ class SFFLatticeList(SFFListType):
         _assert_or_raise(parent_group, h5py.Group)
         obj = cls(new_obj=False)
         group = parent_group[name]
+        if _hff_workers(args) > 1:
+            lattices = _hff_read_parallel(group, SFFLattice, _hff_workers(args), args=args)
+            if lattices is not None:
+                obj._local.lattice = lattices
+                obj._update_dict()
+                return obj
         for subgroup in sorted(group.values(), key=lambda g: int(os.path.basename(g.name))):
             obj.append(SFFLattice.from_hff(subgroup, args=args))
         return obj
@@ -834,6 +1499,7 @@ class SFFEncodedSequence(SFFType):
     """the name of the attribute with the size"""
 
     def __init__(self, **kwargs):
+        data_array = None
         if u'data' in kwargs:
             if isinstance(kwargs[u'data'], numpy.ndarray):
                 # check that the dimensions are correct
@@ -841,19 +1507,23 @@ class SFFEncodedSequence(SFFType):
                     assert kwargs[u'data'].shape[1] == 3  # x, y, z
                 except AssertionError:
                     raise ValueError(u"data has invalid dimensions: {}; should be (n, 3)".format(kwargs[u'data'].shape))
-                self._data = kwargs[u'data']
+                data_array = kwargs[u'data']
                 kwargs['data'] = self._encode(kwargs[u'data'], **kwargs)
-            elif isinstance(kwargs[u'data'], (_bytes, _str)):
-                self._data = self._decode(kwargs[u'data'], **kwargs)
+            elif isinstance(kwargs[u'data'], _BUFFER_TYPES + (_str,)):
+                data_array = self._decode(kwargs[u'data'], **kwargs)
                 # make sure the number of items is correct
                 try:
-                    assert self._data.shape[0] == kwargs.get(self.num_items_kwarg)
+                    assert data_array.shape[0] == kwargs.get(self.num_items_kwarg)
                 except AssertionError:
                     raise ValueError(
                         u"mismatch in stated and retrieved number of items: {}/{}".format(
                             kwargs.get(self.num_items_kwarg),
-                            self._data.shape[0]))
+                            data_array.shape[0]))
         super(SFFEncodedSequence, self).__init__(**kwargs)
+        if data_array is not None:
+            _keep_array(
+                self._local, data_array, self.mode or self.default_mode, self.endianness or self.default_endianness
+            )
 
     def __getitem__(self, item):
         return self.data_array[item]
@@ -862,36 +1532,42 @@ class SFFEncodedSequence(SFFType):
         return getattr(self, self.num_items_kwarg)
 
     @classmethod
-    def from_array(cls, data, mode=None, endianness=None):
+    def from_array(cls, data, mode=None, endianness=None, compression=None):
         """Create a :py:class:`SFFVertices` object from a numpy array inferring size and assuming certain defaults
 
         :param data: the data as a :py:class:`numpy.ndarray` object
         :type data: :py:class:`numpy.ndarray`
-        :param mode: the size of each voxel; valid values are: `int8`, `uint8`, `int16`, `uint16`, `int32`, `uint32`, `int64`, `uint64``float32`, `float64`
+        :param mode: the size of each voxel; valid values are: `int8`, `uint8`, `int16`, `uint16`, `int32`, `uint32`, `int64`, `uint64``float32`, `float64`;
+            use `auto` to pick the narrowest mode that holds the data without loss
         :type mode: bytes or str or unicode
         :param endianness: byte ordering: ``little`` (default) or ``big``
         :type endianness: bytes or str or unicode
+        :param str compression: compress the data with ``zlib`` optionally preceded by the ``delta`` and/or
+            ``shuffle`` filters e.g. ``shuffle+zlib``; default is no compression
         :return: a :py:class:`SFFVertices` object
         :rtype: :py:class:`SFFVertices`
         """
         if mode is None:
             mode = cls.default_mode
+        elif mode == u'auto':
+            mode = _narrowest_mode(data)
         if endianness is None:
             endianness = cls.default_endianness
         # assertions
-        encoded_data = SFFEncodedSequence._encode(data, mode=mode, endianness=endianness)
+        encoded_data = SFFEncodedSequence._encode(data, mode=mode, endianness=endianness, compression=compression)
         kwargs = {
             cls.num_items_kwarg: data.shape[0],
             'mode': mode,
             'endianness': endianness,
             'data': encoded_data,
+            'compression': compression or None,  # the attribute is only written for compressed data
         }
         obj = cls(**kwargs)
-        obj._data = data
+        _keep_array(obj._local, data, mode, endianness)
         return obj
 
     @classmethod
-    def from_bytes(cls, byte_seq, num_items, mode=None, endianness=None):
+    def from_bytes(cls, byte_seq, num_items, mode=None, endianness=None, compression=None):
         """Create a :py:class:`SFFVertices` object using a bytes object
 
         :param byte_seq: the data as a base64-encoded sequence; can be bytes or unicode
@@ -901,6 +1577,7 @@ class SFFEncodedSequence(SFFType):
         :type mode: bytes or str or unicode
         :param endianness: byte ordering: ``little`` (default) or ``big``
         :type endianness: bytes or str or unicode
+        :param str compression: the compression applied to the data, if any e.g. ``shuffle+zlib``
         :return: a :py:class:`SFFVertices` object
         :rtype: :py:class:`SFFVertices`
         """
@@ -915,48 +1592,81 @@ class SFFEncodedSequence(SFFType):
             'mode': mode,
             'endianness': endianness,
             'data': byte_seq,
+            'compression': compression or None,
         }
         obj = cls(**kwargs)
         return obj
 
     @property
     def data_array(self):
-        """The data as a :py:class:`numpy.ndarray`"""
-        if not hasattr(self, u'_data'):
+        """The data as a :py:class:`numpy.ndarray`
+
+        As for :py:attr:`SFFLattice.data_array` the array is kept so that changes made to it in place are
+        re-encoded on export.
+        """
+        local = self._local
+        if getattr(local, u'_data_array', None) is None:
             # make numpy from bytes
-            self._data = SFFEncodedSequence._decode(
+            local._data_array = SFFEncodedSequence._decode(
                 self.data,
                 mode=self.mode,
                 endianness=self.endianness,
+                compression=self.compression,
             )
-        return self._data
+            local._data_crc = _payload_fingerprint(local._data_array)
+        return local._data_array
+
+    @data_array.setter
+    def data_array(self, array):
+        """Replace the data (an ``(n, 3)`` array); the payload is encoded when next accessed"""
+        if array.ndim != 2 or array.shape[1] != 3:
+            raise ValueError(u"data has invalid dimensions: {}; should be (n, 3)".format(array.shape))
+        setattr(self, self.num_items_kwarg, array.shape[0])
+        _keep_array(self._local, array, self.mode or self.default_mode, self.endianness or self.default_endianness)
+        self._local.data = None
 
     @staticmethod
-    def _encode(array, mode=None, endianness=None, **kwargs):
+    def _encode(array, mode=None, endianness=None, compression=None, **kwargs):
         """Encode a :py:class:`numpy.ndarray` as a base64-encoded byte sequence
 
         :param array: a :py:class:`numpy.ndarray` array
         :type array: :py:class:`numpy.ndarray`
         :param str mode: the data type
         :param str endianness: the byte orientation
+        :param str compression: the compression, if any e.g. ``delta+shuffle+zlib``
         :return str: the corresponding encoded sequence
         """
         if mode is None:
             mode = SFFEncodedSequence.default_mode
         if endianness is None:
             endianness = SFFEncodedSequence.default_endianness
-        array_in_mode_and_endianness = array.astype(
-            '{}{}'.format(ENDIANNESS[endianness], FORMAT_CHARS[mode]))  # cast to required mode
-        return _decode(base64.b64encode(array_in_mode_and_endianness.tobytes()), u'utf-8')
+        # cast to the required mode only if needed; the array's buffer is encoded directly
+        array = _cast_payload(array, mode, endianness)
+        if not compression:
+            return _decode(base64.b64encode(array), u'ascii')
+        dt = array.dtype
+        filters = _compression_filters(compression)
+        array = array.astype(dt.newbyteorder(u'='), copy=False).reshape(-1, 3)
+        if u'delta' in filters:
+            # difference successive items using their bit patterns so that floats round-trip exactly
+            bits = array.view(u'u{}'.format(dt.itemsize))
+            array = numpy.diff(bits, axis=0, prepend=numpy.zeros((1, 3), dtype=bits.dtype))
+            dt = numpy.dtype(u'{}u{}'.format(ENDIANNESS[endianness], dt.itemsize))
+        binpack = numpy.ascontiguousarray(array, dtype=dt)
+        if u'shuffle' in filters:
+            # group the n-th byte of every value together
+            binpack = numpy.ascontiguousarray(binpack.view(numpy.uint8).reshape(-1, dt.itemsize).T)
+        return _decode(base64.b64encode(zlib.compress(binpack)), u'ascii')
 
     @staticmethod
-    def _decode(bin64, mode=None, endianness=None, **kwargs):
+    def _decode(bin64, mode=None, endianness=None, compression=None, **kwargs):
         """Decode a base64-encoded byte sequence to a numpy array
 
         :param bin64: the base64-encoded byte sequence
-        :type bin64: bytes or unicode
+        :type bin64: bytes, memoryview or unicode
         :param str mode: the data type
         :param str endianness: the byte orientation
+        :param str compression: the compression, if any e.g. ``delta+shuffle+zlib``
         :return: a :py:class:`numpy.ndarray` object
         :rtype: :py:class:`numpy.ndarray`
         """
@@ -964,21 +1674,32 @@ class SFFEncodedSequence(SFFType):
             mode = SFFEncodedSequence.default_mode
         if endianness is None:
             endianness = SFFEncodedSequence.default_endianness
-        if isinstance(bin64, _str):
-            binpack = base64.b64decode(_encode(bin64, u'utf-8'))
-        else:
-            binpack = base64.b64decode(bin64)
+        binpack = binascii.a2b_base64(bin64)  # reads ASCII strings and buffers without converting them first
         dt = numpy.dtype('{}{}'.format(ENDIANNESS[endianness], FORMAT_CHARS[mode]))
+        if not compression:
+            unpacked = numpy.frombuffer(binpack, dtype=dt)
+            return unpacked.reshape(-1, 3)  # leave first value to be auto-filled
+        filters = _compression_filters(compression)
+        binpack = zlib.decompress(binpack)
+        if u'shuffle' in filters:
+            binpack = numpy.frombuffer(binpack, dtype=numpy.uint8).reshape(dt.itemsize, -1).T.tobytes()
+        if u'delta' in filters:
+            bits = numpy.frombuffer(binpack, dtype=u'{}u{}'.format(ENDIANNESS[endianness], dt.itemsize))
+            bits = numpy.cumsum(bits.reshape(-1, 3), axis=0, dtype=u'u{}'.format(dt.itemsize))
+            return bits.view(dt.newbyteorder(u'='))
         unpacked = numpy.frombuffer(binpack, dtype=dt)
-        return unpacked.reshape(-1, 3)  # leave first value to be auto-filled
+        return unpacked.reshape(-1, 3)
 
     def as_json(self, args=None):
-        return {
+        json_data = {
             self.num_items_kwarg: int(getattr(self, self.num_items_kwarg)),
             u'mode': self.mode,
             u'endianness': self.endianness,
-            u'data': self.data
+            u'data': _payload_text(self.data)
         }
+        if self.compression:
+            json_data[u'compression'] = self.compression
+        return json_data
 
     @classmethod
     def from_json(cls, data, args=None):
@@ -991,6 +1712,8 @@ class SFFEncodedSequence(SFFType):
             obj.endianness = data[u'endianness']
         if u'data' in data:
             obj.data = data[u'data']
+        if u'compression' in data:
+            obj.compression = data[u'compression']
         return obj
 
     def as_hff(self, parent_group, name=None, args=None):
@@ -999,13 +1722,16 @@ class SFFEncodedSequence(SFFType):
         group = parent_group.create_group(name)
         num_items = getattr(self, self.num_items_kwarg, None)
         if num_items is not None:
-            group[self.num_items_kwarg] = int(num_items)
+            _hff_set(group, self.num_items_kwarg, int(num_items), args)
         if self.mode:
-            group[u'mode'] = self.mode
+            _hff_set(group, u'mode', self.mode, args)
         if self.endianness:
-            group[u'endianness'] = self.endianness
-        if self.data:
-            group[u'data'] = self.data
+            _hff_set(group, u'endianness', self.endianness, args)
+        data = self.data
+        if data:
+            _hff_set_payload(group, data)
+        if self.compression:
+            _hff_set(group, u'compression', self.compression, args)
         return parent_group
 
     @classmethod
@@ -1014,14 +1740,17 @@ class SFFEncodedSequence(SFFType):
         _assert_or_raise(name, _str)
         obj = cls(new_obj=False)
         group = parent_group[name]
-        if cls.num_items_kwarg in group:
-            setattr(obj, cls.num_items_kwarg, int(group[cls.num_items_kwarg][()]))
-        if u'mode' in group:
-            obj.mode = _decode(group[u'mode'][()], 'utf-8')
-        if u'endianness' in group:
-            obj.endianness = _decode(group[u'endianness'][()], 'utf-8')
-        if u'data' in group:
-            obj.data = _decode(group[u'data'][()], 'utf-8')
+        values = _hff_get(group, [cls.num_items_kwarg, u'mode', u'endianness', u'data', u'compression'])
+        if cls.num_items_kwarg in values:
+            setattr(obj, cls.num_items_kwarg, int(values[cls.num_items_kwarg]))
+        if u'mode' in values:
+            obj.mode = _decode(values[u'mode'], 'utf-8')
+        if u'endianness' in values:
+            obj.endianness = _decode(values[u'endianness'], 'utf-8')
+        if u'data' in values:
+            obj.data = _decode(values[u'data'], 'utf-8')
+        if u'compression' in values:
+            obj.compression = _decode(values[u'compression'], 'utf-8')
         return obj
 
 
@@ -1036,14 +1765,16 @@ class SFFVertices(SFFEncodedSequence):
     repr_string = u"SFFVertices(num_vertices={}, mode={}, endianness={}, data={})"
     repr_args = (u'num_vertices', u'mode', u'endianness', u'data[:100]')
     num_items_kwarg = u'num_vertices'
-    eq_attrs = [u'num_vertices', u'mode', u'endianness', u'data']
+    eq_attrs = [u'num_vertices', u'mode', u'endianness', u'data', u'compression']
 
     # attributes
     num_vertices = SFFAttribute(u'num_vertices', required=True, help=u"the number of vertices contained")
     mode = SFFAttribute(u'mode', default=u"float32", help=u"data type; valid values are: int8, uint8, int16, uint16, "
                                                           u"int32, uint32, int64, uint64, float32, float64 [default: 'float32']")
     endianness = SFFAttribute(u'endianness', default=u"little", help=u"binary packing endianness [default: 'little']")
-    data = SFFAttribute(u'data', required=True, help=u"base64-encoded packed binary data")
+    data = SFFPayloadAttribute(u'data', required=True, help=u"base64-encoded packed binary data")
+    compression = SFFAttribute(u'compression', help=u"compression applied to the packed binary data e.g. 'zlib', "
+                                                    u"'shuffle+zlib' or 'delta+shuffle+zlib' [default: None]")
 
     def as_hff(self, parent_group, name=u'vertices', args=None):
         return super(SFFVertices, self).as_hff(parent_group, name=name, args=args)
@@ -1060,14 +1791,16 @@ class SFFNormals(SFFEncodedSequence):
     repr_string = u"SFFNormals(num_normals={}, mode={}, endianness={}, data={})"
     repr_args = (u'num_normals', u'mode', u'endianness', u'data[:100]')
     num_items_kwarg = u'num_normals'
-    eq_attrs = [u'num_normals', u'mode', u'endianness', u'data']
+    eq_attrs = [u'num_normals', u'mode', u'endianness', u'data', u'compression']
 
     # attributes
     num_normals = SFFAttribute(u'num_normals', required=True, help=u"the number of normals contained")
     mode = SFFAttribute(u'mode', default=u"float32", help=u"data type; valid values are: int8, uint8, int16, uint16, "
                                                           u"int32, uint32, int64, uint64, float32, float64 [default: 'float32']")
     endianness = SFFAttribute(u'endianness', default=u"little", help=u"binary packing endianness [default: 'little']")
-    data = SFFAttribute(u'data', required=True, help=u"base64-encoded packed binary data")
+    data = SFFPayloadAttribute(u'data', required=True, help=u"base64-encoded packed binary data")
+    compression = SFFAttribute(u'compression', help=u"compression applied to the packed binary data e.g. 'zlib', "
+                                                    u"'shuffle+zlib' or 'delta+shuffle+zlib' [default: None]")
 
     def as_hff(self, parent_group, name=u'normals', args=None):
         return super(SFFNormals, self).as_hff(parent_group, name=name, args=args)
@@ -1085,14 +1818,16 @@ class SFFTriangles(SFFEncodedSequence):
     repr_args = (u'num_triangles', u'mode', u'endianness', u'data[:100]')
     default_mode = u'uint32'
     num_items_kwarg = u'num_triangles'
-    eq_attrs = [u'num_triangles', u'mode', u'endianness', u'data']
+    eq_attrs = [u'num_triangles', u'mode', u'endianness', u'data', u'compression']
 
     # attributes
     num_triangles = SFFAttribute(u'num_triangles', required=True, help=u"the number of triangles contained")
     mode = SFFAttribute(u'mode', default=u"uint32", help=u"data type; valid values are: int8, uint8, int16, uint16, "
                                                          u"int32, uint32, int64, uint64, float32, float64 [default: 'float32']")
     endianness = SFFAttribute(u'endianness', default=u"little", help=u"binary packing endianness [default: 'little']")
-    data = SFFAttribute(u'data', required=True, help=u"base64-encoded packed binary data")
+    data = SFFPayloadAttribute(u'data', required=True, help=u"base64-encoded packed binary data")
+    compression = SFFAttribute(u'compression', help=u"compression applied to the packed binary data e.g. 'zlib', "
+                                                    u"'shuffle+zlib' or 'delta+shuffle+zlib' [default: None]")
 
     def as_hff(self, parent_group, name=u'triangles', args=None):
         return super(SFFTriangles, self).as_hff(parent_group, name=name, args=args)
@@ -1169,7 +1904,7 @@ class SFFMesh(SFFIndexType):
             _assert_or_raise(name, _str)
         group = parent_group.create_group(name)
         if self.id is not None:
-            group[u'id'] = self.id
+            _hff_set(group, u'id', self.id, args)
         if self.vertices:
             group = self.vertices.as_hff(group, args=args)
         if self.normals:
@@ -1183,8 +1918,9 @@ class SFFMesh(SFFIndexType):
         _assert_or_raise(parent_group, h5py.Group)
         obj = cls(new_obj=False)
         group = parent_group[parent_group.name]
-        if u'id' in group:
-            obj.id = int(group[u'id'][()])
+        values = _hff_get(group, [u'id'])
+        if u'id' in values:
+            obj.id = int(values[u'id'])
         if u'vertices' in group:
             obj.vertices = SFFVertices.from_hff(group, args=args)
         if u'normals' in group:
@@ -1310,14 +2046,14 @@ class SFFCone(SFFShape):
             _assert_or_raise(name, _str)
         group = parent_group.create_group(name)
         if self.id is not None:
-            group[u'id'] = self.id
+            _hff_set(group, u'id', self.id, args)
         if self.height is not None:
-            group[u'height'] = self.height
+            _hff_set(group, u'height', self.height, args)
         if self.bottom_radius is not None:
-            group[u'bottom_radius'] = self.bottom_radius
+            _hff_set(group, u'bottom_radius', self.bottom_radius, args)
         if self.transform_id is not None:
-            group[u'transform_id'] = self.transform_id
-        group[u'shape'] = u'cone'
+            _hff_set(group, u'transform_id', self.transform_id, args)
+        _hff_set(group, u'shape', u'cone', args)
         return parent_group
 
     @classmethod
@@ -1325,19 +2061,20 @@ class SFFCone(SFFShape):
         _assert_or_raise(parent_group, h5py.Group)
         obj = cls(new_obj=False)
         group = parent_group[parent_group.name]
-        if u'shape' in group:
-            if _decode(group[u'shape'][()], 'utf-8') == u'cone':
-                if u'id' in group:
-                    obj.id = int(group[u'id'][()])
-                if u'height' in group:
-                    obj.height = group[u'height'][()]
-                if u'bottom_radius' in group:
-                    obj.bottom_radius = group[u'bottom_radius'][()]
-                if u'transform_id' in group:
-                    obj.transform_id = int(group[u'transform_id'][()])
+        values = _hff_get(group, [u'shape', u'id', u'height', u'bottom_radius', u'transform_id'])
+        if u'shape' in values:
+            if _decode(values[u'shape'], 'utf-8') == u'cone':
+                if u'id' in values:
+                    obj.id = int(values[u'id'])
+                if u'height' in values:
+                    obj.height = values[u'height']
+                if u'bottom_radius' in values:
+                    obj.bottom_radius = values[u'bottom_radius']
+                if u'transform_id' in values:
+                    obj.transform_id = int(values[u'transform_id'])
                 return obj
             else:
-                raise SFFTypeError(u"cannot convert shape '{}' into cone".format(group[u'shape'][()]))
+                raise SFFTypeError(u"cannot convert shape '{}' into cone".format(values[u'shape']))
         else:
             raise ValueError(u"missing 'shape' attribute")
 
@@ -1398,16 +2135,16 @@ class SFFCuboid(SFFShape):
             _assert_or_raise(name, _str)
         group = parent_group.create_group(name)
         if self.id is not None:
-            group[u'id'] = self.id
+            _hff_set(group, u'id', self.id, args)
         if self.x is not None:
-            group[u'x'] = self.x
+            _hff_set(group, u'x', self.x, args)
         if self.y is not None:
-            group[u'y'] = self.y
+            _hff_set(group, u'y', self.y, args)
         if self.z is not None:
-            group[u'z'] = self.z
+            _hff_set(group, u'z', self.z, args)
         if self.transform_id is not None:
-            group[u'transform_id'] = self.transform_id
-        group[u'shape'] = u'cuboid'
+            _hff_set(group, u'transform_id', self.transform_id, args)
+        _hff_set(group, u'shape', u'cuboid', args)
         return parent_group
 
     @classmethod
@@ -1415,21 +2152,22 @@ class SFFCuboid(SFFShape):
         _assert_or_raise(parent_group, h5py.Group)
         obj = cls(new_obj=False)
         group = parent_group[parent_group.name]
-        if u'shape' in group:
-            if _decode(group[u'shape'][()], 'utf-8') == u'cuboid':
-                if u'id' in group:
-                    obj.id = int(group[u'id'][()])
-                if u'x' in group:
-                    obj.x = group[u'x'][()]
-                if u'y' in group:
-                    obj.y = group[u'y'][()]
-                if u'z' in group:
-                    obj.z = group[u'z'][()]
-                if u'transform_id' in group:
-                    obj.transform_id = int(group[u'transform_id'][()])
+        values = _hff_get(group, [u'shape', u'id', u'x', u'y', u'z', u'transform_id'])
+        if u'shape' in values:
+            if _decode(values[u'shape'], 'utf-8') == u'cuboid':
+                if u'id' in values:
+                    obj.id = int(values[u'id'])
+                if u'x' in values:
+                    obj.x = values[u'x']
+                if u'y' in values:
+                    obj.y = values[u'y']
+                if u'z' in values:
+                    obj.z = values[u'z']
+                if u'transform_id' in values:
+                    obj.transform_id = int(values[u'transform_id'])
                 return obj
             else:
-                raise SFFTypeError(u"cannot convert shape '{}' into cuboid".format(group[u'shape'][()]))
+                raise SFFTypeError(u"cannot convert shape '{}' into cuboid".format(values[u'shape']))
         else:
             raise ValueError(u"missing 'shape' attribute")
 
@@ -1486,14 +2224,14 @@ class SFFCylinder(SFFShape):
             _assert_or_raise(name, _str)
         group = parent_group.create_group(name)
         if self.id is not None:
-            group[u'id'] = self.id
+            _hff_set(group, u'id', self.id, args)
         if self.height is not None:
-            group[u'height'] = self.height
+            _hff_set(group, u'height', self.height, args)
         if self.diameter is not None:
-            group[u'diameter'] = self.diameter
+            _hff_set(group, u'diameter', self.diameter, args)
         if self.transform_id is not None:
-            group[u'transform_id'] = self.transform_id
-        group[u'shape'] = u'cylinder'
+            _hff_set(group, u'transform_id', self.transform_id, args)
+        _hff_set(group, u'shape', u'cylinder', args)
         return parent_group
 
     @classmethod
@@ -1501,19 +2239,20 @@ class SFFCylinder(SFFShape):
         _assert_or_raise(parent_group, h5py.Group)
         obj = cls(new_obj=False)
         group = parent_group[parent_group.name]
-        if u'shape' in group:
-            if _decode(group[u'shape'][()], 'utf-8') == u'cylinder':
-                if u'id' in group:
-                    obj.id = int(group[u'id'][()])
-                if u'height' in group:
-                    obj.height = group[u'height'][()]
-                if u'diameter' in group:
-                    obj.diameter = group[u'diameter'][()]
-                if u'transform_id' in group:
-                    obj.transform_id = int(group[u'transform_id'][()])
+        values = _hff_get(group, [u'shape', u'id', u'height', u'diameter', u'transform_id'])
+        if u'shape' in values:
+            if _decode(values[u'shape'], 'utf-8') == u'cylinder':
+                if u'id' in values:
+                    obj.id = int(values[u'id'])
+                if u'height' in values:
+                    obj.height = values[u'height']
+                if u'diameter' in values:
+                    obj.diameter = values[u'diameter']
+                if u'transform_id' in values:
+                    obj.transform_id = int(values[u'transform_id'])
                 return obj
             else:
-                raise SFFTypeError(u"cannot convert shape '{}' into cylinder".format(group[u'shape'][()]))
+                raise SFFTypeError(u"cannot convert shape '{}' into cylinder".format(values[u'shape']))
         else:
             raise ValueError(u"missing 'shape' attribute")
 
@@ -1574,16 +2313,16 @@ class SFFEllipsoid(SFFShape):
             _assert_or_raise(name, _str)
         group = parent_group.create_group(name)
         if self.id is not None:
-            group[u'id'] = self.id
+            _hff_set(group, u'id', self.id, args)
         if self.x is not None:
-            group[u'x'] = self.x
+            _hff_set(group, u'x', self.x, args)
         if self.y is not None:
-            group[u'y'] = self.y
+            _hff_set(group, u'y', self.y, args)
         if self.z is not None:
-            group[u'z'] = self.z
+            _hff_set(group, u'z', self.z, args)
         if self.transform_id is not None:
-            group[u'transform_id'] = self.transform_id
-        group[u'shape'] = u'ellipsoid'
+            _hff_set(group, u'transform_id', self.transform_id, args)
+        _hff_set(group, u'shape', u'ellipsoid', args)
         return parent_group
 
     @classmethod
@@ -1591,21 +2330,22 @@ class SFFEllipsoid(SFFShape):
         _assert_or_raise(parent_group, h5py.Group)
         obj = cls(new_obj=False)
         group = parent_group[parent_group.name]
-        if u'shape' in group:
-            if _decode(group[u'shape'][()], 'utf-8') == u'ellipsoid':
-                if u'id' in group:
-                    obj.id = int(group[u'id'][()])
-                if u'x' in group:
-                    obj.x = group[u'x'][()]
-                if u'y' in group:
-                    obj.y = group[u'y'][()]
-                if u'z' in group:
-                    obj.z = group[u'z'][()]
-                if u'transform_id' in group:
-                    obj.transform_id = int(group[u'transform_id'][()])
+        values = _hff_get(group, [u'shape', u'id', u'x', u'y', u'z', u'transform_id'])
+        if u'shape' in values:
+            if _decode(values[u'shape'], 'utf-8') == u'ellipsoid':
+                if u'id' in values:
+                    obj.id = int(values[u'id'])
+                if u'x' in values:
+                    obj.x = values[u'x']
+                if u'y' in values:
+                    obj.y = values[u'y']
+                if u'z' in values:
+                    obj.z = values[u'z']
+                if u'transform_id' in values:
+                    obj.transform_id = int(values[u'transform_id'])
                 return obj
             else:
-                raise SFFTypeError(u"cannot convert shape '{}' into ellipsoid".format(group[u'shape'][()]))
+                raise SFFTypeError(u"cannot convert shape '{}' into ellipsoid".format(values[u'shape']))
         else:
             raise ValueError(u"missing 'shape' attribute")
 
@@ -1665,14 +2405,14 @@ class SFFSubtomogramAverage(SFFShape):
             _assert_or_raise(name, _str)
         group = parent_group.create_group(name)
         if self.id is not None:
-            group['id'] = self.id
+            _hff_set(group, 'id', self.id, args)
         if self.lattice_id is not None:
-            group['lattice_id'] = self.lattice_id
+            _hff_set(group, 'lattice_id', self.lattice_id, args)
         if self.value is not None:
-            group['value'] = self.value
+            _hff_set(group, 'value', self.value, args)
         if self.transform_id is not None:
-            group['transform_id'] = self.transform_id
-        group['shape'] = 'subtomogram_average'
+            _hff_set(group, 'transform_id', self.transform_id, args)
+        _hff_set(group, 'shape', 'subtomogram_average', args)
         return parent_group
 
     @classmethod
@@ -1680,16 +2420,17 @@ class SFFSubtomogramAverage(SFFShape):
         _assert_or_raise(parent_group, h5py.Group)
         obj = cls(new_obj=False)
         group = parent_group[parent_group.name]
-        if 'shape' in group:
-            if _decode(group['shape'][()], 'utf-8') == 'subtomogram_average':
-                if 'id' in group:
-                    obj.id = int(group['id'][()])
-                if 'lattice_id' in group:
-                    obj.lattice_id = int(group['lattice_id'][()])
-                if 'value' in group:
-                    obj.value = group['value'][()]
-                if 'transform_id' in group:
-                    obj.transform_id = int(group['transform_id'][()])
+        values = _hff_get(group, ['shape', 'id', 'lattice_id', 'value', 'transform_id'])
+        if 'shape' in values:
+            if _decode(values['shape'], 'utf-8') == 'subtomogram_average':
+                if 'id' in values:
+                    obj.id = int(values['id'])
+                if 'lattice_id' in values:
+                    obj.lattice_id = int(values['lattice_id'])
+                if 'value' in values:
+                    obj.value = values['value']
+                if 'transform_id' in values:
+                    obj.transform_id = int(values['transform_id'])
                 return obj
             else:
                 raise SFFTypeError(f"cannot convert shape '{group['shape']}' into subtomogram average")
@@ -1766,32 +2507,170 @@ class SFFShapePrimitiveList(SFFListType):
                 raise ValueError(u"missing 'shape' attribute")
         return obj
 
+    # one table (structured array) per kind of shape for the 'tables' HDF5 layout and for bulk access: (kind, class,
+    # columns); missing values are -1 in integer columns and NaN in float columns
+    shape_tables = [
+        (u'cone', SFFCone,
+         [(u'id', u'i8'), (u'height', u'f8'), (u'bottom_radius', u'f8'), (u'transform_id', u'i8'),
+          (u'attribute', u'f8')]),
+        (u'cuboid', SFFCuboid,
+         [(u'id', u'i8'), (u'x', u'f8'), (u'y', u'f8'), (u'z', u'f8'), (u'transform_id', u'i8'),
+          (u'attribute', u'f8')]),
+        (u'cylinder', SFFCylinder,
+         [(u'id', u'i8'), (u'height', u'f8'), (u'diameter', u'f8'), (u'transform_id', u'i8'),
+          (u'attribute', u'f8')]),
+        (u'ellipsoid', SFFEllipsoid,
+         [(u'id', u'i8'), (u'x', u'f8'), (u'y', u'f8'), (u'z', u'f8'), (u'transform_id', u'i8'),
+          (u'attribute', u'f8')]),
+        (u'subtomogram_average', SFFSubtomogramAverage,
+         [(u'id', u'i8'), (u'lattice_id', u'i8'), (u'value', u'f8'), (u'transform_id', u'i8')]),
+    ]
+    optional_columns = (u'id', u'transform_id', u'attribute')
+
+    @classmethod
+    def _shape_table(cls, kind):
+        """The class and columns of the table for ``kind``"""
+        for shape_name, shape_class, columns in cls.shape_tables:
+            if shape_name == kind:
+                return shape_class, columns
+        raise SFFValueError(u"invalid shape '{}'; valid shapes are: {}".format(
+            kind, u", ".join(shape_name for shape_name, _, _ in cls.shape_tables)
+        ))
+
+    def _table(self, kind):
+        """A structured array with one row per shape of ``kind``"""
+        shape_class, columns = self._shape_table(kind)
+        # work on the generateDS objects directly since adapters are created on every access
+        shapes = [shape for shape in self._local.shape_primitive if isinstance(shape, shape_class.gds_type)]
+        return _make_table([_gds_values(shape, [column for column, _ in columns]) for shape in shapes], columns)
+
+    @classmethod
+    def _shapes_from_table(cls, kind, table):
+        """A list of ``generateDS`` shapes; one per row of the structured array ``table``"""
+        shape_class, columns = cls._shape_table(kind)
+        names = [column for column, _ in columns if column != u'id']
+        values = [_to_missing(table[column], dtype) for column, dtype in columns if column != u'id']
+        shapes = list()
+        for shape_id, row in zip(_to_missing(table[u'id'], u'i8'), zip(*values)):
+            shape = shape_class.gds_type(**dict(zip(names, row)))
+            # three_d_volume_type has no `id` in the schema (see :py:class:`SFFIndexType`)
+            shape.id = shape_id
+            shape.original_tagname_ = shape_class.gds_tag_name
+            shapes.append(shape)
+        return shapes
+
+    @classmethod
+    def from_arrays(cls, kind, **columns):
+        """Create a list of shapes of one kind from one array per attribute
+
+        This is much faster than creating and appending each shape.
+
+        .. code:: python
+
+            ellipsoids = SFFShapePrimitiveList.from_arrays(
+                u'ellipsoid', x=radii[:, 0], y=radii[:, 1], z=radii[:, 2], transform_id=transform_ids
+            )
+
+        :param str kind: one of ``cone``, ``cuboid``, ``cylinder``, ``ellipsoid`` or ``subtomogram_average``
+        :param columns: one array per attribute (see :py:attr:`shape_tables`); scalars are broadcast;
+            ``id``, ``transform_id`` and ``attribute`` are optional and IDs are allocated as a range if absent
+        :return: a :py:class:`SFFShapePrimitiveList` object
+        :rtype: :py:class:`SFFShapePrimitiveList`
+        """
+        obj = cls()
+        obj.extend_arrays(kind, **columns)
+        return obj
+
+    def extend_arrays(self, kind, **columns):
+        """Append shapes of one kind from one array per attribute
+
+        :param str kind: the kind of shape (see :py:meth:`from_arrays`)
+        :param columns: one array per attribute (see :py:meth:`from_arrays`)
+        """
+        shape_class, dtype = self._shape_table(kind)
+        names = [column for column, _ in dtype]
+        unknown = set(columns) - set(names)
+        if unknown:
+            raise SFFValueError(u"invalid attribute(s) for shape '{}': {}".format(kind, u", ".join(sorted(unknown))))
+        missing = set(names) - set(columns) - set(self.optional_columns)
+        if missing:
+            raise SFFValueError(u"missing attribute(s) for shape '{}': {}".format(kind, u", ".join(sorted(missing))))
+        given = [column for column in names if column in columns]
+        arrays = numpy.broadcast_arrays(*[numpy.atleast_1d(columns[column]) for column in given])
+        if arrays[0].ndim != 1:
+            raise SFFValueError(u"attributes must be one-dimensional arrays")
+        table = numpy.empty(len(arrays[0]), dtype=dtype)
+        for column, _dtype in dtype:
+            table[column] = _from_missing(None, _dtype)
+        for column, array in zip(given, arrays):
+            table[column] = array
+        # allocate IDs as a range from the same counter as shapes created one by one past any IDs in this list
+        ids = numpy.fromiter(self._id_dict.keys(), dtype=numpy.int64, count=len(self._id_dict))
+        if u'id' in columns:
+            if len(numpy.unique(table[u'id'])) < len(table) or numpy.isin(table[u'id'], ids).any():
+                raise SFFValueError(u"shape IDs must be unique")
+            first = table[u'id'].max() + SFFShape.increment_by if len(table) else SFFShape.shape_id
+        else:
+            first = max(SFFShape.shape_id, ids.max() + SFFShape.increment_by if len(ids) else SFFShape.shape_id)
+            table[u'id'] = numpy.arange(len(table)) * SFFShape.increment_by + first
+            first += len(table) * SFFShape.increment_by
+        SFFShape.update_counter(max(SFFShape.shape_id, int(first)))
+        shapes = self._shapes_from_table(kind, table)
+        self._local.shape_primitive.extend(shapes)
+        self._id_dict.update({shape.id: shape_class.from_gds_type(shape) for shape in shapes})
+
+    def to_arrays(self, kind):
+        """The attributes of all shapes of one kind as arrays
+
+        :param str kind: the kind of shape (see :py:meth:`from_arrays`)
+        :return: a ``dict`` of :py:class:`numpy.ndarray` keyed by attribute name (see :py:attr:`shape_tables`);
+            missing values are -1 for integer attributes and NaN for float attributes
+        :rtype: dict
+        """
+        table = self._table(kind)
+        return {column: table[column] for column in table.dtype.names}
+
     def as_hff(self, parent_group, name=u'shape_primitive_list', args=None):
         _assert_or_raise(parent_group, h5py.Group)
         group = parent_group.create_group(name)
-        for shape in self:
-            group = shape.as_hff(group, args=args)
+        if _hff_layout(args) == u'tables':
+            group.attrs[u'layout'] = u'tables'
+            for shape in self._local.shape_primitive:
+                if getattr(shape, u'id', None) is None:
+                    shape.id = get_unique_id()
+            for kind, _, _ in self.shape_tables:
+                table = self._table(kind)
+                if len(table):
+                    group.create_dataset(kind, data=table)
+        else:
+            for shape in self:
+                group = shape.as_hff(group, args=args)
         return parent_group
 
     @classmethod
     def from_hff(cls, parent_group, name=u'shape_primitive_list', args=None):
         _assert_or_raise(parent_group, h5py.Group)
-        obj = cls(new_obj=False)
         group = parent_group[name]
+        obj = cls(new_obj=False)
+        if _decode(group.attrs.get(u'layout', u'groups'), u'utf-8') == u'tables':
+            shapes = list()
+            for kind, _, _ in cls.shape_tables:
+                if kind in group:
+                    shapes += cls._shapes_from_table(kind, group[kind][()])
+            # shapes are ordered by ID as in the 'groups' layout
+            shapes.sort(key=lambda shape: shape.id)
+            obj._local.shape_primitive = shapes
+            obj._update_dict()
+            return obj
+        shape_classes = {kind: shape_class for kind, shape_class, _ in cls.shape_tables}
         for subgroup in sorted(group.values(), key=lambda g: int(os.path.basename(g.name))):
-            if u'shape' in subgroup:
-                if _decode(subgroup[u'shape'][()], 'utf-8') == u'cone':
-                    obj.append(SFFCone.from_hff(subgroup, args=args))
-                elif _decode(subgroup[u'shape'][()], 'utf-8') == u'cuboid':
-                    obj.append(SFFCuboid.from_hff(subgroup, args=args))
-                elif _decode(subgroup[u'shape'][()], 'utf-8') == u'cylinder':
-                    obj.append(SFFCylinder.from_hff(subgroup, args=args))
-                elif _decode(subgroup[u'shape'][()], 'utf-8') == u'ellipsoid':
-                    obj.append(SFFEllipsoid.from_hff(subgroup, args=args))
-                elif _decode(subgroup['shape'][()], 'utf-8') == 'subtomogram_average':
-                    obj.append(SFFSubtomogramAverage.from_hff(subgroup, args=args))
+            shape_name = _hff_get(subgroup, [u'shape']).get(u'shape')
+            if shape_name is not None:
+                shape_name = _decode(shape_name, u'utf-8')
+                if shape_name in shape_classes:
+                    obj.append(shape_classes[shape_name].from_hff(subgroup, args=args))
                 else:
-                    raise SFFTypeError(u"cannot convert shape '{}'".format(subgroup[u'shape'][()]))
+                    raise SFFTypeError(u"cannot convert shape '{}'".format(shape_name))
             else:
                 raise ValueError(u"missing 'shape' attribute")
         return obj
@@ -1895,9 +2774,9 @@ class SFFSegment(SFFIndexType):
             _assert_or_raise(name, _str)
         group = parent_group.create_group(name)
         if self.id is not None:
-            group[u'id'] = self.id
+            _hff_set(group, u'id', self.id, args)
         if self.parent_id is not None:
-            group[u'parent_id'] = self.parent_id
+            _hff_set(group, u'parent_id', self.parent_id, args)
         if self.biological_annotation is not None:
             group = self.biological_annotation.as_hff(group, args=args)
         if self.colour is not None:
@@ -1914,15 +2793,21 @@ class SFFSegment(SFFIndexType):
     def from_hff(cls, parent_group, name=None, args=None):
         _assert_or_raise(parent_group, h5py.Group)
         group = parent_group[parent_group.name]
+        values = _hff_get(group, [u'id', u'parent_id', u'colour'])
         obj = cls(new_obj=False)
-        if u'id' in group:
-            obj.id = int(group[u'id'][()])
-        if u'parent_id' in group:
-            obj.parent_id = int(group[u'parent_id'][()])
+        if u'id' in values:
+            obj.id = int(values[u'id'])
+        if u'parent_id' in values:
+            obj.parent_id = int(values[u'parent_id'])
         if u'biological_annotation' in group:
             obj.biological_annotation = SFFBiologicalAnnotation.from_hff(group, args=args)
-        if u'colour' in group:
-            obj.colour = SFFRGBA.from_hff(group, args=args)
+        if u'colour' in values:
+            # the colour is read with the other values of the segment
+            colour = SFFRGBA(new_obj=False)
+            colour.value = values[u'colour']
+            obj.colour = colour
+        if getattr(args, u'exclude_geometry', False):
+            return obj
         if u'mesh_list' in group:
             obj.mesh_list = SFFMeshList.from_hff(group, args=args)
         if u'three_d_volume' in group:
@@ -1953,22 +2838,210 @@ class SFFSegmentList(SFFListType):
             obj.append(SFFSegment.from_json(seg, args=args))
         return obj
 
+    # the 'tables' HDF5 layout has one row per segment in `segments` and one row per external reference, mesh and
+    # shape (in `shapes/<kind>`; see :py:attr:`SFFShapePrimitiveList.shape_tables`) in side tables whose `segment`
+    # column is the row of the segment; the `has_*` flags distinguish missing objects from missing values
+    segment_columns = [
+        (u'id', u'i8'), (u'parent_id', u'i8'),
+        (u'has_colour', u'u1'), (u'red', u'f8'), (u'green', u'f8'), (u'blue', u'f8'), (u'alpha', u'f8'),
+        (u'has_biological_annotation', u'u1'), (u'name', u'str'), (u'description', u'str'),
+        (u'number_of_instances', u'i8'),
+        (u'has_three_d_volume', u'u1'), (u'lattice_id', u'i8'), (u'value', u'f8'), (u'transform_id', u'i8'),
+    ]
+    external_reference_columns = [
+        (u'segment', u'i8'), (u'id', u'i8'), (u'resource', u'str'), (u'url', u'str'), (u'accession', u'str'),
+        (u'label', u'str'), (u'description', u'str'),
+    ]
+    mesh_sequences = [(u'vertices', SFFVertices), (u'normals', SFFNormals), (u'triangles', SFFTriangles)]
+    mesh_columns = [(u'segment', u'i8'), (u'id', u'i8'), (u'transform_id', u'i8')] + [
+        (u'{}_{}'.format(sequence, column), dtype) for sequence, _ in mesh_sequences for column, dtype in [
+            (u'present', u'u1'), (u'count', u'i8'), (u'mode', u'str'), (u'endianness', u'str'),
+            (u'compression', u'str'), (u'data', u'str'),
+        ]
+    ]
+
     def as_hff(self, parent_group, name=u'segment_list', args=None):
         _assert_or_raise(parent_group, h5py.Group)
         group = parent_group.create_group(name)
-        for segment in self:
-            group = segment.as_hff(group, args=args)
+        if _hff_layout(args) == u'tables':
+            group.attrs[u'layout'] = u'tables'
+            self._as_hff_tables(group)
+        else:
+            for segment in self:
+                group = segment.as_hff(group, args=args)
         return parent_group
 
+    @classmethod
+    def _annotation_rows(cls, segments, offset=0):
+        """The rows of the ``segments`` and ``external_references`` tables for the ``generateDS`` objects
+        ``segments`` which are rows ``offset`` onwards of the ``segments`` table"""
+        segment_rows, reference_rows = list(), list()
+        for index, segment in enumerate(segments, offset):
+            if segment.id is None:
+                segment.id = get_unique_id()
+            annotation = segment.biological_annotation
+            annotation_values = _gds_values(annotation, [u'name', u'description', u'number_of_instances'])
+            # the same defaults as the 'groups' layout
+            if annotation is not None and not (
+                    isinstance(annotation_values[2], numbers.Integral) and annotation_values[2] > 0):
+                annotation_values[2] = 1
+            segment_rows.append(
+                [segment.id, segment.parent_id if segment.parent_id is not None else 0,
+                 segment.colour is not None] +
+                _gds_values(segment.colour, [u'red', u'green', u'blue', u'alpha']) +
+                [annotation is not None] + annotation_values +
+                [segment.three_d_volume is not None] +
+                _gds_values(segment.three_d_volume, [u'lattice_id', u'value', u'transform_id'])
+            )
+            if annotation is not None and annotation.external_references is not None:
+                for reference in annotation.external_references.ref:
+                    if reference.id is None:
+                        reference.id = get_unique_id()
+                    reference_rows.append([index] + _gds_values(reference, [
+                        u'id', u'resource', u'url', u'accession', u'label', u'description'
+                    ]))
+        return segment_rows, reference_rows
+
+    @classmethod
+    def _table_rows(cls, segments, offset=0):
+        """The rows of every table for the ``generateDS`` objects ``segments`` which are rows ``offset`` onwards of
+        the ``segments`` table
+
+        :return: (name, rows, columns) for each table (``segments``, ``external_references``, ``meshes`` and
+            ``shapes/<kind>``)
+        :rtype: list
+        """
+        mesh_rows = list()
+        shape_rows = _dict((kind, list()) for kind, _, _ in SFFShapePrimitiveList.shape_tables)
+        segment_rows, reference_rows = cls._annotation_rows(segments, offset=offset)
+        for index, segment in enumerate(segments, offset):
+            if segment.mesh_list is not None:
+                for mesh in segment.mesh_list.mesh:
+                    if mesh.id is None:
+                        mesh.id = get_unique_id()
+                    row = [index, mesh.id, mesh.transform_id]
+                    for sequence_name, sequence_class in cls.mesh_sequences:
+                        sequence = getattr(mesh, sequence_name)
+                        if sequence is not None and _payload_dirty(sequence):
+                            sequence_class.from_gds_type(sequence).data  # encodes the mapped or changed array
+                        row += [sequence is not None] + _gds_values(sequence, [
+                            sequence_class.num_items_kwarg, u'mode', u'endianness', u'compression', u'data'
+                        ])
+                    mesh_rows.append(row)
+            if segment.shape_primitive_list is not None:
+                for shape in segment.shape_primitive_list.shape_primitive:
+                    if getattr(shape, u'id', None) is None:
+                        shape.id = get_unique_id()
+                    for kind, shape_class, columns in SFFShapePrimitiveList.shape_tables:
+                        if isinstance(shape, shape_class.gds_type):
+                            shape_rows[kind].append([index] + _gds_values(shape, [column for column, _ in columns]))
+                            break
+        return [
+            (u'segments', segment_rows, cls.segment_columns),
+            (u'external_references', reference_rows, cls.external_reference_columns),
+            (u'meshes', mesh_rows, cls.mesh_columns),
+        ] + [
+            (u'shapes/{}'.format(kind), shape_rows[kind], [(u'segment', u'i8')] + columns)
+            for kind, _, columns in SFFShapePrimitiveList.shape_tables
+        ]
+
+    def _as_hff_tables(self, group):
+        """Write all segments as a few tables"""
+        group.create_group(u'shapes')
+        # work on the generateDS objects directly since adapters are created on every access
+        for name, rows, columns in self._table_rows(self._local.segment):
+            # empty side tables are left out
+            if rows or name == u'segments':
+                group.create_dataset(name, data=_make_table(rows, columns))
+
     @classmethod
     def from_hff(cls, parent_group, name=u'segment_list', args=None):
         _assert_or_raise(parent_group, h5py.Group)
         obj = cls(new_obj=False)
         group = parent_group[name]
+        if _decode(group.attrs.get(u'layout', u'groups'), u'utf-8') == u'tables':
+            obj._local.segment = cls._segments_from_hff_tables(
+                group, geometry=not getattr(args, u'exclude_geometry', False)
+            )
+            obj._update_dict()
+            return obj
+        if _hff_workers(args) > 1:
+            segments = _hff_read_parallel(group, SFFSegment, _hff_workers(args), args=args)
+            if segments is not None:
+                obj._local.segment = segments
+                obj._update_dict()
+                return obj
         for subgroup in sorted(group.values(), key=lambda g: int(os.path.basename(g.name))):
             obj.append(SFFSegment.from_hff(subgroup, args=args))
         return obj
 
+    @staticmethod
+    def _rows(table, columns):
+        """Generator of the rows of ``table`` as dictionaries"""
+        values = _table_columns(table, columns)
+        names = [column for column, _ in columns]
+        for row in zip(*[values[name] for name in names]):
+            yield dict(zip(names, row))
+
+    @classmethod
+    def _segments_from_hff_tables(cls, group, geometry=True):
+        """Read the tables written by :py:meth:`_as_hff_tables` as a list of ``generateDS`` segments; without
+        ``geometry`` 3D volumes, meshes and shapes are left out"""
+        segments = list()
+        for row in cls._rows(group[u'segments'][()], cls.segment_columns):
+            segment = _gds_object(SFFSegment, id=row[u'id'], parent_id=row[u'parent_id'])
+            if row[u'has_colour']:
+                segment.colour = _gds_object(
+                    SFFRGBA, red=row[u'red'], green=row[u'green'], blue=row[u'blue'], alpha=row[u'alpha']
+                )
+            if row[u'has_biological_annotation']:
+                segment.biological_annotation = _gds_object(
+                    SFFBiologicalAnnotation, name=row[u'name'], description=row[u'description'],
+                    number_of_instances=row[u'number_of_instances']
+                )
+            if geometry and row[u'has_three_d_volume']:
+                segment.three_d_volume = _gds_object(
+                    SFFThreeDVolume, lattice_id=row[u'lattice_id'], value=row[u'value'], transform_id=row[u'transform_id']
+                )
+            segments.append(segment)
+        if u'external_references' in group:
+            for row in cls._rows(group[u'external_references'][()], cls.external_reference_columns):
+                annotation = segments[row.pop(u'segment')].biological_annotation
+                if annotation.external_references is None:
+                    annotation.external_references = _gds_object(SFFExternalReferenceList)
+                annotation.external_references.ref.append(_gds_object(SFFExternalReference, **row))
+        if not geometry:
+            return segments
+        if u'meshes' in group:
+            for row in cls._rows(group[u'meshes'][()], cls.mesh_columns):
+                mesh = _gds_object(SFFMesh, id=row[u'id'], transform_id=row[u'transform_id'])
+                for sequence_name, sequence_class in cls.mesh_sequences:
+                    if row[u'{}_present'.format(sequence_name)]:
+                        setattr(mesh, sequence_name, _gds_object(sequence_class, **{
+                            sequence_class.num_items_kwarg: row[u'{}_count'.format(sequence_name)],
+                            u'mode': row[u'{}_mode'.format(sequence_name)],
+                            u'endianness': row[u'{}_endianness'.format(sequence_name)],
+                            u'compression': row[u'{}_compression'.format(sequence_name)],
+                            u'data': row[u'{}_data'.format(sequence_name)],
+                        }))
+                segment = segments[row[u'segment']]
+                if segment.mesh_list is None:
+                    segment.mesh_list = _gds_object(SFFMeshList)
+                segment.mesh_list.mesh.append(mesh)
+        for kind, _, _ in SFFShapePrimitiveList.shape_tables:
+            if kind in group[u'shapes']:
+                table = group[u'shapes'][kind][()]
+                for index, shape in zip(table[u'segment'].tolist(), SFFShapePrimitiveList._shapes_from_table(kind, table)):
+                    segment = segments[index]
+                    if segment.shape_primitive_list is None:
+                        segment.shape_primitive_list = _gds_object(SFFShapePrimitiveList)
+                    segment.shape_primitive_list.shape_primitive.append(shape)
+        # shapes are ordered by ID as in the 'groups' layout
+        for segment in segments:
+            if segment.shape_primitive_list is not None:
+                segment.shape_primitive_list.shape_primitive.sort(key=lambda shape: shape.id)
+        return segments
+
 
 class SFFTransformationMatrix(SFFIndexType):
     """Transformation matrix transform"""
@@ -2046,7 +3119,7 @@ class SFFTransformationMatrix(SFFIndexType):
     def data_array(self):
         if not hasattr(self, u'_data'):
             # make numpy array from string
-            self._data = numpy.array(list(map(float, self.data.split(' ')))).reshape(
+            self._data = numpy.array(self.data.split(), dtype=numpy.float64).reshape(
                 self.rows,
                 self.cols
             )
@@ -2098,11 +3171,11 @@ class SFFTransformationMatrix(SFFIndexType):
             _assert_or_raise(name, _str)
         group = parent_group.create_group(name)
         if self.id is not None:
-            group[u'id'] = self.id
+            _hff_set(group, u'id', self.id, args)
         if self.rows is not None:
-            group[u'rows'] = self.rows
+            _hff_set(group, u'rows', self.rows, args)
         if self.cols is not None:
-            group[u'cols'] = self.cols
+            _hff_set(group, u'cols', self.cols, args)
         if self.data is not None:
             group[u'data'] = self.data
         return parent_group
@@ -2112,14 +3185,15 @@ class SFFTransformationMatrix(SFFIndexType):
         _assert_or_raise(parent_group, h5py.Group)
         obj = cls(new_obj=False)
         group = parent_group[parent_group.name]
-        if u'id' in group:
-            obj.id = int(group[u'id'][()])
-        if u'rows' in group:
-            obj.rows = int(group[u'rows'][()])
-        if u'cols' in group:
-            obj.cols = int(group[u'cols'][()])
-        if u'data' in group:
-            obj.data = _decode(group[u'data'][()], 'utf-8')
+        values = _hff_get(group, [u'id', u'rows', u'cols', u'data'])
+        if u'id' in values:
+            obj.id = int(values[u'id'])
+        if u'rows' in values:
+            obj.rows = int(values[u'rows'])
+        if u'cols' in values:
+            obj.cols = int(values[u'cols'])
+        if u'data' in values:
+            obj.data = _decode(values[u'data'], 'utf-8')
         return obj
 
 
@@ -2142,7 +3216,7 @@ class SFFTransformList(SFFListType):
         first = True
         rows = None
         cols = None
-        for transform in self:
+        for transform in self._local.transformation_matrix:
             if first:
                 rows = transform.rows
                 cols = transform.cols
@@ -2153,6 +3227,139 @@ class SFFTransformList(SFFListType):
                     break
         return transformation_matrices_similar, rows, cols
 
+    def _array_key(self):
+        """The shape and data of every matrix; the cached array is stale if this changes
+
+        The data strings are compared by identity first so this is much cheaper than parsing.
+        """
+        return [(transform.rows, transform.cols, transform.data) for transform in self._local.transformation_matrix]
+
+    def as_array(self):
+        """All matrices as a single array of shape ``(N, rows, cols)``
+
+        The data of all matrices is parsed in one pass and the result is cached until any matrix is added, removed or
+        changed. The array is read-only; use :py:meth:`from_array` to create matrices from an array.
+
+        :return: a read-only array of ``float64``
+        :rtype: :py:class:`numpy.ndarray`
+        :raises SFFValueError: if the matrices have different shapes
+        """
+        key = self._array_key()
+        # list adapters are created on every access so the cache is kept on the `generateDS` object
+        cached = getattr(self._local, u'_transform_array', None)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        similar, rows, cols = self._check_transformation_matrix_homogeneity()
+        if not similar:
+            raise SFFValueError(u"cannot make an array from transformation matrices of different shapes")
+        if not key:
+            array = numpy.empty((0, 0, 0), dtype=numpy.float64)
+        else:
+            values = numpy.array(u" ".join(data for _, _, data in key).split(), dtype=numpy.float64)
+            if values.size != len(key) * rows * cols:
+                raise ValueError(u"incompatible rows/cols and array")
+            array = values.reshape(len(key), rows, cols)
+        array.flags.writeable = False
+        self._local._transform_array = (key, array)
+        return array
+
+    @classmethod
+    def from_array(cls, array):
+        """Create a list of transformation matrices from an array of shape ``(N, rows, cols)``
+
+        All matrices are formatted in one pass and IDs are allocated as a range.
+
+        :param array: the matrices
+        :type array: :py:class:`numpy.ndarray`
+        :return: a :py:class:`SFFTransformList` object
+        :rtype: :py:class:`SFFTransformList`
+        """
+        array = numpy.array(array, dtype=numpy.float64)
+        if array.ndim != 3:
+            raise SFFValueError(u"array must have shape (N, rows, cols) not {}".format(array.shape))
+        count, rows, cols = array.shape
+        obj = cls()
+        # formatted as by `SFFTransformationMatrix.stringify` but in one pass over all values
+        size = rows * cols
+        strings = list(map(repr, array.ravel().tolist()))
+        first = SFFTransformationMatrix.transform_id
+        obj._local.transformation_matrix = [
+            _sff.transformation_matrix_type(id=first + i, rows=rows, cols=cols,
+                                            data=u" ".join(strings[i * size:(i + 1) * size]))
+            for i in range(count)
+        ]
+        for transform in obj._local.transformation_matrix:
+            transform.original_tagname_ = SFFTransformationMatrix.gds_tag_name
+        SFFTransformationMatrix.transform_id = first + count
+        obj._update_dict()
+        array.flags.writeable = False
+        obj._local._transform_array = (obj._array_key(), array)
+        return obj
+
+    def intern(self, tolerance=0.0):
+        """Remove duplicate matrices keeping the first of each set of identical matrices
+
+        Matrices are compared by stacking those of each shape into one array and finding its unique rows. With a
+        ``tolerance`` each of the remaining matrices (in order) is then merged into the first kept matrix from which
+        none of its values differs by more than ``tolerance``.
+
+        References to removed matrices must be updated using the returned mapping
+        (see :py:meth:`SFFSegmentation.intern_transforms`).
+
+        :param float tolerance: the largest difference between values considered identical (default: exact)
+        :return: a ``dict`` from the ID of each removed matrix to the ID of the matrix kept in its place
+        :rtype: dict
+        """
+        if tolerance < 0:
+            raise SFFValueError(u"tolerance must not be negative: {}".format(tolerance))
+        transforms = self._local.transformation_matrix
+        # group by shape so that each group stacks into one array
+        groups = _dict()
+        for index, transform in enumerate(transforms):
+            groups.setdefault((transform.rows, transform.cols), list()).append(index)
+        keep = numpy.ones(len(transforms), dtype=bool)
+        mapping = _dict()
+        for (rows, cols), indices in groups.items():
+            if len(indices) < 2:
+                continue
+            values = numpy.array(u" ".join(transforms[index].data for index in indices).split(), dtype=numpy.float64)
+            if values.size != len(indices) * rows * cols:
+                raise ValueError(u"incompatible rows/cols and array")
+            values = values.reshape(len(indices), rows * cols)
+            _, first, inverse = numpy.unique(values, axis=0, return_index=True, return_inverse=True)
+            kept = first[inverse.ravel()]  # for each matrix, the position in `indices` of the matrix kept for it
+            if tolerance > 0:
+                kept = self._merge_within(values, numpy.unique(kept), tolerance)[kept]
+            for position in numpy.flatnonzero(kept != numpy.arange(len(indices))).tolist():
+                index, kept_index = indices[position], indices[kept[position]]
+                keep[index] = False
+                if transforms[index].id is not None:
+                    mapping[transforms[index].id] = transforms[kept_index].id
+        if not keep.all():
+            self._local.transformation_matrix = [transform for transform, k in zip(transforms, keep.tolist()) if k]
+            self._id_dict = _dict()
+            self._update_dict()
+        return mapping
+
+    @staticmethod
+    def _merge_within(values, positions, tolerance):
+        """Map each of the distinct rows of ``values`` at ``positions`` (in order) to the first of them from which
+        none of its values differs by more than ``tolerance``
+
+        :return: an array from each position to the position of the row it is merged into
+        :rtype: :py:class:`numpy.ndarray`
+        """
+        merged = numpy.arange(len(values))
+        kept = list()
+        for position in positions.tolist():
+            if kept:
+                within = numpy.abs(values[kept] - values[position]).max(axis=1) <= tolerance
+                if within.any():
+                    merged[position] = kept[int(numpy.argmax(within))]
+                    continue
+            kept.append(position)
+        return merged
+
     def as_json(self, args=None):
         tlist = list()
         for tx in self:
@@ -2242,13 +3449,13 @@ class SFFSoftware(SFFIndexType):
             _assert_or_raise(name, _str)
         group = parent_group.create_group(name)
         if self.id is not None:
-            group[u'id'] = self.id
+            _hff_set(group, u'id', self.id, args)
         if self.name is not None:
-            group[u'name'] = self.name
+            _hff_set(group, u'name', self.name, args)
         if self.version is not None:
-            group[u'version'] = self.version
+            _hff_set(group, u'version', self.version, args)
         if self.processing_details is not None:
-            group[u'processing_details'] = self.processing_details
+            _hff_set(group, u'processing_details', self.processing_details, args)
         return parent_group
 
     @classmethod
@@ -2256,14 +3463,15 @@ class SFFSoftware(SFFIndexType):
         _assert_or_raise(parent_group, h5py.Group)
         obj = cls(new_obj=False)
         group = parent_group[parent_group.name]
-        if u'id' in group:
-            obj.id = int(group[u'id'][()])
-        if u'name' in group:
-            obj.name = _decode(group[u'name'][()], 'utf-8')
-        if u'version' in group:
-            obj.version = _decode(group[u'version'][()], 'utf-8')
-        if u'processing_details' in group:
-            obj.processing_details = _decode(group[u'processing_details'][()], 'utf-8')
+        values = _hff_get(group, [u'id', u'name', u'version', u'processing_details'])
+        if u'id' in values:
+            obj.id = int(values[u'id'])
+        if u'name' in values:
+            obj.name = _decode(values[u'name'], 'utf-8')
+        if u'version' in values:
+            obj.version = _decode(values[u'version'], 'utf-8')
+        if u'processing_details' in values:
+            obj.processing_details = _decode(values[u'processing_details'], 'utf-8')
         return obj
 
 
@@ -2360,15 +3568,15 @@ class SFFBoundingBox(SFFType):
     def as_hff(self, parent_group, name=u'bounding_box', args=None):
         _assert_or_raise(parent_group, h5py.Group)
         group = parent_group.create_group(name)
-        group[u'xmin'] = self.xmin
+        _hff_set(group, u'xmin', self.xmin, args)
         if self.xmax is not None:
-            group[u'xmax'] = self.xmax
-        group[u'ymin'] = self.ymin
+            _hff_set(group, u'xmax', self.xmax, args)
+        _hff_set(group, u'ymin', self.ymin, args)
         if self.ymax is not None:
-            group[u'ymax'] = self.ymax
-        group[u'zmin'] = self.zmin
+            _hff_set(group, u'ymax', self.ymax, args)
+        _hff_set(group, u'zmin', self.zmin, args)
         if self.zmax is not None:
-            group[u'zmax'] = self.zmax
+            _hff_set(group, u'zmax', self.zmax, args)
         return parent_group
 
     @classmethod
@@ -2376,21 +3584,111 @@ class SFFBoundingBox(SFFType):
         _assert_or_raise(parent_group, h5py.Group)
         obj = cls(new_obj=False)
         group = parent_group[name]
-        if u'xmin' in group:
-            obj.xmin = group[u'xmin'][()]
-        if u'xmax' in group:
-            obj.xmax = group[u'xmax'][()]
-        if u'ymin' in group:
-            obj.ymin = group[u'ymin'][()]
-        if u'ymax' in group:
-            obj.ymax = group[u'ymax'][()]
-        if u'zmin' in group:
-            obj.zmin = group[u'zmin'][()]
-        if u'zmax' in group:
-            obj.zmax = group[u'zmax'][()]
+        values = _hff_get(group, [u'xmin', u'xmax', u'ymin', u'ymax', u'zmin', u'zmax'])
+        if u'xmin' in values:
+            obj.xmin = values[u'xmin']
+        if u'xmax' in values:
+            obj.xmax = values[u'xmax']
+        if u'ymin' in values:
+            obj.ymin = values[u'ymin']
+        if u'ymax' in values:
+            obj.ymax = values[u'ymax']
+        if u'zmin' in values:
+            obj.zmin = values[u'zmin']
+        if u'zmax' in values:
+            obj.zmax = values[u'zmax']
         return obj
 
 
+#: the metadata member of an SFFZ container
+SFFZ_METADATA = u'segmentation.json'
+
+#: the alignment of the data of each ``.npy`` member of an SFFZ container
+SFFZ_ALIGNMENT = 64
+
+_SFFZ_PADDING_ID = 0xD935  # zip extra field used for alignment padding
+
+
+def _payload_dtype(mode, endianness):
+    """The :py:class:`numpy.dtype` with which payloads of ``mode`` and ``endianness`` are stored in an SFFZ
+    container; binary masks are stored one voxel to the byte so that they can be mapped"""
+    if mode == BIT_MODE:
+        return numpy.dtype(numpy.uint8)
+    return numpy.dtype(u'{}{}'.format(ENDIANNESS[endianness], FORMAT_CHARS[mode]))
+
+
+def _sffz_payloads(seg_local):
+    """Generator of (member name, adapter class, ``generateDS`` object) for every lattice and encoded sequence of
+    the ``generateDS`` segmentation ``seg_local``"""
+    if seg_local.lattice_list is not None:
+        for i, lattice in enumerate(seg_local.lattice_list.lattice):
+            yield u'lattice_list/{}.npy'.format(i), SFFLattice, lattice
+    if seg_local.segment_list is not None:
+        for i, segment in enumerate(seg_local.segment_list.segment):
+            if segment.mesh_list is None:
+                continue
+            for j, mesh in enumerate(segment.mesh_list.mesh):
+                for kind, item_class in [(u'vertices', SFFVertices), (u'normals', SFFNormals),
+                                         (u'triangles', SFFTriangles)]:
+                    local = getattr(mesh, kind)
+                    if local is not None:
+                        yield u'segment_list/{}/mesh_list/{}/{}.npy'.format(i, j, kind), item_class, local
+
+
+def _write_npy_member(zf, name, array):
+    """Write ``array`` to the zip file ``zf`` as the uncompressed ``.npy`` member ``name`` so that its data is
+    aligned to :py:data:`SFFZ_ALIGNMENT` bytes in the file"""
+    array = numpy.ascontiguousarray(array)
+    _write_npy_chunks(zf, name, array.shape, array.dtype, [array])
+
+
+def _write_npy_chunks(zf, name, shape, dtype, chunks):
+    """As :py:func:`_write_npy_member` for an array of ``shape`` and ``dtype`` whose data (in C order) is given in
+    pieces by the iterable of arrays ``chunks`` so that the whole array is never held in memory"""
+    dtype = numpy.dtype(dtype)
+    header = io.BytesIO()
+    numpy.lib.format.write_array_header_1_0(header, {
+        u'descr': numpy.lib.format.dtype_to_descr(dtype), u'fortran_order': False, u'shape': tuple(shape),
+    })
+    header = header.getvalue()
+    info = zipfile.ZipInfo(name, date_time=(1980, 1, 1, 0, 0, 0))
+    info.compress_type = zipfile.ZIP_STORED
+    info.file_size = len(header) + int(numpy.prod(shape, dtype=numpy.int64)) * dtype.itemsize
+    zip64 = info.file_size * 1.05 > zipfile.ZIP64_LIMIT  # as decided by `ZipFile.open`
+    # the header is padded so that the .npy (and therefore its data) starts on an aligned offset
+    offset = zf.fp.tell() + 30 + len(name.encode(u'utf-8')) + 4 + (20 if zip64 else 0)
+    padding = -offset % SFFZ_ALIGNMENT
+    info.extra = struct.pack(u'<HH', _SFFZ_PADDING_ID, padding) + b'\0' * padding
+    with zf.open(info, u'w', force_zip64=zip64) as f:
+        f.write(header)
+        for chunk in chunks:
+            f.write(numpy.ascontiguousarray(chunk, dtype=dtype).reshape(-1).view(numpy.uint8))
+
+
+def _read_npy_member(zf, info, fn=None):
+    """Read the ``.npy`` member ``info`` of the zip file ``zf``; uncompressed members of the file ``fn`` are
+    memory-mapped read-only"""
+    if fn is None or info.compress_type != zipfile.ZIP_STORED:
+        with zf.open(info) as f:
+            return numpy.lib.format.read_array(f)
+    with open(fn, u'rb') as f:
+        f.seek(info.header_offset)
+        local_header = f.read(30)
+        if local_header[:4] != b'PK\x03\x04':
+            raise SFFValueError(u"invalid SFFZ container member: {}".format(info.filename))
+        name_length, extra_length = struct.unpack(u'<HH', local_header[26:30])
+        f.seek(info.header_offset + 30 + name_length + extra_length)
+        if numpy.lib.format.read_magic(f) == (1, 0):
+            shape, fortran_order, dtype = numpy.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran_order, dtype = numpy.lib.format.read_array_header_2_0(f)
+        offset = f.tell()
+    if not numpy.prod(shape, dtype=numpy.int64):
+        return numpy.empty(shape, dtype=dtype)  # empty files cannot be mapped
+    return numpy.memmap(fn, dtype=dtype, mode=u'r', offset=offset, shape=shape,
+                        order=u'F' if fortran_order else u'C')
+
+
 class SFFSegmentation(SFFType):
     """Adapter class to make using the output of ``generateDS`` easier to use"""
     gds_type = _sff.segmentation
@@ -2526,16 +3824,18 @@ class SFFSegmentation(SFFType):
     def as_hff(self, parent_group, name=None, args=None):
         _assert_or_raise(parent_group, h5py.File)
         group = parent_group
+        if _hff_layout_version(args) > 1:
+            group.attrs[u'hff_layout_version'] = _hff_layout_version(args)
         if self.version is not None:
-            group[u'version'] = self.version
+            _hff_set(group, u'version', self.version, args)
         if self.name is not None:
-            group[u'name'] = self.name
+            _hff_set(group, u'name', self.name, args)
         if self.details is not None:
-            group[u'details'] = self.details
+            _hff_set(group, u'details', self.details, args)
         if self.software_list:
             group = self.software_list.as_hff(group, args=args)
         if self.primary_descriptor is not None:
-            group[u'primary_descriptor'] = self.primary_descriptor
+            _hff_set(group, u'primary_descriptor', self.primary_descriptor, args)
         if self.transform_list:
             group = self.transform_list.as_hff(group, args=args)
         if self.bounding_box is not None:
@@ -2546,6 +3846,8 @@ class SFFSegmentation(SFFType):
             group = self.segment_list.as_hff(group, args=args)
         if self.lattice_list:
             group = self.lattice_list.as_hff(group, args=args)
+        if getattr(args, u'annotation_index', False):
+            group = self.annotation_index.as_hff(group, args=args)
         return parent_group
 
     @classmethod
@@ -2553,16 +3855,17 @@ class SFFSegmentation(SFFType):
         _assert_or_raise(parent_group, h5py.File)
         obj = cls(new_obj=False)
         group = parent_group
-        if u'version' in group:
-            obj.version = _decode(group[u'version'][()], 'utf-8')
-        if u'name' in group:
-            obj.name = _decode(group[u'name'][()], 'utf-8')
-        if u'details' in group:
-            obj.details = _decode(group[u'details'][()], 'utf-8')
+        values = _hff_get(group, [u'version', u'name', u'details', u'primary_descriptor'])
+        if u'version' in values:
+            obj.version = _decode(values[u'version'], 'utf-8')
+        if u'name' in values:
+            obj.name = _decode(values[u'name'], 'utf-8')
+        if u'details' in values:
+            obj.details = _decode(values[u'details'], 'utf-8')
         if u'software_list' in group:
             obj.software_list = SFFSoftwareList.from_hff(group, args=args)
-        if u'primary_descriptor' in group:
-            obj.primary_descriptor = _decode(group[u'primary_descriptor'][()], 'utf-8')
+        if u'primary_descriptor' in values:
+            obj.primary_descriptor = _decode(values[u'primary_descriptor'], 'utf-8')
         if u'transform_list' in group:
             obj.transform_list = SFFTransformList.from_hff(group, args=args)
         if u'bounding_box' in group:
@@ -2573,6 +3876,9 @@ class SFFSegmentation(SFFType):
             obj.segment_list = SFFSegmentList.from_hff(group, args=args)
         if u'lattice_list' in group:
             obj.lattice_list = SFFLatticeList.from_hff(group, args=args)
+        if u'annotation_index' in group:
+            obj._annotation_index = SFFAnnotationIndex.from_hff(group, args=args)
+            obj._annotation_index._attach(obj)
         return obj
 
     @classmethod
@@ -2585,6 +3891,7 @@ class SFFSegmentation(SFFType):
         :return seg: the corresponding :py:class:`SFFSegmentation` object
         :rtype seg: :py:class:`SFFSegmentation`
         """
+        annotation_index = None
         if not os.path.exists(fn):
             print_date(_encode(u"File {} not found".format(fn), u'utf-8'))
             sys.exit(74)
@@ -2595,22 +3902,264 @@ class SFFSegmentation(SFFType):
                 with h5py.File(fn, u'r') as h:
                     seg = cls.from_hff(h, args=args)
                 seg_local = seg._local
+                annotation_index = getattr(seg, u'_annotation_index', None)
             elif re.match(r'.*\.json$', fn, re.IGNORECASE):
                 with open(fn, u'r') as f:
                     data = json.load(f)
                 seg = cls.from_json(data, args=args)
                 seg_local = seg._local
+            elif re.match(r'.*\.sffz$', fn, re.IGNORECASE):
+                seg_local = cls.from_sffz(fn, args=args)._local
             else:
                 print_date(_encode(u"Invalid EMDB-SFF file name: {}".format(fn), u'utf-8'))
                 sys.exit(65)
         # now create the output object
         obj = cls(new_obj=False)
         obj._local = seg_local
+        if annotation_index is not None:
+            annotation_index._attach(obj)
+        obj._annotation_index = annotation_index
         return obj
 
     def to_file(self, *args, **kwargs):
         """Alias for :py:meth:`.export` method. Passes all args and kwargs onto :py:meth:`.SFFSegmentation.export`"""
-        return super(SFFSegmentation, self).export(*args, **kwargs)
+        return self.export(*args, **kwargs)
+
+    def export(self, fn, args=None, *_args, **_kwargs):
+        """Export to a file on disc; the output format is determined by the extension (see
+        :py:meth:`.SFFType.export`) which may also be
+
+        - ``.sffz`` - an SFFZ container (see :py:meth:`as_sffz`)
+
+        Lattices of mode :py:data:`BIT_MODE` are an extension of the EMDB-SFF schema and are only written if
+        ``args.schema_extensions`` is set (``--schema-extensions``); otherwise nothing is written and the status is 65.
+        """
+        extension_lattices = _extension_lattices(self._local)
+        if extension_lattices and not _schema_extensions(args):
+            print_date(u"Lattice(s) {} have mode '{}' which is an extension of the EMDB-SFF schema; use "
+                       u"--schema-extensions to write them".format(u", ".join(map(_str, extension_lattices)), BIT_MODE))
+            return 65
+        if isinstance(fn, _str) and re.match(r'.*\.sffz$', fn, re.IGNORECASE):
+            if not self._is_valid():
+                raise SFFValueError("export failed due to validation error")
+            self.as_sffz(fn, args=args)
+            return 0
+        # the XML writer reads payloads directly from the `generateDS` objects
+        for _, item_class, local in _sffz_payloads(self._local):
+            _sync_payload(item_class, local)  # encodes mapped, assigned or changed arrays
+        return super(SFFSegmentation, self).export(fn, args, *_args, **_kwargs)
+
+    def as_sffz(self, fn, args=None):
+        """Write this segmentation as an SFFZ container
+
+        An SFFZ container is an uncompressed zip file with the JSON of the segmentation as the member
+        ``segmentation.json`` (:py:data:`SFFZ_METADATA`) in which the ``data`` of every lattice, vertices, normals
+        and triangles is instead the name of an ``.npy`` member holding the decoded array. The data of each
+        ``.npy`` member is aligned to :py:data:`SFFZ_ALIGNMENT` bytes so that :py:meth:`from_sffz` can map it
+        straight into memory.
+
+        :param str fn: the output file name
+        :param args: parsed arguments; as for JSON output ``exclude_geometry`` leaves out all geometry
+        :type args: :py:class:`argparse.Namespace`
+        """
+        if getattr(args, u'exclude_geometry', False):
+            payloads = list()
+        else:
+            payloads = list(_sffz_payloads(self._local))
+        with zipfile.ZipFile(fn, u'w', zipfile.ZIP_STORED, allowZip64=True) as zf:
+            for name, item_class, local in payloads:
+                item = item_class.from_gds_type(local)
+                _write_npy_member(zf, name, numpy.asarray(
+                    item.data_array, dtype=_payload_dtype(item.mode, item.endianness)
+                ))
+            # refer to the members in place of the payloads while making the metadata
+            # changed arrays were written as they are and are still only encoded when needed
+            payload_data = [(local.data, getattr(local, u'_data_crc', None)) for _, _, local in payloads]
+            try:
+                for name, _, local in payloads:
+                    local.data = name
+                    local._data_crc = None
+                metadata = self.as_json(args=args)
+            finally:
+                for (_, _, local), (data, crc) in zip(payloads, payload_data):
+                    local.data = data
+                    local._data_crc = crc
+            info = zipfile.ZipInfo(SFFZ_METADATA, date_time=(1980, 1, 1, 0, 0, 0))
+            zf.writestr(info, _encode(json.dumps(metadata), u'utf-8'), compress_type=zipfile.ZIP_STORED)
+
+    @classmethod
+    def from_sffz(cls, fn, args=None):
+        """Read an SFFZ container (see :py:meth:`as_sffz`)
+
+        The arrays of the lattices and encoded sequences of a container on disc are memory-mapped read-only so that
+        opening it costs little and data is only read as it is used; each payload is only encoded if it is
+        accessed e.g. to export to another format.
+
+        :param fn: the container's file name or a file object (whose arrays are read into memory)
+        :type fn: str or file
+        :param args: parsed arguments
+        :type args: :py:class:`argparse.Namespace`
+        :return seg: the corresponding :py:class:`SFFSegmentation` object
+        :rtype seg: :py:class:`SFFSegmentation`
+        """
+        with zipfile.ZipFile(fn, u'r') as zf:
+            seg = cls.from_json(json.loads(_decode(zf.read(SFFZ_METADATA), u'utf-8')), args=args)
+            filename = fn if isinstance(fn, _str) else None
+            for _, _, local in _sffz_payloads(seg._local):
+                if local.data is not None:  # the name of the member
+                    local._data_array = _read_npy_member(zf, zf.getinfo(local.data), filename)
+                    local.data = None
+        return seg
+
+    @classmethod
+    def open(cls, fn, mode=u'r'):
+        """Open the EMDB-SFF HDF5 file ``fn`` to read its annotation and, with mode ``r+``, update it in place
+
+        .. code:: python
+
+            with SFFSegmentation.open(u'file.hff', mode=u'r+') as session:
+                segment = session.segmentation.segment_list.get_by_id(9764)
+                segment.biological_annotation.description = u'mitochondrion'
+
+        :param str fn: the name of an HDF5 file (``.hff``, ``.h5`` or ``.hdf5``)
+        :param str mode: ``r`` (default) or ``r+``
+        :return session: the open file
+        :rtype session: :py:class:`SFFHFFSession`
+        """
+        if not re.match(r'.*\.(hff|h5|hdf5)$', fn, re.IGNORECASE):
+            raise SFFValueError(u"only HDF5 files can be opened for update: {}".format(fn))
+        return SFFHFFSession(fn, mode=mode)
+
+    @property
+    def annotation_index(self):
+        """An :py:class:`SFFAnnotationIndex` of all the external references for vectorised queries
+
+        The index is built on first use (unless it was read from an HFF file) and rebuilt on the next query after
+        :py:meth:`merge_annotation`, :py:meth:`copy_annotation` and :py:meth:`clear_annotation`. Call
+        :py:meth:`reset_annotation_index` after changing external references any other way.
+        """
+        if getattr(self, u'_annotation_index', None) is None:
+            self._annotation_index = SFFAnnotationIndex.from_segmentation(self)
+        return self._annotation_index
+
+    def reset_annotation_index(self):
+        """Discard the annotation index; it is rebuilt on next use (as are indexes already in use)"""
+        self._annotation_index = None
+        self._annotation_changed()
+
+    def _annotation_changed(self):
+        # annotation indexes compare this against the version they were built from
+        self._annotation_version = getattr(self, u'_annotation_version', 0) + 1
+
+    def intern_transforms(self, tolerance=0.0):
+        """Keep one copy of each distinct transformation matrix and point all references to it
+
+        The ``transform_id`` of every shape, mesh and 3D volume which referred to a removed duplicate is updated.
+
+        :param float tolerance: the largest difference between values considered identical (default: exact);
+            see :py:meth:`SFFTransformList.intern`
+        :return: a ``dict`` from the ID of each removed matrix to the ID of the matrix kept in its place
+        :rtype: dict
+        """
+        if self._local.transform_list is None:
+            return _dict()
+        mapping = self.transform_list.intern(tolerance=tolerance)
+        if mapping and self._local.segment_list is not None:
+            # update the `generateDS` objects directly since adapters are created on every access
+            for segment in self._local.segment_list.segment:
+                referrers = list()
+                if segment.shape_primitive_list is not None:
+                    referrers += segment.shape_primitive_list.shape_primitive
+                if segment.mesh_list is not None:
+                    referrers += segment.mesh_list.mesh
+                if segment.three_d_volume is not None:
+                    referrers.append(segment.three_d_volume)
+                for referrer in referrers:
+                    if referrer.transform_id in mapping:
+                        referrer.transform_id = mapping[referrer.transform_id]
+        return mapping
+
+    @classmethod
+    async def aload(cls, fn, args=None, executor=None):
+        """Asynchronous version of :py:meth:`from_file`
+
+        The file is read and parsed by :py:meth:`from_file` in ``executor`` so the event loop is never blocked and
+        files are read exactly as :py:meth:`from_file` reads them (e.g. HDF5 lists in worker processes with
+        ``args.hff_workers`` and SFFZ arrays memory-mapped). A load which has started when the awaiting task is
+        cancelled runs to completion in the background and its result is discarded. Each load allocates IDs from
+        blocks reserved from the process-wide counter (see :py:func:`sfftkrw.core.utils.id_allocation`) so many may
+        run concurrently without their IDs colliding with each other or with those of existing objects.
+
+        .. code:: python
+
+            seg = await SFFSegmentation.aload(u'file.sff')
+
+        :param str fn: name of a file hosting an EMDB-SFF-structured segmentation
+        :param args: parsed arguments
+        :type args: :py:class:`argparse.Namespace`
+        :param executor: the executor to use (default: the event loop's default executor)
+        :type executor: :py:class:`concurrent.futures.Executor`
+        :return seg: the corresponding :py:class:`SFFSegmentation` object
+        :rtype seg: :py:class:`SFFSegmentation`
+        :raises ValueError: if ``fn`` is not an EMDB-SFF file name
+        :raises IOError: if ``fn`` does not exist
+        """
+        if not re.match(r'.*\.(sff|xml|hff|h5|hdf5|json|sffz)$', fn, re.IGNORECASE):
+            raise ValueError(u"Invalid EMDB-SFF file name: {}".format(fn))
+        if not os.path.exists(fn):  # rather than exiting as from_file does
+            raise IOError(u"File {} not found".format(fn))
+        loop = asyncio.get_event_loop()  # the running loop; get_running_loop() needs Python 3.7
+
+        def _load():
+            with id_allocation():
+                return cls.from_file(fn, args=args)
+
+        return await loop.run_in_executor(executor, _load)
+
+    async def aexport(self, fn, args=None, executor=None):
+        """Asynchronous version of :py:meth:`export`
+
+        Encoding and writing run in ``executor``. The output is written to a temporary file in the same directory
+        which replaces ``fn`` only when complete so that cancelling the awaiting task never leaves a partial file;
+        if the export is cancelled ``fn`` is left untouched.
+
+        .. code:: python
+
+            status = await seg.aexport(u'file.hff')
+
+        :param str fn: filename to export to; the output format is determined by the extension
+        :param args: parsed arguments
+        :type args: :py:class:`argparse.Namespace`
+        :param executor: the executor to use (default: the event loop's default executor)
+        :type executor: :py:class:`concurrent.futures.Executor`
+        :return int status: exit status as for :py:meth:`export`
+        """
+        loop = asyncio.get_event_loop()  # the running loop; get_running_loop() needs Python 3.7
+        cancelled = threading.Event()
+
+        def _export():
+            dirname, basename = os.path.split(os.path.abspath(fn))
+            handle, temp_fn = make_temporary_file(
+                dirname, prefix=u'.{}.'.format(basename), suffix=u'.{}'.format(fn.split(u'.')[-1])
+            )
+            os.close(handle)
+            try:
+                with id_allocation():
+                    status = self.export(temp_fn, args)
+                if status == 0 and not cancelled.is_set():
+                    if os.path.exists(fn):
+                        shutil.copymode(fn, temp_fn)  # as when fn is overwritten
+                    os.replace(temp_fn, fn)
+            finally:
+                if os.path.exists(temp_fn):
+                    os.remove(temp_fn)
+            return status
+
+        try:
+            return await loop.run_in_executor(executor, _export)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
 
     def merge_annotation(self, other_seg, include_colour=False):
         """Merge the annotation from another sff_seg to this one
@@ -2625,9 +4174,12 @@ class SFFSegmentation(SFFType):
         self.software_list = other_seg.software_list
         self.global_external_references = other_seg.global_external_references
         self.details = other_seg.details
+        self._annotation_changed()
+        # the ID lookup is built each time the segment list is accessed
+        other_segments = other_seg.segments
         # loop through segments
         for segment in self.segments:
-            other_segment = other_seg.segments.get_by_id(segment.id)
+            other_segment = other_segments.get_by_id(segment.id)
             segment.biological_annotation = other_segment.biological_annotation
             if include_colour:
                 segment.colour = other_segment.colour
@@ -2646,6 +4198,7 @@ class SFFSegmentation(SFFType):
             to = self.global_external_references
         else:
             to = self.segments.get_by_id(to_id).biological_annotation.external_references
+        self._annotation_changed()
         # the id for global notes
         for extref in _from:
             to.append(extref)
@@ -2656,8 +4209,185 @@ class SFFSegmentation(SFFType):
         :param from_id: segment ID
         :return:
         """
+        self._annotation_changed()
         if from_id == -1:
             self.global_external_references.clear()  # = SFFGlobalExternalReferenceList()
         else:
             segment = self.segments.get_by_id(from_id)
             segment.biological_annotation.external_references.clear()  # = SFFExternalReferenceList()
+
+
+class SFFHFFSession(object):
+    """An EMDB-SFF HDF5 file opened with :py:meth:`SFFSegmentation.open` whose annotation is updated in place
+
+    Only the annotation is read into :py:attr:`segmentation`: the name, details and global external references of
+    the segmentation and the ID, parent ID, colour and biological annotation of each segment. Lattices, meshes,
+    shapes, 3D volumes and transforms are neither read nor written so that updates take as long on large files as
+    they do on small ones. :py:meth:`flush` (also called on closing a session opened with mode ``r+``) rewrites only
+    what has changed in the layout and layout version of the file; any annotation index in the file is rebuilt.
+
+    Segments may not be added or removed. HDF5 does not reclaim the space of replaced groups and tables so files
+    which are updated often should be repacked (e.g. with ``h5repack``).
+    """
+    modes = (u'r', u'r+')
+
+    def __init__(self, fn, mode=u'r'):
+        if mode not in self.modes:
+            raise SFFValueError(u"invalid mode '{}'; valid modes are: {}".format(mode, u", ".join(self.modes)))
+        self.fn = fn
+        self.mode = mode
+        self._file = h5py.File(fn, mode)
+        try:
+            self._args = argparse.Namespace(
+                hff_layout_version=int(self._file.attrs.get(u'hff_layout_version', 1)), exclude_geometry=True
+            )
+            self.segmentation = self._read()
+        except Exception:
+            self._file.close()
+            raise
+        self._state = self._snapshot()
+
+    def __repr__(self):
+        return u"SFFHFFSession(fn={}, mode={})".format(self.fn, self.mode)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:  # leave the file as it was
+            self._file.close()
+
+    @property
+    def closed(self):
+        return not self._file
+
+    def _read(self):
+        h = self._file
+        seg = SFFSegmentation(new_obj=False)
+        values = _hff_get(h, [u'version', u'name', u'details', u'primary_descriptor'])
+        for name in [u'version', u'name', u'details', u'primary_descriptor']:
+            if name in values:
+                setattr(seg, name, _decode(values[name], u'utf-8'))
+        if u'global_external_references' in h:
+            seg.global_external_references = SFFGlobalExternalReferenceList.from_hff(h, args=self._args)
+        if u'segment_list' in h:
+            seg.segment_list = SFFSegmentList.from_hff(h, args=self._args)
+        return seg
+
+    def _snapshot(self):
+        """The state of everything which may be written back"""
+        seg = self.segmentation
+        segments = _dict()
+        for segment in seg.segment_list:
+            segments[segment.id] = (
+                segment.parent_id,
+                segment.colour.value if segment.colour is not None else None,
+                segment.biological_annotation.as_json() if segment.biological_annotation is not None else None,
+            )
+        return {
+            u'name': seg.name,
+            u'details': seg.details,
+            u'global_external_references': seg.global_external_references.as_json(),
+            u'segments': segments,
+        }
+
+    def flush(self):
+        """Write back whatever has changed since the file was opened or last flushed
+
+        :return paths: the HDF5 paths of the groups, datasets or attributes (on their group) which were written
+        :rtype paths: list
+        :raises SFFValueError: if the session is read-only or segments were added or removed
+        """
+        if self.mode == u'r':
+            raise SFFValueError(u"{} is open read-only".format(self.fn))
+        state = self._snapshot()
+        if list(state[u'segments']) != list(self._state[u'segments']):
+            raise SFFValueError(u"segments cannot be added or removed when updating {} in place".format(self.fn))
+        h, args, paths = self._file, self._args, list()
+        for name in [u'name', u'details']:
+            if state[name] != self._state[name]:
+                _hff_replace(h, name, state[name], args)
+                paths.append(u'/{}'.format(name))
+        annotation_changed = False
+        if state[u'global_external_references'] != self._state[u'global_external_references']:
+            if u'global_external_references' in h:
+                del h[u'global_external_references']
+            if self.segmentation.global_external_references:
+                self.segmentation.global_external_references.as_hff(h, args=args)
+            paths.append(u'/global_external_references')
+            annotation_changed = True  # global external references are indexed too
+        changed = [
+            segment_id for segment_id, values in state[u'segments'].items()
+            if values != self._state[u'segments'][segment_id]
+        ]
+        if changed:
+            group = h[u'segment_list']
+            if _decode(group.attrs.get(u'layout', u'groups'), u'utf-8') == u'tables':
+                annotation_changed = self._flush_tables(group, changed, state, paths) or annotation_changed
+            else:
+                annotation_changed = self._flush_groups(group, changed, state, paths) or annotation_changed
+        if annotation_changed and u'annotation_index' in h:
+            del h[u'annotation_index']
+            SFFAnnotationIndex.from_segmentation(self.segmentation).as_hff(h, args=args)
+            paths.append(u'/annotation_index')
+        h.flush()
+        self._state = state
+        return paths
+
+    def _flush_groups(self, group, changed, state, paths):
+        """Rewrite the changed values of the segments ``changed`` in the ``groups`` layout"""
+        annotation_changed = False
+        for segment_id in changed:
+            segment = self.segmentation.segment_list.get_by_id(segment_id)
+            segment_group = group[_str(segment_id)]
+            parent_id, colour, annotation = state[u'segments'][segment_id]
+            old_parent_id, old_colour, old_annotation = self._state[u'segments'][segment_id]
+            if parent_id != old_parent_id:
+                _hff_replace(segment_group, u'parent_id', parent_id, self._args)
+                paths.append(u'{}/parent_id'.format(segment_group.name))
+            if colour != old_colour:
+                _hff_replace(segment_group, u'colour', colour, self._args)
+                paths.append(u'{}/colour'.format(segment_group.name))
+            if annotation != old_annotation:
+                if u'biological_annotation' in segment_group:
+                    del segment_group[u'biological_annotation']
+                if segment.biological_annotation is not None:
+                    segment.biological_annotation.as_hff(segment_group, args=self._args)
+                paths.append(u'{}/biological_annotation'.format(segment_group.name))
+                annotation_changed = True
+        return annotation_changed
+
+    def _flush_tables(self, group, changed, state, paths):
+        """Rewrite the ``segments`` table (keeping its 3D volume columns, which are not read) and, if any annotation
+        changed, the ``external_references`` table of the ``tables`` layout"""
+        segment_rows, reference_rows = SFFSegmentList._annotation_rows(
+            self.segmentation._local.segment_list.segment
+        )
+        table = _make_table(segment_rows, SFFSegmentList.segment_columns)
+        existing = group[u'segments'][()]
+        for column in [u'has_three_d_volume', u'lattice_id', u'value', u'transform_id']:
+            table[column] = existing[column]
+        group[u'segments'][...] = table
+        paths.append(group[u'segments'].name)
+        if all(state[u'segments'][i][2] == self._state[u'segments'][i][2] for i in changed):
+            return False
+        if u'external_references' in group:
+            del group[u'external_references']
+        if reference_rows:
+            group.create_dataset(u'external_references', data=_make_table(
+                reference_rows, SFFSegmentList.external_reference_columns
+            ))
+        paths.append(u'{}/external_references'.format(group.name))
+        return True
+
+    def close(self):
+        """Write back any changes (mode ``r+``) and close the file"""
+        if self.closed:
+            return
+        try:
+            if self.mode == u'r+':
+                self.flush()
+        finally:
+            self._file.close()
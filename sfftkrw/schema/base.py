@@ -115,10 +115,12 @@ class SFFType(object):
     def from_gds_type(cls, inst=None):
         """Create an :py:class:`.SFFType` subclass directly from a `gds_type` object
 
-        Notice that we ignore do not pass `*args, **kwargs` as we assume the `inst` is complete.
+        Notice that we ignore do not pass `*args, **kwargs` as we assume the `inst` is complete. The initialiser is
+        not called so that we do not create a ``generateDS`` object only to replace it with `inst`; adapters are
+        created each time a list is accessed so this matters.
         """
         if isinstance(inst, cls.gds_type):
-            obj = cls(new_obj=False)
+            obj = cls.__new__(cls, new_obj=False)
             obj._local = inst
         elif inst is None:
             obj = None
@@ -401,22 +403,18 @@ class SFFIndexType(SFFType):
             if not kwargs[u'new_obj']:
                 setattr(self, self.index_attr, None)
         super(SFFIndexType, self).__init__(*args, **kwargs)
-        # fixme: adds `vID` and `PID` to segments ?! (harmless bug)
-        # id
+        # id; always set because some adapters (e.g. `SFFSubtomogramAverage`) keep an `id` their `gds_type` lacks
         if u'id' in kwargs:
             self._local.id = kwargs[u'id']
         else:
             self._local.id = getattr(self, self.index_attr)
-        # vID: vertices
-        if u'vID' in kwargs:
-            self._local.vID = kwargs[u'vID']
-        else:
-            self._local.vID = getattr(self, self.index_attr)
-        # PID: polygons
-        if u'PID' in kwargs:
-            self._local.PID = kwargs[u'PID']
-        else:
-            self._local.PID = getattr(self, self.index_attr)
+        # vID (vertices) and PID (polygons) only if the `gds_type` has them
+        for id_attr in [u'vID', u'PID']:
+            if hasattr(self._local, id_attr):
+                if id_attr in kwargs:
+                    setattr(self._local, id_attr, kwargs[id_attr])
+                else:
+                    setattr(self._local, id_attr, getattr(self, self.index_attr))
 
     @classmethod
     def reset_id(cls):
@@ -426,7 +424,9 @@ class SFFIndexType(SFFType):
     @classmethod
     def from_gds_type(cls, inst=None):
         if isinstance(inst, cls.gds_type):
-            obj = cls(new_obj=False)
+            # skip the checks in `__new__` which only matter when allocating an index
+            obj = super(SFFIndexType, cls).__new__(cls, new_obj=False)
+            setattr(obj, cls.index_attr, None)  # as `__init__` does for `new_obj=False`
             obj._local = inst
         elif inst is None:
             obj = inst
@@ -557,7 +557,8 @@ class SFFListType(SFFType):
     @classmethod
     def from_gds_type(cls, inst=None):
         if isinstance(inst, cls.gds_type):
-            obj = cls(new_obj=False)
+            obj = cls.__new__(cls, new_obj=False)
+            obj._id_dict = _dict()
             obj._local = inst
             obj._update_dict()
         elif inst is None:
@@ -0,0 +1,317 @@
+# -*- coding: utf-8 -*-
+# postgenerate.py
+"""
+postgenerate.py
+===============
+
+Changes made to a module after it is generated from the EMDB-SFF XSD by ``generateDS.py``
+
+Regenerating a module (see the command line recorded at its top) discards everything that is not in the XSD, so
+the changes below are made by running this module on the generated file:
+
+.. code:: bash
+
+    generateDS.py -o sfftkrw/schema/v0_8_0_dev1.py ../EMDB-SFF/segmentation_da.xsd
+    python -m sfftkrw.schema.postgenerate sfftkrw/schema/v0_8_0_dev1.py
+
+Each change leaves a module which already has it unchanged so the module in the repository is always the output of
+this step. The extensions of the schema made here are recorded as XSD in the documentation (see *Extensions of the
+EMDB-SFF schema* in ``docs/data_model.rst``).
+
+* :py:func:`add_slots` gives ``GeneratedsSuper`` and every generated class a ``__slots__`` holding every attribute
+  set by its constructor so that generated objects carry no instance dictionary.
+* :py:func:`add_bit_mode` adds the lattice mode ``bit`` (binary masks packed 8 voxels to the byte) to ``mode_type``;
+  it is an extension of the EMDB-SFF schema which is only written when asked for (``--schema-extensions``).
+* :py:func:`add_compression` adds the optional attribute ``compression`` (e.g. ``shuffle+zlib``) to vertices, normals
+  and triangles; it is only written when the data is compressed.
+* :py:func:`skip_private_attributes` leaves attributes whose names start with an underscore (the caches the adapters
+  keep on generated objects e.g. decoded arrays) out of comparisons.
+"""
+from __future__ import print_function
+
+import ast
+import io
+import sys
+
+__author__ = 'Paul K. Korir, PhD'
+__email__ = 'pkorir@ebi.ac.uk, paul.korir@gmail.com'
+__date__ = '2026-10-19'
+
+#: the attributes set by every generated constructor; their slots are in ``GeneratedsSuper``
+COMMON_SLOTS = ('gds_collector_', 'gds_elementtree_node_', 'original_tagname_', 'parent_object_', 'ns_prefix_')
+
+#: the longest line written
+MAX_LINE_LENGTH = 120
+
+_SUPER_SLOTS_COMMENT = (
+    u"# every attribute set in the generated constructors has a slot (see sfftkrw.schema.postgenerate); "
+    u"`__dict__`\n"
+    u"# is only created for others\n"
+)
+
+_GDS_STATE = u'''
+def gds_state_(self):
+    """All (name, value) pairs set on the instance: slots (base class first) then `__dict__`"""
+    state = []
+    for class_ in reversed(type(self).__mro__):
+        for name in class_.__dict__.get('__slots__', ()):
+            if name != '__dict__' and hasattr(self, name):
+                state.append((name, getattr(self, name)))
+    state.extend(getattr(self, '__dict__', {}).items())
+    return state
+'''
+
+
+def _first_lineno(node):
+    """The first line of ``node`` including any decorators"""
+    return min([node.lineno] + [d.lineno for d in getattr(node, u'decorator_list', [])])
+
+
+def _last_lineno(lines, node, next_node):
+    """The last line of ``node`` in a class body; ``end_lineno`` is only available from Python 3.8"""
+    end = getattr(node, u'end_lineno', None)
+    if end is not None:
+        return end
+    end = _first_lineno(next_node) - 1
+    while lines[end - 1].strip() == u'' or lines[end - 1].lstrip().startswith(u'#'):
+        end -= 1
+    return end
+
+
+def _format_slots(names, indent):
+    """The ``__slots__`` assignment for ``names`` wrapped as in the rest of the generated module"""
+    items = [u"'{}'".format(name) for name in names]
+    single = u"{}__slots__ = ({}{})\n".format(indent, u", ".join(items), u"," if len(items) == 1 else u"")
+    if len(single) - 1 <= MAX_LINE_LENGTH:
+        return single
+    inner = indent + u' ' * 4
+    rows, row = list(), list()
+    for i, item in enumerate(items):
+        text = item + (u"," if i < len(items) - 1 else u"")
+        if row and len(inner + u" ".join(row + [text])) > MAX_LINE_LENGTH:
+            rows.append(inner + u" ".join(row) + u"\n")
+            row = list()
+        row.append(text)
+    rows.append(inner + u" ".join(row) + u"\n")
+    return u"{}__slots__ = (\n{}{})\n".format(indent, u"".join(rows), indent)
+
+
+def _constructor_attributes(class_node):
+    """The names of the attributes set on ``self`` by the constructor of ``class_node`` in order"""
+    assignments = list()
+    for node in class_node.body:
+        if isinstance(node, ast.FunctionDef) and node.name == u'__init__':
+            for child in ast.walk(node):
+                if isinstance(child, ast.Assign):
+                    for target in child.targets:
+                        if isinstance(target, ast.Attribute) and isinstance(target.value, ast.Name) and \
+                                target.value.id == u'self':
+                            assignments.append((target.lineno, target.col_offset, target.attr))
+    names = list()
+    for _, _, name in sorted(assignments):  # ast.walk() is breadth-first
+        if name not in names:
+            names.append(name)
+    return names
+
+
+def _super_class(tree):
+    """The ``GeneratedsSuper`` class definition (in the ``except ImportError`` clause)"""
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ClassDef) and node.name == u'GeneratedsSuper':
+            return node
+    raise ValueError(u"no GeneratedsSuper class; is this a generateDS module?")
+
+
+def _set_slots(lines, edits, class_node, names, after, comment=u''):
+    """Add an edit which sets the ``__slots__`` of ``class_node`` to ``names``
+
+    An existing ``__slots__`` is replaced; otherwise it is added after the statement named ``after`` preceded by
+    ``comment`` (lines without indentation).
+    """
+    indent = u' ' * class_node.body[0].col_offset
+    body = class_node.body
+    for i, node in enumerate(body):
+        if isinstance(node, ast.Assign) and any(getattr(t, u'id', None) == u'__slots__' for t in node.targets):
+            edits.append((node.lineno - 1, _last_lineno(lines, node, body[i + 1]), _format_slots(names, indent)))
+            return
+    for node in body:
+        if isinstance(node, ast.Assign) and any(getattr(t, u'id', None) == after for t in node.targets):
+            comment = u"".join(indent + line + u"\n" for line in comment.splitlines())
+            edits.append((node.lineno, node.lineno, comment + _format_slots(names, indent)))
+            return
+    raise ValueError(u"class {} has no '{}' attribute".format(class_node.name, after))
+
+
+def add_slots(source):
+    """Give ``GeneratedsSuper`` and every generated class in the module ``source`` a ``__slots__``
+
+    ``GeneratedsSuper`` holds the attributes common to all constructors (:py:data:`COMMON_SLOTS`) and a
+    ``__dict__`` so that other attributes can still be set; its ``__eq__`` compares slots (``gds_state_``) rather
+    than the (empty) instance dictionary.
+
+    :param str source: the text of the generated module
+    :return str source: the changed text
+    """
+    tree = ast.parse(source)
+    lines = source.splitlines(True)
+    edits = list()  # (first line index, last line index (exclusive), text) with 0-based indices
+    super_class = _super_class(tree)
+    super_indent = u' ' * super_class.body[0].col_offset
+    _set_slots(lines, edits, super_class, COMMON_SLOTS + (u'__dict__',), u'__hash__', comment=_SUPER_SLOTS_COMMENT)
+    methods = [node for node in super_class.body if isinstance(node, ast.FunctionDef)]
+    names = [node.name for node in methods]
+    eq = methods[names.index(u'__eq__')]
+    end = _last_lineno(lines, eq, methods[names.index(u'__eq__') + 1])
+    eq_text = u"".join(lines[eq.lineno - 1:end])
+    new_eq_text = eq_text.replace(u'self.__dict__.items()', u'self.gds_state_()').replace(
+        u'other.__dict__.items()', u'other.gds_state_()')
+    if u'gds_state_' not in names:
+        new_eq_text += u"".join(
+            (super_indent + line if line else line) + u"\n" for line in _GDS_STATE.splitlines()
+        )
+    if new_eq_text != eq_text:
+        edits.append((eq.lineno - 1, end, new_eq_text))
+    # generated classes
+    slots = {u'GeneratedsSuper': set(COMMON_SLOTS)}
+    for node in tree.body:
+        if not isinstance(node, ast.ClassDef):
+            continue
+        bases = [base.id for base in node.bases if isinstance(base, ast.Name)]
+        if not any(base in slots for base in bases):
+            continue
+        inherited = set().union(*[slots[base] for base in bases if base in slots])
+        names = [name for name in _constructor_attributes(node) if name not in inherited]
+        slots[node.name] = inherited | set(names)
+        _set_slots(lines, edits, node, names, u'superclass')
+    for first, last, text in sorted(edits, reverse=True):
+        lines[first:last] = [text]
+    return u"".join(lines)
+
+
+_EQ_FILTER = u"""                return (obj[0] != 'parent_object_' and
+                        obj[0] != 'gds_collector_')
+"""
+
+_PRIVATE_EQ_FILTER = u"""                # names with a leading underscore are caches kept by the adapters
+                return (obj[0] != 'parent_object_' and
+                        obj[0] != 'gds_collector_' and
+                        not obj[0].startswith('_'))
+"""
+
+
+def skip_private_attributes(source):
+    """Leave attributes whose names start with an underscore out of ``GeneratedsSuper.__eq__`` in ``source``"""
+    return source.replace(_EQ_FILTER, _PRIVATE_EQ_FILTER)
+
+
+_MODE_TYPE_MEMBERS = (u"    FLOAT_64 = 'float64'\n", u"    FLOAT_64 = 'float64'\n    BIT = 'bit'\n")
+
+_MODE_TYPE_ENUMERATIONS = (u"'float64']\n", u"'float64', 'bit']\n")
+
+
+def add_bit_mode(source):
+    """Add the lattice mode ``bit`` to the ``mode_type`` enumeration and to the validation of the mode of
+    ``lattice_type`` (but not of the encoded sequences) in ``source``"""
+    old, new = _MODE_TYPE_MEMBERS
+    if new not in source:
+        source = source.replace(old, new, 1)
+    start = source.find(u'\nclass lattice_type(')
+    if start < 0:
+        return source
+    end = source.find(u'\nclass ', start + 1)
+    end = len(source) if end < 0 else end
+    old, new = _MODE_TYPE_ENUMERATIONS
+    lattice_type = source[start:end]
+    if new not in lattice_type:
+        source = source[:start] + lattice_type.replace(old, new) + source[end:]
+    return source
+
+
+#: the generated classes of encoded sequences
+ENCODED_SEQUENCE_CLASSES = (u'vertices_type', u'normals_type', u'triangles_type')
+
+_COMPRESSION_PARAMETER = (
+    u"data=None, gds_collector_=None,\n                 **kwargs_):\n",
+    u"data=None, compression=None,\n                 gds_collector_=None, **kwargs_):\n",
+)
+
+_COMPRESSION_CONSTRUCTOR = u"""        self.compression = _cast(None, compression)
+        self.compression_nsprefix_ = None
+"""
+
+_COMPRESSION_ACCESSORS = u"""
+    def get_compression(self):
+        return self.compression
+
+    def set_compression(self, compression):
+        self.compression = compression
+"""
+
+_COMPRESSION_EXPORT = u"""        if self.compression is not None and 'compression' not in already_processed:
+            already_processed.add('compression')
+            outfile.write(' compression=%s' % (
+            self.gds_encode(self.gds_format_string(quote_attrib(self.compression), input_name='compression')),))
+"""
+
+_COMPRESSION_BUILD = u"""        value = find_attr_value_('compression', node)
+        if value is not None and 'compression' not in already_processed:
+            already_processed.add('compression')
+            self.compression = value
+"""
+
+
+def _insert_before(text, anchor, insertion):
+    """Insert ``insertion`` in ``text`` before the blank line preceding the first ``anchor``"""
+    index = text.index(anchor)
+    return text[:index] + insertion + text[index:]
+
+
+def add_compression(source):
+    """Add the optional attribute ``compression`` to the classes in :py:data:`ENCODED_SEQUENCE_CLASSES` in
+    ``source``; as for the other optional attributes it is only written when it is not ``None``"""
+    for name in ENCODED_SEQUENCE_CLASSES:
+        start = source.find(u'\nclass {}('.format(name))
+        if start < 0:
+            continue
+        end = source.find(u'\nclass ', start + 1)
+        end = len(source) if end < 0 else end
+        text = source[start:end]
+        if u'compression=None' in text:
+            continue
+        old, new = _COMPRESSION_PARAMETER
+        text = text.replace(old, new, 1)
+        text = _insert_before(text, u'\n    def factory(', _COMPRESSION_CONSTRUCTOR)
+        text = _insert_before(text, u'\n    def validate_mode_type(', _COMPRESSION_ACCESSORS)
+        text = _insert_before(text, u'\n    def exportChildren(', _COMPRESSION_EXPORT)
+        text = _insert_before(text, u'\n    def buildChildren(', _COMPRESSION_BUILD)
+        source = source[:start] + text + source[end:]
+    return source
+
+
+def postgenerate(source):
+    """Make every change to the generated module ``source``"""
+    return skip_private_attributes(add_bit_mode(add_slots(add_compression(source))))
+
+
+def main(args=None):
+    """Make every change to each generated module named in ``args`` in place"""
+    if args is None:
+        args = sys.argv[1:]
+    if not args:
+        print(u"usage: python -m sfftkrw.schema.postgenerate <generated module> [...]", file=sys.stderr)
+        return 64
+    for fn in args:
+        with io.open(fn, u'r', encoding=u'utf-8') as f:
+            source = f.read()
+        changed = postgenerate(source)
+        if changed != source:
+            with io.open(fn, u'w', encoding=u'utf-8') as f:
+                f.write(changed)
+            print(u"{}: changed".format(fn))
+        else:
+            print(u"{}: unchanged".format(fn))
+    return 0
+
+
+if __name__ == u'__main__':
+    sys.exit(main())
@@ -170,6 +170,11 @@ except ImportError as exp:
 
     class GeneratedsSuper(object):
         __hash__ = object.__hash__
+        # every attribute set in the generated constructors has a slot (see sfftkrw.schema.postgenerate); `__dict__`
+        # is only created for others
+        __slots__ = (
+            'gds_collector_', 'gds_elementtree_node_', 'original_tagname_', 'parent_object_', 'ns_prefix_', '__dict__'
+        )
         tzoff_pattern = re_.compile(r'(\+|-)((0\d|1[0-3]):[0-5]\d|14:00)$')
 
         class _FixedOffsetTZ(datetime_.tzinfo):
@@ -663,14 +668,26 @@ except ImportError as exp:
 
         def __eq__(self, other):
             def excl_select_objs_(obj):
+                # names with a leading underscore are caches kept by the adapters
                 return (obj[0] != 'parent_object_' and
-                        obj[0] != 'gds_collector_')
+                        obj[0] != 'gds_collector_' and
+                        not obj[0].startswith('_'))
 
             if type(self) != type(other):
                 return False
             return all(x == y for x, y in zip_longest(
-                filter(excl_select_objs_, self.__dict__.items()),
-                filter(excl_select_objs_, other.__dict__.items())))
+                filter(excl_select_objs_, self.gds_state_()),
+                filter(excl_select_objs_, other.gds_state_())))
+
+        def gds_state_(self):
+            """All (name, value) pairs set on the instance: slots (base class first) then `__dict__`"""
+            state = []
+            for class_ in reversed(type(self).__mro__):
+                for name in class_.__dict__.get('__slots__', ()):
+                    if name != '__dict__' and hasattr(self, name):
+                        state.append((name, getattr(self, name)))
+            state.extend(getattr(self, '__dict__', {}).items())
+            return state
 
         def __ne__(self, other):
             return not self.__eq__(other)
@@ -776,6 +793,13 @@ def quote_xml_aux(inStr):
     return s1
 
 
+def quote_payload(inStr):
+    "Quote a base64 payload for an element or a double-quoted attribute; buffers (bytes, bytearray or memoryview) have no markup chars."
+    if not isinstance(inStr, BaseStrType_) and isinstance(inStr, (bytes, bytearray, memoryview)):
+        return str(inStr, 'ascii')
+    return quote_xml(inStr).replace('"', '&quot;')
+
+
 def quote_attrib(inStr):
     s1 = (isinstance(inStr, BaseStrType_) and inStr or '%s' % inStr)
     s1 = s1.replace('&', '&amp;')
@@ -1064,6 +1088,7 @@ class mode_type(Enum):
     UINT_64 = 'uint64'
     FLOAT_32 = 'float32'
     FLOAT_64 = 'float64'
+    BIT = 'bit'
 
 
 class primary_descriptorType(Enum):
@@ -1235,6 +1260,13 @@ class segmentation(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = (
+        'schema_version', 'schema_version_nsprefix_', 'version', 'version_nsprefix_', 'name', 'name_nsprefix_',
+        'software_list', 'software_list_nsprefix_', 'transform_list', 'transform_list_nsprefix_', 'primary_descriptor',
+        'primary_descriptor_nsprefix_', 'bounding_box', 'bounding_box_nsprefix_', 'global_external_references',
+        'global_external_references_nsprefix_', 'segment_list', 'segment_list_nsprefix_', 'lattice_list',
+        'lattice_list_nsprefix_', 'details', 'details_nsprefix_'
+    )
 
     def __init__(self, schema_version='0.8.0.dev1', version=None, name=None, software_list=None, transform_list=None,
                  primary_descriptor=None, bounding_box=None, global_external_references=None, segment_list=None,
@@ -1567,6 +1599,10 @@ class software_type(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = (
+        'id', 'id_nsprefix_', 'name', 'name_nsprefix_', 'version', 'version_nsprefix_', 'processing_details',
+        'processing_details_nsprefix_'
+    )
 
     def __init__(self, id=None, name=None, version=None, processing_details=None, gds_collector_=None, **kwargs_):
         self.gds_collector_ = gds_collector_
@@ -1744,6 +1780,7 @@ class transformation_matrix_type(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = ('id', 'id_nsprefix_', 'rows', 'rows_nsprefix_', 'cols', 'cols_nsprefix_', 'data', 'data_nsprefix_')
 
     def __init__(self, id=None, rows=None, cols=None, data=None, gds_collector_=None, **kwargs_):
         self.gds_collector_ = gds_collector_
@@ -1864,9 +1901,10 @@ class transformation_matrix_type(GeneratedsSuper):
         if self.data is not None:
             namespaceprefix_ = self.data_nsprefix_ + ':' if (UseCapturedNS_ and self.data_nsprefix_) else ''
             showIndent(outfile, level, pretty_print)
-            outfile.write('<%sdata>%s</%sdata>%s' % (
-            namespaceprefix_, self.gds_encode(self.gds_format_string(quote_xml(self.data), input_name='data')),
-            namespaceprefix_, eol_))
+            # write the (possibly very large) payload on its own to avoid copying it into the element
+            outfile.write('<%sdata>' % (namespaceprefix_,))
+            outfile.write(self.gds_encode(self.gds_format_string(quote_payload(self.data), input_name='data')))
+            outfile.write('</%sdata>%s' % (namespaceprefix_, eol_))
 
     def build(self, node, gds_collector_=None):
         self.gds_collector_ = gds_collector_
@@ -1920,6 +1958,10 @@ class bounding_box_type(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = (
+        'xmin', 'xmin_nsprefix_', 'xmax', 'xmax_nsprefix_', 'ymin', 'ymin_nsprefix_', 'ymax', 'ymax_nsprefix_', 'zmin',
+        'zmin_nsprefix_', 'zmax', 'zmax_nsprefix_'
+    )
 
     def __init__(self, xmin='0', xmax=None, ymin='0', ymax=None, zmin='0', zmax=None, gds_collector_=None, **kwargs_):
         self.gds_collector_ = gds_collector_
@@ -2130,6 +2172,11 @@ class segment_type(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = (
+        'id', 'id_nsprefix_', 'parent_id', 'parent_id_nsprefix_', 'biological_annotation',
+        'biological_annotation_nsprefix_', 'colour', 'colour_nsprefix_', 'three_d_volume', 'three_d_volume_nsprefix_',
+        'shape_primitive_list', 'shape_primitive_list_nsprefix_', 'mesh_list', 'mesh_list_nsprefix_'
+    )
 
     def __init__(self, id=None, parent_id=None, biological_annotation=None, colour=None, three_d_volume=None,
                  shape_primitive_list=None, mesh_list=None, gds_collector_=None, **kwargs_):
@@ -2350,6 +2397,7 @@ class biomolecule_type(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = ('id', 'id_nsprefix_', 'valueOf_')
 
     def __init__(self, id=None, valueOf_=None, gds_collector_=None, **kwargs_):
         self.gds_collector_ = gds_collector_
@@ -2467,6 +2515,9 @@ class three_d_volume_type(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = (
+        'lattice_id', 'lattice_id_nsprefix_', 'value', 'value_nsprefix_', 'transform_id', 'transform_id_nsprefix_'
+    )
 
     def __init__(self, lattice_id=None, value=None, transform_id=None, gds_collector_=None, **kwargs_):
         self.gds_collector_ = gds_collector_
@@ -2629,6 +2680,10 @@ class lattice_type(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = (
+        'id', 'id_nsprefix_', 'mode', 'mode_nsprefix_', 'endianness', 'endianness_nsprefix_', 'size', 'size_nsprefix_',
+        'start', 'start_nsprefix_', 'data', 'data_nsprefix_'
+    )
 
     def __init__(self, id=None, mode=None, endianness='little', size=None, start=None, data=None, gds_collector_=None,
                  **kwargs_):
@@ -2719,7 +2774,7 @@ class lattice_type(GeneratedsSuper):
                 return False
             value = value
             enumerations = ['int8', 'uint8', 'int16', 'uint16', 'int32', 'uint32', 'int64', 'uint64', 'float32',
-                            'float64']
+                            'float64', 'bit']
             if value not in enumerations:
                 lineno = self.gds_get_node_lineno_()
                 self.gds_collector_.add_message(
@@ -2818,9 +2873,10 @@ class lattice_type(GeneratedsSuper):
         if self.data is not None:
             namespaceprefix_ = self.data_nsprefix_ + ':' if (UseCapturedNS_ and self.data_nsprefix_) else ''
             showIndent(outfile, level, pretty_print)
-            outfile.write('<%sdata>%s</%sdata>%s' % (
-            namespaceprefix_, self.gds_encode(self.gds_format_string(quote_xml(self.data), input_name='data')),
-            namespaceprefix_, eol_))
+            # write the (possibly very large) payload on its own to avoid copying it into the element
+            outfile.write('<%sdata>' % (namespaceprefix_,))
+            outfile.write(self.gds_encode(self.gds_format_string(quote_payload(self.data), input_name='data')))
+            outfile.write('</%sdata>%s' % (namespaceprefix_, eol_))
 
     def build(self, node, gds_collector_=None):
         self.gds_collector_ = gds_collector_
@@ -2884,6 +2940,10 @@ class mesh_type(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = (
+        'id', 'id_nsprefix_', 'vertices', 'vertices_nsprefix_', 'normals', 'normals_nsprefix_', 'triangles',
+        'triangles_nsprefix_', 'transform_id', 'transform_id_nsprefix_'
+    )
 
     def __init__(self, id=None, vertices=None, normals=None, triangles=None, transform_id=None, gds_collector_=None,
                  **kwargs_):
@@ -3076,9 +3136,13 @@ class vertices_type(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = (
+        'num_vertices', 'num_vertices_nsprefix_', 'mode', 'mode_nsprefix_', 'endianness', 'endianness_nsprefix_',
+        'data', 'data_nsprefix_', 'compression', 'compression_nsprefix_'
+    )
 
-    def __init__(self, num_vertices=None, mode='float32', endianness='little', data=None, gds_collector_=None,
-                 **kwargs_):
+    def __init__(self, num_vertices=None, mode='float32', endianness='little', data=None, compression=None,
+                 gds_collector_=None, **kwargs_):
         self.gds_collector_ = gds_collector_
         self.gds_elementtree_node_ = None
         self.original_tagname_ = None
@@ -3092,6 +3156,8 @@ class vertices_type(GeneratedsSuper):
         self.endianness_nsprefix_ = None
         self.data = _cast(None, data)
         self.data_nsprefix_ = None
+        self.compression = _cast(None, compression)
+        self.compression_nsprefix_ = None
 
     def factory(*args_, **kwargs_):
         if CurrentSubclassModule_ is not None:
@@ -3136,6 +3202,12 @@ class vertices_type(GeneratedsSuper):
     def set_data(self, data):
         self.data = data
 
+    def get_compression(self):
+        return self.compression
+
+    def set_compression(self, compression):
+        self.compression = compression
+
     def validate_mode_type(self, value):
         # Validate type mode_type, a restriction on xs:string.
         if value is not None and Validate_simpletypes_ and self.gds_collector_ is not None:
@@ -3219,8 +3291,14 @@ class vertices_type(GeneratedsSuper):
             self.gds_encode(self.gds_format_string(quote_attrib(self.endianness), input_name='endianness')),))
         if self.data is not None and 'data' not in already_processed:
             already_processed.add('data')
-            outfile.write(
-                ' data=%s' % (self.gds_encode(self.gds_format_string(quote_attrib(self.data), input_name='data')),))
+            # write the (possibly very large) payload on its own to avoid copying it into the attribute
+            outfile.write(' data="')
+            outfile.write(self.gds_encode(self.gds_format_string(quote_payload(self.data), input_name='data')))
+            outfile.write('"')
+        if self.compression is not None and 'compression' not in already_processed:
+            already_processed.add('compression')
+            outfile.write(' compression=%s' % (
+            self.gds_encode(self.gds_format_string(quote_attrib(self.compression), input_name='compression')),))
 
     def exportChildren(self, outfile, level, namespaceprefix_='', namespacedef_='', name_='vertices_type',
                        fromsubclass_=False, pretty_print=True):
@@ -3259,6 +3337,10 @@ class vertices_type(GeneratedsSuper):
         if value is not None and 'data' not in already_processed:
             already_processed.add('data')
             self.data = value
+        value = find_attr_value_('compression', node)
+        if value is not None and 'compression' not in already_processed:
+            already_processed.add('compression')
+            self.compression = value
 
     def buildChildren(self, child_, node, nodeName_, fromsubclass_=False, gds_collector_=None):
         pass
@@ -3275,9 +3357,13 @@ class normals_type(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = (
+        'num_normals', 'num_normals_nsprefix_', 'mode', 'mode_nsprefix_', 'endianness', 'endianness_nsprefix_', 'data',
+        'data_nsprefix_', 'compression', 'compression_nsprefix_'
+    )
 
-    def __init__(self, num_normals=None, mode='float32', endianness='little', data=None, gds_collector_=None,
-                 **kwargs_):
+    def __init__(self, num_normals=None, mode='float32', endianness='little', data=None, compression=None,
+                 gds_collector_=None, **kwargs_):
         self.gds_collector_ = gds_collector_
         self.gds_elementtree_node_ = None
         self.original_tagname_ = None
@@ -3291,6 +3377,8 @@ class normals_type(GeneratedsSuper):
         self.endianness_nsprefix_ = None
         self.data = _cast(None, data)
         self.data_nsprefix_ = None
+        self.compression = _cast(None, compression)
+        self.compression_nsprefix_ = None
 
     def factory(*args_, **kwargs_):
         if CurrentSubclassModule_ is not None:
@@ -3335,6 +3423,12 @@ class normals_type(GeneratedsSuper):
     def set_data(self, data):
         self.data = data
 
+    def get_compression(self):
+        return self.compression
+
+    def set_compression(self, compression):
+        self.compression = compression
+
     def validate_mode_type(self, value):
         # Validate type mode_type, a restriction on xs:string.
         if value is not None and Validate_simpletypes_ and self.gds_collector_ is not None:
@@ -3418,8 +3512,14 @@ class normals_type(GeneratedsSuper):
             self.gds_encode(self.gds_format_string(quote_attrib(self.endianness), input_name='endianness')),))
         if self.data is not None and 'data' not in already_processed:
             already_processed.add('data')
-            outfile.write(
-                ' data=%s' % (self.gds_encode(self.gds_format_string(quote_attrib(self.data), input_name='data')),))
+            # write the (possibly very large) payload on its own to avoid copying it into the attribute
+            outfile.write(' data="')
+            outfile.write(self.gds_encode(self.gds_format_string(quote_payload(self.data), input_name='data')))
+            outfile.write('"')
+        if self.compression is not None and 'compression' not in already_processed:
+            already_processed.add('compression')
+            outfile.write(' compression=%s' % (
+            self.gds_encode(self.gds_format_string(quote_attrib(self.compression), input_name='compression')),))
 
     def exportChildren(self, outfile, level, namespaceprefix_='', namespacedef_='', name_='normals_type',
                        fromsubclass_=False, pretty_print=True):
@@ -3458,6 +3558,10 @@ class normals_type(GeneratedsSuper):
         if value is not None and 'data' not in already_processed:
             already_processed.add('data')
             self.data = value
+        value = find_attr_value_('compression', node)
+        if value is not None and 'compression' not in already_processed:
+            already_processed.add('compression')
+            self.compression = value
 
     def buildChildren(self, child_, node, nodeName_, fromsubclass_=False, gds_collector_=None):
         pass
@@ -3474,9 +3578,13 @@ class triangles_type(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = (
+        'num_triangles', 'num_triangles_nsprefix_', 'mode', 'mode_nsprefix_', 'endianness', 'endianness_nsprefix_',
+        'data', 'data_nsprefix_', 'compression', 'compression_nsprefix_'
+    )
 
-    def __init__(self, num_triangles=None, mode='uint32', endianness='little', data=None, gds_collector_=None,
-                 **kwargs_):
+    def __init__(self, num_triangles=None, mode='uint32', endianness='little', data=None, compression=None,
+                 gds_collector_=None, **kwargs_):
         self.gds_collector_ = gds_collector_
         self.gds_elementtree_node_ = None
         self.original_tagname_ = None
@@ -3490,6 +3598,8 @@ class triangles_type(GeneratedsSuper):
         self.endianness_nsprefix_ = None
         self.data = _cast(None, data)
         self.data_nsprefix_ = None
+        self.compression = _cast(None, compression)
+        self.compression_nsprefix_ = None
 
     def factory(*args_, **kwargs_):
         if CurrentSubclassModule_ is not None:
@@ -3534,6 +3644,12 @@ class triangles_type(GeneratedsSuper):
     def set_data(self, data):
         self.data = data
 
+    def get_compression(self):
+        return self.compression
+
+    def set_compression(self, compression):
+        self.compression = compression
+
     def validate_mode_type(self, value):
         # Validate type mode_type, a restriction on xs:string.
         if value is not None and Validate_simpletypes_ and self.gds_collector_ is not None:
@@ -3618,8 +3734,14 @@ class triangles_type(GeneratedsSuper):
             self.gds_encode(self.gds_format_string(quote_attrib(self.endianness), input_name='endianness')),))
         if self.data is not None and 'data' not in already_processed:
             already_processed.add('data')
-            outfile.write(
-                ' data=%s' % (self.gds_encode(self.gds_format_string(quote_attrib(self.data), input_name='data')),))
+            # write the (possibly very large) payload on its own to avoid copying it into the attribute
+            outfile.write(' data="')
+            outfile.write(self.gds_encode(self.gds_format_string(quote_payload(self.data), input_name='data')))
+            outfile.write('"')
+        if self.compression is not None and 'compression' not in already_processed:
+            already_processed.add('compression')
+            outfile.write(' compression=%s' % (
+            self.gds_encode(self.gds_format_string(quote_attrib(self.compression), input_name='compression')),))
 
     def exportChildren(self, outfile, level, namespaceprefix_='', namespacedef_='', name_='triangles_type',
                        fromsubclass_=False, pretty_print=True):
@@ -3658,6 +3780,10 @@ class triangles_type(GeneratedsSuper):
         if value is not None and 'data' not in already_processed:
             already_processed.add('data')
             self.data = value
+        value = find_attr_value_('compression', node)
+        if value is not None and 'compression' not in already_processed:
+            already_processed.add('compression')
+            self.compression = value
 
     def buildChildren(self, child_, node, nodeName_, fromsubclass_=False, gds_collector_=None):
         pass
@@ -3670,6 +3796,9 @@ class rgba_type(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = (
+        'red', 'red_nsprefix_', 'green', 'green_nsprefix_', 'blue', 'blue_nsprefix_', 'alpha', 'alpha_nsprefix_'
+    )
 
     def __init__(self, red=None, green=None, blue=None, alpha=1.0, gds_collector_=None, **kwargs_):
         self.gds_collector_ = gds_collector_
@@ -3880,6 +4009,7 @@ class float_vector_type(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = ('x', 'x_nsprefix_', 'y', 'y_nsprefix_', 'z', 'z_nsprefix_')
 
     def __init__(self, x=None, y=None, z=None, gds_collector_=None, **kwargs_):
         self.gds_collector_ = gds_collector_
@@ -4019,6 +4149,10 @@ class external_reference_type(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = (
+        'id', 'id_nsprefix_', 'resource', 'resource_nsprefix_', 'url', 'url_nsprefix_', 'accession',
+        'accession_nsprefix_', 'label', 'label_nsprefix_', 'description', 'description_nsprefix_'
+    )
 
     def __init__(self, id=None, resource=None, url=None, accession=None, label=None, description=None,
                  gds_collector_=None, **kwargs_):
@@ -4208,6 +4342,7 @@ class volume_structure_type(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = ('cols', 'cols_nsprefix_', 'rows', 'rows_nsprefix_', 'sections', 'sections_nsprefix_')
 
     def __init__(self, cols=None, rows=None, sections=None, gds_collector_=None, **kwargs_):
         self.gds_collector_ = gds_collector_
@@ -4369,6 +4504,7 @@ class volume_index_type(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = ('cols', 'cols_nsprefix_', 'rows', 'rows_nsprefix_', 'sections', 'sections_nsprefix_')
 
     def __init__(self, cols=None, rows=None, sections=None, gds_collector_=None, **kwargs_):
         self.gds_collector_ = gds_collector_
@@ -4524,6 +4660,7 @@ class shape_primitive(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = ()
 
     def __init__(self, gds_collector_=None, **kwargs_):
         self.gds_collector_ = gds_collector_
@@ -4617,6 +4754,10 @@ class cuboid(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = (
+        'id', 'id_nsprefix_', 'x', 'x_nsprefix_', 'y', 'y_nsprefix_', 'z', 'z_nsprefix_', 'transform_id',
+        'transform_id_nsprefix_', 'attribute', 'attribute_nsprefix_'
+    )
 
     def __init__(self, id=None, x=None, y=None, z=None, transform_id=None, attribute=None, gds_collector_=None,
                  **kwargs_):
@@ -4859,6 +5000,10 @@ class ellipsoid(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = (
+        'id', 'id_nsprefix_', 'x', 'x_nsprefix_', 'y', 'y_nsprefix_', 'z', 'z_nsprefix_', 'transform_id',
+        'transform_id_nsprefix_', 'attribute', 'attribute_nsprefix_'
+    )
 
     def __init__(self, id=None, x=None, y=None, z=None, transform_id=None, attribute=None, gds_collector_=None,
                  **kwargs_):
@@ -5100,6 +5245,10 @@ class cylinder(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = (
+        'id', 'id_nsprefix_', 'height', 'height_nsprefix_', 'diameter', 'diameter_nsprefix_', 'transform_id',
+        'transform_id_nsprefix_', 'attribute', 'attribute_nsprefix_'
+    )
 
     def __init__(self, id=None, height=None, diameter=None, transform_id=None, attribute=None, gds_collector_=None,
                  **kwargs_):
@@ -5318,6 +5467,10 @@ class cone(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = (
+        'id', 'id_nsprefix_', 'height', 'height_nsprefix_', 'bottom_radius', 'bottom_radius_nsprefix_', 'transform_id',
+        'transform_id_nsprefix_', 'attribute', 'attribute_nsprefix_'
+    )
 
     def __init__(self, id=None, height=None, bottom_radius=None, transform_id=None, attribute=None, gds_collector_=None,
                  **kwargs_):
@@ -5538,6 +5691,7 @@ class transform(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = ()
 
     def __init__(self, gds_collector_=None, **kwargs_):
         self.gds_collector_ = gds_collector_
@@ -5630,6 +5784,7 @@ class vertex_list_type(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = ('num_vertices', 'num_vertices_nsprefix_', 'v', 'v_nsprefix_')
 
     def __init__(self, num_vertices=None, v=None, gds_collector_=None, **kwargs_):
         self.gds_collector_ = gds_collector_
@@ -5769,6 +5924,7 @@ class triangle_list_type(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = ('num_triangles', 'num_triangles_nsprefix_', 'P', 'P_nsprefix_')
 
     def __init__(self, num_triangles=None, P=None, gds_collector_=None, **kwargs_):
         self.gds_collector_ = gds_collector_
@@ -5909,6 +6065,10 @@ class vertex_type(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = (
+        'id', 'id_nsprefix_', 'designation', 'designation_nsprefix_', 'x', 'x_nsprefix_', 'y', 'y_nsprefix_', 'z',
+        'z_nsprefix_'
+    )
 
     def __init__(self, id=None, designation='surface', x=None, y=None, z=None, gds_collector_=None, **kwargs_):
         self.gds_collector_ = gds_collector_
@@ -6094,6 +6254,7 @@ class triangle_type(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = ('id', 'id_nsprefix_', 'v', 'v_nsprefix_')
 
     def __init__(self, id=None, v=None, gds_collector_=None, **kwargs_):
         self.gds_collector_ = gds_collector_
@@ -6239,6 +6400,7 @@ class complexes_and_macromolecules_type(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = ('macromolecule_list', 'macromolecule_list_nsprefix_', 'complex_list', 'complex_list_nsprefix_')
 
     def __init__(self, macromolecule_list=None, complex_list=None, gds_collector_=None, **kwargs_):
         self.gds_collector_ = gds_collector_
@@ -6374,6 +6536,10 @@ class oldThreeDVolumeType(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = (
+        'id', 'id_nsprefix_', 'file', 'file_nsprefix_', 'objectPath', 'objectPath_nsprefix_', 'contourLevel',
+        'contourLevel_nsprefix_', 'transformId', 'transformId_nsprefix_', 'format', 'format_nsprefix_'
+    )
 
     def __init__(self, id=None, file=None, objectPath=None, contourLevel=None, transformId=None, format=None,
                  gds_collector_=None, **kwargs_):
@@ -6617,6 +6783,7 @@ class meshPointType(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = ('index', 'index_nsprefix_', 'designation', 'designation_nsprefix_', 'point', 'point_nsprefix_')
 
     def __init__(self, index=None, designation=None, point=None, gds_collector_=None, **kwargs_):
         self.gds_collector_ = gds_collector_
@@ -6772,6 +6939,7 @@ class hsvType(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = ('hue', 'hue_nsprefix_', 'saturation', 'saturation_nsprefix_', 'value', 'value_nsprefix_')
 
     def __init__(self, hue=None, saturation=None, value=None, gds_collector_=None, **kwargs_):
         self.gds_collector_ = gds_collector_
@@ -6927,6 +7095,7 @@ class runLengthEncodingType(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = ('string', 'string_nsprefix_', 'offset', 'offset_nsprefix_', 'boxSize', 'boxSize_nsprefix_')
 
     def __init__(self, string=None, offset=None, boxSize=None, gds_collector_=None, **kwargs_):
         self.gds_collector_ = gds_collector_
@@ -7106,6 +7275,7 @@ class integerVectorType(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = ('x', 'x_nsprefix_', 'y', 'y_nsprefix_', 'z', 'z_nsprefix_')
 
     def __init__(self, x=None, y=None, z=None, gds_collector_=None, **kwargs_):
         self.gds_collector_ = gds_collector_
@@ -7261,6 +7431,7 @@ class positiveIntegerVectorType(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = ('x', 'x_nsprefix_', 'y', 'y_nsprefix_', 'z', 'z_nsprefix_')
 
     def __init__(self, x=None, y=None, z=None, gds_collector_=None, **kwargs_):
         self.gds_collector_ = gds_collector_
@@ -7427,6 +7598,7 @@ class colourType(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = ('name', 'name_nsprefix_', 'rgba', 'rgba_nsprefix_')
 
     def __init__(self, name=None, rgba=None, gds_collector_=None, **kwargs_):
         self.gds_collector_ = gds_collector_
@@ -7564,6 +7736,7 @@ class contourType(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = ('id', 'id_nsprefix_', 'p', 'p_nsprefix_')
 
     def __init__(self, id=None, p=None, gds_collector_=None, **kwargs_):
         self.gds_collector_ = gds_collector_
@@ -7702,6 +7875,7 @@ class viewVectorRotationType(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = ('id', 'id_nsprefix_', 'x', 'x_nsprefix_', 'y', 'y_nsprefix_', 'z', 'z_nsprefix_', 'r', 'r_nsprefix_')
 
     def __init__(self, id=None, x=None, y=None, z=None, r=None, gds_collector_=None, **kwargs_):
         self.gds_collector_ = gds_collector_
@@ -7922,6 +8096,7 @@ class canonicalEulerAnglesType(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = ('id', 'id_nsprefix_', 'phi', 'phi_nsprefix_', 'theta', 'theta_nsprefix_', 'psi', 'psi_nsprefix_')
 
     def __init__(self, id=None, phi=None, theta=None, psi=None, gds_collector_=None, **kwargs_):
         self.gds_collector_ = gds_collector_
@@ -8126,6 +8301,7 @@ class software_listType(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = ('software', 'software_nsprefix_')
 
     def __init__(self, software=None, gds_collector_=None, **kwargs_):
         self.gds_collector_ = gds_collector_
@@ -8253,6 +8429,7 @@ class transform_listType(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = ('transformation_matrix', 'transformation_matrix_nsprefix_')
 
     def __init__(self, transformation_matrix=None, gds_collector_=None, **kwargs_):
         self.gds_collector_ = gds_collector_
@@ -8379,6 +8556,7 @@ class global_external_referencesType(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = ('ref', 'ref_nsprefix_')
 
     def __init__(self, ref=None, gds_collector_=None, **kwargs_):
         self.gds_collector_ = gds_collector_
@@ -8505,6 +8683,7 @@ class segment_listType(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = ('segment', 'segment_nsprefix_')
 
     def __init__(self, segment=None, gds_collector_=None, **kwargs_):
         self.gds_collector_ = gds_collector_
@@ -8630,6 +8809,7 @@ class lattice_listType(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = ('lattice', 'lattice_nsprefix_')
 
     def __init__(self, lattice=None, gds_collector_=None, **kwargs_):
         self.gds_collector_ = gds_collector_
@@ -8755,6 +8935,10 @@ class biological_annotationType(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = (
+        'name', 'name_nsprefix_', 'description', 'description_nsprefix_', 'external_references',
+        'external_references_nsprefix_', 'number_of_instances', 'number_of_instances_nsprefix_'
+    )
 
     def __init__(self, name=None, description=None, external_references=None, number_of_instances=None,
                  gds_collector_=None, **kwargs_):
@@ -8937,6 +9121,7 @@ class external_referencesType(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = ('ref', 'ref_nsprefix_')
 
     def __init__(self, ref=None, gds_collector_=None, **kwargs_):
         self.gds_collector_ = gds_collector_
@@ -9061,6 +9246,7 @@ class shape_primitive_listType(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = ('shape_primitive', 'shape_primitive_nsprefix_')
 
     def __init__(self, shape_primitive=None, gds_collector_=None, **kwargs_):
         self.gds_collector_ = gds_collector_
@@ -9213,6 +9399,7 @@ class mesh_listType(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = ('mesh', 'mesh_nsprefix_')
 
     def __init__(self, mesh=None, gds_collector_=None, **kwargs_):
         self.gds_collector_ = gds_collector_
@@ -9336,6 +9523,7 @@ class macromolecule_listType(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = ('macromolecule', 'macromolecule_nsprefix_')
 
     def __init__(self, macromolecule=None, gds_collector_=None, **kwargs_):
         self.gds_collector_ = gds_collector_
@@ -9462,6 +9650,7 @@ class complex_listType(GeneratedsSuper):
     __hash__ = GeneratedsSuper.__hash__
     subclass = None
     superclass = None
+    __slots__ = ('complex', 'complex_nsprefix_')
 
     def __init__(self, complex=None, gds_collector_=None, **kwargs_):
         self.gds_collector_ = gds_collector_
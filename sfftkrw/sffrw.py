@@ -9,12 +9,13 @@ sfftkrw.sffrw is the main entry point for performing command-line operations.
 from __future__ import division, print_function
 
 import importlib
+import json
+import os
 import re
 import sys
 
-from .core import _decode
 from .core.print_tools import print_date
-from .core.utils import get_version
+from .core.utils import get_summary, get_version
 
 __author__ = "Paul K. Korir, PhD"
 __email__ = "pkorir@ebi.ac.uk, paul.korir@gmail.com"
@@ -26,47 +27,80 @@ def handle_convert(args):  # @UnusedVariable
     """
     Handle `convert` subcommand
 
+    Conversions go through the conversion cache when ``--cache-dir`` is given (see
+    :py:meth:`sfftkrw.core.cache.ConversionCache.convert`).
+
     :param args: parsed arguments
     :type args: `argparse.Namespace`
     :param configs: configurations object
     :type configs: ``sfftk.core.configs.Configs``
     :return int status: status
     """
-    schema_version = get_version(args.from_file)
-    if args.verbose:
+    if getattr(args, u'cache_dir', None) is not None:
+        from .core.cache import ConversionCache
+        cache = ConversionCache(args.cache_dir, max_size=args.cache_size * 2 ** 20, hardlink=args.cache_hardlink)
+        return cache.convert(args.from_file, args.output, args)
+    return convert_file(args.from_file, args.output, args)
+
+
+def convert_file(from_file, output, args=None):
+    """Convert ``from_file`` to ``output`` applying the conversion options in ``args``
+
+    :param str from_file: the input file
+    :param str output: the output file; the extension determines the output format
+    :param args: parsed arguments (conversion options)
+    :type args: `argparse.Namespace`
+    :return int status: status
+    """
+    verbose = getattr(args, u'verbose', False)
+    schema_version = get_version(from_file)
+    if verbose:
         print_date(u"Using schema version {}".format(schema_version))
     adapter_name = 'sfftkrw.schema.adapter_v{schema_version}'.format(
         schema_version=schema_version.replace('.', '_')
     )
     adapter = importlib.import_module(adapter_name)
-    if re.match(r'.*\.(sff|xml)$', args.from_file, re.IGNORECASE):
-        if args.verbose:
-            print_date("Converting from EMDB-SFF (XML) file {}".format(args.from_file))
-        seg = adapter.SFFSegmentation.from_file(args.from_file, args)
-    elif re.match(r'.*\.(hff|h5|hdf5)$', args.from_file, re.IGNORECASE):
-        if args.verbose:
-            print_date("Converting from EMDB-SFF (HDF5) file {}".format(args.from_file))
-        seg = adapter.SFFSegmentation.from_file(args.from_file, args)
-        if args.verbose:
+    if re.match(r'.*\.(sff|xml)$', from_file, re.IGNORECASE):
+        if verbose:
+            print_date("Converting from EMDB-SFF (XML) file {}".format(from_file))
+        seg = adapter.SFFSegmentation.from_file(from_file, args)
+    elif re.match(r'.*\.(hff|h5|hdf5)$', from_file, re.IGNORECASE):
+        if verbose:
+            print_date("Converting from EMDB-SFF (HDF5) file {}".format(from_file))
+        seg = adapter.SFFSegmentation.from_file(from_file, args)
+        if verbose:
             print_date("Created SFFSegmentation object")
-    elif re.match(r'.*\.json$', args.from_file, re.IGNORECASE):
-        if args.verbose:
-            print_date("Converting from EMDB-SFF (JSON) file {}".format(args.from_file))
-        seg = adapter.SFFSegmentation.from_file(args.from_file, args)
-        if args.verbose:
+    elif re.match(r'.*\.json$', from_file, re.IGNORECASE):
+        if verbose:
+            print_date("Converting from EMDB-SFF (JSON) file {}".format(from_file))
+        seg = adapter.SFFSegmentation.from_file(from_file, args)
+        if verbose:
+            print_date("Created SFFSegmentation object")
+    elif re.match(r'.*\.sffz$', from_file, re.IGNORECASE):
+        if verbose:
+            print_date("Converting from EMDB-SFF (SFFZ) container {}".format(from_file))
+        seg = adapter.SFFSegmentation.from_file(from_file, args)
+        if verbose:
             print_date("Created SFFSegmentation object")
     else:
-        raise ValueError("Unknown file type %s" % args.from_file)
-    if args.primary_descriptor is not None:
+        raise ValueError("Unknown file type %s" % from_file)
+    if getattr(args, u'primary_descriptor', None) is not None:
         seg.primary_descriptor = args.primary_descriptor
-    if args.details is not None:
+    if getattr(args, u'details', None) is not None:
         seg.details = args.details
+    if getattr(args, u'intern_transforms', False):
+        if hasattr(seg, u'intern_transforms'):
+            mapping = seg.intern_transforms(tolerance=getattr(args, u'transform_tolerance', 0.0))
+            if verbose:
+                print_date("Removed {} duplicate transformation matrices".format(len(mapping)))
+        else:
+            print_date("Ignoring --intern-transforms for EMDB-SFF v{}".format(schema_version))
     # export as args.format
-    if args.verbose:
-        print_date("Exporting to {}".format(args.output))
+    if verbose:
+        print_date("Exporting to {}".format(output))
     # perform actual export
-    status = seg.export(args.output, args)
-    if args.verbose:
+    status = seg.export(output, args)
+    if verbose:
         if status == 0:
             print_date("Done")
         else:
@@ -83,45 +117,173 @@ def handle_view(args):  # @UnusedVariable
     :type configs: ``sfftk.core.configs.Configs``
     :return int status: status
     """
-    schema_version = get_version(args.from_file)
+    if args.batch:
+        return _view_batch(args)
+    summary = get_summary(args.from_file)
+    if summary[u'version'] is None:
+        print_date(u"Not an EMDB-SFF file: {}".format(args.from_file))
+        return 65
     if args.verbose:
-        print_date(u"Using schema version {}".format(schema_version))
-    adapter_name = 'sfftkrw.schema.adapter_v{schema_version}'.format(
-        schema_version=schema_version.replace('.', '_')
+        print_date(u"Using schema version {}".format(summary[u'version']))
+    print(u"*" * 50)
+    print(u"EMDB-SFF Segmentation version {}".format(summary[u'version']))
+    print(u"Segmentation name: {}".format(summary[u'name']))
+    print(u"Format: {}".format(summary[u'format']))
+    print(u"Primary descriptor: {}".format(summary[u'primary_descriptor']))
+    print(u"No. of segments: {}".format(summary[u'segments']))
+    print(u"*" * 50)
+    return 0
+
+
+def handle_validate(args):
+    """Handle `validate` subcommand
+
+    :param args: parsed arguments
+    :type args: `argparse.Namespace`
+    :return int status: 0 if all files are valid; 74 if any could not be read; 65 otherwise
+    """
+    from . import SUPPORTED_EMDB_SFF_VERSIONS
+    status = 0
+    for fn in args.from_file:
+        try:
+            schema_version = get_version(fn)
+        except (IOError, OSError) as error:
+            print_date(u"Unable to read {}: {}".format(fn, error))
+            status = max(status, 74)
+            continue
+        except (ValueError, KeyError, IndexError, SyntaxError):
+            schema_version = None
+        if schema_version not in SUPPORTED_EMDB_SFF_VERSIONS:
+            print(u"{}: invalid".format(fn))
+            status = max(status, 65)
+            continue
+        if args.verbose:
+            print_date(u"Using schema version {} for {}".format(schema_version, fn))
+        adapter = importlib.import_module(u'sfftkrw.schema.adapter_v{schema_version}'.format(
+            schema_version=schema_version.replace(u'.', u'_')
+        ))
+        seg = adapter.SFFSegmentation.from_file(fn)
+        if seg._is_valid():
+            print(u"{}: valid".format(fn))
+        else:
+            print(u"{}: invalid".format(fn))
+            status = max(status, 65)
+    return status
+
+
+def _view_batch(args):
+    """Write a CSV summary of every EMDB-SFF file in the directory `args.from_file` to standard output
+
+    :param args: parsed arguments
+    :type args: `argparse.Namespace`
+    :return int status: status
+    """
+    import csv
+    from .core.utils import SUMMARY_FIELDS, batch_summary
+    writer = csv.DictWriter(sys.stdout, fieldnames=SUMMARY_FIELDS)
+    writer.writeheader()
+    count = 0
+    for row in batch_summary(args.from_file, workers=args.workers):
+        writer.writerow(row)
+        count += 1
+    if args.verbose:
+        print_date(u"Summarised {} files in {}".format(count, args.from_file))
+    return 0
+
+
+def handle_upgrade(args):
+    """Handle `upgrade` subcommand
+
+    :param args: parsed arguments
+    :type args: `argparse.Namespace`
+    :return int status: status
+    """
+    from .core.upgrade import upgrade
+    if args.verbose:
+        print_date(u"Upgrading {} to {}...".format(args.from_file, args.output))
+    status = upgrade(args.from_file, args.output, args=args)
+    if args.verbose and status == 0:
+        print_date(u"Done")
+    return status
+
+
+def handle_bench(args):
+    """Handle `bench` subcommand
+
+    :param args: parsed arguments
+    :type args: `argparse.Namespace`
+    :return int status: status
+    """
+    from .core.bench import run_benchmarks
+
+    def _progress(result):
+        print_date(u"{} size={}: {:.6f} s; {} bytes peak".format(
+            u" ".join(filter(None, [result[u'benchmark'], result[u'variant']])), result[u'size'], result[u'seconds'],
+            result[u'peak_bytes']
+        ))
+
+    report = run_benchmarks(
+        sizes=args.sizes, repeats=args.repeats, benchmarks=args.benchmarks,
+        callback=_progress if args.verbose else None
     )
-    adapter = importlib.import_module(adapter_name)
-    if re.match(r'.*\.(sff|xml)$', args.from_file, re.IGNORECASE):
-        seg = adapter.SFFSegmentation.from_file(args.from_file, args)
-        print("*" * 50)
-        print(u"EMDB-SFF Segmentation version {}".format(_decode(seg.version, u'utf-8')))
-        print(u"Segmentation name: {}".format(_decode(seg.name, u'utf-8')))
-        print(u"Format: XML")
-        print(u"Primary descriptor: {}".format(_decode(seg.primary_descriptor, u'utf-8')))
-        print(u"No. of segments: {}".format(len(seg.segments)))
-        print(u"*" * 50)
-    elif re.match(r'.*\.(hff|h5|hdf5)$', args.from_file, re.IGNORECASE):
-        seg = adapter.SFFSegmentation.from_file(args.from_file, args)
-        print("*" * 50)
-        print(u"EMDB-SFF Segmentation version {}".format(_decode(seg.version, u'utf-8')))
-        print(u"Segmentation name: {}".format(_decode(seg.name, u'utf-8')))
-        print(u"Format: HDF5")
-        print(u"Primary descriptor: {}".format(_decode(seg.primary_descriptor, u'utf-8')))
-        print(u"No. of segments: {}".format(len(seg.segments)))
-        print(u"*" * 50)
-    elif re.match(r'.*\.json$', args.from_file, re.IGNORECASE):
-        seg = adapter.SFFSegmentation.from_file(args.from_file, args)
-        print("*" * 50)
-        print(u"EMDB-SFF Segmentation version {}".format(_decode(seg.version, u'utf-8')))
-        print(u"Segmentation name: {}".format(_decode(seg.name, u'utf-8')))
-        print(u"Format: JSON")
-        print(u"Primary descriptor: {}".format(_decode(seg.primary_descriptor, u'utf-8')))
-        print(u"No. of segments: {}".format(len(seg.segments)))
-        print(u"*" * 50)
+    if args.output is None:
+        json.dump(report, sys.stdout, indent=2)
+        print()
     else:
-        print(u"Not implemented view for files of type .{}".format(args.from_file.split('.')[-1]), file=sys.stderr)
+        with open(args.output, u'w') as f:
+            json.dump(report, f, indent=2)
+        if args.verbose:
+            print_date(u"Wrote {} results to {}".format(len(report[u'results']), args.output))
     return 0
 
 
+def handle_generate(args):
+    """Handle `generate` subcommand
+
+    :param args: parsed arguments
+    :type args: `argparse.Namespace`
+    :return int status: status
+    """
+    from .core.generate import SegmentationGenerator
+    generator = SegmentationGenerator(
+        segments=args.segments, external_references=args.external_references, lattices=args.lattices,
+        lattice_shape=args.lattice_shape, lattice_mode=args.lattice_mode, sparsity=args.sparsity,
+        meshes=args.meshes, vertices=args.vertices, triangles=args.triangles, shapes=args.shapes, seed=args.seed,
+    )
+    if args.verbose:
+        print_date(u"Writing {!r} to {}...".format(generator, args.output))
+    status = generator.write(args.output, args=args)
+    if args.verbose and status == 0:
+        print_date(u"Wrote {} bytes".format(os.path.getsize(args.output)))
+    return status
+
+
+def handle_serve(args):
+    """Handle `serve` subcommand
+
+    :param args: parsed arguments
+    :type args: `argparse.Namespace`
+    :return int status: status
+    """
+    from .core.serve import serve
+    return serve(args.socket, workers=args.workers, verbose=args.verbose)
+
+
+def handle_client(args, argv):
+    """Run a `convert`, `view` or `validate` on the server named by `--server`
+
+    :param args: parsed arguments
+    :type args: `argparse.Namespace`
+    :param list argv: the unparsed arguments which are sent to the server
+    :return int status: status
+    """
+    from .core.serve import submit
+    response = submit(argv, socket_path=args.server)
+    sys.stdout.write(response[u'stdout'])
+    sys.stderr.write(response[u'stderr'])
+    return response[u'status']
+
+
 def _module_test_runner(mod, args):
     """Module test runner 
     
@@ -210,13 +372,26 @@ def main():
             return 64
         elif args == 0:  # e.g. show version has no error but has no handler either
             return 0
+        # thin client
+        if getattr(args, 'server', None) is not None:
+            return handle_client(args, sys.argv[1:])
         # subcommands
         if args.subcommand == 'convert':
             return handle_convert(args)
         elif args.subcommand == "view":
             return handle_view(args)
+        elif args.subcommand == "validate":
+            return handle_validate(args)
         elif args.subcommand == "tests":
             return handle_tests(args)
+        elif args.subcommand == "serve":
+            return handle_serve(args)
+        elif args.subcommand == "upgrade":
+            return handle_upgrade(args)
+        elif args.subcommand == "bench":
+            return handle_bench(args)
+        elif args.subcommand == "generate":
+            return handle_generate(args)
 
     except KeyboardInterrupt:
         ### handle keyboard interrupt ###
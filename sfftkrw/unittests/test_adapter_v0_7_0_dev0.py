@@ -16,6 +16,7 @@ import unittest
 
 import h5py
 import numpy
+from lxml import etree
 from random_words import RandomWords, LoremIpsum
 
 rw = RandomWords()
@@ -1940,6 +1941,55 @@ class TestSFFMesh(Py23FixTestCase):
         self.assertEqual(m.vertices, self.vertices)
         self.assertEqual(m.polygons, self.polygons)
 
+    def test_arrays(self):
+        """Test reading meshes into arrays from memory, HDF5 and XML"""
+        # four vertices (IDs 10-13) each followed by its normal (IDs 20-23)
+        points = numpy.random.rand(8, 3).astype(numpy.float32)
+        _vertices = emdb_sff.vertexListType(v=[
+            emdb_sff.vertexType(vID=vID, designation=designation, x=float(x), y=float(y), z=float(z))
+            for vID, designation, (x, y, z) in zip(
+                [10, 20, 11, 21, 12, 22, 13, 23], [u'surface', u'normal'] * 4, points
+            )
+        ])
+        # a quad (with normals) and a triangle
+        _polygons = emdb_sff.polygonListType(P=[
+            emdb_sff.polygonType(PID=0, v=[10, 20, 11, 21, 12, 22, 13, 23]),
+            emdb_sff.polygonType(PID=1, v=[13, 12, 11]),
+        ])
+        mesh = adapter.SFFMesh.from_gds_type(emdb_sff.meshType(id=0, vertexList=_vertices, polygonList=_polygons))
+        vertices, normals, triangles = mesh.as_arrays()
+        self.assertTrue(numpy.allclose(vertices, points[::2]))
+        self.assertTrue(numpy.allclose(normals, points[1::2]))
+        self.assertEqual(triangles.tolist(), [[0, 1, 2], [0, 2, 3], [3, 2, 1]])
+        # from files
+        segmentation = adapter.SFFSegmentation(name=u'meshes', version=EMDB_SFF_VERSION,
+                                               primaryDescriptor=u'meshList')
+        segmentation.segments = adapter.SFFSegmentList()
+        segment = adapter.SFFSegment(colour=adapter.SFFRGBA(random_colour=True))
+        segment.meshes = adapter.SFFMeshList()
+        segment.meshes.append(mesh)
+        segmentation.segments.append(segment)
+        segmentation.lattices = adapter.SFFLatticeList()
+        with tempfile.NamedTemporaryFile(suffix=u'.hff') as f:
+            segmentation.export(f.name)
+            with h5py.File(f.name, u'r') as h:
+                arrays = adapter.SFFMesh.arrays_from_hff(h[u'segments/1/meshes/0'])
+        for array, expected in zip(arrays, (vertices, normals, triangles)):
+            self.assertTrue(numpy.allclose(array, expected))
+        with tempfile.NamedTemporaryFile(suffix=u'.sff') as f:
+            segmentation.export(f.name)
+            element = etree.parse(f.name).find(u'segmentList/segment/meshList/mesh')
+            arrays = adapter.SFFMesh.arrays_from_xml(element)
+        for array, expected in zip(arrays, (vertices, normals, triangles)):
+            self.assertTrue(numpy.allclose(array, expected, atol=1e-6))
+        # unequal numbers of vertices and normals: no normals
+        _vertices.v.append(emdb_sff.vertexType(vID=24, designation=u'normal', x=0.0, y=0.0, z=1.0))
+        self.assertIsNone(mesh.as_arrays()[1])
+        # polygons referring to missing vertices
+        _polygons.P[1].v.append(99)
+        with self.assertRaises(ValueError):
+            mesh.as_arrays()
+
 
 class TestSFFMeshList(Py23FixTestCase):
     """Test the SFFMeshList class"""
@@ -1,13 +1,22 @@
 # -*- coding: utf-8 -*-
 from __future__ import print_function
 
+import argparse
+import asyncio
+import base64
 import importlib
+import io
 import json
 import os
 import random
 import re
+import shutil
 import sys
 import tempfile
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
 
 import h5py
 import numpy
@@ -788,6 +797,130 @@ class TestSFFGlobalExternalReferenceList(Py23FixTestCase):
             self.assertEqual(G, G2)
 
 
+class TestSFFAnnotationIndex(Py23FixTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.segmentation = adapter.SFFSegmentation(name=u'test', primary_descriptor=u'shape_primitive_list')
+        cls.segmentation.global_external_references = adapter.SFFGlobalExternalReferenceList()
+        cls.segmentation.global_external_references.append(
+            adapter.SFFExternalReference(resource=u'go', url=u'url', accession=u'GO:0005739')
+        )
+        segment_list = adapter.SFFSegmentList()
+        for i in _xrange(1, 11):
+            external_references = adapter.SFFExternalReferenceList()
+            external_references.append(adapter.SFFExternalReference(
+                resource=u'go', url=u'url', accession=u'GO:0005739' if i % 3 == 0 else u'GO:{:07d}'.format(i)
+            ))
+            if i % 2 == 0:
+                external_references.append(adapter.SFFExternalReference(
+                    resource=u'uniprot', url=u'url', accession=u'P{:05d}'.format(i), label=u'protein'
+                ))
+            segment_list.append(adapter.SFFSegment(
+                id=i, biological_annotation=adapter.SFFBiologicalAnnotation(external_references=external_references)
+            ))
+        segment_list.append(adapter.SFFSegment(id=11))  # no annotation
+        cls.segmentation.segment_list = segment_list
+
+    @classmethod
+    def tearDownClass(cls):
+        adapter.SFFExternalReference.reset_id()
+        adapter.SFFSegment.reset_id()
+
+    def test_create(self):
+        """Test that the index has all external references"""
+        index = self.segmentation.annotation_index
+        self.assertIsInstance(index, adapter.SFFAnnotationIndex)
+        self.assertEqual(len(index), 16)
+        self.assertEqual(index.segment_id[0], -1)  # global
+        self.assertEqual(index.row(0)[u'accession'], u'GO:0005739')
+        self.assertIsNone(index.row(0)[u'segment_id'])
+        self.assertIsNone(index.row(0)[u'label'])
+        # strings are shared between columns and rows
+        self.assertEqual(len(index.strings), len(set(index.strings)))
+        self.assertEqual(index.strings.count(u'url'), 1)
+        self.assertEqual(index.data[u'accession'].dtype, numpy.int32)
+        # empty
+        index = adapter.SFFSegmentation().annotation_index
+        self.assertEqual(len(index), 0)
+        self.assertEqual(len(index.segment_ids(accession=u'GO:0005739')), 0)
+
+    def test_query(self):
+        """Test vectorised queries agree with nested loops"""
+        index = self.segmentation.annotation_index
+        expected = [
+            segment.id for segment in self.segmentation.segment_list if segment.biological_annotation is not None and
+            any(extref.accession == u'GO:0005739' for extref in segment.biological_annotation.external_references)
+        ]
+        self.assertEqual(index.segment_ids(accession=u'GO:0005739'), expected)
+        self.assertEqual(index.segment_ids(resource=u'uniprot'), [2, 4, 6, 8, 10])
+        self.assertEqual(index.segment_ids(accession=[u'GO:0005739', u'P00002']), [2, 3, 6, 9])
+        self.assertEqual(index.segment_ids(accession=u'GO:0005739', segment_id=[3, 4, 6]), [3, 6])
+        self.assertEqual(index.segment_ids(label=None, resource=u'uniprot'), [])
+        self.assertEqual(index.segment_ids(accession=u'unknown'), [])
+        self.assertEqual(int(numpy.sum(index.mask(accession=u'GO:0005739'))), 4)  # includes global
+        with self.assertRaises(TypeError):
+            index.mask(colour=u'red')
+
+    def test_views(self):
+        """Test that rows give the original external references"""
+        index = self.segmentation.annotation_index
+        extrefs = index.select(resource=u'uniprot', segment_id=4)
+        self.assertEqual(len(extrefs), 1)
+        self.assertIsInstance(extrefs[0], adapter.SFFExternalReference)
+        self.assertEqual(extrefs[0].accession, u'P00004')
+        self.assertIsInstance(index.external_references(4), adapter.SFFExternalReferenceList)
+        self.assertEqual(len(index.external_references(4)), 2)
+        with self.assertRaises(KeyError):
+            index.external_references(11)
+        # changes go to the segmentation
+        extrefs[0].label = u'changed'
+        segment = self.segmentation.segment_list.get_by_id(4)
+        self.assertEqual(segment.biological_annotation.external_references[1].label, u'changed')
+        extrefs[0].label = u'protein'
+
+    def test_rebuild(self):
+        """Test that queries reflect changes to the annotation"""
+        segmentation = adapter.SFFSegmentation(name=u'test', primary_descriptor=u'shape_primitive_list')
+        segmentation.global_external_references = adapter.SFFGlobalExternalReferenceList()
+        segment_list = adapter.SFFSegmentList()
+        for i in _xrange(1, 4):
+            external_references = adapter.SFFExternalReferenceList()
+            external_references.append(adapter.SFFExternalReference(resource=u'go', accession=u'GO:{:07d}'.format(i)))
+            segment_list.append(adapter.SFFSegment(
+                id=i, biological_annotation=adapter.SFFBiologicalAnnotation(external_references=external_references)
+            ))
+        segmentation.segment_list = segment_list
+        index = segmentation.annotation_index
+        self.assertEqual(len(index), 3)
+        self.assertIs(segmentation.annotation_index, index)
+        segmentation.copy_annotation(1, 3)
+        self.assertEqual(len(index), 4)
+        self.assertEqual(index.segment_ids(accession=u'GO:0000001'), [1, 3])
+        segmentation.clear_annotation(1)
+        self.assertEqual(index.segment_ids(accession=u'GO:0000001'), [3])
+        self.assertEqual(len(index.external_references(1)), 0)
+        segmentation.copy_annotation(2, -1)
+        self.assertEqual(index.segment_id.tolist(), [-1, 2, 3, 3])
+        # changes made any other way need a reset
+        segmentation.segment_list.get_by_id(2).biological_annotation.external_references.append(
+            adapter.SFFExternalReference(resource=u'omit', accession=u'OMIT:0000001')
+        )
+        self.assertEqual(index.segment_ids(resource=u'omit'), [])
+        segmentation.reset_annotation_index()
+        self.assertEqual(index.segment_ids(resource=u'omit'), [2])
+        self.assertEqual(index.row(2)[u'accession'], u'OMIT:0000001')  # after segment 2's first row
+        # merging replaces the annotation
+        other = adapter.SFFSegmentation(name=u'other', primary_descriptor=u'shape_primitive_list')
+        other.global_external_references = adapter.SFFGlobalExternalReferenceList()
+        other.segment_list = adapter.SFFSegmentList()
+        for i in _xrange(1, 4):
+            other.segment_list.append(adapter.SFFSegment(id=i, biological_annotation=adapter.SFFBiologicalAnnotation(
+                external_references=adapter.SFFExternalReferenceList()
+            )))
+        segmentation.merge_annotation(other)
+        self.assertEqual(len(index), 0)
+
+
 class TestSFFBiologicalAnnotation(Py23FixTestCase):
     def setUp(self):
         self.name = " ".join(rw.random_words(count=3))
@@ -1296,6 +1429,37 @@ class TestSFFLattice(Py23FixTestCase):
             r"""SFFLattice\(id=\d+, mode=".*", endianness=".*", size=SFFVolumeStructure\(.*\), start=SFFVolumeIndex\(.*\), data=".*"\)"""
         )
 
+    def test_create_classmethod_array_auto_mode(self):
+        """Test that `mode='auto'` picks the narrowest mode which holds the data without loss"""
+        # small labels fit in a uint8
+        data = numpy.random.randint(0, 256, size=(self.r, self.c, self.s))
+        l = adapter.SFFLattice.from_array(data, mode=u'auto', size=self.l_size)
+        self.assertEqual(l.mode, u'uint8')
+        self.assertEqual(l.data_array.flatten().tolist(), data.flatten().tolist())
+        # negative values
+        data = numpy.random.randint(-1000, 1000, size=(self.r, self.c, self.s))
+        data[0, 0, 0] = -1000
+        l = adapter.SFFLattice.from_array(data, mode=u'auto', size=self.l_size)
+        self.assertEqual(l.mode, u'int16')
+        self.assertEqual(l.data_array.flatten().tolist(), data.flatten().tolist())
+        # whole-valued floats are narrowed as integers
+        data = numpy.random.randint(0, 70000, size=(self.r, self.c, self.s)).astype(numpy.float32)
+        data[0, 0, 0] = 70000
+        l = adapter.SFFLattice.from_array(data, mode=u'auto', size=self.l_size)
+        self.assertEqual(l.mode, u'uint32')
+        self.assertEqual(l.data_array.flatten().tolist(), data.flatten().tolist())
+        # other floats keep their width
+        l = adapter.SFFLattice.from_array(self.l_data, mode=u'auto', size=self.l_size)
+        self.assertEqual(l.mode, u'float64')
+        self.assertEqual(l.data_array.flatten().tolist(), self.l_data.flatten().tolist())
+        l = adapter.SFFLattice.from_array(self.l_data.astype(numpy.float32), mode=u'auto', size=self.l_size)
+        self.assertEqual(l.mode, u'float32')
+        # nonsense dtypes
+        with self.assertRaises(base.SFFTypeError):
+            adapter.SFFLattice.from_array(
+                numpy.full((self.r, self.c, self.s), u'a'), mode=u'auto', size=self.l_size
+            )
+
     def test_create_classmethod_bytes(self):
         """Test that we can create an object using the classmethod"""
         l = adapter.SFFLattice.from_bytes(
@@ -1402,6 +1566,138 @@ class TestSFFLattice(Py23FixTestCase):
                 self.assertIsInstance(l2.id, int)
 
 
+    def test_codec_modes(self):
+        """Test that payloads are encoded from and decoded to arrays of the lattice's mode and endianness"""
+        array = numpy.random.randint(0, 200, size=(self.s, self.r, self.c))
+        for mode in [u'uint8', u'int16', u'uint32', u'float32']:
+            for endianness in [u'little', u'big']:
+                encoded = adapter.SFFLattice._encode(array, mode=mode, endianness=endianness)
+                binpack = zlib.decompress(base64.b64decode(encoded))
+                self.assertEqual(binpack, array.astype(u'{}{}'.format(
+                    adapter.ENDIANNESS[endianness], adapter.FORMAT_CHARS[mode])).tobytes())
+                decoded = adapter.SFFLattice._decode(encoded, self.l_size, mode=mode, endianness=endianness)
+                self.assertEqual(decoded.dtype, numpy.dtype(adapter.FORMAT_CHARS[mode]).newbyteorder(
+                    adapter.ENDIANNESS[endianness]))
+                self.assertEqual(decoded.shape, (self.s, self.r, self.c))
+                self.assertTrue(decoded.flags.writeable)
+                self.assertTrue(numpy.array_equal(decoded, array))
+        # payloads of the wrong size
+        with self.assertRaises(base.SFFValueError):
+            adapter.SFFLattice._decode(adapter.SFFLattice._encode(array, mode=u'uint8'), self.l_size, mode=u'uint16')
+        with self.assertRaises(base.SFFValueError):
+            adapter.SFFLattice._decode(adapter.SFFLattice._encode(array, mode=u'uint16'), self.l_size, mode=u'uint8')
+        # values which do not fit the mode
+        size = adapter.SFFVolumeStructure(cols=2, rows=1, sections=1)
+        for values, mode in [([-1, 3], u'uint8'), ([1, 300], u'uint8'), ([1.7, 3], u'int32'), ([1, 2 ** 31], u'int32'),
+                             ([numpy.nan, 1], u'uint16'), ([1.0, 1e300], u'float32')]:
+            array = numpy.array(values).reshape(1, 1, 2)
+            with self.assertRaises(base.SFFValueError):
+                adapter.SFFLattice._encode(array, mode=mode)
+            with self.assertRaises(base.SFFValueError):
+                adapter.SFFLattice.from_array(array, size=size, mode=mode)
+        # whole floats and narrower integers are cast; floating point modes only lose precision
+        for values, mode in [([1.0, 255.0], u'uint8'), ([-3, 7], u'int8'), ([0.1, 1e30], u'float32'),
+                             ([numpy.inf, 1], u'float32')]:
+            array = numpy.array(values).reshape(1, 1, 2)
+            decoded = adapter.SFFLattice._decode(adapter.SFFLattice._encode(array, mode=mode), size, mode=mode)
+            self.assertTrue(numpy.array_equal(decoded, array.astype(adapter.FORMAT_CHARS[mode])))
+
+    def test_bit_mode(self):
+        """Test that binary masks can be packed 8 voxels to the byte"""
+        mask = numpy.random.randint(0, 2, size=(self.r, self.c, self.s))
+        l = adapter.SFFLattice.from_array(mask, mode=u'bit', size=self.l_size)
+        self.assertEqual(l.mode, u'bit')
+        self.assertEqual(l.data_array.flatten().tolist(), mask.flatten().tolist())
+        # one bit per voxel before compression
+        binpack = zlib.decompress(base64.b64decode(l.data))
+        self.assertEqual(len(binpack), (self.r * self.c * self.s + 7) // 8)
+        # decoding from the encoded data
+        l2 = adapter.SFFLattice.from_bytes(l.data, self.l_size, mode=u'bit')
+        self.assertEqual(l2.data_array.flatten().tolist(), mask.flatten().tolist())
+        # boolean arrays
+        l3 = adapter.SFFLattice.from_array(mask.astype(bool), mode=u'bit', size=self.l_size)
+        self.assertEqual(l3.data, l.data)
+        # `auto` never picks bits, which other readers may not decode
+        l4 = adapter.SFFLattice.from_array(mask, mode=u'auto', size=self.l_size)
+        self.assertEqual(l4.mode, u'uint8')
+        self.assertEqual(adapter.SFFLattice.from_array(mask.astype(bool), mode=u'auto', size=self.l_size).mode,
+                         u'uint8')
+        # only 0s and 1s
+        mask[0, 0, 0] = 2
+        with self.assertRaises(base.SFFValueError):
+            adapter.SFFLattice.from_array(mask, mode=u'bit', size=self.l_size)
+
+    def test_bit_mode_serialisers(self):
+        """Test that bit-packed lattices survive all three formats"""
+        mask = numpy.random.randint(0, 2, size=(self.r, self.c, self.s))
+        segmentation = adapter.SFFSegmentation(
+            name=u'mask',
+            primary_descriptor=u'three_d_volume',
+            lattice_list=adapter.SFFLatticeList()
+        )
+        segmentation.lattice_list.append(adapter.SFFLattice.from_array(mask, mode=u'bit', size=self.l_size))
+        temp_file = tempfile.NamedTemporaryFile()
+        for ext in [u'sff', u'hff', u'json', u'sffz']:
+            fn = u'{}.{}'.format(temp_file.name, ext)
+            # an extension of the schema is only written when asked for
+            self.assertEqual(segmentation.export(fn), 65)
+            self.assertFalse(os.path.exists(fn))
+            args = argparse.Namespace(exclude_geometry=False, schema_extensions=True)
+            self.assertEqual(segmentation.export(fn, args=args), 0)
+            seg = adapter.SFFSegmentation.from_file(fn)
+            os.remove(fn)
+            lattice = seg.lattice_list[0]
+            self.assertEqual(lattice.mode, u'bit')
+            self.assertEqual(lattice.data_array.flatten().tolist(), mask.flatten().tolist())
+
+    def test_dirty_tracking(self):
+        """Test that the payload is only re-encoded once the array has changed"""
+        l = adapter.SFFLattice.from_bytes(
+            self.l_unicode, self.l_size, mode=self.l_mode, endianness=self.l_endian, start=self.l_start
+        )
+        # the array is kept with the `generateDS` object so every adapter sees the same array
+        array = l.data_array
+        self.assertIs(adapter.SFFLattice.from_gds_type(l._local).data_array, array)
+        segmentation = adapter.SFFSegmentation(
+            name=u'lattice', primary_descriptor=u'three_d_volume', lattice_list=adapter.SFFLatticeList()
+        )
+        segmentation.lattice_list.append(l)
+        fn = os.path.join(TEST_DATA_PATH, u'sff', u'v0.8', u'test_dirty_tracking.json')
+        with mock.patch.object(adapter.SFFLattice, u'_encode', wraps=adapter.SFFLattice._encode) as _encode:
+            with mock.patch.object(adapter, u'_payload_fingerprint', wraps=adapter._payload_fingerprint) as _crc:
+                self.assertEqual(l.data, self.l_unicode)
+                self.assertEqual(l.as_json()[u'data'], self.l_unicode)
+                self.assertEqual(repr(l), repr(l))
+                # reading the payload neither encodes nor looks for changes
+                self.assertEqual(_encode.call_count, 0)
+                self.assertEqual(_crc.call_count, 0)
+                # changes in place are found (once) on export
+                array[0, 0, 0] += 1
+                self.assertEqual(l.data, self.l_unicode)
+                segmentation.export(fn)
+                self.assertEqual(_crc.call_count, 2)  # the check and the fingerprint of the new payload
+            self.assertEqual(_encode.call_count, 1)
+            self.assertNotEqual(l.data, self.l_unicode)
+            self.assertTrue(numpy.array_equal(adapter.SFFSegmentation.from_file(fn).lattice_list[0].data_array, array))
+            os.remove(fn)
+            self.assertTrue(numpy.array_equal(
+                adapter.SFFLattice._decode(l.data, self.l_size, mode=self.l_mode, endianness=self.l_endian), array
+            ))
+            # clean again
+            l.data
+            self.assertEqual(_encode.call_count, 1)
+            # assignment
+            l.data_array = numpy.zeros_like(array)
+            self.assertEqual(l.data, adapter.SFFLattice._encode(
+                numpy.zeros_like(array), mode=self.l_mode, endianness=self.l_endian
+            ))
+        with self.assertRaises(base.SFFValueError):
+            l.data_array = numpy.zeros((self.s + 1, self.r, self.c))
+        # a new payload supersedes the array
+        l.data = self.l_unicode
+        self.assertTrue(numpy.array_equal(l.data_array.reshape(-1), self.l_data.reshape(-1)))
+
+
 class TestSFFLatticeList(Py23FixTestCase):
     """Test the SFFLatticeList class"""
 
@@ -1711,6 +2007,81 @@ class TestSFFVertices(Py23FixTestCase):
             )
         )
 
+    def test_compression(self):
+        """Test that vertices round-trip exactly through every compression"""
+        for compression in [u'zlib', u'shuffle+zlib', u'delta+zlib', u'delta+shuffle+zlib']:
+            for endianness in [u'little', u'big']:
+                v = adapter.SFFVertices.from_array(
+                    self.data, mode=u'float64', endianness=endianness, compression=compression
+                )
+                self.assertEqual(v.compression, compression)
+                v2 = adapter.SFFVertices.from_bytes(
+                    v.data, self.num_vertices, mode=u'float64', endianness=endianness, compression=compression
+                )
+                self.assertTrue(numpy.array_equal(v2.data_array, self.data))
+        # the default is no compression and the attribute is only written for compressed data
+        for compression in [None, u'']:
+            v = adapter.SFFVertices.from_array(self.data, compression=compression)
+            self.assertIsNone(v.compression)
+            xml = io.StringIO()
+            v._local.export(xml, 0)
+            self.assertNotIn(u'compression', xml.getvalue())
+            self.assertNotIn(u'compression', v.as_json())
+        xml = io.StringIO()
+        adapter.SFFVertices.from_array(self.data, compression=u'zlib')._local.export(xml, 0)
+        self.assertIn(u' compression="zlib"', xml.getvalue())
+        # invalid compressions
+        for compression in [u'gzip', u'shuffle', u'shuffle+delta+zlib', u'delta+delta+zlib']:
+            with self.assertRaises(base.SFFValueError):
+                adapter.SFFVertices.from_array(self.data, compression=compression)
+
+    def test_buffers(self):
+        """Test that payloads may be buffers from the codec to the writers"""
+        v = adapter.SFFVertices.from_bytes(self.unicode, self.num_vertices, mode=self.mode, endianness=self.endian)
+        for buffer in [self.unicode.encode(u'ascii'), bytearray(self.unicode, u'ascii'),
+                       memoryview(self.unicode.encode(u'ascii'))]:
+            v2 = adapter.SFFVertices.from_bytes(buffer, self.num_vertices, mode=self.mode, endianness=self.endian)
+            self.assertTrue(numpy.array_equal(v2.data_array, self.data))
+            # XML
+            xml, xml2 = io.StringIO(), io.StringIO()
+            v._local.export(xml, 0)
+            v2._local.export(xml2, 0)
+            self.assertEqual(xml.getvalue(), xml2.getvalue())
+            # JSON
+            self.assertEqual(v.as_json(), v2.as_json())
+            # HDF5
+            with h5py.File(self.test_hdf5_fn, u'w') as h:
+                v2.as_hff(h.create_group(u'container'))
+            with h5py.File(self.test_hdf5_fn, u'r') as h:
+                self.assertEqual(v, adapter.SFFVertices.from_hff(h[u'container']))
+
+    def test_dirty_tracking(self):
+        """Test that unchanged payloads are written out as they were read"""
+        v = adapter.SFFVertices.from_bytes(self.unicode, self.num_vertices, mode=self.mode, endianness=self.endian)
+        with mock.patch.object(adapter.SFFEncodedSequence, u'_encode', wraps=adapter.SFFEncodedSequence._encode) \
+                as _encode:
+            array = v.data_array
+            self.assertEqual(v.as_json()[u'data'], self.unicode)
+            with h5py.File(self.test_hdf5_fn, u'w') as h:
+                v.as_hff(h.create_group(u'container'), name=u'vertices')
+            self.assertEqual(_encode.call_count, 0)
+            array = array.copy()
+            array[0] = [1.0, 2.0, 3.0]
+            v.data_array = array
+            self.assertEqual(v.num_vertices, self.num_vertices)
+            with h5py.File(self.test_hdf5_fn, u'w') as h:
+                v.as_hff(h.create_group(u'container'), name=u'vertices')
+            self.assertEqual(_encode.call_count, 1)
+        with h5py.File(self.test_hdf5_fn, u'r') as h:
+            v2 = adapter.SFFVertices.from_hff(h[u'container'], name=u'vertices')
+        self.assertTrue(numpy.array_equal(v2.data_array, array))
+        # arrays passed in are kept in the mode of the payload
+        v = adapter.SFFVertices.from_array(numpy.random.rand(10, 3), mode=u'float32')
+        self.assertEqual(v.data_array.dtype, numpy.float32)
+        self.assertTrue(numpy.array_equal(v.data_array, adapter.SFFVertices._decode(v.data, mode=u'float32')))
+        with self.assertRaises(ValueError):
+            v.data_array = numpy.zeros((10, 2))
+
     def test_create_classmethod_bytes(self):
         """Test that we can create an object using the classmethod"""
         v = adapter.SFFVertices.from_bytes(
@@ -2107,6 +2478,17 @@ class TestSFFTriangles(Py23FixTestCase):
                 data=numpy.random.rand(self.num_triangles, 4)
             )
 
+    def test_values_out_of_range(self):
+        """Test that indices which do not fit the mode are rejected rather than wrapped"""
+        for data in [[[-1, 2, 3]], [[1, 2, 2 ** 32]], [[0.5, 2, 3]]]:
+            for compression in [None, u'delta+shuffle+zlib']:
+                with self.assertRaises(base.SFFValueError):
+                    adapter.SFFTriangles._encode(numpy.array(data), mode=u'uint32', compression=compression)
+            with self.assertRaises(base.SFFValueError):
+                adapter.SFFTriangles.from_array(numpy.array(data))
+        t = adapter.SFFTriangles.from_array(numpy.array([[0.0, 1.0, 2.0]]))
+        self.assertEqual(t.data_array.tolist(), [[0, 1, 2]])
+
     def test_create_init_bytes(self):
         """Test that we can create from bytes using __init__"""
         v = adapter.SFFTriangles(
@@ -2201,6 +2583,59 @@ class TestSFFTriangles(Py23FixTestCase):
             )
         )
 
+    def test_create_classmethod_array_auto_mode(self):
+        """Test that `mode='auto'` picks the narrowest mode for the indices"""
+        v = adapter.SFFTriangles.from_array(data=self.data, mode=u'auto')
+        self.assertEqual(v.mode, u'uint8')
+        self.assertEqual(v.data_array.flatten().tolist(), self.data.flatten().tolist())
+        data = numpy.random.randint(0, 100000, size=(self.num_triangles, 3))
+        data[0, 0] = 65536
+        v = adapter.SFFTriangles.from_array(data=data, mode=u'auto')
+        self.assertEqual(v.mode, u'uint32')
+        self.assertEqual(v.data_array.flatten().tolist(), data.flatten().tolist())
+        # survives a round trip
+        v2 = adapter.SFFTriangles.from_json(v.as_json())
+        self.assertEqual(v2.mode, u'uint32')
+        self.assertEqual(v2.data_array.flatten().tolist(), data.flatten().tolist())
+
+    def test_compression(self):
+        """Test that compressed triangles survive JSON, HDF5 and XML"""
+        t = adapter.SFFTriangles.from_array(self.data, mode=self.mode, compression=u'delta+shuffle+zlib')
+        self.assertTrue(numpy.array_equal(t.data_array, self.data))
+        # json
+        t_json = t.as_json()
+        self.assertEqual(t_json[u'compression'], u'delta+shuffle+zlib')
+        t2 = adapter.SFFTriangles.from_json(t_json)
+        self.assertEqual(t, t2)
+        self.assertTrue(numpy.array_equal(t2.data_array, self.data))
+        # hff
+        with h5py.File(self.test_hdf5_fn, u'w') as h:
+            group = h.create_group(u'container')
+            t.as_hff(group)
+        with h5py.File(self.test_hdf5_fn, u'r') as h:
+            t3 = adapter.SFFTriangles.from_hff(h[u'container'])
+        self.assertEqual(t, t3)
+        self.assertTrue(numpy.array_equal(t3.data_array, self.data))
+        # xml
+        vertices_data = numpy.random.rand(100, 3).astype(numpy.float32)
+        vertices = adapter.SFFVertices.from_array(vertices_data, compression=u'shuffle+zlib')
+        segmentation = adapter.SFFSegmentation(name=u'meshes', primary_descriptor=u'mesh_list')
+        segmentation.segment_list = adapter.SFFSegmentList()
+        segment = adapter.SFFSegment(mesh_list=adapter.SFFMeshList())
+        segment.mesh_list.append(adapter.SFFMesh(vertices=vertices, triangles=t))
+        segmentation.segment_list.append(segment)
+        temp_file = tempfile.NamedTemporaryFile()
+        segmentation.export(temp_file.name + u'.sff')
+        seg = adapter.SFFSegmentation.from_file(temp_file.name + u'.sff')
+        os.remove(temp_file.name + u'.sff')
+        mesh = seg.segment_list[0].mesh_list[0]
+        self.assertEqual(mesh.vertices.compression, u'shuffle+zlib')
+        self.assertTrue(numpy.array_equal(mesh.vertices.data_array, vertices_data))
+        self.assertEqual(mesh.triangles.compression, u'delta+shuffle+zlib')
+        self.assertTrue(numpy.array_equal(mesh.triangles.data_array, self.data))
+        adapter.SFFSegment.reset_id()
+        adapter.SFFMesh.reset_id()
+
     def test_create_classmethod_bytes(self):
         """Test that we can create an object using the classmethod"""
         v = adapter.SFFTriangles.from_bytes(
@@ -3584,6 +4019,109 @@ class TestSFFShapePrimitiveList(Py23FixTestCase):
             S2 = adapter.SFFShapePrimitiveList.from_hff(h[u'container'])
             self.assertEqual(S, S2)
 
+    def test_hff_tables(self):
+        """Interconvert to HDF5 with one table per kind of shape"""
+        args = argparse.Namespace(hff_layout=u'tables')
+        # empty
+        S = adapter.SFFShapePrimitiveList()
+        with h5py.File(self.test_hdf5_fn, u'w') as h:
+            group = S.as_hff(h.create_group(u'container'), args=args)
+            self.assertEqual(len(group[u'shape_primitive_list']), 0)
+        with h5py.File(self.test_hdf5_fn, u'r') as h:
+            self.assertEqual(S, adapter.SFFShapePrimitiveList.from_hff(h[u'container']))
+        # non-empty; shapes of different kinds are interleaved and some attributes are missing
+        S = adapter.SFFShapePrimitiveList()
+        for _ in _xrange(_random_integer(start=2, stop=10)):
+            S.append(adapter.SFFCone(height=_random_float(10), bottom_radius=_random_float(10), transform_id=0))
+            S.append(adapter.SFFCuboid(x=_random_float(10), y=_random_float(10), z=_random_float(10)))
+            S.append(adapter.SFFEllipsoid(
+                x=_random_float(10), y=_random_float(10), z=_random_float(10), transform_id=1, attribute=0.5
+            ))
+            S.append(adapter.SFFSubtomogramAverage(
+                lattice_id=_random_integer(), value=_random_float(10), transform_id=_random_integer()
+            ))
+        S.append(adapter.SFFCylinder(height=_random_float(10), diameter=_random_float(10), transform_id=2))
+        with h5py.File(self.test_hdf5_fn, u'w') as h:
+            group = S.as_hff(h.create_group(u'container'), args=args)
+            tables = group[u'shape_primitive_list']
+            self.assertEqual(_decode(tables.attrs[u'layout'], u'utf-8'), u'tables')
+            self.assertEqual(sorted(tables.keys()),
+                             [u'cone', u'cuboid', u'cylinder', u'ellipsoid', u'subtomogram_average'])
+            self.assertEqual(sum(len(table) for table in tables.values()), len(S))
+            self.assertTrue(numpy.isnan(tables[u'cuboid'][u'attribute']).all())
+            self.assertTrue((tables[u'cuboid'][u'transform_id'] == -1).all())
+        with h5py.File(self.test_hdf5_fn, u'r') as h:
+            S2 = adapter.SFFShapePrimitiveList.from_hff(h[u'container'])
+        self.assertEqual(S, S2)
+        self.assertEqual(list(S2.get_ids()), list(S.get_ids()))
+        self.assertIsInstance(S2[1], adapter.SFFCuboid)
+        self.assertIsNone(S2[1].transform_id)
+        self.assertIsNone(S2[1].attribute)
+        self.assertEqual(S2[2].attribute, 0.5)
+        self.assertEqual(S2[3].lattice_id, S[3].lattice_id)
+        # the table layout is only used when asked for
+        with h5py.File(self.test_hdf5_fn, u'w') as h:
+            group = S.as_hff(h.create_group(u'container'))
+            self.assertNotIn(u'layout', group[u'shape_primitive_list'].attrs)
+            self.assertEqual(len(group[u'shape_primitive_list']), len(S))
+        with self.assertRaises(base.SFFValueError):
+            with h5py.File(self.test_hdf5_fn, u'w') as h:
+                S.as_hff(h.create_group(u'container'), args=argparse.Namespace(hff_layout=u'rows'))
+
+
+    def test_arrays(self):
+        """Create from and convert to arrays"""
+        n = _random_integer(start=2, stop=10)
+        x, y, z = numpy.random.rand(3, n)
+        S = adapter.SFFShapePrimitiveList.from_arrays(u'ellipsoid', x=x, y=y, z=z, transform_id=numpy.arange(n))
+        self.assertEqual(len(S), n)
+        self.assertEqual(list(S.get_ids()), list(_xrange(n)))
+        self.assertIsInstance(S[0], adapter.SFFEllipsoid)
+        self.assertIsInstance(S.get_by_id(n - 1), adapter.SFFEllipsoid)
+        self.assertEqual(S[1].x, x[1])
+        self.assertEqual(S[1].transform_id, 1)
+        self.assertIsNone(S[1].attribute)
+        # the same as creating the shapes one by one
+        S2 = adapter.SFFShapePrimitiveList()
+        for i in _xrange(n):
+            S2.append(adapter.SFFEllipsoid(x=x[i], y=y[i], z=z[i], transform_id=i))
+        self.assertEqual(S, S2)
+        self.assertEqual(S.as_json(), S2.as_json())
+        # scalars are broadcast and IDs continue past those in the list
+        S.extend_arrays(u'subtomogram_average', lattice_id=0, value=[1.0, 2.0], transform_id=3)
+        self.assertEqual(len(S), n + 2)
+        self.assertEqual(S[-1].id, n + 1)
+        self.assertEqual(S[-1].value, 2.0)
+        self.assertEqual(S[-2].lattice_id, 0)
+        S.append(adapter.SFFCone(height=1.0, bottom_radius=2.0))
+        self.assertEqual(S[-1].id, n + 2)
+        # to arrays
+        arrays = S.to_arrays(u'ellipsoid')
+        self.assertEqual(sorted(arrays.keys()), [u'attribute', u'id', u'transform_id', u'x', u'y', u'z'])
+        self.assertTrue(numpy.array_equal(arrays[u'x'], x))
+        self.assertTrue(numpy.array_equal(arrays[u'id'], numpy.arange(n)))
+        self.assertTrue(numpy.isnan(arrays[u'attribute']).all())
+        arrays = S.to_arrays(u'cone')
+        self.assertEqual(arrays[u'transform_id'].tolist(), [-1])
+        self.assertEqual(len(S.to_arrays(u'cuboid')[u'id']), 0)
+        # round trip including IDs
+        S3 = adapter.SFFShapePrimitiveList.from_arrays(u'ellipsoid', **S.to_arrays(u'ellipsoid'))
+        self.assertEqual(S3.to_arrays(u'ellipsoid')[u'id'].tolist(), list(_xrange(n)))
+        self.assertEqual(S3, S2)
+        # errors
+        with self.assertRaises(base.SFFValueError):
+            adapter.SFFShapePrimitiveList.from_arrays(u'sphere', x=x)
+        with self.assertRaises(base.SFFValueError):
+            adapter.SFFShapePrimitiveList.from_arrays(u'ellipsoid', x=x, y=y)  # no z
+        with self.assertRaises(base.SFFValueError):
+            adapter.SFFShapePrimitiveList.from_arrays(u'ellipsoid', x=x, y=y, z=z, height=1.0)
+        with self.assertRaises(base.SFFValueError):
+            adapter.SFFShapePrimitiveList.from_arrays(u'ellipsoid', x=x, y=y, z=z, id=0)  # duplicate IDs
+        with self.assertRaises(base.SFFValueError):
+            S.extend_arrays(u'cone', height=1.0, bottom_radius=1.0, id=[0])  # already in the list
+        with self.assertRaises(ValueError):
+            adapter.SFFShapePrimitiveList.from_arrays(u'ellipsoid', x=x, y=numpy.ones(n + 1), z=z)
+
 
 class TestSFFSegment(Py23FixTestCase):
     """Test the SFFSegment class"""
@@ -4105,6 +4643,93 @@ class TestSFFSegmentList(Py23FixTestCase):
             S2 = adapter.SFFSegmentList.from_hff(h[u'container'])
             self.assertEqual(S, S2)
 
+    def test_hff_tables(self):
+        """Interconvert to HDF5 with all segments in a few tables"""
+        args = argparse.Namespace(hff_layout=u'tables')
+        # empty
+        S = adapter.SFFSegmentList()
+        with h5py.File(self.test_hdf5_fn, u'w') as h:
+            group = S.as_hff(h.create_group(u'container'), args=args)
+            self.assertEqual(len(group[u'segment_list/segments']), 0)
+        with h5py.File(self.test_hdf5_fn, u'r') as h:
+            self.assertEqual(S, adapter.SFFSegmentList.from_hff(h[u'container']))
+        # non-empty; some segments have no colour, annotation, meshes or shapes
+        S = adapter.SFFSegmentList()
+        for i in _xrange(_random_integer(start=3, stop=6)):
+            external_references = adapter.SFFExternalReferenceList()
+            [external_references.append(
+                adapter.SFFExternalReference(
+                    resource=rw.random_word(),
+                    url='https://{}.com/{}/{}'.format(*rw.random_words(count=3)),
+                    accession=rw.random_word(),
+                )
+            ) for _ in _xrange(_random_integer(start=1, stop=3))]
+            mesh_list = adapter.SFFMeshList()
+            mesh_list.append(
+                adapter.SFFMesh(
+                    vertices=adapter.SFFVertices.from_array(numpy.random.rand(4, 3)),
+                    normals=adapter.SFFNormals.from_array(numpy.random.rand(4, 3)),
+                    triangles=adapter.SFFTriangles.from_array(numpy.random.randint(0, 4, size=(4, 3))),
+                    transform_id=0,
+                )
+            )
+            shape_primitive_list = adapter.SFFShapePrimitiveList.from_arrays(
+                u'ellipsoid', x=numpy.random.rand(3), y=1.0, z=2.0, transform_id=0
+            )
+            shape_primitive_list.append(adapter.SFFCone(height=1.0, bottom_radius=_random_float(10)))
+            S.append(
+                adapter.SFFSegment(
+                    parent_id=i,
+                    colour=adapter.SFFRGBA(random_colour=True),
+                    biological_annotation=adapter.SFFBiologicalAnnotation(
+                        name=u'segment ✓ {}'.format(i),
+                        number_of_instances=_random_integer(start=1),
+                        external_references=external_references,
+                    ),
+                    mesh_list=mesh_list,
+                    shape_primitive_list=shape_primitive_list,
+                )
+            )
+            S.append(
+                adapter.SFFSegment(
+                    three_d_volume=adapter.SFFThreeDVolume(lattice_id=i, value=_random_float(10)),
+                )
+            )
+        with h5py.File(self.test_hdf5_fn, u'w') as h:
+            group = S.as_hff(h.create_group(u'container'), args=args)[u'segment_list']
+            self.assertEqual(_decode(group.attrs[u'layout'], u'utf-8'), u'tables')
+            self.assertEqual(len(group[u'segments']), len(S))
+            self.assertEqual(len(group[u'meshes']), len(S) // 2)
+            self.assertEqual(len(group[u'shapes/ellipsoid']), 3 * len(S) // 2)
+            self.assertEqual(len(group[u'shapes/cone']), len(S) // 2)
+            self.assertEqual(
+                len(group[u'external_references']),
+                sum(len(s.biological_annotation.external_references) for s in S if s.biological_annotation)
+            )
+        with h5py.File(self.test_hdf5_fn, u'r') as h:
+            S2 = adapter.SFFSegmentList.from_hff(h[u'container'])
+        self.assertEqual(S, S2)
+        self.assertEqual(list(S2.get_ids()), list(S.get_ids()))
+        self.assertIsNone(S2[1].colour)
+        self.assertIsNone(S2[1].biological_annotation)
+        self.assertEqual(S2[1].three_d_volume.value, S[1].three_d_volume.value)
+        self.assertEqual(S2[0].biological_annotation.name, S[0].biological_annotation.name)
+        self.assertTrue(numpy.array_equal(
+            S2[0].mesh_list[0].vertices.data_array, S[0].mesh_list[0].vertices.data_array
+        ))
+        self.assertEqual(S2[0].shape_primitive_list.to_arrays(u'ellipsoid')[u'x'].tolist(),
+                         S[0].shape_primitive_list.to_arrays(u'ellipsoid')[u'x'].tolist())
+        # the same segmentation as the 'groups' layout
+        for fn in [u'emd_1014.sff', u'emd_3791.sff']:
+            seg = adapter.SFFSegmentation.from_file(os.path.join(TEST_DATA_PATH, u'sff', u'v0.8', fn))
+            segment_lists = list()
+            for layout in [u'groups', u'tables']:
+                with h5py.File(self.test_hdf5_fn, u'w') as h:
+                    seg.segment_list.as_hff(h, args=argparse.Namespace(hff_layout=layout))
+                with h5py.File(self.test_hdf5_fn, u'r') as h:
+                    segment_lists.append(adapter.SFFSegmentList.from_hff(h))
+            self.assertEqual(segment_lists[0], segment_lists[1])
+
 
 class TestSFFSoftware(Py23FixTestCase):
     """Test the SFFSoftware class"""
@@ -4646,6 +5271,73 @@ class TestSFFTransformList(Py23FixTestCase):
             T2 = adapter.SFFTransformList.from_hff(h[u'container'])
             self.assertEqual(T, T2)
 
+    def test_array(self):
+        """Interconvert with an (N, rows, cols) array"""
+        A = numpy.random.rand(self.tx_count, self.rows, self.cols)
+        T = adapter.SFFTransformList.from_array(A)
+        self.assertEqual(len(T), self.tx_count)
+        self.assertEqual(list(T.get_ids()), list(_xrange(self.tx_count)))
+        # the same as adding matrices one at a time
+        T2 = adapter.SFFTransformList()
+        [T2.append(adapter.SFFTransformationMatrix.from_array(a)) for a in A]
+        self.assertEqual(T, T2)
+        self.assertEqual(T[1].data, T2[1].data)
+        self.assertTrue(numpy.array_equal(T[1].data_array, A[1]))
+        # parsed all at once
+        self.assertTrue(numpy.array_equal(T2.as_array(), A))
+        # cached on the underlying object so that repeat access (even via new adapters) is free
+        B = T2.as_array()
+        self.assertIs(adapter.SFFTransformList.from_gds_type(T2._local).as_array(), B)
+        self.assertFalse(B.flags.writeable)
+        # ...until the list changes
+        T2.append(adapter.SFFTransformationMatrix.from_array(numpy.ones((self.rows, self.cols))))
+        self.assertEqual(T2.as_array().shape, (self.tx_count + 1, self.rows, self.cols))
+        self.assertTrue(numpy.array_equal(T2.as_array()[-1], numpy.ones((self.rows, self.cols))))
+        T2[0].data_array = numpy.zeros((self.rows, self.cols))
+        self.assertTrue(numpy.array_equal(T2.as_array()[0], numpy.zeros((self.rows, self.cols))))
+        del T2[0]
+        self.assertTrue(numpy.array_equal(T2.as_array()[0], A[1]))
+        # the cache is not part of equality
+        _T = emdb_sff.transform_listType(transformation_matrix=T._local.transformation_matrix)
+        _T.original_tagname_ = T._local.original_tagname_
+        self.assertTrue(hasattr(T._local, u'_transform_array'))
+        self.assertEqual(T._local, _T)
+        # empty
+        self.assertEqual(adapter.SFFTransformList().as_array().shape, (0, 0, 0))
+        # errors
+        T2.append(adapter.SFFTransformationMatrix.from_array(numpy.ones((self.rows + 1, self.cols))))
+        with self.assertRaises(base.SFFValueError):
+            T2.as_array()
+        with self.assertRaises(base.SFFValueError):
+            adapter.SFFTransformList.from_array(A[0])
+
+    def test_intern(self):
+        """Remove duplicate matrices"""
+        identity, scale = numpy.eye(3, 4), numpy.eye(3, 4) * 2.5
+        T = adapter.SFFTransformList.from_array(numpy.stack([identity, scale, identity, identity + 1e-9, scale]))
+        T.append(adapter.SFFTransformationMatrix.from_array(numpy.eye(4)))  # a different shape
+        T.append(adapter.SFFTransformationMatrix.from_array(numpy.eye(4)))
+        self.assertEqual(T.intern(), {2: 0, 4: 1, 6: 5})
+        self.assertEqual(list(T.get_ids()), [0, 1, 3, 5])
+        self.assertEqual([tx.id for tx in T], [0, 1, 3, 5])
+        self.assertTrue(numpy.array_equal(T[1].data_array, scale))
+        # no more duplicates
+        self.assertEqual(T.intern(), {})
+        # within a tolerance
+        self.assertEqual(T.intern(tolerance=1e-6), {3: 0})
+        self.assertEqual([tx.id for tx in T], [0, 1, 5])
+        # values no more than the tolerance apart are merged wherever they fall relative to multiples of it...
+        T = adapter.SFFTransformList.from_array(numpy.stack([identity + 0.00049, identity + 0.00051]))
+        self.assertEqual(T.intern(tolerance=1e-3), {1: 0})
+        # ...but values further apart are not
+        T = adapter.SFFTransformList.from_array(numpy.stack([identity, identity + 0.0009, identity + 0.0018]))
+        self.assertEqual(T.intern(tolerance=1e-3), {1: 0})
+        self.assertEqual([tx.id for tx in T], [0, 2])
+        T = adapter.SFFTransformList.from_array(numpy.stack([identity + 0.0004, identity + 0.0015]))
+        self.assertEqual(T.intern(tolerance=1e-3), {})
+        with self.assertRaises(base.SFFValueError):
+            T.intern(tolerance=-1)
+
 
 class TestSFFSegmentation(Py23FixTestCase):
     @classmethod
@@ -5438,6 +6130,168 @@ class TestSFFSegmentation(Py23FixTestCase):
             find = f.readline().find(b'HDF')
             self.assertGreaterEqual(find, 0)
 
+    def test_hff_layout_version(self):
+        """Small values are attributes in HDF5 layout version 2 and both versions are readable"""
+        temp_dir = tempfile.mkdtemp()
+        try:
+            for fn in [u'emd_1547.sff', u'emd_3791.sff']:
+                segmentation = adapter.SFFSegmentation.from_file(os.path.join(TEST_DATA_PATH, u'sff', u'v0.8', fn))
+                segmentation.details = u'x' * (2 ** 14)  # too long for an attribute
+                segmentations = list()
+                for version in [1, 2]:
+                    hff_file = os.path.join(temp_dir, u'v{}.hff'.format(version))
+                    segmentation.export(hff_file, args=argparse.Namespace(hff_layout_version=version))
+                    with h5py.File(hff_file, u'r') as h:
+                        segment = h[u'segment_list/{}'.format(segmentation.segments[0].id)]
+                        if version == 1:
+                            self.assertNotIn(u'hff_layout_version', h.attrs)
+                            self.assertIn(u'version', h)
+                            self.assertEqual(len(segment.attrs), 0)
+                            self.assertIn(u'id', segment)
+                        else:
+                            self.assertEqual(h.attrs[u'hff_layout_version'], 2)
+                            self.assertNotIn(u'version', h)
+                            self.assertEqual(_decode(h.attrs[u'version'], u'utf-8'), segmentation.version)
+                            self.assertIn(u'details', h)
+                            self.assertEqual(segment.attrs[u'id'], segmentation.segments[0].id)
+                            self.assertEqual(tuple(segment.attrs[u'colour']), segmentation.segments[0].colour.value)
+                            self.assertNotIn(u'id', segment)
+                    segmentations.append(adapter.SFFSegmentation.from_file(hff_file))
+                self.assertEqual(segmentations[0], segmentations[1])
+                self.assertEqual(segmentations[1].details, segmentation.details)
+                self.assertEqual(segmentations[1].segments[0].colour, segmentation.segments[0].colour)
+            with self.assertRaises(base.SFFValueError):
+                segmentation.export(os.path.join(temp_dir, u'v3.hff'), args=argparse.Namespace(hff_layout_version=3))
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_read_hff_parallel(self):
+        """Read the segments and lattices of an HDF5 file in worker processes"""
+        args = argparse.Namespace(hff_workers=2)
+        temp_dir = tempfile.mkdtemp()
+        try:
+            for fn in [u'emd_1014.sff', u'emd_3791.sff']:
+                hff_file = os.path.join(temp_dir, fn.replace(u'.sff', u'.hff'))
+                adapter.SFFSegmentation.from_file(os.path.join(TEST_DATA_PATH, u'sff', u'v0.8', fn)).export(hff_file)
+                segmentation = adapter.SFFSegmentation.from_file(hff_file)
+                parallel_segmentation = adapter.SFFSegmentation.from_file(hff_file, args=args)
+                self.assertEqual(segmentation, parallel_segmentation)
+                self.assertEqual(list(parallel_segmentation.segment_list.get_ids()),
+                                 list(segmentation.segment_list.get_ids()))
+                self.assertEqual(len(parallel_segmentation.lattice_list), len(segmentation.lattice_list))
+                for lattice, parallel_lattice in zip(segmentation.lattice_list, parallel_segmentation.lattice_list):
+                    self.assertTrue(numpy.array_equal(lattice.data_array, parallel_lattice.data_array))
+                # files read into memory are read in this process
+                with open(hff_file, u'rb') as f:
+                    with h5py.File(io.BytesIO(f.read()), u'r') as h:
+                        self.assertEqual(segmentation, adapter.SFFSegmentation.from_hff(h, args=args))
+            with self.assertRaises(base.SFFValueError):
+                adapter.SFFSegmentation.from_file(hff_file, args=argparse.Namespace(hff_workers=-1))
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_sffz(self):
+        """Write and read SFFZ containers with memory-mapped arrays"""
+        temp_dir = tempfile.mkdtemp()
+        try:
+            for fn in [u'emd_1547.sff', u'emd_3791.sff']:
+                segmentation = adapter.SFFSegmentation.from_file(os.path.join(TEST_DATA_PATH, u'sff', u'v0.8', fn))
+                sffz_file = os.path.join(temp_dir, fn.replace(u'.sff', u'.sffz'))
+                self.assertEqual(segmentation.export(sffz_file), 0)
+                sffz_segmentation = adapter.SFFSegmentation.from_file(sffz_file)
+                arrays = list()
+                for lattice, sffz_lattice in zip(segmentation.lattice_list, sffz_segmentation.lattice_list):
+                    arrays.append((lattice.data_array, sffz_lattice.data_array))
+                for segment, sffz_segment in zip(segmentation.segment_list, sffz_segmentation.segment_list):
+                    for mesh, sffz_mesh in zip(segment.mesh_list, sffz_segment.mesh_list):
+                        arrays.append((mesh.vertices.data_array, sffz_mesh.vertices.data_array))
+                        arrays.append((mesh.triangles.data_array, sffz_mesh.triangles.data_array))
+                self.assertTrue(arrays)
+                for array, sffz_array in arrays:
+                    self.assertIsInstance(sffz_array, numpy.memmap)
+                    self.assertEqual(sffz_array.offset % adapter.SFFZ_ALIGNMENT, 0)
+                    self.assertTrue(numpy.array_equal(array, sffz_array))
+                # payloads are encoded on export to other formats
+                for ext in [u'sff', u'hff', u'json']:
+                    out_file = os.path.join(temp_dir, u'out.{}'.format(ext))
+                    sffz_segmentation.export(out_file)
+                    out_segmentation = adapter.SFFSegmentation.from_file(out_file)
+                    self.assertEqual(out_segmentation.lattice_list, segmentation.lattice_list)
+                    for lattice, out_lattice in zip(segmentation.lattice_list, out_segmentation.lattice_list):
+                        self.assertTrue(numpy.array_equal(lattice.data_array, out_lattice.data_array))
+                # files read into memory
+                with open(sffz_file, u'rb') as f:
+                    buffer_segmentation = adapter.SFFSegmentation.from_sffz(io.BytesIO(f.read()))
+                self.assertEqual(buffer_segmentation.segment_list, segmentation.segment_list)
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_open(self):
+        """Update the annotation of HDF5 files in place"""
+        temp_dir = tempfile.mkdtemp()
+        try:
+            segmentation = adapter.SFFSegmentation.from_file(os.path.join(TEST_DATA_PATH, u'sff', u'v0.8', u'emd_1547.sff'))
+            hff_file = os.path.join(temp_dir, u'emd_1547.hff')
+            for args in [None, argparse.Namespace(hff_layout=u'tables'),
+                         argparse.Namespace(hff_layout_version=2, annotation_index=True)]:
+                segmentation.export(hff_file, args=args)
+                original = adapter.SFFSegmentation.from_file(hff_file)
+                segment_id = original.segment_list[0].id
+                # geometry is neither read nor written
+                with mock.patch.object(adapter.SFFMeshList, u'from_hff') as from_hff, \
+                        mock.patch.object(adapter.SFFLatticeList, u'from_hff') as lattice_from_hff, \
+                        mock.patch.object(adapter.SFFMeshList, u'as_hff') as as_hff:
+                    with adapter.SFFSegmentation.open(hff_file, mode=u'r+') as session:
+                        self.assertEqual(len(session.segmentation.segment_list), len(original.segment_list))
+                        self.assertEqual(session.flush(), list())
+                        segment = session.segmentation.segment_list.get_by_id(segment_id)
+                        segment.biological_annotation.description = u'changed ✓'
+                        segment.biological_annotation.external_references.append(
+                            adapter.SFFExternalReference(resource=u'go', url=u'http://x.org/GO_1', accession=u'GO_1')
+                        )
+                        segment.colour = adapter.SFFRGBA(red=1.0, green=0.0, blue=0.0)
+                        session.segmentation.details = u'new details'
+                        paths = session.flush()
+                        self.assertIn(u'/details', paths)
+                        self.assertEqual(session.flush(), list())
+                        session.segmentation.name = u'new name'
+                    self.assertTrue(session.closed)
+                    from_hff.assert_not_called()
+                    lattice_from_hff.assert_not_called()
+                    as_hff.assert_not_called()
+                updated = adapter.SFFSegmentation.from_file(hff_file)
+                self.assertEqual(updated.name, u'new name')
+                self.assertEqual(updated.details, u'new details')
+                segment = updated.segment_list.get_by_id(segment_id)
+                self.assertEqual(segment.biological_annotation.description, u'changed ✓')
+                self.assertEqual(segment.colour.value, (1.0, 0.0, 0.0, 1.0))
+                self.assertEqual(updated.annotation_index.segment_ids(accession=u'GO_1'), [segment_id])
+                self.assertEqual(updated.segment_list[0].mesh_list, original.segment_list[0].mesh_list)
+                self.assertEqual(list(updated.segment_list)[1:], list(original.segment_list)[1:])
+                self.assertEqual(updated.lattice_list, original.lattice_list)
+            # exceptions leave the file as it was
+            with self.assertRaises(KeyError):
+                with adapter.SFFSegmentation.open(hff_file, mode=u'r+') as session:
+                    session.segmentation.name = u'not written'
+                    raise KeyError(u'oops')
+            self.assertEqual(adapter.SFFSegmentation.from_file(hff_file).name, u'new name')
+            # segments may not be added
+            session = adapter.SFFSegmentation.open(hff_file, mode=u'r+')
+            session.segmentation.segment_list.append(adapter.SFFSegment(colour=adapter.SFFRGBA(random_colour=True)))
+            with self.assertRaises(base.SFFValueError):
+                session.flush()
+            session._file.close()
+            # read-only
+            with adapter.SFFSegmentation.open(hff_file) as session:
+                with self.assertRaises(base.SFFValueError):
+                    session.flush()
+            with self.assertRaises(base.SFFValueError):
+                adapter.SFFSegmentation.open(hff_file, mode=u'w')
+            with self.assertRaises(base.SFFValueError):
+                adapter.SFFSegmentation.open(os.path.join(TEST_DATA_PATH, u'sff', u'v0.8', u'emd_1547.sff'))
+        finally:
+            shutil.rmtree(temp_dir)
+
     def test_export_json(self):
         """Export to a JSON file"""
         temp_file = tempfile.NamedTemporaryFile()
@@ -5448,6 +6302,104 @@ class TestSFFSegmentation(Py23FixTestCase):
             J = json.load(f)
             self.assertEqual(J[u'primary_descriptor'], u"three_d_volume")
 
+    def test_aload(self):
+        """Load several files concurrently"""
+        fns = [os.path.join(TEST_DATA_PATH, u'sff', u'v0.8', u'emd_1547.{}'.format(ext)) for ext in [u'sff', u'hff',
+                                                                                                       u'json']]
+
+        async def _load_all():
+            return await asyncio.gather(*[adapter.SFFSegmentation.aload(fn) for fn in fns])
+
+        segmentations = asyncio.get_event_loop().run_until_complete(_load_all())
+        for fn, segmentation in zip(fns, segmentations):
+            self.assertEqual(segmentation, adapter.SFFSegmentation.from_file(fn))
+        # files are read as from_file reads them
+        temp_dir = tempfile.mkdtemp()
+        try:
+            sffz_file = os.path.join(temp_dir, u'emd_1547.sffz')
+            segmentations[0].export(sffz_file)
+            segmentation = asyncio.get_event_loop().run_until_complete(adapter.SFFSegmentation.aload(sffz_file))
+            self.assertIsInstance(segmentation.lattice_list[0].data_array, numpy.memmap)
+            args = argparse.Namespace(hff_workers=2)
+            with mock.patch.object(adapter, u'_hff_read_parallel', wraps=adapter._hff_read_parallel) as read_parallel:
+                segmentation = asyncio.get_event_loop().run_until_complete(
+                    adapter.SFFSegmentation.aload(fns[1], args=args))
+            self.assertTrue(read_parallel.called)
+            self.assertEqual(segmentation, segmentations[1])
+        finally:
+            shutil.rmtree(temp_dir)
+        with self.assertRaises(ValueError):
+            asyncio.get_event_loop().run_until_complete(adapter.SFFSegmentation.aload(u'file.txt'))
+        with self.assertRaises(IOError):
+            asyncio.get_event_loop().run_until_complete(adapter.SFFSegmentation.aload(u'nonexistent.sff'))
+
+    def test_aexport(self):
+        """Export asynchronously then read back"""
+        temp_dir = tempfile.mkdtemp()
+        try:
+            for ext in [u'sff', u'hff', u'json']:
+                fn = os.path.join(temp_dir, u'file.{}'.format(ext))
+                status = asyncio.get_event_loop().run_until_complete(self.segmentation.aexport(fn))
+                self.assertEqual(status, 0)
+                self.assertEqual(os.listdir(temp_dir), [u'file.{}'.format(ext)])
+                segmentation = adapter.SFFSegmentation.from_file(fn)
+                self.assertEqual(segmentation.name, self.segmentation.name)
+                # the permissions of a new file...
+                umask = os.umask(0o022)
+                os.umask(umask)
+                self.assertEqual(os.stat(fn).st_mode & 0o777, 0o666 & ~umask)
+                # ...or those of the file replaced
+                os.chmod(fn, 0o640)
+                asyncio.get_event_loop().run_until_complete(self.segmentation.aexport(fn))
+                self.assertEqual(os.stat(fn).st_mode & 0o777, 0o640)
+                os.remove(fn)
+
+            # a cancelled export leaves nothing behind
+            executor = ThreadPoolExecutor(max_workers=1)
+            busy = threading.Event()
+            executor.submit(busy.wait)  # hold the only worker until the export has been cancelled
+
+            async def _cancel():
+                task = asyncio.ensure_future(
+                    self.segmentation.aexport(os.path.join(temp_dir, u'file.hff'), executor=executor)
+                )
+                await asyncio.sleep(0)
+                task.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await task
+
+            asyncio.get_event_loop().run_until_complete(_cancel())
+            busy.set()
+            executor.shutdown(wait=True)
+            self.assertEqual(os.listdir(temp_dir), [])
+            # ...even when the cancellation arrives in the middle of writing
+            executor = ThreadPoolExecutor(max_workers=1)
+            started, resume = threading.Event(), threading.Event()
+            export = adapter.SFFSegmentation.export
+
+            def _slow_export(segmentation, fn, *args, **kwargs):
+                started.set()
+                resume.wait()
+                return export(segmentation, fn, *args, **kwargs)
+
+            async def _cancel_while_writing():
+                task = asyncio.ensure_future(
+                    self.segmentation.aexport(os.path.join(temp_dir, u'file.hff'), executor=executor)
+                )
+                while not started.is_set():
+                    await asyncio.sleep(0.01)
+                task.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await task
+
+            with mock.patch.object(adapter.SFFSegmentation, u'export', _slow_export):
+                asyncio.get_event_loop().run_until_complete(_cancel_while_writing())
+                resume.set()
+                executor.shutdown(wait=True)
+            self.assertEqual(os.listdir(temp_dir), [])
+        finally:
+            shutil.rmtree(temp_dir)
+
     def test_merge_annotation(self):
         """Test that we can merge annotation from one to another"""
         seg1_fn = os.path.join(TEST_DATA_PATH, u'sff', u'v0.8', u'annotated_emd_1014.json')
@@ -5522,3 +6474,104 @@ class TestSFFSegmentation(Py23FixTestCase):
         self.assertTrue(len(from_segment.biological_annotation.external_references) > 0)
         seg.clear_annotation(from_segment_id)
         self.assertEqual(len(from_segment.biological_annotation.external_references), 0)
+
+    def test_intern_transforms(self):
+        """Test that duplicate transforms are removed and references to them updated"""
+        seg = adapter.SFFSegmentation(name=u'interned', primary_descriptor=u'shape_primitive_list')
+        seg.transform_list = adapter.SFFTransformList.from_array(
+            numpy.stack([numpy.eye(3, 4), numpy.eye(3, 4) * 2, numpy.eye(3, 4), numpy.eye(3, 4) * 2])
+        )
+        segment = adapter.SFFSegment(id=1)
+        segment.shape_primitive_list = adapter.SFFShapePrimitiveList.from_arrays(
+            u'ellipsoid', x=1.0, y=2.0, z=3.0, transform_id=[0, 1, 2, 3]
+        )
+        segment.mesh_list = adapter.SFFMeshList()
+        segment.mesh_list.append(adapter.SFFMesh(
+            vertices=adapter.SFFVertices.from_array(numpy.random.rand(3, 3)),
+            triangles=adapter.SFFTriangles.from_array(numpy.array([[0, 1, 2]])),
+            transform_id=3,
+        ))
+        segment.three_d_volume = adapter.SFFThreeDVolume(lattice_id=0, value=1, transform_id=2)
+        seg.segment_list = adapter.SFFSegmentList()
+        seg.segment_list.append(segment)
+        self.assertEqual(seg.intern_transforms(), {2: 0, 3: 1})
+        self.assertEqual(len(seg.transform_list), 2)
+        segment = seg.segment_list[0]
+        self.assertEqual([shape.transform_id for shape in segment.shape_primitive_list], [0, 1, 0, 1])
+        self.assertEqual(segment.mesh_list[0].transform_id, 1)
+        self.assertEqual(segment.three_d_volume.transform_id, 0)
+        # nothing to do
+        self.assertEqual(seg.intern_transforms(), {})
+        self.assertEqual(adapter.SFFSegmentation(name=u'empty').intern_transforms(), {})
+
+    def test_annotation_index(self):
+        """Test the lazily built annotation index and its rebuilds"""
+        seg_fn = os.path.join(TEST_DATA_PATH, u'sff', u'v0.8', u'emd_1014.json')
+        seg = adapter.SFFSegmentation.from_file(seg_fn)
+        self.assertIsNone(getattr(seg, u'_annotation_index', None))  # not built yet
+        index = seg.annotation_index
+        self.assertIsInstance(index, adapter.SFFAnnotationIndex)
+        self.assertIs(seg.annotation_index, index)
+        expected = sorted(
+            segment.id for segment in seg.segment_list
+            if any(extref.accession == u'GO_0070207' for extref in segment.biological_annotation.external_references)
+        )
+        self.assertTrue(len(expected) > 0)
+        self.assertEqual(index.segment_ids(accession=u'GO_0070207'), expected)
+        self.assertEqual(index.segment_ids(accession=u'GO_0070207', resource=u'unknown'), [])
+        with self.assertRaises(TypeError):
+            index.segment_ids(colour=u'x')
+
+        def _rows(_index):
+            return [_index.row(i) for i in _xrange(len(_index))]
+
+        def _rebuilt(_seg):
+            return _rows(adapter.SFFAnnotationIndex.from_segmentation(_seg))
+
+        # the index follows changes to the annotation
+        segment_ids = list(seg.segment_list.get_ids())
+        seg.clear_annotation(segment_ids[0])
+        self.assertEqual(_rows(index), _rebuilt(seg))
+        self.assertNotIn(segment_ids[0], index.segment_ids(accession=u'GO_0070207'))
+        seg.copy_annotation(segment_ids[1], segment_ids[0])
+        seg.copy_annotation(segment_ids[2], segment_ids[0])
+        seg.copy_annotation(segment_ids[1], -1)
+        self.assertEqual(_rows(index), _rebuilt(seg))
+        seg.merge_annotation(adapter.SFFSegmentation.from_file(
+            os.path.join(TEST_DATA_PATH, u'sff', u'v0.8', u'annotated_emd_1014.json')
+        ))
+        self.assertEqual(_rows(index), _rebuilt(seg))
+        self.assertIs(seg.annotation_index, index)
+        seg.reset_annotation_index()
+        self.assertIsNot(seg.annotation_index, index)
+
+    def test_annotation_index_hff(self):
+        """Test that the annotation index may be saved in and read from HFF files"""
+        seg = adapter.SFFSegmentation.from_file(os.path.join(TEST_DATA_PATH, u'sff', u'v0.8', u'emd_1014.json'))
+        temp_dir = tempfile.mkdtemp()
+        try:
+            fn = os.path.join(temp_dir, u'file.hff')
+            # not saved by default
+            seg.export(fn)
+            with h5py.File(fn, u'r') as h:
+                self.assertNotIn(u'annotation_index', h)
+            seg.export(fn, args=argparse.Namespace(annotation_index=True))
+            with h5py.File(fn, u'r') as h:
+                self.assertIn(u'annotation_index', h)
+            seg2 = adapter.SFFSegmentation.from_file(fn)
+            self.assertIsNotNone(getattr(seg2, u'_annotation_index', None))  # loaded; not built
+            index, index2 = seg.annotation_index, seg2.annotation_index
+            self.assertEqual(len(index2), len(index))
+            self.assertEqual([index2.row(i) for i in _xrange(len(index2))],
+                             [index.row(i) for i in _xrange(len(index))])
+            self.assertEqual(index2.segment_ids(accession=u'GO_0070207'), index.segment_ids(accession=u'GO_0070207'))
+            # the external references are looked up when first used
+            self.assertIsNone(index2._refs)
+            self.assertEqual(index2[0], index[0])
+            self.assertEqual(index2.external_references(index.segment_ids()[0]),
+                             index.external_references(index.segment_ids()[0]))
+            # changes to the annotation rebuild the loaded index
+            seg2.clear_annotation(index.segment_ids()[0])
+            self.assertEqual(len(index2), len(index) - len(index.external_references(index.segment_ids()[0])))
+        finally:
+            shutil.rmtree(temp_dir)
@@ -5,7 +5,11 @@ Unit for schema adapter
 """
 from __future__ import print_function
 
+import copy
 import importlib
+import io
+import itertools
+import pickle
 import random
 import sys
 import tempfile
@@ -271,6 +275,144 @@ class TestSFFType(Py23FixTestCase):
             s = adapter.SFFSegment()
             b1 == s
 
+    def test_slots(self):
+        """Test that no instance dictionaries are populated by generated classes"""
+        for name in dir(emdb_sff):
+            gds_class = getattr(emdb_sff, name)
+            if isinstance(gds_class, type) and issubclass(gds_class, emdb_sff.GeneratedsSuper):
+                self.assertEqual(gds_class().__dict__, {}, gds_class)
+        s = adapter.SFFSegment(colour=adapter.SFFRGBA(random_colour=True))
+        self.assertEqual(s._local.__dict__, {})
+        self.assertEqual(s.colour._local.__dict__, {})
+        # other attributes still work
+        s._local.custom = 1
+        self.assertEqual(s._local.custom, 1)
+        # equality, copying and pickling use slots
+        s1 = emdb_sff.external_reference_type(id=1, resource=u'a', url=u'b', accession=u'c')
+        s2 = copy.deepcopy(s1)
+        self.assertEqual(s1, s2)
+        self.assertEqual(s1, pickle.loads(pickle.dumps(s1)))
+        s2.accession = u'd'
+        self.assertNotEqual(s1, s2)
+
+    def test_postgenerate(self):
+        """Test that the generated module is the output of the post-generation step"""
+        from ..schema import postgenerate
+        with io.open(emdb_sff.__file__.replace(u'.pyc', u'.py'), u'r', encoding=u'utf-8') as f:
+            source = f.read()
+        self.assertEqual(postgenerate.postgenerate(source), source)
+        # a freshly generated module
+        generated = u"""try:
+    from generatedssuper import GeneratedsSuper
+except ImportError as exp:
+
+    class GeneratedsSuper(object):
+        __hash__ = object.__hash__
+
+        def __eq__(self, other):
+            def excl_select_objs_(obj):
+                return (obj[0] != 'parent_object_' and
+                        obj[0] != 'gds_collector_')
+
+            if type(self) != type(other):
+                return False
+            return all(x == y for x, y in zip_longest(
+                filter(excl_select_objs_, self.__dict__.items()),
+                filter(excl_select_objs_, other.__dict__.items())))
+
+        def __ne__(self, other):
+            return not self.__eq__(other)
+
+
+class point_type(GeneratedsSuper):
+    __hash__ = GeneratedsSuper.__hash__
+    subclass = None
+    superclass = None
+
+    def __init__(self, x=None, v=None, gds_collector_=None, **kwargs_):
+        self.gds_collector_ = gds_collector_
+        self.gds_elementtree_node_ = None
+        self.original_tagname_ = None
+        self.parent_object_ = kwargs_.get('parent_object_')
+        self.ns_prefix_ = None
+        self.x = x
+        if v is None:
+            self.v = []
+        else:
+            self.v = v
+        self.v_nsprefix_ = None
+"""
+        changed = postgenerate.postgenerate(generated)
+        self.assertEqual(postgenerate.postgenerate(changed), changed)
+        namespace = {u'zip_longest': itertools.zip_longest}
+        exec(changed, namespace)
+        point_type = namespace[u'point_type']
+        self.assertEqual(point_type.__slots__, (u'x', u'v', u'v_nsprefix_'))
+        p1, p2 = point_type(x=1), point_type(x=1)
+        self.assertEqual(p1.__dict__, {})
+        self.assertEqual(p1, p2)
+        p2._cache = 1  # ignored
+        self.assertEqual(p1, p2)
+        p2.x = 2
+        self.assertNotEqual(p1, p2)
+        # 'bit' is only a mode of lattices
+        modes = u"""class mode_type(Enum):
+    FLOAT_64 = 'float64'
+
+
+class lattice_type(GeneratedsSuper):
+    enumerations = ['float32',
+                    'float64']
+
+
+class vertices_type(GeneratedsSuper):
+    enumerations = ['float32',
+                    'float64']
+"""
+        changed = postgenerate.add_bit_mode(modes)
+        self.assertEqual(postgenerate.add_bit_mode(changed), changed)
+        self.assertEqual(changed, modes.replace(
+            u"'float64'\n", u"'float64'\n    BIT = 'bit'\n", 1
+        ).replace(u"'float64']\n\n", u"'float64', 'bit']\n\n", 1))
+        # encoded sequences have an optional compression
+        sequences = u"""import sys
+
+
+class vertices_type(object):
+    def __init__(self, data=None, gds_collector_=None,
+                 **kwargs_):
+        self.data = _cast(None, data)
+        self.data_nsprefix_ = None
+
+    def factory(*args_, **kwargs_):
+        pass
+
+    def validate_mode_type(self, value):
+        pass
+
+    def exportAttributes(self, outfile, already_processed):
+        pass
+
+    def exportChildren(self, outfile):
+        pass
+
+    def buildAttributes(self, node, attrs, already_processed):
+        pass
+
+    def buildChildren(self, child_, node, nodeName_):
+        pass
+"""
+        changed = postgenerate.add_compression(sequences)
+        self.assertEqual(postgenerate.add_compression(changed), changed)
+        namespace = {u'_cast': lambda type_, value: value}
+        exec(changed, namespace)
+        vertices_type = namespace[u'vertices_type']
+        self.assertIsNone(vertices_type().compression)
+        v = vertices_type(data=u'data', compression=u'zlib')
+        self.assertEqual(v.get_compression(), u'zlib')
+        self.assertIn(u"if self.compression is not None and 'compression' not in already_processed:", changed)
+        self.assertIn(u"value = find_attr_value_('compression', node)", changed)
+
 
 class TestSFFIndexType(Py23FixTestCase):
     """Test the indexing mixin class `SFFIndexType"""
@@ -3,14 +3,32 @@
 """Unit tests for :py:mod:`sfftkrw.core` package"""
 from __future__ import division, print_function
 
+import argparse
+import json
 import os
 import random
+import shutil
+import subprocess
 import sys
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from unittest import mock
 
+import h5py
+import numpy
 from random_words import RandomWords, LoremIpsum
 
+import sfftkrw_client
+
 from . import TEST_DATA_PATH, _random_integer, Py23FixTestCase
+from ..core import _str, _xrange
+from ..core import cache
+from ..core import generate
 from ..core import print_tools
+from ..core import serve
+from ..core import store
+from ..core import upgrade
 from ..core import utils
 from ..core.parser import parse_args, tool_list
 
@@ -274,6 +292,70 @@ class TestCoreParserConvert(Py23FixTestCase):
         )
         self.assertEqual(args, 64)
 
+    def test_annotation_index(self):
+        """Test the annotation index option"""
+        args = parse_args('convert {}'.format(self.test_data_file), use_shlex=True)
+        self.assertFalse(args.annotation_index)
+        args = parse_args('convert --annotation-index {}'.format(self.test_data_file), use_shlex=True)
+        self.assertTrue(args.annotation_index)
+
+    def test_hff_layout(self):
+        """Test the HDF5 layout option"""
+        args = parse_args('convert {}'.format(self.test_data_file), use_shlex=True)
+        self.assertEqual(args.hff_layout, u'groups')
+        args = parse_args('convert --hff-layout tables {}'.format(self.test_data_file), use_shlex=True)
+        self.assertEqual(args.hff_layout, u'tables')
+        with self.assertRaises(SystemExit):
+            parse_args('convert --hff-layout rows {}'.format(self.test_data_file), use_shlex=True)
+
+    def test_hff_layout_version(self):
+        """Test the HDF5 layout version option"""
+        args = parse_args('convert {}'.format(self.test_data_file), use_shlex=True)
+        self.assertEqual(args.hff_layout_version, 1)
+        args = parse_args('convert --hff-layout-version 2 {}'.format(self.test_data_file), use_shlex=True)
+        self.assertEqual(args.hff_layout_version, 2)
+        with self.assertRaises(SystemExit):
+            parse_args('convert --hff-layout-version 3 {}'.format(self.test_data_file), use_shlex=True)
+
+    def test_hff_workers(self):
+        """Test the number of HDF5 reader processes"""
+        args = parse_args('convert {}'.format(self.test_hff_file), use_shlex=True)
+        self.assertIsNone(args.hff_workers)
+        args = parse_args('convert --hff-workers 4 {}'.format(self.test_hff_file), use_shlex=True)
+        self.assertEqual(args.hff_workers, 4)
+        args = parse_args('convert --hff-workers 0 {}'.format(self.test_hff_file), use_shlex=True)
+        self.assertEqual(args, 64)
+
+    def test_intern_transforms(self):
+        """Test the options to intern transforms"""
+        args = parse_args('convert {}'.format(self.test_data_file), use_shlex=True)
+        self.assertFalse(args.intern_transforms)
+        self.assertEqual(args.transform_tolerance, 0.0)
+        args = parse_args('convert --intern-transforms --transform-tolerance 1e-6 {}'.format(self.test_data_file),
+                          use_shlex=True)
+        self.assertTrue(args.intern_transforms)
+        self.assertEqual(args.transform_tolerance, 1e-6)
+        args = parse_args('convert --transform-tolerance -1 {}'.format(self.test_data_file), use_shlex=True)
+        self.assertEqual(args, 64)
+
+    def test_cache(self):
+        """Test the conversion cache options"""
+        args = parse_args('convert {}'.format(self.test_data_file), use_shlex=True)
+        self.assertIsNone(args.cache_dir)
+        self.assertEqual(args.cache_size, cache.DEFAULT_CACHE_SIZE)
+        self.assertFalse(args.cache_hardlink)
+        args = parse_args(
+            'convert --cache-dir /tmp/cache --cache-size 10 --cache-hardlink {}'.format(self.test_data_file),
+            use_shlex=True
+        )
+        self.assertEqual(args.cache_dir, '/tmp/cache')
+        self.assertEqual(args.cache_size, 10)
+        self.assertTrue(args.cache_hardlink)
+        # failure
+        args = parse_args('convert --cache-dir /tmp/cache --cache-size 0 {}'.format(self.test_data_file),
+                          use_shlex=True)
+        self.assertEqual(args, 64)
+
 
 class TestCoreParserView(Py23FixTestCase):
     @classmethod
@@ -295,6 +377,124 @@ class TestCoreParserView(Py23FixTestCase):
         args = parse_args('view --sff-version file.sff', use_shlex=True)
         self.assertTrue(args.sff_version)
 
+    def test_batch(self):
+        """Test view in batch mode"""
+        args = parse_args('view --batch {}'.format(TEST_DATA_PATH), use_shlex=True)
+        self.assertTrue(args.batch)
+        self.assertIsNone(args.workers)
+        args = parse_args('view --batch -w 2 {}'.format(TEST_DATA_PATH), use_shlex=True)
+        self.assertEqual(args.workers, 2)
+        # must be a directory
+        args = parse_args('view --batch file.sff', use_shlex=True)
+        self.assertEqual(args, 64)
+        args = parse_args('view --batch -w 0 {}'.format(TEST_DATA_PATH), use_shlex=True)
+        self.assertEqual(args, 64)
+
+
+class TestCoreParserServe(Py23FixTestCase):
+    def test_default(self):
+        """Test serve parser"""
+        args = parse_args('serve', use_shlex=True)
+        self.assertEqual(args, 0)  # shows help
+        args = parse_args('serve -v', use_shlex=True)
+        self.assertEqual(args.socket, serve.DEFAULT_SOCKET)
+        self.assertIsNone(args.workers)
+
+    def test_socket_workers(self):
+        """Test serve parser with socket and workers"""
+        args = parse_args('serve --socket /tmp/sff.sock --workers 3', use_shlex=True)
+        self.assertEqual(args.socket, '/tmp/sff.sock')
+        self.assertEqual(args.workers, 3)
+        # failure
+        args = parse_args('serve --workers 0', use_shlex=True)
+        self.assertEqual(args, 64)
+
+    def test_server(self):
+        """Test the client option of convert, view and validate"""
+        args = parse_args('convert --server /tmp/sff.sock file.sff', use_shlex=True)
+        self.assertEqual(args.server, '/tmp/sff.sock')
+        args = parse_args('view --server /tmp/sff.sock file.sff', use_shlex=True)
+        self.assertEqual(args.server, '/tmp/sff.sock')
+        args = parse_args('validate --server /tmp/sff.sock file.sff file.hff', use_shlex=True)
+        self.assertEqual(args.server, '/tmp/sff.sock')
+        self.assertEqual(args.from_file, ['file.sff', 'file.hff'])
+        args = parse_args('view file.sff', use_shlex=True)
+        self.assertIsNone(args.server)
+
+
+class TestCoreParserUpgrade(Py23FixTestCase):
+    def test_default(self):
+        """Test upgrade parser"""
+        args = parse_args('upgrade file.sff', use_shlex=True)
+        self.assertEqual(args.output, 'file.hff')
+        args = parse_args('upgrade /path/to/file.hff', use_shlex=True)
+        self.assertEqual(args.output, '/path/to/file.sff')
+        args = parse_args('upgrade file.sff -o file.json --json-indent 4', use_shlex=True)
+        self.assertEqual(args.output, 'file.json')
+        self.assertEqual(args.json_indent, 4)
+        # failure
+        args = parse_args('upgrade file.json', use_shlex=True)
+        self.assertEqual(args, 64)
+
+
+class TestCoreParserBench(Py23FixTestCase):
+    def test_default(self):
+        """Test bench parser"""
+        args = parse_args('bench', use_shlex=True)
+        self.assertIsNone(args.sizes)
+        self.assertEqual(args.repeats, 3)
+        self.assertIsNone(args.benchmarks)
+        self.assertIsNone(args.output)
+        args = parse_args('bench -s 10 20 -r 1 -b files annotation -o results.json', use_shlex=True)
+        self.assertEqual(args.sizes, [10, 20])
+        self.assertEqual(args.repeats, 1)
+        self.assertEqual(args.benchmarks, ['files', 'annotation'])
+        self.assertEqual(args.output, 'results.json')
+        # failures
+        self.assertEqual(parse_args('bench -s 0', use_shlex=True), 64)
+        self.assertEqual(parse_args('bench -r 0', use_shlex=True), 64)
+        self.assertEqual(parse_args('bench -b files nothing', use_shlex=True), 64)
+
+
+class TestCoreParserGenerate(Py23FixTestCase):
+    def test_default(self):
+        """Test generate parser"""
+        args = parse_args('generate file.hff', use_shlex=True)
+        self.assertEqual(args.output, 'file.hff')
+        self.assertEqual(args.segments, 100)
+        self.assertEqual(args.external_references, 1)
+        self.assertEqual(args.lattices, 0)
+        self.assertEqual(args.lattice_shape, [64, 64, 64])
+        self.assertEqual(args.lattice_mode, 'uint8')
+        self.assertEqual(args.sparsity, 0.9)
+        self.assertEqual(args.meshes, 0)
+        self.assertEqual(args.shapes, 1)
+        self.assertEqual(args.seed, 0)
+        args = parse_args(
+            'generate file.sffz -n 10 -e 3 -l 2 --lattice-shape 4 5 6 --lattice-mode bit --sparsity 0.5 -m 2 '
+            '--vertices 30 --triangles 40 -p 0 --seed 7', use_shlex=True
+        )
+        self.assertEqual(args.segments, 10)
+        self.assertEqual(args.external_references, 3)
+        self.assertEqual(args.lattices, 2)
+        self.assertEqual(args.lattice_shape, [4, 5, 6])
+        self.assertEqual(args.lattice_mode, 'bit')
+        self.assertFalse(args.schema_extensions)
+        self.assertEqual(args.sparsity, 0.5)
+        self.assertEqual(args.meshes, 2)
+        self.assertEqual(args.vertices, 30)
+        self.assertEqual(args.triangles, 40)
+        self.assertEqual(args.shapes, 0)
+        self.assertEqual(args.seed, 7)
+        # failures
+        self.assertEqual(parse_args('generate file.txt', use_shlex=True), 64)
+        self.assertEqual(parse_args('generate file.hff -n -1', use_shlex=True), 64)
+        self.assertEqual(parse_args('generate file.hff --lattice-shape 4 0 4', use_shlex=True), 64)
+        self.assertEqual(parse_args('generate file.hff --lattice-mode uint7', use_shlex=True), 64)
+        self.assertEqual(parse_args('generate file.hff --sparsity 1.5', use_shlex=True), 64)
+        self.assertEqual(parse_args('generate file.hff --vertices 0', use_shlex=True), 64)
+        self.assertEqual(parse_args('generate file.hff --seed -1', use_shlex=True), 64)
+
 
 class TestCoreParserTests(Py23FixTestCase):
     def test_tests_default(self):
@@ -488,6 +688,89 @@ class TestCoreUtils(Py23FixTestCase):
         v8_version = utils.get_version(self.v8_sff_file)
         self.assertEqual(v8_version, '0.8.0.dev1')
 
+    def test_get_summary(self):
+        """Summaries agree with the full segmentation for all formats and versions"""
+        from ..schema.adapter_v0_8_0_dev1 import SFFSegmentation
+        for ext, format_ in [(u'sff', u'XML'), (u'hff', u'HDF5'), (u'json', u'JSON')]:
+            fn = os.path.join(TEST_DATA_PATH, u'sff', u'v0.8', u'emd_1547.{}'.format(ext))
+            seg = SFFSegmentation.from_file(fn)
+            summary = utils.get_summary(fn)
+            self.assertEqual(summary[u'format'], format_)
+            self.assertEqual(summary[u'version'], seg.version)
+            self.assertEqual(summary[u'name'], seg.name)
+            self.assertEqual(summary[u'primary_descriptor'], seg.primary_descriptor)
+            self.assertEqual(summary[u'segments'], len(seg.segments))
+            # v0.7 names
+            summary = utils.get_summary(os.path.join(TEST_DATA_PATH, u'sff', u'v0.7', u'emd_1547.{}'.format(ext)))
+            self.assertEqual(summary[u'version'], u'0.7.0.dev0')
+            self.assertEqual(summary[u'primary_descriptor'], u'threeDVolume')
+            self.assertEqual(summary[u'segments'], 5)
+        summary = utils.get_summary(os.path.join(TEST_DATA_PATH, u'sff', u'v0.8', u'emd_3791.sff'))
+        self.assertEqual(summary[u'primary_descriptor'], u'mesh_list')
+        self.assertEqual(summary[u'segments'], 4)
+        # segments in tables
+        handle, fn = tempfile.mkstemp(suffix=u'.hff')
+        os.close(handle)
+        try:
+            seg = SFFSegmentation.from_file(os.path.join(TEST_DATA_PATH, u'sff', u'v0.8', u'emd_1547.sff'))
+            seg.export(fn, args=argparse.Namespace(hff_layout=u'tables'))
+            self.assertEqual(utils.get_summary(fn)[u'segments'], len(seg.segments))
+            # small values as attributes
+            seg.export(fn, args=argparse.Namespace(hff_layout_version=2))
+            summary = utils.get_summary(fn)
+            self.assertEqual(summary[u'name'], seg.name)
+            self.assertEqual(summary[u'primary_descriptor'], seg.primary_descriptor)
+            self.assertEqual(summary[u'segments'], len(seg.segments))
+            self.assertEqual(utils.get_version(fn), seg.version)
+        finally:
+            os.remove(fn)
+        # SFFZ container
+        handle, fn = tempfile.mkstemp(suffix=u'.sffz')
+        os.close(handle)
+        try:
+            seg = SFFSegmentation.from_file(os.path.join(TEST_DATA_PATH, u'sff', u'v0.8', u'emd_1547.sff'))
+            seg.export(fn)
+            summary = utils.get_summary(fn)
+            self.assertEqual(summary[u'format'], u'SFFZ')
+            self.assertEqual(summary[u'name'], seg.name)
+            self.assertEqual(summary[u'segments'], len(seg.segments))
+            self.assertEqual(utils.get_version(fn), seg.version)
+        finally:
+            os.remove(fn)
+        with self.assertRaises(ValueError):
+            utils.get_summary(u'file.xxx')
+
+    def test_batch_summary(self):
+        """Summarise a directory tree"""
+        temp_dir = tempfile.mkdtemp()
+        try:
+            os.mkdir(os.path.join(temp_dir, u'sub'))
+            shutil.copy(os.path.join(TEST_DATA_PATH, u'sff', u'v0.8', u'emd_1832.sff'), temp_dir)
+            shutil.copy(os.path.join(TEST_DATA_PATH, u'sff', u'v0.8', u'emd_1832.hff'), os.path.join(temp_dir, u'sub'))
+            with open(os.path.join(temp_dir, u'sub', u'broken.json'), u'w') as f:
+                f.write(u'{')
+            with open(os.path.join(temp_dir, u'notes.txt'), u'w') as f:
+                f.write(u'not an EMDB-SFF file')
+            rows = list(utils.batch_summary(temp_dir, workers=2))
+            self.assertEqual([row[u'file'] for row in rows], [
+                os.path.join(temp_dir, u'emd_1832.sff'),
+                os.path.join(temp_dir, u'sub', u'broken.json'),
+                os.path.join(temp_dir, u'sub', u'emd_1832.hff'),
+            ])
+            for row in rows:
+                self.assertEqual(sorted(row.keys()), sorted(utils.SUMMARY_FIELDS))
+            self.assertEqual(rows[0][u'segments'], 6)
+            self.assertIsNone(rows[0][u'error'])
+            self.assertTrue(rows[1][u'error'].startswith(u'JSONDecodeError'))
+            self.assertEqual(rows[2][u'format'], u'HDF5')
+            self.assertEqual(rows[2][u'segments'], 6)
+        finally:
+            shutil.rmtree(temp_dir)
+        # nothing to do
+        temp_dir = tempfile.mkdtemp()
+        self.assertEqual(list(utils.batch_summary(temp_dir)), [])
+        os.rmdir(temp_dir)
+
     def test_get_unique_id(self):
         from ..core.utils import get_unique_id
         id_1 = get_unique_id()
@@ -496,3 +779,637 @@ class TestCoreUtils(Py23FixTestCase):
         from ..core.utils import get_unique_id
         id_2 = get_unique_id()
         self.assertTrue(id_1 + 1 == id_2)
+
+    def test_id_allocation(self):
+        """Each thread in `id_allocation` has its own counter drawing on reserved IDs"""
+        from ..core.utils import get_unique_id, id_allocation
+        id_1 = get_unique_id()
+        results = dict()
+
+        def _allocate(name):
+            with id_allocation(block=16):
+                results[name] = [get_unique_id() for _ in _xrange(100)]
+
+        threads = [threading.Thread(target=_allocate, args=(name,)) for name in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        all_ids = [i for ids in results.values() for i in ids]
+        # unique across threads and with the IDs given out before and after
+        self.assertEqual(len(set(all_ids)), 400)
+        self.assertGreater(min(all_ids), id_1)
+        id_2 = get_unique_id()
+        self.assertGreater(id_2, max(all_ids))
+        for ids in results.values():
+            self.assertEqual(ids, sorted(ids))
+        # nesting restores the enclosing counter
+        with id_allocation(start=10):
+            self.assertEqual(get_unique_id(), 10)
+            with id_allocation(block=4):
+                self.assertEqual(get_unique_id(), id_2 + 1)
+            self.assertEqual(get_unique_id(), 11)
+        # counting from `start` does not reserve IDs
+        self.assertEqual(get_unique_id(), id_2 + 5)
+
+
+class TestCoreBench(Py23FixTestCase):
+    def test_bench_memory(self):
+        """Test the memory benchmark on a small segmentation"""
+        from ..core import bench
+        r = bench.bench_memory(segments=10)
+        self.assertEqual(r[u'segments'], 10)
+        self.assertGreaterEqual(r[u'objects'], 70)  # 7 objects per segment
+        self.assertGreater(r[u'total_bytes'], 0)
+        self.assertGreater(r[u'bytes_per_object'], 0)
+
+    def test_run_benchmarks(self):
+        """Test the benchmark suite at small sizes"""
+        from ..core import bench
+        from ..schema import FORMAT_CHARS
+        results = list()
+        report = bench.run_benchmarks(sizes=[2, 5], repeats=1, callback=results.append)
+        self.assertEqual(report[u'sizes'], [2, 5])
+        self.assertEqual(report[u'repeats'], 1)
+        self.assertEqual(report[u'results'], results)
+        # the report is machine-readable
+        self.assertEqual(json.loads(json.dumps(report)), report)
+        for result in results:
+            self.assertGreaterEqual(result[u'seconds'], 0)
+            self.assertGreaterEqual(result[u'peak_bytes'], 0)
+            self.assertGreater(result[u'items'], 0)
+        variants = lambda benchmark: set(r[u'variant'] for r in results if r[u'benchmark'] == benchmark)
+        for benchmark in [u'export', u'from_file']:
+            self.assertEqual(variants(benchmark), {u'sff', u'hff', u'json'})
+        for benchmark in [u'lattice_encode', u'lattice_decode']:
+            self.assertEqual(variants(benchmark), set(FORMAT_CHARS) | {u'bit'})
+        self.assertEqual(len(variants(u'sequence_encode')), 2 * len(bench.MESH_COMPRESSIONS))
+        for benchmark in [u'merge_annotation', u'get_by_id', u'validate']:
+            self.assertEqual(
+                sorted(r[u'size'] for r in results if r[u'benchmark'] == benchmark), [2, 5]
+            )
+        # a subset
+        report = bench.run_benchmarks(sizes=[2], repeats=1, benchmarks=[u'annotation'])
+        self.assertEqual(set(r[u'benchmark'] for r in report[u'results']), {u'merge_annotation', u'get_by_id', u'validate'})
+
+
+class TestCoreGenerate(Py23FixTestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_segments(self):
+        """Test that segments depend only on the parameters and the seed"""
+        g = generate.SegmentationGenerator(segments=5, external_references=2, meshes=2, vertices=10, triangles=20,
+                                           shapes=3, seed=1)
+        segment = g.segment(3)
+        self.assertEqual(segment.id, 4)
+        self.assertEqual(len(segment.biological_annotation.external_references), 2)
+        self.assertEqual(len(segment.mesh_list), 2)
+        self.assertEqual(segment.mesh_list[0].vertices.data_array.shape, (10, 3))
+        self.assertEqual(segment.mesh_list[0].triangles.data_array.shape, (20, 3))
+        self.assertEqual(len(segment.shape_primitive_list), 3)
+        self.assertIsNone(segment.three_d_volume)
+        # the same segment however it is made
+        self.assertEqual(segment, list(g.iter_segments())[3])
+        self.assertEqual(segment, generate.SegmentationGenerator(
+            segments=5, external_references=2, meshes=2, vertices=10, triangles=20, shapes=3, seed=1
+        ).segment(3))
+        self.assertNotEqual(segment.colour, generate.SegmentationGenerator(
+            segments=5, external_references=2, meshes=2, vertices=10, triangles=20, shapes=3, seed=2
+        ).segment(3).colour)
+        self.assertEqual(g.primary_descriptor, u'mesh_list')
+
+    def test_lattices(self):
+        """Test the values and sparsity of generated lattices"""
+        g = generate.SegmentationGenerator(segments=300, lattices=1, lattice_shape=(10, 20, 30), sparsity=0.75)
+        array = g.lattice_array(0)
+        self.assertEqual(array.shape, (10, 20, 30))
+        self.assertEqual(array.dtype, numpy.uint8)
+        self.assertAlmostEqual(numpy.mean(array == 0), 0.75, delta=0.05)
+        # values which do not fit uint8 are left out
+        self.assertEqual(array.max(), 255)
+        self.assertEqual(g.segment(254).three_d_volume.value, 255)
+        self.assertIsNone(g.segment(255).three_d_volume)
+        self.assertEqual(g.primary_descriptor, u'three_d_volume')
+        # segments alternate between lattices
+        g = generate.SegmentationGenerator(segments=5, lattices=2, lattice_shape=(4, 4, 4), sparsity=0.5)
+        self.assertEqual((g.segment(3).three_d_volume.lattice_id, g.segment(3).three_d_volume.value), (1, 2))
+        # binary masks only hold the first segment of each lattice
+        g = generate.SegmentationGenerator(segments=5, lattices=2, lattice_shape=(4, 4, 4), lattice_mode=u'bit',
+                                           sparsity=0.5)
+        self.assertEqual((g.segment(1).three_d_volume.lattice_id, g.segment(1).three_d_volume.value), (1, 1))
+        self.assertIsNone(g.segment(3).three_d_volume)
+        self.assertTrue(set(numpy.unique(g.lattice_array(1))) <= {0, 1})
+        # invalid parameters
+        with self.assertRaises(generate.SFFValueError):
+            generate.SegmentationGenerator(lattice_mode=u'uint7')
+        with self.assertRaises(generate.SFFValueError):
+            generate.SegmentationGenerator(sparsity=-0.1)
+        with self.assertRaises(generate.SFFValueError):
+            generate.SegmentationGenerator(segments=-1)
+
+    def test_write(self):
+        """Test that a streamed segmentation is the same as the one in memory in every format"""
+        from ..schema.adapter_v0_8_0_dev1 import SFFSegmentation
+        g = generate.SegmentationGenerator(
+            segments=7, external_references=2, lattices=2, lattice_shape=(5, 6, 7), lattice_mode=u'int16',
+            sparsity=0.5, meshes=1, vertices=20, triangles=30, shapes=2, seed=3,
+        )
+        expected = g.segmentation()
+        self.assertTrue(expected._is_valid())
+        for fn, layout in [(u'g.sff', None), (u'g.json', None), (u'g.sffz', None), (u'g.hff', u'groups'),
+                           (u'g.hff', u'tables')]:
+            fn = os.path.join(self.temp_dir, fn)
+            self.assertEqual(g.write(fn, args=argparse.Namespace(hff_layout=layout)), 0)
+            seg = SFFSegmentation.from_file(fn)
+            self.assertEqual(seg.name, expected.name)
+            self.assertEqual(seg.primary_descriptor, u'mesh_list')
+            self.assertEqual(seg.transform_list, expected.transform_list)
+            self.assertEqual(seg.segment_list, expected.segment_list)
+            self.assertEqual(len(seg.lattice_list), 2)
+            for lattice, expected_lattice in zip(seg.lattice_list, expected.lattice_list):
+                self.assertEqual(lattice.id, expected_lattice.id)
+                self.assertTrue(numpy.array_equal(lattice.data_array, expected_lattice.data_array))
+        # the streamed XML is exactly what export writes
+        expected.export(os.path.join(self.temp_dir, u'e.sff'))
+        with open(os.path.join(self.temp_dir, u'g.sff')) as f, open(os.path.join(self.temp_dir, u'e.sff')) as e:
+            self.assertEqual(f.read(), e.read())
+        with self.assertRaises(generate.SFFValueError):
+            g.write(os.path.join(self.temp_dir, u'g.txt'))
+        # lattices of mode 'bit' (an extension of the schema) are only written when asked for
+        g = generate.SegmentationGenerator(segments=3, lattices=1, lattice_shape=(4, 4, 4), lattice_mode=u'bit')
+        fn = os.path.join(self.temp_dir, u'b.sff')
+        self.assertEqual(g.write(fn), 65)
+        self.assertFalse(os.path.exists(fn))
+        self.assertEqual(g.write(fn, args=argparse.Namespace(schema_extensions=True)), 0)
+        self.assertEqual(SFFSegmentation.from_file(fn).lattice_list[0].mode, u'bit')
+
+    def test_write_tables(self):
+        """Test the 'tables' HDF5 layout written in more than one batch"""
+        from ..schema.adapter_v0_8_0_dev1 import SFFSegmentation
+        g = generate.SegmentationGenerator(segments=generate.TABLE_BATCH + 10, shapes=1)
+        fn = os.path.join(self.temp_dir, u'g.hff')
+        g.write(fn, args=argparse.Namespace(hff_layout=u'tables'))
+        seg = SFFSegmentation.from_file(fn)
+        self.assertEqual(len(seg.segment_list), generate.TABLE_BATCH + 10)
+        self.assertEqual(seg.segment_list.get_by_id(generate.TABLE_BATCH + 5), g.segment(generate.TABLE_BATCH + 4))
+
+    def test_write_large_payloads(self):
+        """Test that HDF5 lattice payloads too large for a string are written in chunks and read back"""
+        from ..schema.adapter_v0_8_0_dev1 import SFFSegmentation
+        g = generate.SegmentationGenerator(segments=5, lattices=2, lattice_shape=(6, 7, 8), sparsity=0.5)
+        fn = os.path.join(self.temp_dir, u'g.hff')
+        with mock.patch.object(generate, u'HFF_STRING_LIMIT', 100):
+            with mock.patch.object(generate, u'HFF_PAYLOAD_CHUNK', 64):
+                g.write(fn)
+        with h5py.File(fn, u'r') as h:
+            data = h[u'lattice_list/0/data']
+            self.assertEqual(data.dtype, numpy.uint8)
+            self.assertEqual(data.chunks, (64,))
+            self.assertGreater(data.shape[0], 2 * 64)  # several chunks
+        seg = SFFSegmentation.from_file(fn)
+        for index, lattice in enumerate(seg.lattice_list):
+            self.assertTrue(numpy.array_equal(lattice.data_array, g.lattice_array(index)))
+        # and exported to other formats
+        seg.export(os.path.join(self.temp_dir, u'g.sff'))
+        seg = SFFSegmentation.from_file(os.path.join(self.temp_dir, u'g.sff'))
+        self.assertTrue(numpy.array_equal(seg.lattice_list[1].data_array, g.lattice_array(1)))
+
+
+class TestCoreCache(Py23FixTestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.out_dir = tempfile.mkdtemp()
+        self.sff_file = os.path.join(TEST_DATA_PATH, 'sff', 'v0.8', 'emd_1832.sff')
+        self.hff_file = os.path.join(TEST_DATA_PATH, 'sff', 'v0.8', 'emd_1832.hff')
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+        shutil.rmtree(self.out_dir)
+
+    def test_key(self):
+        """Test that keys depend on the input content, output format and options"""
+        c = cache.ConversionCache(self.cache_dir)
+        key = c.key(self.sff_file, 'file.hff')
+        self.assertEqual(key, c.key(self.sff_file, 'other.h5'))
+        self.assertNotEqual(key, c.key(self.sff_file, 'file.json'))
+        self.assertNotEqual(key, c.key(self.hff_file, 'file.hff'))
+        self.assertNotEqual(key, c.key(self.sff_file, 'file.hff', argparse.Namespace(details=u'details')))
+        # a copy of the input has the same key
+        copy_file = os.path.join(self.out_dir, 'copy.sff')
+        shutil.copy(self.sff_file, copy_file)
+        self.assertEqual(key, c.key(copy_file, 'file.hff'))
+        with self.assertRaises(ValueError):
+            c.key(self.sff_file, 'file.xxx')
+
+    def test_fetch_store(self):
+        """Test that stored conversions can be fetched"""
+        c = cache.ConversionCache(self.cache_dir)
+        output = os.path.join(self.out_dir, 'emd_1832.hff')
+        key = c.key(self.hff_file, output)
+        self.assertFalse(c.fetch(key, output))
+        c.store(key, self.hff_file)
+        self.assertTrue(c.fetch(key, output))
+        with open(output, 'rb') as f, open(self.hff_file, 'rb') as g:
+            self.assertEqual(f.read(), g.read())
+        self.assertEqual(c.size, os.path.getsize(self.hff_file))
+        # entries (which may be hardlinked to outputs) have the permissions of new files
+        umask = os.umask(0o022)
+        os.umask(umask)
+        self.assertEqual(os.stat(c._entry(key)).st_mode & 0o777, 0o666 & ~umask)
+        c.clear()
+        self.assertEqual(c.size, 0)
+
+    def test_hardlink(self):
+        """Test that hits may be hardlinked"""
+        c = cache.ConversionCache(self.cache_dir, hardlink=True)
+        output = os.path.join(self.out_dir, 'emd_1832.sff')
+        key = c.key(self.sff_file, output)
+        c.store(key, self.sff_file)
+        self.assertTrue(c.fetch(key, output))
+        self.assertEqual(os.stat(output).st_nlink, 2)
+
+    def test_evict(self):
+        """Test that the least recently used entries are evicted first"""
+        size = os.path.getsize(self.sff_file)
+        c = cache.ConversionCache(self.cache_dir, max_size=2 * size)
+        output = os.path.join(self.out_dir, 'out.sff')
+        keys = [c.key(self.sff_file, 'file.sff', argparse.Namespace(details=_str(i))) for i in range(3)]
+        c.store(keys[0], self.sff_file)
+        c.store(keys[1], self.sff_file)
+        # make the first entry the least recently used
+        os.utime(c._entry(keys[0]), (0, 0))
+        c.store(keys[2], self.sff_file)
+        self.assertEqual(c.size, 2 * size)
+        self.assertFalse(c.fetch(keys[0], output))
+        self.assertTrue(c.fetch(keys[1], output))
+        self.assertTrue(c.fetch(keys[2], output))
+
+    def test_fetch_evicted(self):
+        """Test that an entry evicted while being fetched is a miss"""
+        c = cache.ConversionCache(self.cache_dir)
+        output = os.path.join(self.out_dir, 'emd_1832.sff')
+        key = c.key(self.sff_file, output)
+        c.store(key, self.sff_file)
+        utime = os.utime
+
+        def _evict(path, times):
+            utime(path, times)
+            os.remove(path)
+
+        with mock.patch.object(cache.os, u'utime', side_effect=_evict):
+            self.assertFalse(c.fetch(key, output))
+        self.assertFalse(os.path.exists(output))
+
+    def test_convert(self):
+        """Test converting through the cache"""
+        c = cache.ConversionCache(self.cache_dir)
+        output = os.path.join(self.out_dir, 'emd_1832.json')
+        self.assertEqual(c.convert(self.sff_file, output), 0)
+        self.assertEqual(c.size, os.path.getsize(output))
+        os.remove(output)
+        self.assertEqual(c.convert(self.sff_file, output), 0)
+        self.assertTrue(os.path.exists(output))
+        self.assertEqual(len(c._entries()), 1)
+
+    def test_convert_delegates(self):
+        """Test that misses are converted as by ``sff convert``"""
+        c = cache.ConversionCache(self.cache_dir)
+        output = os.path.join(self.out_dir, 'emd_1832.json')
+        args = argparse.Namespace(details=u'details')
+        with mock.patch(u'sfftkrw.sffrw.convert_file', return_value=1) as convert_file:
+            self.assertEqual(c.convert(self.sff_file, output, args), 1)
+        convert_file.assert_called_once_with(self.sff_file, output, args)
+        self.assertEqual(len(c._entries()), 0)
+
+
+def _write_store_region(path, offset, value):
+    """Write a region of ``value`` to the store at ``path`` (run in worker processes)"""
+    store.LatticeStore(path).write_region(offset, numpy.full((10, 10, 10), value, dtype=numpy.uint16))
+
+
+class TestCoreStore(Py23FixTestCase):
+    def setUp(self):
+        self.store_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.store_dir)
+
+    def test_regions(self):
+        """Test writing and reading regions across chunks"""
+        s = store.LatticeStore.create(os.path.join(self.store_dir, u'1'), (20, 30, 25), mode=u'int16',
+                                      endianness=u'big', chunks=(8, 8, 8))
+        self.assertTrue(numpy.array_equal(s.read_region((0, 0, 0), (20, 30, 25)), numpy.zeros((20, 30, 25))))
+        expected = numpy.zeros((20, 30, 25), dtype=numpy.int16)
+        for offset, shape in [((3, 5, 7), (10, 12, 9)), ((0, 0, 0), (8, 8, 8)), ((12, 20, 15), (8, 10, 10))]:
+            region = numpy.random.randint(-1000, 1000, size=shape)
+            s.write_region(offset, region)
+            expected[tuple(slice(o, o + n) for o, n in zip(offset, shape))] = region
+        # chunks and the manifest have the permissions of new files
+        umask = os.umask(0o022)
+        os.umask(umask)
+        for name in [u'manifest.json', u'chunks/0.0.0']:
+            self.assertEqual(os.stat(os.path.join(self.store_dir, u'1', name)).st_mode & 0o777, 0o666 & ~umask)
+        # reopened
+        s = store.LatticeStore(os.path.join(self.store_dir, u'1'))
+        self.assertEqual(s.dtype, numpy.dtype(u'>i2'))
+        self.assertTrue(numpy.array_equal(s.read_region((0, 0, 0), (20, 30, 25)), expected))
+        self.assertTrue(numpy.array_equal(s.read_region((5, 6, 7), (9, 9, 9)), expected[5:14, 6:15, 7:16]))
+        with self.assertRaises(ValueError):
+            s.read_region((15, 0, 0), (10, 1, 1))
+        with self.assertRaises(ValueError):
+            s.write_region((0, 0, 0), numpy.zeros((21, 1, 1)))
+        # values which do not fit the mode are rejected, not wrapped
+        with self.assertRaises(ValueError):
+            s.write_region((0, 0, 0), numpy.full((1, 1, 1), 40000))
+        with self.assertRaises(ValueError):
+            s.write_region((0, 0, 0), numpy.full((1, 1, 1), 1.5))
+        s.write_region((0, 0, 0), numpy.full((1, 1, 1), -2.0))
+        self.assertEqual(s.read_region((0, 0, 0), (1, 1, 1))[0, 0, 0], -2)
+        u = store.LatticeStore.create(os.path.join(self.store_dir, u'2'), (2, 2, 2), mode=u'uint16')
+        with self.assertRaises(ValueError):
+            u.write_region((0, 0, 0), numpy.full((1, 1, 1), -1))
+        b = store.LatticeStore.create(os.path.join(self.store_dir, u'3'), (2, 2, 2), mode=u'bit')
+        with self.assertRaises(ValueError):
+            b.write_region((0, 0, 0), numpy.full((1, 1, 1), 2, dtype=numpy.uint8))
+        with self.assertRaises(ValueError):
+            store.LatticeStore.create(os.path.join(self.store_dir, u'1'), (1, 1, 1))
+        with self.assertRaises(ValueError):
+            store.LatticeStore(self.store_dir)
+
+    def test_parallel_writes(self):
+        """Test that processes may write overlapping regions of the same chunks at once"""
+        path = os.path.join(self.store_dir, u'1')
+        store.LatticeStore.create(path, (10, 10, 40), mode=u'uint16', chunks=(16, 16, 16))
+        offsets = [(0, 0, i * 10) for i in range(4)]
+        with ProcessPoolExecutor(max_workers=4) as executor:
+            list(executor.map(_write_store_region, [path] * 4, offsets, range(1, 5)))
+        region = store.LatticeStore(path).read_region((0, 0, 0), (10, 10, 40))
+        for i in range(4):
+            self.assertTrue(numpy.all(region[:, :, i * 10:(i + 1) * 10] == i + 1))
+
+    def test_convert(self):
+        """Test moving lattices between EMDB-SFF files and stores"""
+        from ..schema.adapter_v0_8_0_dev1 import SFFSegmentation
+        fn = os.path.join(TEST_DATA_PATH, u'sff', u'v0.8', u'emd_1547.sff')
+        seg = SFFSegmentation.from_file(fn)
+        stores = store.export_lattices(fn, self.store_dir, chunks=(32, 32, 32))
+        self.assertEqual(len(stores), len(seg.lattice_list))
+        for s, lattice in zip(stores, seg.lattice_list):
+            self.assertEqual(s.id, lattice.id)
+            self.assertTrue(numpy.array_equal(s.to_lattice().data_array, lattice.data_array))
+        output = os.path.join(self.store_dir, u'emd_1547.hff')
+        self.assertEqual(store.import_lattices(fn, self.store_dir, output), 0)
+        out_seg = SFFSegmentation.from_file(output)
+        self.assertEqual(len(out_seg.lattice_list), len(seg.lattice_list))
+        for out_lattice, lattice in zip(out_seg.lattice_list, seg.lattice_list):
+            self.assertEqual(out_lattice.id, lattice.id)
+            self.assertEqual(out_lattice.mode, lattice.mode)
+            self.assertTrue(numpy.array_equal(out_lattice.data_array, lattice.data_array))
+
+    def test_convert_non_cubic(self):
+        """Test that lattices which are not cubes keep their size and data through a store"""
+        from ..schema.adapter_v0_8_0_dev1 import SFFSegmentation
+        fn = os.path.join(self.store_dir, u'non_cubic.sff')
+        generate.SegmentationGenerator(segments=4, lattices=1, lattice_shape=(3, 4, 5), sparsity=0.5).write(fn)
+        seg = SFFSegmentation.from_file(fn)
+        stores = store.export_lattices(fn, os.path.join(self.store_dir, u'stores'))
+        self.assertEqual(stores[0].shape, (3, 4, 5))
+        output = os.path.join(self.store_dir, u'non_cubic.hff')
+        self.assertEqual(store.import_lattices(fn, os.path.join(self.store_dir, u'stores'), output), 0)
+        lattice, out_lattice = seg.lattice_list[0], SFFSegmentation.from_file(output).lattice_list[0]
+        self.assertEqual(out_lattice.size, lattice.size)
+        self.assertEqual(out_lattice.size.value, (5, 4, 3))
+        self.assertTrue(numpy.array_equal(out_lattice.data_array, lattice.data_array))
+
+
+class TestCoreUpgrade(Py23FixTestCase):
+    @classmethod
+    def setUpClass(cls):
+        from ..schema import adapter_v0_7_0_dev0 as adapter, v0_7_0_dev0 as emdb_sff
+        cls.upgrade_dir = tempfile.mkdtemp()
+        # a v0.7 segmentation of meshes: each vertex is followed by its normal and polygons are quads
+        cls.meshes = list()
+        segmentation = adapter.SFFSegmentation(name=u'meshes', version=u'0.7.0.dev0', primaryDescriptor=u'meshList')
+        segmentation.software = adapter.SFFSoftware(name=u'sfftk-rw', version=u'0.7.0', processingDetails=u'none')
+        segmentation.transforms = adapter.SFFTransformList()
+        segmentation.transforms.append(adapter.SFFTransformationMatrix(
+            rows=3, cols=4, data=u" ".join(map(_str, range(12)))))
+        segmentation.segments = adapter.SFFSegmentList()
+        vID = 0
+        for _ in _xrange(2):
+            segment = adapter.SFFSegment(colour=adapter.SFFRGBA(random_colour=True))
+            segment.biological_annotation = adapter.SFFBiologicalAnnotation(name=rw.random_word())
+            segment.meshes = adapter.SFFMeshList()
+            for _ in _xrange(2):
+                no_vertices = _random_integer(start=4, stop=50)
+                points = numpy.random.rand(no_vertices, 2, 3).astype(numpy.float32)
+                vertices = list()
+                for surface, normal in points:
+                    vertices.append(emdb_sff.vertexType(vID=vID, designation=u'surface', x=float(surface[0]),
+                                                        y=float(surface[1]), z=float(surface[2])))
+                    vertices.append(emdb_sff.vertexType(vID=vID + 1, designation=u'normal', x=float(normal[0]),
+                                                        y=float(normal[1]), z=float(normal[2])))
+                    vID += 2
+                first = vID - 2 * no_vertices
+                quads = numpy.random.randint(0, no_vertices, size=(_random_integer(start=1, stop=50), 4))
+                polygons = [
+                    emdb_sff.polygonType(PID=i, v=[int(first + 2 * j + k) for j in quad for k in (0, 1)])
+                    for i, quad in enumerate(quads)
+                ]
+                segment.meshes.append(adapter.SFFMesh.from_gds_type(emdb_sff.meshType(
+                    id=len(segment.meshes),
+                    vertexList=emdb_sff.vertexListType(v=vertices),
+                    polygonList=emdb_sff.polygonListType(P=polygons),
+                )))
+                triangles = numpy.concatenate((quads[:, [0, 1, 2]], quads[:, [0, 2, 3]]), axis=1).reshape(-1, 3)
+                cls.meshes.append((points[:, 0], points[:, 1], triangles))
+            segmentation.segments.append(segment)
+        segmentation.lattices = adapter.SFFLatticeList()
+        cls.v0_7_sff = os.path.join(cls.upgrade_dir, u'meshes.sff')
+        cls.v0_7_hff = os.path.join(cls.upgrade_dir, u'meshes.hff')
+        segmentation.export(cls.v0_7_sff)
+        segmentation.export(cls.v0_7_hff)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.upgrade_dir)
+
+    def test_meshes(self):
+        """Test upgrading v0.7 meshes to encoded v0.8 meshes"""
+        from ..schema.adapter_v0_8_0_dev1 import SFFSegmentation
+        for fn in [self.v0_7_sff, self.v0_7_hff]:
+            for ext in [u'sff', u'hff', u'json']:
+                output = os.path.join(self.upgrade_dir, u'upgraded.{}'.format(ext))
+                self.assertEqual(upgrade.upgrade(fn, output), 0)
+                seg = SFFSegmentation.from_file(output)
+                self.assertEqual(seg.version, u'0.8.0.dev1')
+                self.assertEqual(seg.primary_descriptor, u'mesh_list')
+                self.assertEqual(seg.software_list[0].name, u'sfftk-rw')
+                self.assertEqual(len(seg.transform_list), 1)
+                self.assertEqual(len(seg.segment_list), 2)
+                meshes = [mesh for segment in seg.segment_list for mesh in segment.mesh_list]
+                self.assertEqual(len(meshes), len(self.meshes))
+                for mesh, (vertices, normals, triangles) in zip(meshes, self.meshes):
+                    self.assertTrue(numpy.allclose(mesh.vertices.data_array, vertices, atol=1e-6))
+                    self.assertTrue(numpy.allclose(mesh.normals.data_array, normals, atol=1e-6))
+                    self.assertEqual(mesh.triangles.data_array.tolist(), triangles.tolist())
+
+    def test_volumes(self):
+        """Test that annotations and lattices survive upgrades"""
+        from ..schema import adapter_v0_7_0_dev0, adapter_v0_8_0_dev1
+        for name in [u'emd_1547.sff', u'emd_1547.hff', u'annotated_emd_1014.hff', u'emd_1832.hff']:
+            fn = os.path.join(TEST_DATA_PATH, u'sff', u'v0.7', name)
+            old = adapter_v0_7_0_dev0.SFFSegmentation.from_file(fn)
+            output = os.path.join(self.upgrade_dir, u'upgraded.sff')
+            self.assertEqual(upgrade.upgrade(fn, output), 0)
+            new = adapter_v0_8_0_dev1.SFFSegmentation.from_file(output)
+            self.assertEqual(new.name, old.name)
+            self.assertEqual(new.primary_descriptor, u'three_d_volume')
+            old_segments = list(old.segments)
+            if name.endswith(u'.hff'):  # HDF5 segments are upgraded in order of ID
+                old_segments.sort(key=lambda s: s.id)
+            self.assertEqual([s.id for s in new.segment_list], [s.id for s in old_segments])
+            for new_segment, old_segment in zip(new.segment_list, old_segments):
+                self.assertEqual(new_segment.parent_id, old_segment.parent_id)
+                self.assertEqual(new_segment.colour.value, old_segment.colour.value)
+                self.assertEqual(new_segment.three_d_volume.value, old_segment.volume.value)
+                new_annotation = new_segment.biological_annotation
+                old_annotation = old_segment.biological_annotation
+                if old_annotation is None:
+                    self.assertIsNone(new_annotation)
+                    continue
+                self.assertEqual(new_annotation.name, old_annotation.name)
+                self.assertEqual(
+                    [(e.resource, e.url, e.accession) for e in new_annotation.external_references or []],
+                    [(e.type, e.other_type, e.value) for e in old_annotation.external_references or []]
+                )
+            for new_lattice, old_lattice in zip(new.lattice_list, old.lattices):
+                self.assertEqual(new_lattice.id, old_lattice.id)
+                self.assertTrue(numpy.array_equal(new_lattice.data_array, old_lattice.data_array))
+        # v0.7 JSON has no geometry
+        self.assertEqual(upgrade.upgrade(os.path.join(TEST_DATA_PATH, u'sff', u'v0.7', u'emd_1547.json'),
+                                         os.path.join(self.upgrade_dir, u'upgraded.sff')), 64)
+
+    def test_other_versions(self):
+        """Test that files which are not v0.7 are rejected"""
+        output = os.path.join(self.upgrade_dir, u'not_upgraded.sff')
+        for name in [u'emd_1547.sff', u'emd_1547.hff']:
+            self.assertEqual(upgrade.upgrade(os.path.join(TEST_DATA_PATH, u'sff', u'v0.8', name), output), 65)
+        self.assertFalse(os.path.exists(output))
+        self.assertEqual(upgrade.upgrade(os.path.join(self.upgrade_dir, u'missing.hff'), output), 74)
+
+
+class TestCoreServe(Py23FixTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super(TestCoreServe, cls).setUpClass()
+        cls.temp_dir = tempfile.mkdtemp()
+        cls.socket_path = os.path.join(cls.temp_dir, 'sfftkrw.sock')
+        cls.server = serve.JobServer(cls.socket_path, workers=1)
+        cls.server.pool.submit(os.getpid).result()  # start the worker before any test replaces the standard streams
+        cls.thread = threading.Thread(target=cls.server.serve_forever)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.thread.join()
+        shutil.rmtree(cls.temp_dir)
+        super(TestCoreServe, cls).tearDownClass()
+
+    def test_view(self):
+        """Test a view job"""
+        response = serve.submit(['view', 'emd_1832.sff'], socket_path=self.socket_path,
+                                cwd=os.path.join(TEST_DATA_PATH, 'sff', 'v0.8'))
+        self.assertEqual(response['status'], 0)
+        self.assertIn(u'No. of segments: 6', response['stdout'])
+
+    def test_convert(self):
+        """Test a convert job"""
+        output = os.path.join(self.temp_dir, 'emd_1832.json')
+        response = serve.submit(
+            ['convert', '-v', os.path.join(TEST_DATA_PATH, 'sff', 'v0.8', 'emd_1832.sff'), '-o', output],
+            socket_path=self.socket_path
+        )
+        self.assertEqual(response['status'], 0)
+        self.assertIn(u'Exporting to {}'.format(output), response['stderr'])
+        self.assertTrue(os.path.exists(output))
+
+    def test_validate(self):
+        """Test a validate job"""
+        fn = os.path.join(TEST_DATA_PATH, 'sff', 'v0.8', 'emd_1832.hff')
+        response = serve.submit(['validate', fn], socket_path=self.socket_path)
+        self.assertEqual(response['status'], 0)
+        self.assertEqual(response['stdout'], u'{}: valid\n'.format(fn))
+        not_sff = os.path.join(self.temp_dir, 'not_sff.json')
+        with open(not_sff, 'w') as f:
+            json.dump({u'name': u'not EMDB-SFF'}, f)
+        response = serve.submit(['validate', fn, not_sff], socket_path=self.socket_path)
+        self.assertEqual(response['status'], 65)
+        self.assertEqual(response['stdout'], u'{}: valid\n{}: invalid\n'.format(fn, not_sff))
+        response = serve.submit(['validate', 'missing.sff'], socket_path=self.socket_path, cwd=self.temp_dir)
+        self.assertEqual(response['status'], 74)
+
+    def test_working_directory(self):
+        """Test that jobs leave the working directory of the worker unchanged"""
+        cwd = os.getcwd()
+        response = serve.run_job(['view', 'emd_1832.sff'], os.path.join(TEST_DATA_PATH, 'sff', 'v0.8'))
+        self.assertEqual(response['status'], 0)
+        self.assertEqual(os.getcwd(), cwd)
+
+    def test_client(self):
+        """Test the lightweight client"""
+        fn = os.path.join(TEST_DATA_PATH, 'sff', 'v0.8', 'emd_1832.hff')
+        with mock.patch('sys.stdout') as stdout:
+            self.assertEqual(sfftkrw_client.main(['--socket', self.socket_path, 'validate', fn]), 0)
+        stdout.write.assert_called_once_with(u'{}: valid\n'.format(fn))
+        with mock.patch('sys.stderr'):
+            self.assertEqual(sfftkrw_client.main(['--socket', self.socket_path]), 64)
+            missing = os.path.join(self.temp_dir, 'missing.sock')
+            self.assertEqual(sfftkrw_client.main(['--socket', missing, 'validate', fn]), 69)
+        # the client imports neither sfftkrw nor its dependencies
+        modules = subprocess.check_output([
+            sys.executable, '-c', 'import sys, sfftkrw_client; print(sorted(sys.modules))'
+        ], cwd=os.path.dirname(os.path.abspath(sfftkrw_client.__file__)))
+        for module in ['sfftkrw', 'h5py', 'lxml', 'numpy']:
+            self.assertNotIn(u"'{}'".format(module), modules.decode(u'utf-8'))
+
+    def test_errors(self):
+        """Test that failing jobs report their status"""
+        response = serve.submit(['unknown'], socket_path=self.socket_path)
+        self.assertEqual(response['status'], 64)
+        response = serve.submit(['convert', '-R', 'something', 'file.sff'], socket_path=self.socket_path)
+        self.assertEqual(response['status'], 64)
+        response = serve.submit(['view', 'missing.sff'], socket_path=self.socket_path, cwd=self.temp_dir)
+        self.assertNotEqual(response['status'], 0)
+        self.assertIn(u'missing.sff', response['stderr'])
+
+    def test_existing_socket_path(self):
+        """Test that only stale sockets are replaced"""
+        import socket
+        # a running server is not taken over
+        with self.assertRaises(OSError):
+            serve.JobServer(self.socket_path, workers=1)
+        self.assertEqual(serve.serve(self.socket_path, workers=1), 73)
+        fn = os.path.join(TEST_DATA_PATH, 'sff', 'v0.8', 'emd_1832.hff')
+        self.assertEqual(serve.submit(['validate', fn], socket_path=self.socket_path)['status'], 0)
+        # nor is a file which is not a socket removed
+        path = os.path.join(self.temp_dir, 'file.sock')
+        with open(path, 'w') as f:
+            f.write(u'not a socket')
+        with self.assertRaises(OSError):
+            serve.JobServer(path, workers=1)
+        self.assertTrue(os.path.isfile(path))
+        os.remove(path)
+        # a socket on which no one is listening is replaced
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(path)
+        stale.close()
+        server = serve.JobServer(path, workers=1)
+        server.server_close()
+        self.assertFalse(os.path.exists(path))
@@ -7,15 +7,20 @@ Unit tests for convert subcommand
 """
 from __future__ import division, print_function
 
+import csv
 import glob
 import importlib
+import io
+import json
 import os
 import shlex
 import shutil
 import sys
+import tempfile
+from unittest import mock
 
 from . import TEST_DATA_PATH, Py23FixTestCase
-from .. import SFFSegmentation
+from .. import SFFSegmentation, SFFTransformationMatrix
 from .. import sffrw as Main
 from ..core.parser import parse_args
 
@@ -130,6 +135,47 @@ class TestMainHandleConvert(Py23FixTestCase):
         self.assertIsNone(segment.three_d_volume)
         self.assertTrue(len(seg.lattice_list) == 0)
 
+    def test_cache(self):
+        """Test that repeat conversions are served from the cache"""
+        cache_dir = tempfile.mkdtemp()
+        output_fn = os.path.join(TEST_DATA_PATH, 'test_data.json')
+        cmd = 'convert --cache-dir {cache_dir} -o {output} {input}'.format(
+            cache_dir=cache_dir,
+            output=output_fn,
+            input=os.path.join(TEST_DATA_PATH, 'sff', 'v0.8', 'emd_1832.hff'),
+        )
+        try:
+            self.assertEqual(Main.handle_convert(parse_args(cmd, use_shlex=True)), 0)
+            with open(output_fn) as f:
+                converted = f.read()
+            os.remove(output_fn)
+            # the hit does not load the input
+            with mock.patch.object(SFFSegmentation, 'from_file') as from_file:
+                self.assertEqual(Main.handle_convert(parse_args(cmd, use_shlex=True)), 0)
+                from_file.assert_not_called()
+            with open(output_fn) as f:
+                self.assertEqual(f.read(), converted)
+            # different options miss
+            with mock.patch.object(SFFSegmentation, 'from_file', wraps=SFFSegmentation.from_file) as from_file:
+                Main.handle_convert(parse_args(cmd + ' --json-sort', use_shlex=True))
+                from_file.assert_called_once()
+        finally:
+            shutil.rmtree(cache_dir)
+
+    def test_intern_transforms(self):
+        """Test that we can remove duplicate transforms when converting"""
+        seg = SFFSegmentation.from_file(os.path.join(TEST_DATA_PATH, 'sff', 'v0.8', 'emd_1014.sff'))
+        # give every transform a duplicate
+        transform_list = seg.transform_list
+        for array in transform_list.as_array():
+            transform_list.append(SFFTransformationMatrix.from_array(array))
+        input_fn = os.path.join(TEST_DATA_PATH, 'test_data.json')
+        seg.export(input_fn)
+        output_fn = os.path.join(TEST_DATA_PATH, 'test_data.sff')
+        args = parse_args('convert --intern-transforms -o {} {}'.format(output_fn, input_fn), use_shlex=True)
+        self.assertEqual(Main.handle_convert(args), 0)
+        self.assertEqual(len(SFFSegmentation.from_file(output_fn).transform_list), len(seg.transform_list) // 2)
+
 
 class TestMainHandleView(Py23FixTestCase):
     def test_read_sff(self):
@@ -153,6 +199,38 @@ class TestMainHandleView(Py23FixTestCase):
         ), use_shlex=True)
         self.assertEqual(0, Main.handle_view(args))
 
+    def test_read_summary(self):
+        """Test that view prints the summary"""
+        args = parse_args('view {} '.format(
+            os.path.join(TEST_DATA_PATH, 'sff', 'v0.8', 'emd_1547.hff'),
+        ), use_shlex=True)
+        with mock.patch('sys.stdout', new_callable=io.StringIO) as stdout:
+            self.assertEqual(0, Main.handle_view(args))
+        self.assertIn(u"EMDB-SFF Segmentation version 0.8.0.dev1", stdout.getvalue())
+        self.assertIn(u"Format: HDF5", stdout.getvalue())
+        self.assertIn(u"Primary descriptor: three_d_volume", stdout.getvalue())
+        self.assertIn(u"No. of segments: 5", stdout.getvalue())
+
+    def test_read_not_sff(self):
+        """Test that we report files without EMDB-SFF content"""
+        args = parse_args('view {} '.format(
+            os.path.join(TEST_DATA_PATH, 'sff', 'v0.7', 'output_emd_1014.hff'),
+        ), use_shlex=True)
+        self.assertEqual(65, Main.handle_view(args))
+
+    def test_batch(self):
+        """Test that we can view a directory as CSV"""
+        args = parse_args('view --batch -w 2 {}'.format(os.path.join(TEST_DATA_PATH, 'sff', 'v0.8')), use_shlex=True)
+        with mock.patch('sys.stdout', new_callable=io.StringIO) as stdout:
+            self.assertEqual(0, Main.handle_view(args))
+        rows = list(csv.DictReader(io.StringIO(stdout.getvalue())))
+        self.assertEqual(len(rows), len(glob.glob(os.path.join(TEST_DATA_PATH, 'sff', 'v0.8', '*.*'))))
+        row = [row for row in rows if row['file'].endswith('emd_1547.json')][0]
+        self.assertEqual(row['format'], 'JSON')
+        self.assertEqual(row['version'], '0.8.0.dev1')
+        self.assertEqual(row['segments'], '5')
+        self.assertEqual(row['error'], '')
+
     def test_read_unknown(self):
         """Test that we cannot view unknown"""
         args = parse_args('view {}'.format(
@@ -163,6 +241,54 @@ class TestMainHandleView(Py23FixTestCase):
             Main.handle_view(args)
 
 
+class TestMainHandleUpgrade(Py23FixTestCase):
+    def test_upgrade(self):
+        """Test that we can upgrade a v0.7 file"""
+        output_fn = os.path.join(tempfile.mkdtemp(), 'emd_1832.sff')
+        args = parse_args('upgrade --verbose -o {} {}'.format(
+            output_fn,
+            os.path.join(TEST_DATA_PATH, 'sff', 'v0.7', 'emd_1832.hff'),
+        ), use_shlex=True)
+        try:
+            self.assertEqual(Main.handle_upgrade(args), 0)
+            seg = SFFSegmentation.from_file(output_fn)
+            self.assertEqual(seg.version, '0.8.0.dev1')
+            self.assertEqual(len(seg.segment_list), 6)
+        finally:
+            shutil.rmtree(os.path.dirname(output_fn))
+
+
+class TestMainHandleBench(Py23FixTestCase):
+    def test_bench(self):
+        """Test that benchmark results are written as JSON"""
+        output_fn = os.path.join(tempfile.mkdtemp(), 'bench.json')
+        args = parse_args('bench -s 2 -r 1 -b annotation sequence_codecs -o {}'.format(output_fn), use_shlex=True)
+        try:
+            self.assertEqual(Main.handle_bench(args), 0)
+            with open(output_fn) as f:
+                report = json.load(f)
+            self.assertEqual(report['sizes'], [2])
+            self.assertIn('merge_annotation', [r['benchmark'] for r in report['results']])
+            self.assertIn('sequence_decode', [r['benchmark'] for r in report['results']])
+        finally:
+            shutil.rmtree(os.path.dirname(output_fn))
+
+
+class TestMainHandleGenerate(Py23FixTestCase):
+    def test_generate(self):
+        """Test that a synthetic segmentation is written"""
+        output_fn = os.path.join(tempfile.mkdtemp(), 'synthetic.sffz')
+        args = parse_args('generate -n 12 -l 1 --lattice-shape 4 5 6 -m 1 --vertices 8 --triangles 6 {}'.format(
+            output_fn), use_shlex=True)
+        try:
+            self.assertEqual(Main.handle_generate(args), 0)
+            seg = SFFSegmentation.from_file(output_fn)
+            self.assertEqual(len(seg.segment_list), 12)
+            self.assertEqual(seg.lattice_list[0].data_array.shape, (4, 5, 6))
+        finally:
+            shutil.rmtree(os.path.dirname(output_fn))
+
+
 class TestMainHandleTests(Py23FixTestCase):
     """The test runners"""
 
@@ -238,6 +364,25 @@ class TestMainMain(Py23FixTestCase):
         status = Main.main()
         self.assertEqual(status, 0)
 
+    def test_main_validate(self):
+        """Test the validate subcommand"""
+        in_file = os.path.join(TEST_DATA_PATH, u'sff', u'v0.8', u'emd_1832.sff')
+        sys.argv = shlex.split(u"sff validate {} {}".format(in_file, in_file.replace(u'.sff', u'.hff')))
+        self.assertEqual(Main.main(), 0)
+
+    def test_main_server(self):
+        """Test that `--server` hands the job to the server"""
+        in_file = os.path.join(TEST_DATA_PATH, u'sff', u'v0.8', u'emd_1832.sff')
+        cmd = shlex.split(u"sff view --server /tmp/sfftkrw-test.sock {}".format(
+            in_file,
+        ))
+        sys.argv = cmd
+        response = {u'status': 65, u'stdout': u'', u'stderr': u''}
+        with mock.patch(u'sfftkrw.core.serve.submit', return_value=response) as submit:
+            status = Main.main()
+        submit.assert_called_once_with(cmd[1:], socket_path=u'/tmp/sfftkrw-test.sock')
+        self.assertEqual(status, 65)
+
     def test_main_tests(self):
         """Test the main entry point"""
         cmd = shlex.split(u"sff tests all --dry-run")
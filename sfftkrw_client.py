@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+# sfftkrw_client.py
+"""
+sfftkrw_client.py
+=================
+
+A lightweight client for the conversion server (``sff serve``; see :py:mod:`sfftkrw.core.serve`)
+
+Running ``sff <job> --server <socket>`` imports the whole of ``sfftkrw`` (and therefore ``h5py``, ``lxml``, ``numpy``
+and the adapters) only to hand the job over. This module lives outside the ``sfftkrw`` package and uses only the
+standard library so that sending a job costs no more than starting the interpreter:
+
+.. code:: bash
+
+    sff-client --socket /tmp/sfftkrw.sock convert file.sff -o file.hff
+    sff-client --socket /tmp/sfftkrw.sock view file.hff
+    sff-client --socket /tmp/sfftkrw.sock validate file.sff file.hff
+
+The exit status is that of the job; the job's output is written to the standard streams.
+"""
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import socket
+import sys
+import tempfile
+
+__author__ = 'Paul K. Korir, PhD'
+__email__ = 'pkorir@ebi.ac.uk, paul.korir@gmail.com'
+__date__ = '2026-10-19'
+
+#: the default path of the server socket
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), u'sfftkrw.sock')
+
+
+def submit(argv, socket_path=DEFAULT_SOCKET, cwd=None):
+    """Submit a job to a running server
+
+    :param list argv: the job's command-line arguments e.g. ``['convert', 'file.sff']``
+    :param str socket_path: the path of the server's socket
+    :param str cwd: the directory against which relative paths are resolved (default: the current directory)
+    :return: the response with keys ``status``, ``stdout`` and ``stderr``
+    :rtype: dict
+    """
+    if cwd is None:
+        cwd = os.getcwd()
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socket_path)
+        client.sendall(json.dumps({u'argv': list(argv), u'cwd': cwd}).encode(u'utf-8') + b'\n')
+        with client.makefile(u'rb') as f:
+            return json.loads(f.readline().decode(u'utf-8'))
+    finally:
+        client.close()
+
+
+def main(argv=None):
+    """Send the job in ``argv`` (default: the command line) to the server and write out its output
+
+    :param list argv: ``[-s SOCKET] job [job arguments ...]``
+    :return int status: the job's exit status; 69 if there is no server
+    """
+    parser = argparse.ArgumentParser(
+        prog=u'sff-client', description=u"Send a convert, view or validate job to a running 'sff serve'")
+    parser.add_argument(u'-s', u'--socket', default=DEFAULT_SOCKET,
+                        help=u"path of the server's Unix domain socket [default: {}]".format(DEFAULT_SOCKET))
+    parser.add_argument(u'job', nargs=argparse.REMAINDER,
+                        help=u"the job as it would be given to 'sff' e.g. convert file.sff -o file.hff")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+    if not args.job:
+        parser.print_usage(sys.stderr)
+        return 64
+    try:
+        response = submit(args.job, socket_path=args.socket)
+    except (OSError, ValueError) as error:
+        print(u"{}: the server on {} did not run the job: {}".format(parser.prog, args.socket, error),
+              file=sys.stderr)
+        return 69
+    sys.stdout.write(response[u'stdout'])
+    sys.stderr.write(response[u'stderr'])
+    return response[u'status']
+
+
+if __name__ == u'__main__':
+    sys.exit(main())